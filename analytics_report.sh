@@ -11,7 +11,6 @@ SCRIPTS_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 VAULT="${VAULT:-$HOME/vault/houjinzei}"
 EXPORT_DIR="$VAULT/50_エクスポート"
 REPORT_DIR="$VAULT/40_分析"
-MASTER_FILE="$EXPORT_DIR/problems_master.json"
 ATTEMPTS_FILE="$EXPORT_DIR/attempts.json"
 
 mkdir -p "$REPORT_DIR"
@@ -31,8 +30,8 @@ if [[ "${1:-}" == "--pull" ]]; then
   echo "取得完了: $ATTEMPTS_FILE"
 fi
 
-if [[ ! -f "$MASTER_FILE" ]]; then
-  echo "エラー: $MASTER_FILE が見つかりません" >&2
+if [[ ! -f "$EXPORT_DIR/problems/_manifest.json" && ! -f "$EXPORT_DIR/problems_master.json" ]]; then
+  echo "エラー: 問題マスタが見つかりません（$EXPORT_DIR/problems/）" >&2
   exit 1
 fi
 
@@ -43,18 +42,19 @@ fi
 
 export PYTHONPATH="${SCRIPTS_DIR}:${PYTHONPATH:-}"
 
-python3 - "$MASTER_FILE" "$ATTEMPTS_FILE" "$REPORT_DIR" <<'PYEOF'
+python3 - "$EXPORT_DIR" "$ATTEMPTS_FILE" "$REPORT_DIR" <<'PYEOF'
 import json
 import sys
 from datetime import datetime, timedelta
 from collections import defaultdict
 from pathlib import Path
 
-master_path, attempts_path, report_dir = sys.argv[1:4]
+export_dir, attempts_path, report_dir = sys.argv[1:4]
 
-with open(master_path) as f:
-    master = json.load(f)
-problems = master.get("problems", {})
+from lib.problems_master import ProblemsMaster
+
+# 件数はマニフェストから、個別の問題は該当シャードだけを読む
+problems = ProblemsMaster(export_dir)
 
 with open(attempts_path) as f:
     adata = json.load(f)
@@ -190,9 +190,12 @@ L(f"**連続学習日数: {streak}日**")
 L(f"")
 
 # ── Coverage ──
-attempted_all = len(set(a.get("problem_id", "") for a in attempts))
-cov = round(attempted_all / len(problems) * 100) if problems else 0
-L(f"**カバー率: {cov}%** ({attempted_all}/{len(problems)}問)")
+# 類似問題（同じ duplicate_group）は 1 問として数える
+coverage_unit = {pid: p.get("duplicate_group") or pid for pid, p in problems.items()}
+total_units = len(set(coverage_unit.values()))
+attempted_all = len(set(coverage_unit.get(pid, pid) for pid in (a.get("problem_id", "") for a in attempts)))
+cov = round(attempted_all / total_units * 100) if total_units else 0
+L(f"**カバー率: {cov}%** ({attempted_all}/{total_units}問)")
 L(f"")
 
 # ── Book-by-book ──
@@ -204,10 +207,10 @@ all_stats = compute_stats(attempts)
 for book in BOOK_ORDER:
     bs = all_stats["by_book"].get(book)
     if not bs:
-        total = sum(1 for p in problems.values() if p.get("book") == book)
+        total = problems.count(book)
         L(f"| {BOOK_SHORT.get(book, book)} | 0/{total} | 0 | 0 | 0 | - | 0分 |")
         continue
-    total = sum(1 for p in problems.values() if p.get("book") == book)
+    total = problems.count(book)
     rate = round(bs["correct"] / bs["total"] * 100) if bs["total"] > 0 else 0
     L(f"| {BOOK_SHORT.get(book, book)} | {bs['ids']}/{total} | {bs['total']} | {bs['correct']} | {bs['wrong']} | {rate}% | {bs['time']}分 |")
 L(f"")
@@ -92,6 +92,7 @@ from pathlib import Path
 
 from lib.anki_common import anki_request, detect_anki_host, sanitize_anki_tag, to_html_block
 from lib.houjinzei_common import atomic_json_write, eprint, extract_body_sections, read_frontmatter
+from lib.problems_master import ProblemsMaster
 from lib.topic_normalize import get_parent_category, normalize_topic
 
 
@@ -128,7 +129,7 @@ def load_exported(path: Path):
     return data
 
 
-def find_problem_by_topic(problem_map: dict, topic_id: str, note_fm: dict):
+def find_problem_by_topic(problem_map, topic_id: str, note_fm: dict):
     title_candidate = topic_id.split("/")[-1].split("_")[-1]
     normalized_topic_candidates = []
 
@@ -232,7 +233,6 @@ def main():
 
     export_dir = vault / "50_エクスポート"
     results_path = export_dir / "komekome_results.json"
-    problems_path = export_dir / "problems_master.json"
     tracking_path = export_dir / "anki_mistakes_exported.json"
 
     results = load_json(results_path, "komekome_results.json")
@@ -252,10 +252,13 @@ def main():
         eprint("エラー: komekome_results.json の results が配列ではありません")
         raise SystemExit(1)
 
-    problems_data = load_json(problems_path, "problems_master.json")
-    problem_map = problems_data.get("problems") if isinstance(problems_data, dict) else None
-    if not isinstance(problem_map, dict):
-        eprint("エラー: problems_master.json の problems がオブジェクトではありません")
+    try:
+        problem_map = ProblemsMaster(export_dir)
+    except (OSError, ValueError) as e:
+        eprint(f"エラー: 問題マスタを読み込めません: {e}")
+        raise SystemExit(1)
+    if not problem_map.found:
+        eprint(f"エラー: 問題マスタが見つかりません: {problem_map.dir}")
         raise SystemExit(1)
 
     exported_data = load_exported(tracking_path)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Compare chunk size spread: fixed pages_per_chunk vs byte/token budget.
+
+Usage:
+    python3 benchmarks/bench_chunk_sizes.py                      # synthetic samples
+    python3 benchmarks/bench_chunk_sizes.py 02_extracted/*_text.txt
+    python3 benchmarks/bench_chunk_sizes.py --budget-bytes 200000 book_text.txt
+
+Synthetic samples mix sparse pages (tables of contents, blank-ish pages) with
+dense statute pages and put chapter headings at irregular intervals, which is
+what makes fixed page counts swing in size.
+"""
+
+import argparse
+import random
+import statistics
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from lib.chunk_splitter import (
+    build_budget_chunks,
+    build_chunks,
+    detect_chapter_starts,
+    page_weights,
+    parse_pages,
+)
+
+
+def synthetic_text(seed: int, total_pages: int) -> str:
+    rng = random.Random(seed)
+    blocks = []
+    chapter = 0
+    for i in range(1, total_pages + 1):
+        lines = []
+        if i == 1 or rng.random() < 0.02:
+            chapter += 1
+            lines.append(f"第{chapter}章 総則")
+        density = rng.choice((1, 2, 8, 24, 60))  # sparse .. dense page
+        lines.extend("法人税法第二十二条　各事業年度の所得の金額の計算" * 3 for _ in range(density))
+        blocks.append(f"--- ページ {i} ---\n" + "\n".join(lines) + "\n\n")
+    return "".join(blocks)
+
+
+def describe(label: str, sizes: list[int], budget: int) -> str:
+    mean = statistics.fmean(sizes)
+    stdev = statistics.pstdev(sizes)
+    over = sum(1 for s in sizes if s > budget * 1.2)
+    return (
+        f"  {label:<14} chunks={len(sizes):>3}  mean={mean:>10,.0f}  stdev={stdev:>10,.0f}  "
+        f"cv={stdev / mean if mean else 0:5.2f}  min={min(sizes):>9,}  max={max(sizes):>9,}  >1.2×budget={over}"
+    )
+
+
+def bench(name: str, raw: str, pages_per_chunk: int, budget: int, tolerance: float) -> None:
+    pages = parse_pages(raw)
+    weights = page_weights(pages, "bytes")
+    chapters = detect_chapter_starts(pages)
+
+    def sizes(chunks):
+        return [sum(weights[s:e]) for s, e in chunks]
+
+    fixed, fixed_mode = build_chunks(pages, pages_per_chunk)
+    budgeted, _ = build_budget_chunks(weights, chapters, budget, tolerance)
+    print(f"{name}: {len(pages)} pages, {sum(weights):,} bytes, {len(chapters)} chapter starts")
+    print(describe(f"pages({fixed_mode[:8]})", sizes(fixed), budget))
+    print(describe("budget", sizes(budgeted), budget))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Chunk size variance benchmark")
+    parser.add_argument("inputs", nargs="*", help="Extracted *_text.txt files (default: synthetic samples)")
+    parser.add_argument("--pages-per-chunk", type=int, default=50)
+    parser.add_argument("--budget-bytes", type=int, default=300_000)
+    parser.add_argument("--chapter-tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    if args.inputs:
+        samples = [(p, Path(p).read_text(encoding="utf-8")) for p in args.inputs]
+    else:
+        samples = [(f"synthetic-{seed}", synthetic_text(seed, pages)) for seed, pages in ((1, 600), (2, 1500), (3, 3000))]
+
+    for name, raw in samples:
+        bench(name, raw, args.pages_per_chunk, args.budget_bytes, args.chapter_tolerance)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Compare lib/llm_json.py with the previous extract_json_array on large LLM outputs.
+
+Usage:
+    python3 benchmarks/bench_llm_json.py                        # synthetic outputs
+    python3 benchmarks/bench_llm_json.py --sizes 0.5,2,8        # MB
+    python3 benchmarks/bench_llm_json.py 02_extracted/*_gemini_raw.txt
+
+Synthetic outputs are problem-list arrays of the requested size in three
+shapes: a clean fenced array, the same array preceded by bracket-heavy prose,
+and an array truncated mid-element (the case the previous implementation
+handled by calling raw_decode from every "[", which is quadratic). The
+previous implementation is skipped above --legacy-max-mb to keep the run short.
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from lib.llm_json import find_json
+
+
+def legacy_extract_json_array(text: str):
+    """extract_problems.sh にあった旧実装（比較用）。"""
+    text = text.strip()
+    try:
+        value = json.loads(text)
+        if isinstance(value, list):
+            return value
+    except Exception:
+        pass
+    for m in re.finditer(r"```(?:json)?\s*(.*?)\s*```", text, flags=re.DOTALL | re.IGNORECASE):
+        try:
+            value = json.loads(m.group(1).strip())
+            if isinstance(value, list):
+                return value
+        except Exception:
+            continue
+    decoder = json.JSONDecoder()
+    for i, ch in enumerate(text):
+        if ch != "[":
+            continue
+        try:
+            value, _ = decoder.raw_decode(text[i:])
+            if isinstance(value, list):
+                return value
+        except Exception:
+            continue
+    raise ValueError("JSON配列を抽出できませんでした")
+
+
+def synthetic_array(target_bytes: int) -> str:
+    items = []
+    size = 2
+    n = 0
+    while size < target_bytes:
+        n += 1
+        item = json.dumps(
+            {
+                "id": f"calc-4-1-{n:03d}",
+                "title": f"[第{n % 30 + 1}章] 減価償却 {{定額法}}",
+                "topics": ["減価償却", "償却限度額", "[特別償却]"],
+                "page": n,
+                "rank": "ABC"[n % 3],
+            },
+            ensure_ascii=False,
+        )
+        items.append(item)
+        size += len(item.encode("utf-8")) + 2
+    return "[\n" + ",\n".join(items) + "\n]"
+
+
+def shapes(target_bytes: int) -> dict[str, str]:
+    body = synthetic_array(target_bytes)
+    prose = "以下が抽出結果です [注: 表 [1] を参照] {要確認}\n" * 20
+    return {
+        "fenced": f"```json\n{body}\n```\n",
+        "prose+fenced": f"{prose}```json\n{body}\n```\n",
+        "truncated": "```json\n" + body[: len(body) * 9 // 10],
+    }
+
+
+def timed(func, text):
+    started = time.perf_counter()
+    try:
+        value = func(text)
+        n = len(value)
+    except ValueError:
+        n = None
+    return time.perf_counter() - started, n
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", help="Raw LLM outputs (default: synthetic)")
+    parser.add_argument("--sizes", default="0.1,0.5,2,8", help="Synthetic sizes in MB")
+    parser.add_argument("--legacy-max-mb", type=float, default=0.5, help="Skip the old implementation above this size")
+    args = parser.parse_args()
+
+    if args.files:
+        cases = [(Path(f).name, Path(f).read_text(encoding="utf-8")) for f in args.files]
+    else:
+        cases = []
+        for mb in (float(x) for x in args.sizes.split(",")):
+            for shape, text in shapes(int(mb * (1 << 20))).items():
+                cases.append((f"{mb:g}MB {shape}", text))
+
+    print(f"{'case':<24} {'MB':>6} {'new s':>8} {'items':>7} {'old s':>8} {'items':>7}")
+    for label, text in cases:
+        mb = len(text.encode("utf-8")) / (1 << 20)
+        new_sec, new_n = timed(lambda t: find_json(t, list), text)
+        if mb <= args.legacy_max_mb:
+            old_sec, old_n = timed(legacy_extract_json_array, text)
+            old = f"{old_sec:>8.3f} {str(old_n):>7}"
+        else:
+            old = f"{'skip':>8} {'':>7}"
+        print(f"{label:<24} {mb:>6.2f} {new_sec:>8.3f} {str(new_n):>7} {old}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
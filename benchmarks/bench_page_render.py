@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Measure page rendering throughput of lib/page_render.py as the worker count grows.
+
+Usage:
+    python3 benchmarks/bench_page_render.py 01_sources/計算問題集①.pdf
+    python3 benchmarks/bench_page_render.py BOOK.pdf --pages 60 --workers 1,2,4,8 --dpi 200
+    python3 benchmarks/bench_page_render.py --synthetic --pages 200   # no pypdfium2 needed
+
+Each worker count renders the same pages into a fresh temporary directory
+(so the "skip existing output" check never hits) and reports pages/s and the
+speed-up over one worker. --synthetic replaces pypdfium2 + WebP encoding with
+a fixed amount of pure-Python CPU work per page, which isolates the pool's
+scheduling overhead on machines without the real dependencies.
+"""
+
+import argparse
+import contextlib
+import hashlib
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from lib.page_render import RenderChunk, page_image_path, plan_chunks, render_chunks
+
+
+def synthetic_render(chunk: RenderChunk, dpi: int, quality: int):
+    """Burn roughly the CPU of one page render, then write a small file."""
+    for page in chunk.pages:
+        data = str(page).encode()
+        for _ in range(dpi * 150):
+            data = hashlib.sha256(data).digest()
+        page_image_path(chunk.out_dir, page).write_bytes(data)
+    return list(chunk.pages), []
+
+
+def page_count(pdf: Path) -> int:
+    import pypdfium2 as pdfium
+
+    doc = pdfium.PdfDocument(str(pdf))
+    try:
+        return len(doc)
+    finally:
+        doc.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdf", nargs="?", type=Path, help="PDF to render")
+    parser.add_argument("--pages", type=int, default=40, help="Number of pages to render (from page 1)")
+    parser.add_argument("--workers", default=f"1,2,4,{os.cpu_count() or 1}", help="Comma-separated worker counts")
+    parser.add_argument("--dpi", type=int, default=200)
+    parser.add_argument("--synthetic", action="store_true", help="Use a CPU-bound stand-in renderer")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        pdf, render, pages = Path("synthetic.pdf"), synthetic_render, args.pages
+    else:
+        if args.pdf is None:
+            parser.error("a PDF is required unless --synthetic is given")
+        try:
+            pages = min(args.pages, page_count(args.pdf))
+        except ImportError:
+            parser.error("pypdfium2 is not installed (use --synthetic to measure the pool alone)")
+        pdf, render = args.pdf, None
+
+    worker_counts = sorted({int(w) for w in args.workers.split(",") if int(w) > 0})
+    print(f"{pages} pages at {args.dpi} dpi from {pdf.name} (CPUs: {os.cpu_count()})")
+    print(f"{'workers':>7} {'seconds':>8} {'pages/s':>8} {'speed-up':>8}")
+    base = None
+    for workers in worker_counts:
+        kwargs = {"render": render} if render else {}
+        # Discard the plan and progress lines
+        with tempfile.TemporaryDirectory() as tmp, open(os.devnull, "w") as null, contextlib.redirect_stdout(null):
+            chunks, _ = plan_chunks({"bench": set(range(1, pages + 1))}, lambda _: pdf, Path(tmp))
+            stats = render_chunks(chunks, args.dpi, workers, **kwargs)
+        rate = stats.pages_per_sec
+        base = base or rate
+        print(f"{workers:>7} {stats.seconds:>8.2f} {rate:>8.1f} {rate / base if base else 0:>7.2f}x")
+        if stats.errors:
+            print(f"        {len(stats.errors)} errors, first: {stats.errors[0]}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Measure lib/pdf_text.py scaling across worker processes.
+
+Usage:
+    python3 benchmarks/bench_pdf_text.py                         # synthetic 200-page PDF
+    python3 benchmarks/bench_pdf_text.py --backend pypdf book.pdf
+    python3 benchmarks/bench_pdf_text.py --workers 1,2,4,8 01_sources/大原/計算問題集①.pdf
+
+For each worker count the whole PDF is extracted once and the wall time,
+pages/s and speedup over one worker are printed. Every run's output is also
+checked to be byte-identical to the single-worker output. The synthetic PDF
+uses dense multi-line text pages so layout analysis dominates, as it does for
+real textbooks; speedup is bounded by os.cpu_count().
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from lib.pdf_text import BACKENDS, page_count, write_page_text
+
+
+def synthetic_pdf(path: Path, pages: int, lines: int = 45) -> Path:
+    """ASCII の本文行を詰めた PDF を書く（Helvetica、外部依存なし）。"""
+    objs = [b"<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(pages))
+    objs.append(f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode())
+    font_id = 3 + 2 * pages
+    for i in range(pages):
+        objs.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents {4 + 2 * i} 0 R "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> >>".encode()
+        )
+        body = [f"BT /F1 9 Tf 40 800 Td 11 TL (Chapter {i // 20 + 1} page {i + 1}) Tj"]
+        for n in range(lines):
+            body.append(f"T* (Article {n}: taxable income is gross revenue less deductible expenses {i}-{n}) Tj")
+        body.append("ET")
+        stream = "\n".join(body).encode()
+        objs.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objs.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objs, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    for off in offsets:
+        out += b"%010d 00000 n \n" % off
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref)
+    path.write_bytes(bytes(out))
+    return path
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="*", help="PDF files (default: synthetic sample)")
+    parser.add_argument("--backend", choices=BACKENDS, default="pdfminer")
+    parser.add_argument("--workers", default="", help="Comma-separated worker counts (default: 1,2,4,..,cpu)")
+    parser.add_argument("--pages", type=int, default=200, help="Synthetic sample page count")
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    if args.workers:
+        counts = [int(w) for w in args.workers.split(",")]
+    else:
+        counts = [1]
+        while counts[-1] * 2 <= cpus:
+            counts.append(counts[-1] * 2)
+        if counts[-1] != cpus:
+            counts.append(cpus)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmpdir = Path(tmp)
+        pdfs = [Path(p) for p in args.pdfs] or [synthetic_pdf(tmpdir / "synthetic.pdf", args.pages)]
+        print(f"backend={args.backend} cpu_count={cpus}")
+        for pdf in pdfs:
+            total = page_count(str(pdf), args.backend)
+            print(f"\n{pdf.name}: {total} pages")
+            print(f"{'workers':>7} {'sec':>8} {'pages/s':>8} {'speedup':>8}")
+            baseline_sec = None
+            baseline_text = None
+            for workers in counts:
+                out = tmpdir / f"out_{workers}.txt"
+                started = time.perf_counter()
+                write_page_text(str(pdf), str(out), args.backend, workers)
+                sec = time.perf_counter() - started
+                text = out.read_bytes()
+                if baseline_sec is None:
+                    baseline_sec, baseline_text = sec, text
+                elif text != baseline_text:
+                    print(f"  output mismatch with workers={workers}", file=sys.stderr)
+                    return 1
+                print(f"{workers:>7} {sec:>8.2f} {total / sec:>8.1f} {baseline_sec / sec:>7.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""Bytes on the wire for each komekome sync payload, before and after compression.
+
+Usage:
+    python3 benchmarks/bench_sync_payloads.py                    # $VAULT/50_エクスポート
+    python3 benchmarks/bench_sync_payloads.py --synthetic        # generated payloads
+    python3 benchmarks/bench_sync_payloads.py path/to/*.json
+
+For every payload the table shows the file as exported (pretty-printed), the
+compact serialization lib/komekome_push.py now sends, and that body under
+gzip (the level the client uses and level 9) and brotli when the module is
+installed. Workers cannot decode brotli request bodies, so brotli only
+matters for responses. Encode time is the median of --repeat runs.
+
+Synthetic text is drawn from a small vocabulary and compresses better than
+real notes; run it on the vault export for representative numbers.
+"""
+
+import argparse
+import gzip
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from lib.houjinzei_common import VaultPaths
+from lib.komekome_push import GZIP_LEVEL, brotli, compress, encode_json
+
+PAYLOADS = (
+    "problems_master.json",
+    "today_problems.json",
+    "topics_data.json",
+    "dashboard_data.json",
+    "theory_bank.json",
+    "weekly_schedule.json",
+)
+
+_WORDS = "法人税 所得金額 益金 損金 交際費 寄附金 減価償却 引当金 繰越欠損金 受取配当 税額控除 申告調整 別表四 別表五".split()
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return "、".join(rng.choice(_WORDS) for _ in range(words)) + "。"
+
+
+def synthetic_payloads(seed: int = 0) -> dict[str, object]:
+    rng = random.Random(seed)
+    topics = [
+        {
+            "topic_id": f"t{i:03d}",
+            "name": _text(rng, 3),
+            "category": rng.choice(["所得計算", "税額計算", "組織再編"]),
+            "body": "\n".join(_text(rng, 20) for _ in range(12)),
+            "keywords": [rng.choice(_WORDS) for _ in range(5)],
+        }
+        for i in range(300)
+    ]
+    problems = {
+        f"計算1-1-{i:04d}": {"book": "計算1-1", "page": i // 3 + 1, "topic_id": f"t{i % 300:03d}", "question": _text(rng, 15), "answer": _text(rng, 8)}
+        for i in range(2000)
+    }
+    return {
+        "problems_master.json": {"version": 1, "total": len(problems), "problems": problems},
+        "today_problems.json": {"version": 1, "topics": [{"topic_id": t["topic_id"], "problems": list(problems)[:6]} for t in topics[:20]]},
+        "topics_data.json": {"version": 1, "categories": ["所得計算", "税額計算", "組織再編"], "topics": topics},
+        "dashboard_data.json": {"version": 1, "totals": {"topics": 300}, "categories": [{"name": c, "accuracy": rng.random()} for c in "ABC"]},
+    }
+
+
+def _median_ms(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1000
+
+
+def _pct(n: int, base: int) -> str:
+    return f"{n:>11,} ({n / base:4.0%})"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", type=Path, help="Payload files (default: the vault export dir)")
+    parser.add_argument("--synthetic", action="store_true", help="Use generated payloads instead of the vault")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        samples = {name: (json.dumps(p, ensure_ascii=False, indent=2).encode("utf-8"), p) for name, p in synthetic_payloads().items()}
+    else:
+        files = args.files or [VaultPaths().export / name for name in PAYLOADS]
+        samples = {}
+        for path in files:
+            if path.exists():
+                raw = path.read_bytes()
+                samples[path.name] = (raw, json.loads(raw))
+        if not samples:
+            print("no payloads found (use --synthetic)", file=sys.stderr)
+            return 1
+
+    header = f"{'payload':<22} {'exported':>11} {'compact':>17} {f'gzip-{GZIP_LEVEL}':>17} {'gzip-9':>17}"
+    header += f" {'brotli':>17}" if brotli else ""
+    print(header + f" {'gzip ms':>8}")
+    totals = [0, 0, 0, 0, 0]
+    for name, (raw, payload) in samples.items():
+        compact = encode_json(payload)
+        sizes = [len(raw), len(compact), len(compress(compact, "gzip")), len(gzip.compress(compact, compresslevel=9, mtime=0))]
+        if brotli:
+            sizes.append(len(compress(compact, "br")))
+        ms = _median_ms(lambda: compress(encode_json(payload), "gzip"), args.repeat)
+        for i, n in enumerate(sizes):
+            totals[i] += n
+        print(f"{name:<22} {sizes[0]:>11,} " + " ".join(_pct(n, sizes[0]) for n in sizes[1:]) + f" {ms:>8.1f}")
+    print(f"{'total':<22} {totals[0]:>11,} " + " ".join(_pct(n, totals[0]) for n in totals[1:len(sizes)]))
+    if not brotli:
+        print("(brotli is not installed; column omitted)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Replay a month of komekome sync traffic against a local API.
+
+Usage:
+    python3 benchmarks/bench_sync_replay.py                  # 30 days, Python emulator
+    python3 benchmarks/bench_sync_replay.py --backend node   # the real functions under Node
+    python3 benchmarks/bench_sync_replay.py --force          # also replay with PUSH_FORCE=1
+    python3 benchmarks/bench_sync_replay.py --days 7 --seed 3
+
+Each run builds a fresh temporary vault with lib/komekome_replay.py and drives
+komekome_sync.sh push-all / pull (and with it komekome_writeback.sh) once per
+day, with the PWA side uploading attempts and session results in between and
+changing the weekly schedule on Mondays. Nothing leaves the machine.
+
+The table lists, per client command, requests, new connections, bytes on the
+wire (after compression) and time spent inside requests. Wall time per shell
+command includes bash and Python start-up, which dominates against a local
+server; request time is the part that grows with latency to the real site.
+With --force the same month is replayed again sending whole payloads on every
+push, which is what the sync did before delta pushes.
+"""
+
+import argparse
+import statistics
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from lib.komekome_emulator import Emulator, FunctionsServer, serve
+from lib.komekome_replay import ReplayReport, replay
+
+TOKEN = "bench-token"
+
+
+def run(backend: str, days: int, seed: int, force: bool) -> ReplayReport:
+    server = serve(Emulator(TOKEN)) if backend == "python" else FunctionsServer(TOKEN)
+    try:
+        with tempfile.TemporaryDirectory(prefix="bench_sync_replay_") as tmp:
+            return replay(Path(tmp) / "vault", server.url, TOKEN, days=days, seed=seed, force=force)
+    finally:
+        server.shutdown()
+
+
+def show(label: str, report: ReplayReport) -> None:
+    print(f"== {label}: {report.days} days, {report.sessions} sessions, {report.results} results, {report.attempts} attempts")
+    print(f"{'command':<14} {'requests':>8} {'conns':>6} {'sent KB':>9} {'recv KB':>9} {'req ms':>8}  statuses")
+    rows = report.by_command()
+    total = {"requests": 0, "connections": 0, "sent": 0, "received": 0, "seconds": 0.0}
+    for command, row in sorted(rows.items()):
+        for k in total:
+            total[k] += row[k]
+        statuses = " ".join(f"{s}x{n}" for s, n in sorted(row["statuses"].items(), key=lambda kv: str(kv[0])))
+        print(
+            f"{command:<14} {row['requests']:>8} {row['connections']:>6} {row['sent'] / 1024:>9.1f}"
+            f" {row['received'] / 1024:>9.1f} {row['seconds'] * 1000:>8.0f}  {statuses}"
+        )
+    print(
+        f"{'total':<14} {total['requests']:>8} {total['connections']:>6} {total['sent'] / 1024:>9.1f}"
+        f" {total['received'] / 1024:>9.1f} {total['seconds'] * 1000:>8.0f}"
+    )
+    for command, seconds in report.wall.items():
+        print(f"  komekome_sync.sh {command}: median {statistics.median(seconds) * 1000:.0f} ms, total {sum(seconds):.1f} s")
+    print()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", choices=["python", "node"], default="python")
+    parser.add_argument("--force", action="store_true", help="Also replay with whole payloads on every push")
+    args = parser.parse_args()
+
+    show(f"{args.backend}, delta pushes", run(args.backend, args.days, args.seed, force=False))
+    if args.force:
+        show(f"{args.backend}, PUSH_FORCE=1", run(args.backend, args.days, args.seed, force=True))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
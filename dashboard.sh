@@ -12,7 +12,6 @@ SCRIPTS_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 export PYTHONPATH="${SCRIPTS_DIR}:${PYTHONPATH:-}"
 
 python3 - "$VAULT" <<'PYEOF'
-import json
 import os
 import re
 import sys
@@ -27,6 +26,7 @@ from lib.houjinzei_common import (
     read_frontmatter,
     to_int,
 )
+from lib.problems_master import ProblemsMaster
 
 vault_path = sys.argv[1]
 vp = VaultPaths(vault_path)
@@ -133,14 +133,10 @@ for key, vals in topic_results.items():
 # ────────────────────────────────────
 # 3. Problems Master Analysis
 # ────────────────────────────────────
-pm_path = vp.export / "problems_master.json"
 problem_cats = Counter()
-if pm_path.exists():
-    with open(pm_path) as f:
-        pm = json.load(f)
-    for pid, p in pm.get("problems", {}).items():
-        if isinstance(p, dict):
-            problem_cats[p.get("parent_category", "不明")] += 1
+for p in ProblemsMaster(vp.export).values():
+    if isinstance(p, dict):
+        problem_cats[p.get("parent_category", "不明")] += 1
 
 # ────────────────────────────────────
 # 4. Generate Dashboard
@@ -96,6 +96,7 @@ from lib.houjinzei_common import (
     eprint,
     read_frontmatter,
 )
+from lib.llm_cache import cache_key, default_cache
 
 DRY_RUN = os.environ["DRY_RUN"] == "true"
 LIMIT = int(os.environ["LIMIT"])
@@ -221,6 +222,9 @@ def build_prompt(fm: dict, body: str, reference_body: str) -> str:
 
 
 ENGINE = os.environ.get("ENGINE", "claude")
+CLAUDE_MODEL = "claude-sonnet-4-5"
+LLM_ENGINE_ID = "codex" if ENGINE == "codex" else f"claude:{CLAUDE_MODEL}"
+LLM_CACHE = default_cache()
 
 MAX_RETRIES = 3
 RETRY_BACKOFF = [10, 30, 60]  # seconds
@@ -254,7 +258,7 @@ def _run_claude(prompt: str, md_path: Path, attempt: int) -> str | None:
     """claude -p で生成。成功時は本文文字列、失敗時は None。"""
     try:
         result = subprocess.run(
-            ["claude", "-p", prompt, "--output-format", "text", "--model", "claude-sonnet-4-5"],
+            ["claude", "-p", prompt, "--output-format", "text", "--model", CLAUDE_MODEL],
             capture_output=True,
             text=True,
             timeout=300,
@@ -322,9 +326,8 @@ def _run_codex(prompt: str, md_path: Path, attempt: int) -> str | None:
         shutil.rmtree(work_dir, ignore_errors=True)
 
 
-def enrich_note(md_path: Path, fm: dict, body: str, reference_body: str) -> bool:
-    prompt = build_prompt(fm, body, reference_body)
-
+def _generate(prompt: str, md_path: Path) -> str | None:
+    """リトライ付きで本文を生成する。失敗時は None。"""
     runner = _run_codex if ENGINE == "codex" else _run_claude
 
     for attempt in range(MAX_RETRIES):
@@ -336,12 +339,25 @@ def enrich_note(md_path: Path, fm: dict, body: str, reference_body: str) -> bool
             if attempt < MAX_RETRIES - 1:
                 time.sleep(RETRY_BACKOFF[attempt])
                 continue
-            return False
+            return None
+
+        return new_body
+    return None
 
-        # Success - break out of retry loop
-        break
+
+def enrich_note(md_path: Path, fm: dict, body: str, reference_body: str) -> bool:
+    prompt = build_prompt(fm, body, reference_body)
+
+    key = cache_key(LLM_ENGINE_ID, prompt)
+    new_body = LLM_CACHE.get(key) if LLM_CACHE else None
+    if new_body is not None:
+        print(f"  LLMキャッシュ命中: {md_path.name}")
     else:
-        return False
+        new_body = _generate(prompt, md_path)
+        if new_body is None:
+            return False
+        if LLM_CACHE:
+            LLM_CACHE.put(key, new_body)
 
     # frontmatter を保持して body だけ差し替え
     text = md_path.read_text(encoding="utf-8")
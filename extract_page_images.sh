@@ -1,36 +1,45 @@
 #!/usr/bin/env bash
-# PDF→WebP ページ画像抽出
-# 使い方: bash extract_page_images.sh [--book BOOK_NAME] [--dpi N]
+# PDF→WebP ページ画像抽出（ページ単位でプロセス並列。lib/page_render.py）
+# 1 回の描画で thumb / medium / full と、bbox のある問題の切り抜きを書く
+# 使い方: bash extract_page_images.sh [--book BOOK_NAME] [--dpi N] [--workers N]
+#   --workers  描画プロセス数（既定: PAGE_RENDER_WORKERS または CPU 数）
 set -euo pipefail
 
 VAULT="${VAULT:-$HOME/vault/houjinzei}"
 SCRIPTS_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 DPI=200
 BOOK_FILTER=""
+WORKERS="${PAGE_RENDER_WORKERS:-0}"
 
 while [[ $# -gt 0 ]]; do
   case "$1" in
     --dpi) DPI="$2"; shift 2 ;;
     --book) BOOK_FILTER="$2"; shift 2 ;;
-    -h|--help) echo "使い方: bash extract_page_images.sh [--book BOOK_NAME] [--dpi N]"; exit 0 ;;
+    --workers) WORKERS="$2"; shift 2 ;;
+    -h|--help) echo "使い方: bash extract_page_images.sh [--book BOOK_NAME] [--dpi N] [--workers N]"; exit 0 ;;
     *) echo "エラー: 不明な引数: $1" >&2; exit 1 ;;
   esac
 done
 
 export PYTHONPATH="${SCRIPTS_DIR}:${PYTHONPATH:-}"
 
-python3 - "$VAULT" "$DPI" "$BOOK_FILTER" <<'PY'
-import json
+python3 - "$VAULT" "$DPI" "$BOOK_FILTER" "$WORKERS" <<'PY'
+import os
 import sys
 from pathlib import Path
 
+from lib.image_store import ImageManifest
+from lib.page_render import WEBP_QUALITY, page_image_path, plan_chunks, remove_stale_crops, render_chunks
+from lib.page_text_store import default_store
+from lib.pdf_text import page_texts
+from lib.problems_master import ProblemsMaster
+
 vault = Path(sys.argv[1])
 dpi = int(sys.argv[2])
 book_filter = sys.argv[3]
+workers = int(sys.argv[4]) or os.cpu_count() or 1  # 0 = CPU 数
 
-master_path = vault / "50_エクスポート" / "problems_master.json"
-with open(master_path, encoding="utf-8") as f:
-    master = json.load(f)
+master = ProblemsMaster(vault / "50_エクスポート")
 
 output_dir = vault / "02_extracted" / "page_images"
 output_dir.mkdir(parents=True, exist_ok=True)
@@ -40,19 +49,22 @@ sources_dir = vault / "01_sources"
 
 # Collect unique (book, page) pairs from problems
 pages_needed: dict[str, set[int]] = {}
-for pid, prob in master.get("problems", {}).items():
+# bbox のある問題は同じ描画から切り抜きも作る（問題集 → ページ → [(問題 ID, bbox)]）
+crops: dict[str, dict[int, list]] = {}
+# --book 指定時はその問題集のシャードだけを読む
+for prob in (master.book(book_filter).values() if book_filter else master.values()):
     book = prob.get("book", "")
     page = prob.get("page", 0)
     if not book or page <= 0:
         continue
-    if book_filter and book != book_filter:
-        continue
     pages_needed.setdefault(book, set()).add(page)
+    if prob.get("bbox"):
+        crops.setdefault(book, {}).setdefault(page, []).append((prob["id"], tuple(prob["bbox"])))
 
 print(f"対象: {sum(len(v) for v in pages_needed.values())}ページ ({len(pages_needed)}冊)")
 
 try:
-    import pypdfium2 as pdfium
+    import pypdfium2  # noqa: F401  描画はワーカープロセスで行う
 except ImportError:
     print("エラー: pypdfium2 をインストールしてください: pip install pypdfium2", file=sys.stderr)
     sys.exit(1)
@@ -73,52 +85,57 @@ def find_pdf(book_name: str) -> Path | None:
             return path
     return None
 
-extracted = 0
-skipped = 0
+# 描画条件（DPI・品質）・切り抜きの bbox・内容がマニフェストと一致するページだけをスキップする
+manifest = ImageManifest(output_dir)
+
+def is_current(book: str, page: int, path: Path, page_crops: list) -> bool:
+    return manifest.is_rendered(book, page, dpi, WEBP_QUALITY, path, page_crops)
+
+# この実行で描画したページ（問題集 → ページ）。テキスト層の確認はこれだけにする
+rendered: dict[str, set[int]] = {}
 
-for book, pages in sorted(pages_needed.items()):
-    book_dir = output_dir / book
-    book_dir.mkdir(parents=True, exist_ok=True)
+def on_rendered(chunk, pages: list[int]) -> None:
+    for page in pages:
+        manifest.record_render(
+            chunk.book, page, dpi, WEBP_QUALITY, page_image_path(chunk.out_dir, page), chunk.crops.get(page, [])
+        )
+    rendered.setdefault(chunk.book, set()).update(pages)
 
+chunks, stats = plan_chunks(pages_needed, find_pdf, output_dir, is_current=is_current, crops=crops)
+if chunks:
+    print(f"描画: {sum(len(c.pages) for c in chunks)}ページ（既存 {stats.existing}）を {workers}プロセスで処理")
+try:
+    render_chunks(chunks, dpi, workers, stats=stats, on_rendered=on_rendered)
+finally:
+    # bbox を消した・削除した問題の切り抜き（描き直さないページの分も）を消し、
+    # マニフェストからも落とす（残すとアップロードの対象になる）
+    stale = 0
+    for book_dir in [output_dir / book_filter] if book_filter else sorted(output_dir.iterdir()):
+        if book_dir.is_dir():
+            stale += len(remove_stale_crops(book_dir, crops.get(book_dir.name, {})))
+    if stale:
+        print(f"古い切り抜きを削除: {stale}件")
+    manifest.prune()
+    manifest.save()
+
+# 新しく描画したページだけ、ページテキスト（ingest / extract_problems と共有のストア）で
+# テキスト層のないページを警告する。何も描画しなければ PDF を読まない
+text_store = default_store() if rendered else None
+for book, pages in sorted(rendered.items()):
     pdf_path = find_pdf(book)
     if not pdf_path:
-        print(f"警告: PDF not found for '{book}', skipping {len(pages)} pages")
-        skipped += len(pages)
         continue
-
-    print(f"処理中: {book} ({len(pages)}ページ) from {pdf_path.name}")
-
     try:
-        pdf = pdfium.PdfDocument(str(pdf_path))
+        texts = page_texts(str(pdf_path), pages, "pypdf", text_store)
     except Exception as e:
-        print(f"エラー: {pdf_path}: {e}", file=sys.stderr)
-        skipped += len(pages)
+        print(f"  警告: {book}: ページテキストを取得できません: {e}", file=sys.stderr)
         continue
-
-    for page_num in sorted(pages):
-        out_file = book_dir / f"{page_num:03d}.webp"
-        if out_file.exists():
-            extracted += 1
-            continue
-
-        # pypdfium2 uses 0-based indexing
-        page_idx = page_num - 1
-        if page_idx < 0 or page_idx >= len(pdf):
-            print(f"  警告: ページ {page_num} は範囲外 (max={len(pdf)})")
-            skipped += 1
-            continue
-
-        try:
-            page = pdf[page_idx]
-            bitmap = page.render(scale=dpi / 72)
-            image = bitmap.to_pil()
-            image.save(str(out_file), "WEBP", quality=85)
-            extracted += 1
-        except Exception as e:
-            print(f"  エラー: page {page_num}: {e}", file=sys.stderr)
-            skipped += 1
-
-    pdf.close()
-
-print(f"\n完了: {extracted}ページ抽出, {skipped}ページスキップ")
+    blank = sorted(p for p, t in texts.items() if not t.strip())
+    if blank:
+        shown = ", ".join(str(p) for p in blank[:10]) + (" ..." if len(blank) > 10 else "")
+        print(f"  注意: {book} にテキストのないページ {len(blank)}件（スキャン画像・白紙の可能性）: {shown}")
+
+extracted = stats.rendered + stats.existing
+rate = f", {stats.pages_per_sec:.1f}ページ/秒" if stats.rendered else ""
+print(f"\n完了: {extracted}ページ抽出（新規 {stats.rendered}{rate}）, {stats.skipped}ページスキップ")
 PY
@@ -3,14 +3,16 @@ set -euo pipefail
 
 usage() {
   cat <<'USAGE'
-使い方: bash generate_quiz.sh [--date YYYY-MM-DD] [--limit N]
+使い方: bash generate_quiz.sh [--date YYYY-MM-DD] [--limit N] [--allow-duplicates]
   --date   基準日 (例: 2026-02-17)。省略時は本日。
   --limit  出題数上限。省略時は 20。
+  --allow-duplicates  同じ duplicate_group の類似問題も同じ日に出題する。
 USAGE
 }
 
 DATE_ARG=""
 LIMIT_ARG="${DEFAULT_QUIZ_LIMIT:-20}"
+ALLOW_DUPLICATES_ARG=""
 
 while [[ $# -gt 0 ]]; do
   case "$1" in
@@ -32,6 +34,10 @@ while [[ $# -gt 0 ]]; do
       LIMIT_ARG="$2"
       shift 2
       ;;
+    --allow-duplicates)
+      ALLOW_DUPLICATES_ARG=1
+      shift
+      ;;
     -h|--help)
       usage
       exit 0
@@ -51,7 +57,7 @@ fi
 
 VAULT="${VAULT:-$HOME/vault/houjinzei}"
 SCRIPTS_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
-export VAULT DATE_ARG LIMIT_ARG PYTHONPATH="${SCRIPTS_DIR}:${PYTHONPATH:-}"
+export VAULT DATE_ARG LIMIT_ARG ALLOW_DUPLICATES_ARG PYTHONPATH="${SCRIPTS_DIR}:${PYTHONPATH:-}"
 
 # ファイルロック（並行実行対策）
 LOCKFILE="/tmp/houjinzei_vault.lock"
@@ -101,9 +107,12 @@ from lib.learning_efficiency import (
     is_focus_active,
     parse_dt_or_none,
 )
+from lib.page_variants import page_image_variants
+from lib.problems_master import ProblemsMaster
 from lib.quiz_generation import (
     add_priority_balanced_with_problem_cap,
     build_carryover_topics,
+    drop_duplicate_problems,
     filter_scope_candidates,
     split_new_review_budget,
 )
@@ -111,11 +120,13 @@ from lib.topic_problem_map import load_topic_problem_map
 
 DATE_ARG = os.environ.get("DATE_ARG", "").strip()
 LIMIT = int(os.environ["LIMIT_ARG"])
+ALLOW_DUPLICATES = bool(os.environ.get("ALLOW_DUPLICATES_ARG"))
 
 vp = VaultPaths(os.environ["VAULT"])
 TOPIC_ROOT = vp.topics
 TODAY_OUTPUT = vp.export / "today_problems.json"
 COMPAT_OUTPUT = vp.export / "komekome_import.json"
+PAGE_IMAGE_DIR = vp.extracted / "page_images"
 DASHBOARD_OUTPUT = vp.export / "dashboard_data.json"
 RESULTS_OUTPUT = vp.export / "komekome_results.json"
 SCHEDULE_PATH = vp.weekly_schedule
@@ -124,12 +135,8 @@ SCHEDULE_PATH = vp.weekly_schedule
 topic_map = load_topic_problem_map(os.environ["VAULT"])
 mappings = topic_map.get("mappings", {})
 
-master_path = vp.export / "problems_master.json"
-if master_path.exists():
-    with open(master_path, encoding="utf-8") as f:
-        problems_db = json.load(f).get("problems", {})
-else:
-    problems_db = {}
+# 出題する問題のシャードだけを必要になった時点で読む
+problems_db = ProblemsMaster(vp.export)
 
 
 def parse_frontmatter(md_path: Path) -> dict:
@@ -556,9 +563,16 @@ def focus_until_to_text(raw):
     return dt.strftime("%Y-%m-%dT%H:%M:%S") if dt else None
 
 
+# 類似問題（同じ duplicate_group）は 1 日に 1 問だけ。繰越分を先に数える
+seen_groups: set[str] = set()
+for ct in carryover_topics:
+    drop_duplicate_problems([p.get("problem_id") for p in ct.get("problems", []) if isinstance(p, dict)], problems_db, seen_groups)
+
 for s in selected:
     tid = s["topic_id"]
     problem_ids = mappings.get(tid, [])
+    if not ALLOW_DUPLICATES:
+        problem_ids = drop_duplicate_problems(problem_ids, problems_db, seen_groups)
     problems_out = []
     for pid in problem_ids:
         prob = problems_db.get(pid)
@@ -574,6 +588,7 @@ for s in selected:
             "title": prob.get("title", ""),
             "time_min": prob.get("time_min", 0),
             "page_image_key": f"{prob.get('book', '')}/{prob.get('page', 0):03d}.webp" if prob.get("page") else None,
+            "page_images": page_image_variants(PAGE_IMAGE_DIR, prob.get("book", ""), prob.get("page", 0), pid),
         })
     total_problems += len(problems_out)
     focus_until_at = focus_until_to_text(s.get("focus_until_at"))
@@ -652,11 +667,10 @@ PY
 # Cloudflare Workers同期（失敗してもquiz生成は成功扱い）
 SYNC_SCRIPT="$SCRIPTS_DIR/komekome_sync.sh"
 if [[ -f "$SYNC_SCRIPT" ]]; then
-  for cmd in push push-today push-topics push-dashboard; do
-    if ! bash "$SYNC_SCRIPT" "$cmd" 2>&1; then
-      echo "⚠️  sync $cmd 失敗（quiz生成は成功済み）" >&2
-    fi
-  done
+  # problems / today / topics / dashboard を 1 プロセスで並行に push（失敗したキーは個別に表示される）
+  if ! bash "$SYNC_SCRIPT" push-all 2>&1; then
+    echo "⚠️  sync push-all 失敗（quiz生成は成功済み）" >&2
+  fi
 else
   echo "⚠️  komekome_sync.sh が見つかりません: $SYNC_SCRIPT" >&2
 fi
@@ -89,6 +89,8 @@ from datetime import datetime
 from pathlib import Path
 
 from lib.houjinzei_common import VaultPaths, atomic_json_write, extract_body_sections, read_frontmatter
+from lib.llm_cache import cache_key, default_cache
+from lib.llm_json import find_json
 
 VAULT = os.environ["VAULT"]
 TOPICS_DIR = Path(os.environ["TOPICS_DIR"])
@@ -98,6 +100,7 @@ SLEEP_SEC = int(os.environ["SLEEP_SEC"])
 MAX_QUESTIONS = int(os.environ["MAX_QUESTIONS"])
 RESUME = os.environ["RESUME"] == "true"
 CATEGORIES_FILTER = set(c.strip() for c in os.environ.get("CATEGORIES", "").split(",") if c.strip())
+LLM_CACHE = default_cache()
 
 vp = VaultPaths(VAULT)
 
@@ -258,11 +261,10 @@ def extract_json_array_from_text(text: str):
                 if isinstance(sub, list):
                     return sub
 
-    start = s.find("[")
-    end = s.rfind("]")
-    if start == -1 or end == -1 or end <= start:
-        raise ValueError("JSON配列を検出できません")
-    return json.loads(s[start:end + 1])
+    try:
+        return find_json(s, list)
+    except ValueError:
+        raise ValueError("JSON配列を検出できません") from None
 
 
 def sanitize_id_part(s: str) -> str:
@@ -384,7 +386,14 @@ for idx, (path, rel, fm, body) in enumerate(targets, start=1):
 
     print(f"[{idx}/{len(targets)}] 生成中: {topic_name}")
     prompt = build_prompt(topic_name, category, importance or "未設定", body_content)
-    raw, err = run_claude(prompt)
+    llm_key = cache_key("claude", prompt)
+    raw = LLM_CACHE.get(llm_key) if LLM_CACHE else None
+    cache_hit = raw is not None
+    if cache_hit:
+        print("  LLMキャッシュ命中")
+        err = None
+    else:
+        raw, err = run_claude(prompt)
 
     if err:
         print(f"  エラー: {err}", file=sys.stderr)
@@ -415,6 +424,9 @@ for idx, (path, rel, fm, body) in enumerate(targets, start=1):
             time.sleep(SLEEP_SEC)
         continue
 
+    if LLM_CACHE and not cache_hit:
+        LLM_CACHE.put(llm_key, raw)
+
     if MAX_QUESTIONS > 0:
         remain = MAX_QUESTIONS - generated_in_run
         if remain <= 0:
@@ -449,7 +461,7 @@ for idx, (path, rel, fm, body) in enumerate(targets, start=1):
     save_progress(progress)
     print(f"  生成完了: {added}問（累計追加 {generated_in_run}問）")
 
-    if idx < len(targets) and SLEEP_SEC > 0:
+    if idx < len(targets) and SLEEP_SEC > 0 and not cache_hit:
         time.sleep(SLEEP_SEC)
 
 output_data = {
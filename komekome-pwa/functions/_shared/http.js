@@ -0,0 +1,37 @@
+// functions/api/komekome/ の各ハンドラーが使う JSON の応答と本文の読み出し
+// （ハンドラーを持たないのでルートにはならない。CORS ヘッダーは各ハンドラーが渡す）
+
+export const COMPRESS_MIN_BYTES = 1024;
+
+// Accept-Encoding から応答の圧縮方式を選ぶ（圧縮自体は runtime が Content-Encoding を見て行う）
+export function acceptedEncoding(request) {
+  const accepted = (request?.headers?.get("Accept-Encoding") || "")
+    .split(",")
+    .map((part) => part.trim().split(";"))
+    .filter(([, q]) => !/^\s*q=0(\.0*)?\s*$/.test(q || ""))
+    .map(([name]) => name.trim().toLowerCase());
+  if (accepted.includes("br")) return "br";
+  if (accepted.includes("gzip")) return "gzip";
+  return null;
+}
+
+export function jsonResponse(data, status, request, extraHeaders = {}) {
+  const body = JSON.stringify(data);
+  const headers = { "Content-Type": "application/json", ...extraHeaders };
+  const encoding = body.length >= COMPRESS_MIN_BYTES ? acceptedEncoding(request) : null;
+  if (encoding) {
+    headers["Content-Encoding"] = encoding;
+    headers["Vary"] = "Accept-Encoding";
+  }
+  return new Response(body, { status, headers });
+}
+
+// Content-Encoding: gzip / deflate で送られた本文を展開して JSON として読む
+export async function readJson(request) {
+  const encoding = (request.headers.get("Content-Encoding") || "identity").toLowerCase();
+  if (encoding === "identity") return request.json();
+  if (encoding !== "gzip" && encoding !== "deflate") {
+    throw new Error(`Unsupported Content-Encoding: ${encoding}`);
+  }
+  return new Response(request.body.pipeThrough(new DecompressionStream(encoding))).json();
+}
@@ -0,0 +1,44 @@
+// JSON Patch（RFC 6902 の add / remove / replace）の適用。topics.js / problems.js の PATCH（komekome_push.py の差分 push）用
+
+function decodePointer(path) {
+  return path.slice(1).split("/").map(t => t.replace(/~1/g, "/").replace(/~0/g, "~"));
+}
+
+export function applyPatch(doc, ops) {
+  if (!Array.isArray(ops)) throw new Error("ops must be an array");
+  let root = structuredClone(doc);
+  for (const op of ops) {
+    const { op: kind, path } = op || {};
+    if (!["add", "remove", "replace"].includes(kind) || typeof path !== "string") {
+      throw new Error(`Unsupported operation: ${JSON.stringify(op)}`);
+    }
+    if (path === "") {
+      if (kind === "remove") throw new Error("Cannot remove the root");
+      root = structuredClone(op.value);
+      continue;
+    }
+    if (!path.startsWith("/")) throw new Error(`Path must start with /: ${path}`);
+    const tokens = decodePointer(path);
+    const last = tokens.pop();
+    let target = root;
+    for (const token of tokens) {
+      target = Array.isArray(target) ? target[Number(token)] : target?.[token];
+      if (target === undefined || target === null || typeof target !== "object") {
+        throw new Error(`Path not found: ${path}`);
+      }
+    }
+    if (Array.isArray(target)) {
+      const index = last === "-" ? target.length : Number(last);
+      const max = kind === "add" ? target.length : target.length - 1;
+      if (!Number.isInteger(index) || index < 0 || index > max) throw new Error(`Index out of range: ${path}`);
+      if (kind === "add") target.splice(index, 0, structuredClone(op.value));
+      else if (kind === "remove") target.splice(index, 1);
+      else target[index] = structuredClone(op.value);
+    } else {
+      if (kind !== "add" && !Object.prototype.hasOwnProperty.call(target, last)) throw new Error(`Path not found: ${path}`);
+      if (kind === "remove") delete target[last];
+      else target[last] = structuredClone(op.value);
+    }
+  }
+  return root;
+}
@@ -1,6 +1,8 @@
 // GET: Retrieve all attempts
 // POST: Add new attempts (append)
 
+import { jsonResponse, readJson } from "../../_shared/http.js";
+
 const ALLOWED_ORIGIN = "https://komekome.pages.dev";
 
 function corsHeaders(request) {
@@ -21,10 +23,7 @@ function unauthorized(request) {
 }
 
 function json(data, status = 200, request) {
-  return new Response(JSON.stringify(data), {
-    status,
-    headers: { "Content-Type": "application/json", ...corsHeaders(request) },
-  });
+  return jsonResponse(data, status, request, corsHeaders(request));
 }
 
 function verifyToken(request, env) {
@@ -47,7 +46,7 @@ export async function onRequestPost(context) {
 
   let body;
   try {
-    body = await request.json();
+    body = await readJson(request);
   } catch {
     return json({ error: "Invalid JSON body" }, 400, request);
   }
@@ -75,7 +74,7 @@ export async function onRequestPut(context) {
 
   let body;
   try {
-    body = await request.json();
+    body = await readJson(request);
   } catch {
     return json({ error: "Invalid JSON body" }, 400, request);
   }
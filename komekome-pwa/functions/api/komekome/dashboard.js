@@ -1,6 +1,8 @@
 // GET: PWA fetches dashboard data
 // POST: WSL pushes dashboard data
 
+import { jsonResponse, readJson } from "../../_shared/http.js";
+
 const ALLOWED_ORIGIN = "https://komekome.pages.dev";
 
 function corsHeaders(request) {
@@ -9,7 +11,7 @@ function corsHeaders(request) {
   return {
     "Access-Control-Allow-Origin": allowed,
     "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
-    "Access-Control-Allow-Headers": "Authorization, Content-Type",
+    "Access-Control-Allow-Headers": "Authorization, Content-Type, X-Komekome-Hash",
   };
 }
 
@@ -21,10 +23,7 @@ function unauthorized(request) {
 }
 
 function json(data, status = 200, request) {
-  return new Response(JSON.stringify(data), {
-    status,
-    headers: { "Content-Type": "application/json", ...corsHeaders(request) },
-  });
+  return jsonResponse(data, status, request, corsHeaders(request));
 }
 
 function verifyToken(request, env) {
@@ -37,6 +36,11 @@ export async function onRequestGet(context) {
   const { request, env } = context;
   if (!verifyToken(request, env)) return unauthorized(request);
 
+  if (new URL(request.url).searchParams.has("hash")) {
+    const { metadata } = await env.KOMEKOME_STORE.getWithMetadata("learning_dashboard_v1");
+    return json({ hash: metadata?.hash || null }, 200, request);
+  }
+
   const data = await env.KOMEKOME_STORE.get("learning_dashboard_v1", "json");
   if (!data) {
     return json({
@@ -56,7 +60,7 @@ export async function onRequestPost(context) {
 
   let body;
   try {
-    body = await request.json();
+    body = await readJson(request);
   } catch {
     return json({ error: "Invalid JSON body" }, 400, request);
   }
@@ -65,7 +69,9 @@ export async function onRequestPost(context) {
     return json({ error: "Request body must contain totals object and categories array" }, 400, request);
   }
 
-  await env.KOMEKOME_STORE.put("learning_dashboard_v1", JSON.stringify(body));
+  // 差分 push の照合用に送信側の内容ハッシュを保存する（なければ消える）
+  const hash = request.headers.get("X-Komekome-Hash");
+  await env.KOMEKOME_STORE.put("learning_dashboard_v1", JSON.stringify(body), hash ? { metadata: { hash } } : {});
 
   return json({ ok: true, total_categories: body.categories.length, stored_at: new Date().toISOString() }, 200, request);
 }
@@ -1,5 +1,8 @@
 // POST: PWA がセッション結果を保存
 // GET: WSL2 が未処理結果を一覧取得
+// PUT: WSL2 が取り込んだセッションをまとめて処理済みにする
+
+import { jsonResponse, readJson } from "../../_shared/http.js";
 
 const ALLOWED_ORIGIN = "https://komekome.pages.dev";
 
@@ -8,7 +11,7 @@ function corsHeaders(request) {
   const allowed = origin === ALLOWED_ORIGIN || origin === "" ? ALLOWED_ORIGIN : origin;
   return {
     "Access-Control-Allow-Origin": allowed,
-    "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+    "Access-Control-Allow-Methods": "GET, POST, PUT, OPTIONS",
     "Access-Control-Allow-Headers": "Authorization, Content-Type",
   };
 }
@@ -20,11 +23,10 @@ function unauthorized(request) {
   });
 }
 
+const MARK_BATCH_MAX = 100; // 1 リクエストで処理済みにできるセッション数（KV 操作数の上限対策）
+
 function json(data, status = 200, request) {
-  return new Response(JSON.stringify(data), {
-    status,
-    headers: { "Content-Type": "application/json", ...corsHeaders(request) },
-  });
+  return jsonResponse(data, status, request, corsHeaders(request));
 }
 
 function verifyToken(request, env) {
@@ -39,7 +41,7 @@ export async function onRequestPost(context) {
 
   let body;
   try {
-    body = await request.json();
+    body = await readJson(request);
   } catch {
     return json({ error: "Invalid JSON body" }, 400, request);
   }
@@ -81,6 +83,47 @@ export async function onRequestGet(context) {
   return json({ results }, 200, request);
 }
 
+export async function onRequestPut(context) {
+  const { request, env } = context;
+  if (!verifyToken(request, env)) return unauthorized(request);
+
+  let body;
+  try {
+    body = await readJson(request);
+  } catch {
+    return json({ error: "Invalid JSON body" }, 400, request);
+  }
+
+  const ids = body?.session_ids;
+  if (!Array.isArray(ids) || !ids.every((id) => typeof id === "string" && id)) {
+    return json({ error: "Request body must contain session_ids array" }, 400, request);
+  }
+  if (ids.length > MARK_BATCH_MAX) {
+    return json({ error: `Too many session_ids (max ${MARK_BATCH_MAX})` }, 400, request);
+  }
+
+  const processedAt = new Date().toISOString();
+  const found = await Promise.all(
+    ids.map(async (sessionId) => {
+      const key = `result:${sessionId}`;
+      const data = await env.KOMEKOME_STORE.get(key, "json");
+      if (!data) return false;
+      if (!data.processed) {
+        data.processed = true;
+        data.processed_at = processedAt;
+        await env.KOMEKOME_STORE.put(key, JSON.stringify(data));
+      }
+      return true;
+    }),
+  );
+
+  return json({
+    ok: true,
+    processed: ids.filter((_, i) => found[i]),
+    missing: ids.filter((_, i) => !found[i]),
+  }, 200, request);
+}
+
 export async function onRequestOptions(context) {
   return new Response(null, {
     headers: corsHeaders(context.request),
@@ -1,5 +1,7 @@
 // PUT: WSL2 が処理済みマークを設定
 
+import { jsonResponse } from "../../../../_shared/http.js";
+
 const ALLOWED_ORIGIN = "https://komekome.pages.dev";
 
 function corsHeaders(request) {
@@ -20,10 +22,7 @@ function unauthorized(request) {
 }
 
 function json(data, status = 200, request) {
-  return new Response(JSON.stringify(data), {
-    status,
-    headers: { "Content-Type": "application/json", ...corsHeaders(request) },
-  });
+  return jsonResponse(data, status, request, corsHeaders(request));
 }
 
 function verifyToken(request, env) {
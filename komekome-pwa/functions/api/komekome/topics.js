@@ -1,6 +1,10 @@
 // GET: PWA fetches enriched topic notes
+// PATCH: WSL pushes a JSON Patch delta (komekome_push.py)
 // POST: WSL pushes topic notes data
 
+import { jsonResponse, readJson } from "../../_shared/http.js";
+import { applyPatch } from "../../_shared/patch.js";
+
 const ALLOWED_ORIGIN = "https://komekome.pages.dev";
 
 function corsHeaders(request) {
@@ -8,8 +12,8 @@ function corsHeaders(request) {
   const allowed = origin === ALLOWED_ORIGIN || origin === "" ? ALLOWED_ORIGIN : origin;
   return {
     "Access-Control-Allow-Origin": allowed,
-    "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
-    "Access-Control-Allow-Headers": "Authorization, Content-Type",
+    "Access-Control-Allow-Methods": "GET, POST, PATCH, OPTIONS",
+    "Access-Control-Allow-Headers": "Authorization, Content-Type, X-Komekome-Hash",
   };
 }
 
@@ -21,10 +25,7 @@ function unauthorized(request) {
 }
 
 function json(data, status = 200, request) {
-  return new Response(JSON.stringify(data), {
-    status,
-    headers: { "Content-Type": "application/json", ...corsHeaders(request) },
-  });
+  return jsonResponse(data, status, request, corsHeaders(request));
 }
 
 function verifyToken(request, env) {
@@ -37,6 +38,11 @@ export async function onRequestGet(context) {
   const { request, env } = context;
   if (!verifyToken(request, env)) return unauthorized(request);
 
+  if (new URL(request.url).searchParams.has("hash")) {
+    const { metadata } = await env.KOMEKOME_STORE.getWithMetadata("topics_data");
+    return json({ hash: metadata?.hash || null }, 200, request);
+  }
+
   const data = await env.KOMEKOME_STORE.get("topics_data", "json");
   if (!data) {
     return json({ version: 0, total: 0, categories: [], topics: [] }, 200, request);
@@ -50,7 +56,7 @@ export async function onRequestPost(context) {
 
   let body;
   try {
-    body = await request.json();
+    body = await readJson(request);
   } catch {
     return json({ error: "Invalid JSON body" }, 400, request);
   }
@@ -59,11 +65,49 @@ export async function onRequestPost(context) {
     return json({ error: "Request body must contain topics" }, 400, request);
   }
 
-  await env.KOMEKOME_STORE.put("topics_data", JSON.stringify(body));
+  // 差分 push の照合用に送信側の内容ハッシュを保存する（なければ消える）
+  const hash = request.headers.get("X-Komekome-Hash");
+  await env.KOMEKOME_STORE.put("topics_data", JSON.stringify(body), hash ? { metadata: { hash } } : {});
 
   return json({ ok: true, total: body.topics.length, stored_at: new Date().toISOString() }, 200, request);
 }
 
+// PATCH: { base, hash, ops } を保存済みの値に当てる（base が保存時のハッシュと違えば 409）
+export async function onRequestPatch(context) {
+  const { request, env } = context;
+  if (!verifyToken(request, env)) return unauthorized(request);
+
+  let body;
+  try {
+    body = await readJson(request);
+  } catch {
+    return json({ error: "Invalid JSON body" }, 400, request);
+  }
+  if (!body || typeof body.base !== "string" || typeof body.hash !== "string" || !Array.isArray(body.ops)) {
+    return json({ error: "Request body must contain base, hash and ops" }, 400, request);
+  }
+
+  const { value, metadata } = await env.KOMEKOME_STORE.getWithMetadata("topics_data", "json");
+  const current = metadata?.hash || null;
+  if (!value || current !== body.base) {
+    return json({ error: "Base hash mismatch", hash: current }, 409, request);
+  }
+
+  let patched;
+  try {
+    patched = applyPatch(value, body.ops);
+  } catch (e) {
+    return json({ error: `Invalid patch: ${e.message}` }, 400, request);
+  }
+  if (!patched || typeof patched !== "object" || !patched.topics) {
+    return json({ error: "Request body must contain topics" }, 400, request);
+  }
+
+  await env.KOMEKOME_STORE.put("topics_data", JSON.stringify(patched), { metadata: { hash: body.hash } });
+
+  return json({ ok: true, total: patched.topics.length, applied: body.ops.length, stored_at: new Date().toISOString() }, 200, request);
+}
+
 export async function onRequestOptions(context) {
   return new Response(null, { headers: corsHeaders(context.request) });
 }
@@ -0,0 +1,208 @@
+#!/usr/bin/env node
+// functions/ の Pages Functions をそのまま Node で動かすローカルサーバー（wrangler もネットワークも不要）
+// 使い方: node local_functions.mjs --token TOKEN [--host 127.0.0.1] [--port 8788] [--pages-dir DIR]
+//   KV（KOMEKOME_STORE）はメモリ上、R2（KOMEKOME_PAGES）は --pages-dir のディレクトリで代える。
+//   起動すると 1 行目に URL を出す（--port 0 なら空いているポート）。
+//   Content-Encoding を付けた応答は Workers の runtime と同じくここで圧縮する。
+//   lib/komekome_emulator.py（Python 版）と同じ応答になることを tests/test_komekome_emulator.py で確かめる。
+
+import { createServer } from "node:http";
+import { readdir, readFile } from "node:fs/promises";
+import { dirname, join, relative, resolve, sep } from "node:path";
+import { fileURLToPath } from "node:url";
+import { parseArgs } from "node:util";
+import { brotliCompressSync, deflateSync, gzipSync } from "node:zlib";
+
+const FUNCTIONS_DIR = join(dirname(fileURLToPath(import.meta.url)), "functions");
+const ENCODERS = { gzip: gzipSync, br: brotliCompressSync, deflate: deflateSync };
+const RELATIVE_IMPORT = /(\bfrom\s*)(["'])(\.\.?\/[^"']+)\2/g;
+
+// ── KV / R2 ──
+
+function decode(value, type) {
+  const kind = typeof type === "object" && type ? type.type : type;
+  if (value === null || kind === undefined || kind === "text") return value;
+  if (kind === "json") return JSON.parse(value);
+  if (kind === "arrayBuffer") return new TextEncoder().encode(value).buffer;
+  throw new Error(`Unsupported KV type: ${kind}`);
+}
+
+class MemoryKV {
+  constructor() {
+    this.entries = new Map();
+  }
+
+  async get(key, type) {
+    return decode(this.entries.get(key)?.value ?? null, type);
+  }
+
+  async getWithMetadata(key, type) {
+    const entry = this.entries.get(key);
+    return { value: decode(entry?.value ?? null, type), metadata: entry?.metadata ?? null };
+  }
+
+  async put(key, value, options = {}) {
+    this.entries.set(key, { value: String(value), metadata: options.metadata ?? null });
+  }
+
+  async delete(key) {
+    this.entries.delete(key);
+  }
+
+  // KV と同じくキーの UTF-8 バイト順。件数が少ないので 1 回で返す
+  async list({ prefix = "" } = {}) {
+    const names = [...this.entries.keys()]
+      .filter((name) => name.startsWith(prefix))
+      .sort((a, b) => Buffer.compare(Buffer.from(a), Buffer.from(b)));
+    return { keys: names.map((name) => ({ name, metadata: this.entries.get(name).metadata })), list_complete: true };
+  }
+}
+
+class DirectoryR2 {
+  constructor(root) {
+    this.root = root ? resolve(root) : null;
+  }
+
+  async get(key) {
+    if (!this.root) return null;
+    const path = resolve(this.root, key);
+    if (!path.startsWith(this.root + sep)) return null; // ディレクトリの外は読ませない
+    try {
+      const body = await readFile(path);
+      return { key, size: body.length, body };
+    } catch {
+      return null;
+    }
+  }
+}
+
+// ── ルーティング（Pages Functions のファイル名規則: [param] と [[catchall]]）──
+
+async function listFunctions(dir) {
+  const files = [];
+  for (const entry of await readdir(dir, { withFileTypes: true })) {
+    const path = join(dir, entry.name);
+    if (entry.isDirectory()) files.push(...(await listFunctions(path)));
+    else if (entry.name.endsWith(".js")) files.push(path);
+  }
+  return files;
+}
+
+// functions は package.json の type に関係なく ES モジュールとして読むため data: URL で import する。
+// 相対 import（functions/_shared/）も読み込み先の data: URL に置き換える（同じ内容は同じモジュールになる）
+async function moduleUrl(file, cache = new Map()) {
+  if (!cache.has(file)) {
+    const source = await readFile(file, "utf-8");
+    const deps = [...source.matchAll(RELATIVE_IMPORT)];
+    const urls = await Promise.all(deps.map((m) => moduleUrl(resolve(dirname(file), m[3]), cache)));
+    let i = 0;
+    const rewritten = source.replace(RELATIVE_IMPORT, (_, from) => `${from}"${urls[i++]}"`);
+    cache.set(file, `data:text/javascript;base64,${Buffer.from(rewritten).toString("base64")}`);
+  }
+  return cache.get(file);
+}
+
+async function loadRoutes() {
+  const routes = [];
+  const cache = new Map();
+  for (const file of await listFunctions(FUNCTIONS_DIR)) {
+    const segments = relative(FUNCTIONS_DIR, file).slice(0, -3).split(sep);
+    if (segments.at(-1) === "index") segments.pop();
+    const module = await import(await moduleUrl(file, cache));
+    // ハンドラーを持たないモジュール（_shared/ など）はルートにならない
+    if (!Object.keys(module).some((name) => name.startsWith("onRequest"))) continue;
+    routes.push({ segments, module });
+  }
+  // 固定のセグメントが多いものを先に、catch-all を最後に試す
+  const weight = (r) => r.segments.filter((s) => !s.startsWith("[")).length - (r.segments.some((s) => s.startsWith("[[")) ? 100 : 0);
+  return routes.sort((a, b) => weight(b) - weight(a));
+}
+
+function match(segments, parts) {
+  const params = {};
+  for (let i = 0; i < segments.length; i++) {
+    const seg = segments[i];
+    const catchAll = seg.match(/^\[\[(.+)\]\]$/);
+    if (catchAll) {
+      params[catchAll[1]] = parts.slice(i);
+      return params;
+    }
+    if (i >= parts.length) return null;
+    const param = seg.match(/^\[(.+)\]$/);
+    if (param) params[param[1]] = parts[i];
+    else if (seg !== parts[i]) return null;
+  }
+  return segments.length === parts.length ? params : null;
+}
+
+function jsonResponse(data, status) {
+  return new Response(JSON.stringify(data), { status, headers: { "Content-Type": "application/json" } });
+}
+
+async function dispatch(routes, env, request) {
+  const parts = new URL(request.url).pathname.split("/").filter(Boolean);
+  for (const { segments, module } of routes) {
+    const params = match(segments, parts);
+    if (!params) continue;
+    const method = request.method[0] + request.method.slice(1).toLowerCase();
+    const handler = module[`onRequest${method}`] || module.onRequest;
+    if (!handler) return new Response(null, { status: 405 });
+    const context = { request, env, params, data: {}, waitUntil() {}, next: () => jsonResponse({ error: "Not found" }, 404) };
+    return handler(context);
+  }
+  return jsonResponse({ error: "Not found" }, 404);
+}
+
+// ── HTTP ──
+
+async function main() {
+  const { values } = parseArgs({
+    options: {
+      host: { type: "string", default: "127.0.0.1" },
+      port: { type: "string", default: "8788" },
+      token: { type: "string" },
+      "pages-dir": { type: "string" },
+    },
+  });
+  if (!values.token) {
+    console.error("エラー: --token を指定してください");
+    process.exit(1);
+  }
+
+  const routes = await loadRoutes();
+  const env = { API_TOKEN: values.token, KOMEKOME_STORE: new MemoryKV(), KOMEKOME_PAGES: new DirectoryR2(values["pages-dir"]) };
+
+  const server = createServer(async (req, res) => {
+    const chunks = [];
+    for await (const chunk of req) chunks.push(chunk);
+    const body = Buffer.concat(chunks);
+
+    let response;
+    try {
+      const request = new Request(`http://${req.headers.host}${req.url}`, {
+        method: req.method,
+        headers: req.headers,
+        body: ["GET", "HEAD"].includes(req.method) ? undefined : body,
+      });
+      response = await dispatch(routes, env, request);
+    } catch (e) {
+      console.error(e);
+      response = new Response("Internal Server Error", { status: 500 });
+    }
+
+    let payload = Buffer.from(await response.arrayBuffer());
+    const encoder = ENCODERS[response.headers.get("Content-Encoding")];
+    if (encoder) payload = encoder(payload);
+    const headers = Object.fromEntries(response.headers);
+    headers["content-length"] = String(payload.length);
+    res.writeHead(response.status, headers);
+    res.end(payload);
+  });
+
+  server.listen(Number(values.port), values.host, () => {
+    const { port } = server.address();
+    console.log(`local functions: http://${values.host}:${port}`);
+  });
+}
+
+main();
@@ -172,14 +172,16 @@ function Card({ title, children, style: extra = {} }) {
 }
 
 // ── Auth image (fetches with Bearer token, renders as blob URL) ──
-function AuthImage({ src, token, style: extra = {}, alt = "" }) {
+function useAuthBlob(src, token) {
   const [blobUrl, setBlobUrl] = useState(null);
-  const [loading, setLoading] = useState(true);
+  const [loading, setLoading] = useState(!!src);
   const [error, setError] = useState(false);
 
   useEffect(() => {
+    if (!src) return undefined;
     let objectUrl = null;
     let cancelled = false;
+    setLoading(true); setError(false);
     (async () => {
       try {
         const res = await fetch(src, { headers: { Authorization: `Bearer ${token}` } });
@@ -197,6 +199,12 @@ function AuthImage({ src, token, style: extra = {}, alt = "" }) {
     return () => { cancelled = true; if (objectUrl) URL.revokeObjectURL(objectUrl); };
   }, [src, token]);
 
+  return { blobUrl, loading, error };
+}
+
+function AuthImage({ src, token, style: extra = {}, alt = "" }) {
+  const { blobUrl, loading, error } = useAuthBlob(src, token);
+
   if (loading) return (
     <div style={{ display: "flex", alignItems: "center", justifyContent: "center", padding: 40, color: C.text3, fontSize: 13, ...extra }}>読込中...</div>
   );
@@ -206,6 +214,38 @@ function AuthImage({ src, token, style: extra = {}, alt = "" }) {
   return <img src={blobUrl} alt={alt} style={{ maxWidth: "100%", borderRadius: 8, ...extra }} />;
 }
 
+// ── Page image: thumb first, then crop/medium; full only when asked ──
+function PageImage({ images, fallbackKey, base, token, alt = "" }) {
+  const [wantFull, setWantFull] = useState(false);
+  const url = (key) => (key ? `${base}/api/komekome/page-image/${key}` : null);
+  const v = images && Object.keys(images).length ? images : { full: fallbackKey };
+  const mainKey = wantFull ? v.full : (v.crop || v.medium || v.full);
+  const preview = useAuthBlob(v.thumb && v.thumb !== mainKey ? url(v.thumb) : null, token);
+  const main = useAuthBlob(url(mainKey), token);
+
+  let body;
+  if (main.blobUrl) {  // full を読み込む間は medium/crop を表示したまま
+    body = <img src={main.blobUrl} alt={alt} style={{ maxWidth: "100%", borderRadius: 8 }} />;
+  } else if (main.error) {
+    body = <div style={{ display: "flex", alignItems: "center", justifyContent: "center", padding: 40, color: C.red, fontSize: 13 }}>画像を読み込めません</div>;
+  } else if (preview.blobUrl) {
+    body = <img src={preview.blobUrl} alt={alt} style={{ width: "100%", borderRadius: 8, filter: "blur(1px)" }} />;
+  } else {
+    body = <div style={{ display: "flex", alignItems: "center", justifyContent: "center", padding: 40, color: C.text3, fontSize: 13 }}>読込中...</div>;
+  }
+  return (
+    <div>
+      {body}
+      {!wantFull && v.full && v.full !== mainKey && (
+        <button onClick={() => setWantFull(true)}
+          style={{ marginTop: 6, background: "none", border: `1px solid ${C.border}`, borderRadius: 8, color: C.text3, fontSize: 11, padding: "4px 10px", cursor: "pointer", fontFamily: font }}>
+          {v.crop ? "ページ全体を高解像度で表示" : "高解像度で表示"}
+        </button>
+      )}
+    </div>
+  );
+}
+
 // ── Reason badge for today's problems ──
 function ReasonBadge({ reason }) {
   const colors = {
@@ -1920,9 +1960,7 @@ function App() {
   // ═══════ PAGE VIEW: PDF Image + Result Entry ═══════
   if (view === "page-view" && todayProblem) {
     const mistakeTypes = getMistakeTypes(todayProblem.type || "計算");
-    const imageUrl = todayProblem.page_image_key
-      ? `${apiBase(apiUrl)}/api/komekome/page-image/${todayProblem.page_image_key}`
-      : null;
+    const hasPageImage = !!(todayProblem.page_image_key || (todayProblem.page_images && todayProblem.page_images.full));
 
     // Step: "view" = show image + ○/×, "mistakes" = show mistake selection for ×, "review" = review after ×
     if (pageViewStep === "review") {
@@ -2115,9 +2153,10 @@ function App() {
             </div>
 
             {/* PDF page image */}
-            {imageUrl ? (
+            {hasPageImage ? (
               <div style={{ background: C.surface, border: `1px solid ${C.border}`, borderRadius: 14, padding: 8, marginBottom: 12, touchAction: "pinch-zoom", overflow: "auto", WebkitOverflowScrolling: "touch" }}>
-                <AuthImage src={imageUrl} token={apiToken} alt={`${todayProblem.book} p.${todayProblem.page}`} />
+                <PageImage key={todayProblem.problem_id} images={todayProblem.page_images} fallbackKey={todayProblem.page_image_key}
+                  base={apiBase(apiUrl)} token={apiToken} alt={`${todayProblem.book} p.${todayProblem.page}`} />
               </div>
             ) : (
               <div style={{ background: C.surface, border: `1px solid ${C.border}`, borderRadius: 14, padding: "40px 16px", marginBottom: 12, textAlign: "center" }}>
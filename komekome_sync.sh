@@ -1,9 +1,10 @@
 #!/usr/bin/env bash
 # ============================================================
 # コメコメ Cloudflare Workers 同期スクリプト
-# 使い方: bash komekome_sync.sh push|pull|push-topics|push-today|push-dashboard|push-theory|push-schedule|pull-schedule|status
-#   push        - komekome_import.json を Workers API にアップロード
+# 使い方: bash komekome_sync.sh push|pull|push-all|push-topics|push-today|push-dashboard|push-theory|push-schedule|pull-schedule|status
+#   push        - problems_master.json（と komekome_import.json / today_problems.json）を Workers API にアップロード
 #   pull        - Workers API から未処理結果をダウンロードし writeback 実行
+#   push-all    - problems / today / topics / dashboard をまとめて並行にアップロード
 #   push-topics - 充実済み論点ノートを Workers API にアップロード
 #   push-today  - today_problems.json を Workers API にアップロード
 #   push-dashboard - dashboard_data.json を Workers API にアップロード
@@ -11,6 +12,11 @@
 #   push-schedule - weekly_schedule.json を Workers API にアップロード
 #   pull-schedule - Workers API から weekly_schedule.json をダウンロード
 #   status      - API のステータスを表示
+#
+# 通信は lib/komekome_client.py（接続の使い回し・並行 push・再試行）が行う。
+#   PUSH_FORCE=1        変更がなくても全体を送る
+#   KOMEKOME_TIMINGS=F  リクエストごとの所要時間を F に JSONL で追記
+#   KOMEKOME_CONF=F     設定ファイルを差し替える（ローカルのエミュレーター相手の検証用）
 # ============================================================
 
 set -euo pipefail
@@ -18,7 +24,7 @@ set -euo pipefail
 SCRIPTS_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 VAULT="${VAULT:-$HOME/vault/houjinzei}"
 EXPORT_DIR="$VAULT/50_エクスポート"
-CONF="$SCRIPTS_DIR/komekome_cf.conf"
+CONF="${KOMEKOME_CONF:-$SCRIPTS_DIR/komekome_cf.conf}"
 
 if [[ ! -f "$CONF" ]]; then
   echo "エラー: 設定ファイルが見つかりません: $CONF" >&2
@@ -48,208 +54,43 @@ fi
 export PYTHONPATH="${SCRIPTS_DIR}:${PYTHONPATH:-}"
 
 usage() {
-  echo "使い方: bash komekome_sync.sh push|pull|push-topics|push-today|push-dashboard|push-theory|push-schedule|pull-schedule|status"
+  echo "使い方: bash komekome_sync.sh push|pull|push-all|push-topics|push-today|push-dashboard|push-theory|push-schedule|pull-schedule|status"
 }
 
-# ── push: problems_master.json → Workers API ──
-do_push() {
-  local master_file="$EXPORT_DIR/problems_master.json"
-  if [[ ! -f "$master_file" ]]; then
-    echo "エラー: $master_file が見つかりません" >&2
-    return 1
-  fi
-
-  local now
-  now=$(date -u +%Y-%m-%dT%H:%M:%SZ)
-
-  local response
-  response=$(curl -s -w "\n%{http_code}" -X POST \
-    "${API_URL}/api/komekome/problems" \
-    -H "Authorization: Bearer ${API_TOKEN}" \
-    -H "Content-Type: application/json" \
-    -H "User-Agent: komekome-sync/1.0" \
-    -d @"$master_file")
-
-  local http_code
-  http_code=$(echo "$response" | tail -1)
-  local body
-  body=$(echo "$response" | sed '$d')
-
-  if [[ "$http_code" != "200" ]]; then
-    echo "エラー: push 失敗 (HTTP $http_code): $body" >&2
-    return 1
-  fi
-
-  echo "push 完了: problems_master.json → Workers API ($now)"
-
-  # 旧 import.json も互換のため push（存在する場合のみ）
-  local import_file="$EXPORT_DIR/komekome_import.json"
-  if [[ -f "$import_file" ]]; then
-    curl -s -X POST \
-      "${API_URL}/api/komekome/import" \
-      -H "Authorization: Bearer ${API_TOKEN}" \
-      -H "Content-Type: application/json" \
-      -H "User-Agent: komekome-sync/1.0" \
-      -d @"$import_file" > /dev/null 2>&1 || true
-  fi
-
-  # today_problems.json も push（存在する場合のみ）
-  local today_file="$EXPORT_DIR/today_problems.json"
-  if [[ -f "$today_file" ]]; then
-    do_push_today || true
-  fi
+# ── Workers API クライアント（lib/komekome_client.py）──
+client() {
+  API_URL="$API_URL" API_TOKEN="$API_TOKEN" VAULT="$VAULT" \
+    python3 "$SCRIPTS_DIR/lib/komekome_client.py" ${KOMEKOME_TIMINGS:+--timings "$KOMEKOME_TIMINGS"} "$@"
 }
 
-# ── pull: Workers API → results + writeback ──
-do_pull() {
-  # ファイルロック
-  local LOCKFILE="/tmp/houjinzei_vault.lock"
-  exec 200>"$LOCKFILE"
-  flock -n 200 || { echo "エラー: 別のスクリプトが実行中です" >&2; return 1; }
-
-  local results_file="$EXPORT_DIR/komekome_results.json"
-  local timestamp
-  timestamp=$(date +%Y%m%d_%H%M%S)
-  local backup_dir="$EXPORT_DIR/backup"
-  mkdir -p "$backup_dir"
-
-  local now
-  now=$(date -u +%Y-%m-%dT%H:%M:%SZ)
-
-  # 未処理結果を取得
-  local response
-  response=$(curl -s -w "\n%{http_code}" \
-    "${API_URL}/api/komekome/result" \
-    -H "Authorization: Bearer ${API_TOKEN}")
+# 差分 push: 変更がなければ送らず、problems / topics は差分を PATCH で送る（lib/komekome_push.py）
+push_keys() {
+  client push "$@" ${PUSH_FORCE:+--force}
+}
 
-  local http_code
-  http_code=$(echo "$response" | tail -1)
-  local body
-  body=$(echo "$response" | sed '$d')
+# ── problems_master.json の書き出しと検証 ──
+prepare_problems() {
+  local master_file="$EXPORT_DIR/problems_master.json"
 
-  if [[ "$http_code" != "200" ]]; then
-    echo "エラー: pull 失敗 (HTTP $http_code): $body" >&2
+  # 問題マスタのシャードから push 用の従来形式ファイルを書き出す（変更がなければ書かない）
+  if ! VAULT="$VAULT" python3 "$SCRIPTS_DIR/lib/problems_master.py" export; then
+    echo "エラー: problems_master.json の書き出しに失敗しました" >&2
     return 1
   fi
-
-  # Python で結果処理: マージ + writeback用ファイル生成
-  python3 - "$body" "$results_file" "$backup_dir" "$timestamp" "$API_URL" "$API_TOKEN" <<'PYEOF'
-import json, sys, urllib.request
-
-body_str, results_file, backup_dir, timestamp, api_url, api_token = sys.argv[1:7]
-
-data = json.loads(body_str)
-all_results = data.get('results', [])
-
-if not all_results:
-    print("pull: 未処理の結果なし（スキップ）")
-    sys.exit(0)
-
-# 全セッションの results を1つにマージ
-merged_results = []
-session_ids = []
-for session in all_results:
-    session_ids.append(session.get('session_id', ''))
-    for r in session.get('results', []):
-        merged_results.append(r)
-
-if not merged_results:
-    print("pull: 未処理の結果なし（スキップ）")
-    sys.exit(0)
-
-# writeback 用のフォーマットに変換
-merged_data = {
-    "session_date": all_results[-1].get('session_date'),
-    "session_id": all_results[-1].get('session_id'),
-    "results": merged_results,
-}
-
-# バックアップ保存
-backup_path = f"{backup_dir}/komekome_results_{timestamp}.json"
-with open(backup_path, 'w', encoding='utf-8') as f:
-    json.dump(merged_data, f, ensure_ascii=False, indent=2)
-
-# メインファイル保存
-with open(results_file, 'w', encoding='utf-8') as f:
-    json.dump(merged_data, f, ensure_ascii=False, indent=2)
-
-print(f"pull: {len(merged_results)}件の結果を取得")
-
-# 処理済みマークを設定
-for sid in session_ids:
-    if not sid:
-        continue
-    url = f"{api_url}/api/komekome/result/{sid}/processed"
-    req = urllib.request.Request(url, method='PUT',
-        headers={'Authorization': f'Bearer {api_token}', 'Content-Type': 'application/json',
-                 'User-Agent': 'komekome-sync/1.0'},
-        data=b'{}')
-    try:
-        urllib.request.urlopen(req)
-    except Exception as e:
-        print(f"警告: processed マーク失敗 ({sid}): {e}", file=sys.stderr)
-
-print(f"pull: {len(session_ids)}セッションを処理済みにマーク")
-PYEOF
-
-  local py_exit=$?
-  if [[ $py_exit -ne 0 ]]; then
-    return 0  # "スキップ" の場合
+  if [[ ! -f "$master_file" ]]; then
+    echo "エラー: $master_file が見つかりません" >&2
+    return 1
   fi
 
-  # results_file が存在する場合のみ writeback 実行
-  if [[ -f "$results_file" ]]; then
-    HOUJINZEI_LOCK_HELD=1 bash "$SCRIPTS_DIR/komekome_writeback.sh" "$results_file"
-    echo "pull 完了: writeback 実行済み ($now)"
+  # アップロード前にスキーマ検証（違反はすべて表示して中止）
+  if ! python3 "$SCRIPTS_DIR/lib/problem_schema.py" "$master_file"; then
+    echo "エラー: problems_master.json がスキーマに違反しているため push を中止しました" >&2
+    return 1
   fi
-
-  # Pull schedule
-  do_pull_schedule || true
-}
-
-# ── status: API ステータス表示 ──
-do_status() {
-  echo "=== コメコメ Workers API 同期ステータス ==="
-  echo "API_URL: $API_URL"
-  echo ""
-
-  # import 状態を確認
-  local import_resp
-  import_resp=$(curl -s \
-    "${API_URL}/api/komekome/import" \
-    -H "Authorization: Bearer ${API_TOKEN}")
-
-  echo "import データ:"
-  echo "$import_resp" | python3 -c "
-import json, sys
-data = json.load(sys.stdin)
-questions = data.get('questions', [])
-date = data.get('generated_date', '不明')
-print(f'  生成日: {date}')
-print(f'  問題数: {len(questions)}')
-"
-
-  echo ""
-
-  # 未処理結果を確認
-  local result_resp
-  result_resp=$(curl -s \
-    "${API_URL}/api/komekome/result" \
-    -H "Authorization: Bearer ${API_TOKEN}")
-
-  echo "未処理 results:"
-  echo "$result_resp" | python3 -c "
-import json, sys
-data = json.load(sys.stdin)
-results = data.get('results', [])
-total = sum(len(r.get('results', [])) for r in results)
-print(f'  セッション数: {len(results)}')
-print(f'  総件数: {total}')
-"
 }
 
-# ── push-topics: 充実済み論点ノート → Workers API ──
-do_push_topics() {
+# ── 充実済み論点ノート → topics_data.json ──
+build_topics() {
   local topics_file="$EXPORT_DIR/topics_data.json"
 
   python3 - "$VAULT" "$topics_file" <<'PYEOF'
@@ -348,166 +189,119 @@ PYEOF
     echo "エラー: topics_data.json の生成に失敗しました" >&2
     return 1
   fi
+}
+
+# ── push: problems_master.json → Workers API ──
+# 旧 import.json（互換）と today_problems.json は存在する場合のみ、失敗しても警告にとどめる
+do_push() {
+  prepare_problems || return 1
 
-  local response
-  response=$(curl -s -w "\n%{http_code}" -X POST \
-    "${API_URL}/api/komekome/topics" \
-    -H "Authorization: Bearer ${API_TOKEN}" \
-    -H "Content-Type: application/json" \
-    -H "User-Agent: komekome-sync/1.0" \
-    -d @"$topics_file")
-
-  local http_code
-  http_code=$(echo "$response" | tail -1)
-  local body
-  body=$(echo "$response" | sed '$d')
-
-  if [[ "$http_code" != "200" ]]; then
-    echo "エラー: push-topics 失敗 (HTTP $http_code): $body" >&2
+  if ! push_keys problems --optional import --optional today; then
+    echo "エラー: push 失敗" >&2
     return 1
   fi
-
-  echo "push-topics 完了: topics_data.json → Workers API"
+  echo "push 完了: problems_master.json → Workers API ($(date -u +%Y-%m-%dT%H:%M:%SZ))"
 }
 
-# ── push-today: today_problems.json → Workers API ──
-do_push_today() {
-  local today_file="$EXPORT_DIR/today_problems.json"
-  if [[ ! -f "$today_file" ]]; then
-    echo "エラー: $today_file が見つかりません" >&2
+# ── push-all: problems / today / topics / dashboard → Workers API（並行）──
+do_push_all() {
+  local names=(today dashboard)
+  local rc=0
+  if prepare_problems; then names+=(problems); else rc=1; fi
+  if build_topics; then names+=(topics); else rc=1; fi
+
+  push_keys "${names[@]}" --optional import || rc=1
+  if [[ $rc -ne 0 ]]; then
+    echo "エラー: push-all で失敗したものがあります" >&2
     return 1
   fi
+  echo "push-all 完了: ${names[*]} → Workers API"
+}
+
+# ── pull: Workers API → results + writeback ──
+do_pull() {
+  # ファイルロック
+  local LOCKFILE="/tmp/houjinzei_vault.lock"
+  exec 200>"$LOCKFILE"
+  flock -n 200 || { echo "エラー: 別のスクリプトが実行中です" >&2; return 1; }
+
+  local results_file="$EXPORT_DIR/komekome_results.json"
+  local now
+  now=$(date -u +%Y-%m-%dT%H:%M:%SZ)
+
+  # 未処理結果を取得して処理済みにする（取り込むものがなければ終了コード 3）
+  local rc=0
+  client pull --results "$results_file" --backup-dir "$EXPORT_DIR/backup" || rc=$?
+  case $rc in
+    0)
+      HOUJINZEI_LOCK_HELD=1 bash "$SCRIPTS_DIR/komekome_writeback.sh" "$results_file"
+      echo "pull 完了: writeback 実行済み ($now)"
+      ;;
+    3) ;;  # 未処理の結果なし（前回の results_file を書き戻し直さない）
+    *)
+      echo "エラー: pull 失敗" >&2
+      return 1
+      ;;
+  esac
+
+  # Pull schedule
+  do_pull_schedule || true
+}
+
+# ── status: API ステータス表示 ──
+do_status() {
+  client status
+}
 
-  local response
-  response=$(curl -s -w "\n%{http_code}" -X POST \
-    "${API_URL}/api/komekome/today" \
-    -H "Authorization: Bearer ${API_TOKEN}" \
-    -H "Content-Type: application/json" \
-    -H "User-Agent: komekome-sync/1.0" \
-    -d @"$today_file")
-
-  local http_code
-  http_code=$(echo "$response" | tail -1)
-  local body
-  body=$(echo "$response" | sed '$d')
-
-  if [[ "$http_code" != "200" ]]; then
-    echo "エラー: push-today 失敗 (HTTP $http_code): $body" >&2
+# ── push-topics: 充実済み論点ノート → Workers API ──
+do_push_topics() {
+  build_topics || return 1
+  if ! push_keys topics; then
+    echo "エラー: push-topics 失敗" >&2
     return 1
   fi
+  echo "push-topics 完了: topics_data.json → Workers API"
+}
 
+# ── push-today: today_problems.json → Workers API ──
+do_push_today() {
+  if ! push_keys today; then
+    echo "エラー: push-today 失敗" >&2
+    return 1
+  fi
   echo "push-today 完了: today_problems.json → Workers API"
 }
 
 # ── push-dashboard: dashboard_data.json → Workers API ──
 do_push_dashboard() {
-  local dashboard_file="$EXPORT_DIR/dashboard_data.json"
-  if [[ ! -f "$dashboard_file" ]]; then
-    echo "エラー: $dashboard_file が見つかりません" >&2
+  if ! push_keys dashboard; then
+    echo "エラー: push-dashboard 失敗" >&2
     return 1
   fi
-
-  local response
-  response=$(curl -s -w "\n%{http_code}" -X POST \
-    "${API_URL}/api/komekome/dashboard" \
-    -H "Authorization: Bearer ${API_TOKEN}" \
-    -H "Content-Type: application/json" \
-    -H "User-Agent: komekome-sync/1.0" \
-    -d @"$dashboard_file")
-
-  local http_code
-  http_code=$(echo "$response" | tail -1)
-  local body
-  body=$(echo "$response" | sed '$d')
-
-  if [[ "$http_code" != "200" ]]; then
-    echo "エラー: push-dashboard 失敗 (HTTP $http_code): $body" >&2
-    return 1
-  fi
-
   echo "push-dashboard 完了: dashboard_data.json → Workers API"
 }
 
 # ── push-theory: theory_bank.json → Workers API ──
 do_push_theory() {
-  local theory_file="$EXPORT_DIR/theory_bank.json"
-  if [[ ! -f "$theory_file" ]]; then
-    echo "エラー: $theory_file が見つかりません" >&2
+  if ! push_keys theory; then
+    echo "エラー: push-theory 失敗" >&2
     return 1
   fi
-
-  local response
-  response=$(curl -s -w "\n%{http_code}" -X POST \
-    "${API_URL}/api/komekome/theory" \
-    -H "Authorization: Bearer ${API_TOKEN}" \
-    -H "Content-Type: application/json" \
-    -H "User-Agent: komekome-sync/1.0" \
-    -d @"$theory_file")
-
-  local http_code
-  http_code=$(echo "$response" | tail -1)
-  local body
-  body=$(echo "$response" | sed '$d')
-
-  if [[ "$http_code" != "200" ]]; then
-    echo "エラー: push-theory 失敗 (HTTP $http_code): $body" >&2
-    return 1
-  fi
-
   echo "push-theory 完了: theory_bank.json → Workers API"
 }
 
 # ── push-schedule: weekly_schedule.json → Workers API ──
 do_push_schedule() {
-  local schedule_file="$EXPORT_DIR/weekly_schedule.json"
-  if [[ ! -f "$schedule_file" ]]; then
-    echo "エラー: $schedule_file が見つかりません" >&2
-    return 1
-  fi
-
-  local response
-  response=$(curl -s -w "\n%{http_code}" -X PUT \
-    "${API_URL}/api/komekome/schedule" \
-    -H "Authorization: Bearer ${API_TOKEN}" \
-    -H "Content-Type: application/json" \
-    -H "User-Agent: komekome-sync/1.0" \
-    -d @"$schedule_file")
-
-  local http_code
-  http_code=$(echo "$response" | tail -1)
-  local body
-  body=$(echo "$response" | sed '$d')
-
-  if [[ "$http_code" != "200" ]]; then
-    echo "エラー: push-schedule 失敗 (HTTP $http_code): $body" >&2
+  if ! push_keys schedule; then
+    echo "エラー: push-schedule 失敗" >&2
     return 1
   fi
-
   echo "push-schedule 完了: weekly_schedule.json → Workers API"
 }
 
 # ── pull-schedule: Workers API → weekly_schedule.json ──
 do_pull_schedule() {
-  local schedule_file="$EXPORT_DIR/weekly_schedule.json"
-
-  local response
-  response=$(curl -s -w "\n%{http_code}" \
-    "${API_URL}/api/komekome/schedule" \
-    -H "Authorization: Bearer ${API_TOKEN}" \
-    -H "User-Agent: komekome-sync/1.0")
-
-  local http_code
-  http_code=$(echo "$response" | tail -1)
-  local body
-  body=$(echo "$response" | sed '$d')
-
-  if [[ "$http_code" != "200" ]]; then
-    echo "エラー: pull-schedule 失敗 (HTTP $http_code): $body" >&2
-    return 1
-  fi
-
-  echo "$body" > "$schedule_file"
-  echo "pull-schedule 完了: Workers API → weekly_schedule.json"
+  client pull-schedule
 }
 
 # ── main ──
@@ -519,6 +313,7 @@ fi
 case "$1" in
   push)        do_push ;;
   pull)        do_pull ;;
+  push-all)    do_push_all ;;
   push-topics) do_push_topics ;;
   push-today)  do_push_today ;;
   push-dashboard) do_push_dashboard ;;
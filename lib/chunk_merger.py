@@ -7,17 +7,36 @@ import argparse
 import json
 import re
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterable
 
+from lib.houjinzei_common import atomic_json_write
 
-def _dedupe_list(values: list[Any]) -> list[Any]:
+
+LIST_FIELDS = ("keywords", "conditions", "related", "type", "practical_points")
+
+
+def _freeze(v: Any) -> Any:
+    """JSON 値の構造ハッシュ用キー。json.dumps(sort_keys=True) で等しい値どうしが等しくなる。"""
+    if isinstance(v, dict):
+        return ("d", tuple(sorted((k, _freeze(x)) for k, x in v.items())))
+    if isinstance(v, list):
+        return ("l", tuple(_freeze(x) for x in v))
+    if isinstance(v, float):
+        return ("f", repr(v))
+    return (type(v).__name__, v)
+
+
+def _dedupe_key(v: Any) -> Any:
+    if isinstance(v, (dict, list)):
+        return _freeze(v)
+    return str(v)
+
+
+def _dedupe_list(values: list[Any], seen: set | None = None) -> list[Any]:
     out = []
-    seen = set()
+    seen = set() if seen is None else seen
     for v in values:
-        if isinstance(v, (dict, list)):
-            key = json.dumps(v, ensure_ascii=False, sort_keys=True)
-        else:
-            key = str(v)
+        key = _dedupe_key(v)
         if key in seen:
             continue
         seen.add(key)
@@ -25,6 +44,15 @@ def _dedupe_list(values: list[Any]) -> list[Any]:
     return out
 
 
+def _field_values(src: dict[str, Any], field: str) -> list[Any]:
+    v = src.get(field)
+    if isinstance(v, list):
+        return v
+    if v not in (None, ""):
+        return [v]
+    return []
+
+
 def _parse_range(r: str) -> tuple[int, int] | None:
     if not isinstance(r, str):
         return None
@@ -50,74 +78,97 @@ def _merge_page_range(a: Any, b: Any) -> str:
     return f"{a} / {b}"
 
 
-def _merge_topic(existing: dict[str, Any], new: dict[str, Any]) -> dict[str, Any]:
-    merged = dict(existing)
+class _MergedTopic:
+    """1 つの topic_id のマージ結果。リスト系フィールドの既出キーを保持し、追加分だけを照合する。"""
 
-    list_fields = ["keywords", "conditions", "related", "type", "practical_points"]
-    for field in list_fields:
-        vals = []
-        for src in (existing, new):
-            v = src.get(field)
-            if isinstance(v, list):
-                vals.extend(v)
-            elif v not in (None, ""):
-                vals.append(v)
-        if vals:
-            merged[field] = _dedupe_list(vals)
+    __slots__ = ("data", "seen")
 
-    merged["page_range"] = _merge_page_range(existing.get("page_range"), new.get("page_range"))
+    def __init__(self, topic: dict[str, Any]):
+        self.data = dict(topic)
+        self.seen: dict[str, set] = {}
 
-    # Prefer richer string values from new only when existing is missing.
-    for field in ("name", "category", "subcategory", "importance"):
-        if not merged.get(field) and new.get(field):
-            merged[field] = new[field]
+    def merge(self, new: dict[str, Any]) -> None:
+        merged = self.data
+        for field in LIST_FIELDS:
+            new_vals = _field_values(new, field)
+            seen = self.seen.get(field)
+            if seen is not None:
+                # merged[field] は重複除去済みのリスト: 新しい値だけを照合して追加
+                merged[field].extend(_dedupe_list(new_vals, seen))
+                continue
+            vals = _field_values(merged, field) + new_vals
+            if vals:
+                seen = set()
+                merged[field] = _dedupe_list(vals, seen)
+                self.seen[field] = seen
 
-    # Preserve unknown keys from both, prioritizing existing for deterministic output.
-    for key, value in new.items():
-        if key not in merged:
-            merged[key] = value
+        existing_range = merged.get("page_range")
+        merged["page_range"] = _merge_page_range(existing_range, new.get("page_range"))
 
-    return merged
+        # Prefer richer string values from new only when existing is missing.
+        for field in ("name", "category", "subcategory", "importance"):
+            if not merged.get(field) and new.get(field):
+                merged[field] = new[field]
 
+        # Preserve unknown keys from both, prioritizing existing for deterministic output.
+        for key, value in new.items():
+            if key not in merged:
+                merged[key] = value
 
-def merge_payloads(payloads: list[dict[str, Any]]) -> dict[str, Any]:
-    if not payloads:
-        return {
-            "source_name": "",
-            "source_type": "",
-            "publisher": "",
-            "total_topics": 0,
-            "topics": [],
-        }
 
-    first = payloads[0]
-    merged_topics: dict[str, dict[str, Any]] = {}
-    order: list[str] = []
+class TopicMerger:
+    """チャンクの topics JSON を 1 つずつ取り込んでマージする（全チャンクを保持しない）。"""
 
-    for payload in payloads:
+    def __init__(self) -> None:
+        self.header: dict[str, Any] | None = None
+        self.topics: dict[str, _MergedTopic] = {}
+
+    def add(self, payload: dict[str, Any] | list[Any]) -> None:
         # Handle both dict {"topics": [...]} and bare list [...] formats
         if isinstance(payload, list):
             topics_list = payload
+            header = {}
         else:
             topics_list = payload.get("topics", [])
+            header = payload
+        if self.header is None:
+            self.header = header
         for topic in topics_list:
             topic_id = topic.get("topic_id")
             if not topic_id:
                 continue
-            if topic_id in merged_topics:
-                merged_topics[topic_id] = _merge_topic(merged_topics[topic_id], topic)
+            entry = self.topics.get(topic_id)
+            if entry is None:
+                self.topics[topic_id] = _MergedTopic(topic)
             else:
-                merged_topics[topic_id] = dict(topic)
-                order.append(topic_id)
+                entry.merge(topic)
 
-    topics = [merged_topics[topic_id] for topic_id in order]
-    return {
-        "source_name": first.get("source_name", ""),
-        "source_type": first.get("source_type", ""),
-        "publisher": first.get("publisher", ""),
-        "total_topics": len(topics),
-        "topics": topics,
-    }
+    def result(self) -> dict[str, Any]:
+        first = self.header or {}
+        topics = [entry.data for entry in self.topics.values()]
+        return {
+            "source_name": first.get("source_name", ""),
+            "source_type": first.get("source_type", ""),
+            "publisher": first.get("publisher", ""),
+            "total_topics": len(topics),
+            "topics": topics,
+        }
+
+
+def merge_payloads(payloads: Iterable[dict[str, Any] | list[Any]]) -> dict[str, Any]:
+    merger = TopicMerger()
+    for payload in payloads:
+        merger.add(payload)
+    return merger.result()
+
+
+def merge_files(paths: Iterable[str | Path]) -> dict[str, Any]:
+    """チャンクファイルを 1 つずつ読み込みながらマージする。"""
+    merger = TopicMerger()
+    for p in paths:
+        with open(p, encoding="utf-8") as f:
+            merger.add(json.load(f))
+    return merger.result()
 
 
 def main() -> int:
@@ -126,13 +177,7 @@ def main() -> int:
     parser.add_argument("inputs", nargs="+", help="Input chunk topics json paths")
     args = parser.parse_args()
 
-    payloads = []
-    for p in args.inputs:
-        path = Path(p)
-        payloads.append(json.loads(path.read_text(encoding="utf-8")))
-
-    merged = merge_payloads(payloads)
-    Path(args.output).write_text(json.dumps(merged, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    atomic_json_write(args.output, merge_files(args.inputs))
     return 0
 
 
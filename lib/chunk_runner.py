@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""Run Gemini over the chunks of a chunk_splitter manifest in parallel.
+
+Each chunk is sent as its own `gemini -p` call (same prompt format as the
+single-file path in ingest.sh) from a bounded worker pool. A chunk that
+times out, exits non-zero or returns no parsable JSON block is retried with
+exponential backoff. Per chunk the runner writes, next to the chunk text:
+
+  <safe>_chunk_<i>_gemini_raw.md   raw Gemini output
+  <safe>_chunk_<i>_topics.json     extracted JSON (input for chunk_merger.py)
+  <safe>_chunk_<i>_structure.md    output with the JSON block removed
+
+and prints the topics paths of successful chunks, in chunk order.
+Responses are looked up in / stored to the shared LLM cache (lib/llm_cache.py)
+keyed on the prompt and the chunk text, so unchanged chunks never reach Gemini
+twice.
+
+With --journal the runner keeps a per-ingest journal (manifest hash and, per
+chunk, status / output paths / duration / attempts), rewritten after every
+chunk. A re-run against the same manifest skips chunks the journal records as
+ok, and --merge-only just replays the journal (no Gemini) so the topics can be
+re-merged after chunk_merger.py changes.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from lib.houjinzei_common import atomic_json_write
+from lib.llm_cache import LLMCache, cache_key, default_cache
+from lib.llm_json import split_json_block
+
+JOURNAL_VERSION = 1
+
+DEFAULT_WORKERS = 3
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 10.0  # 秒: 1回目の再試行待ち（以降 2 倍）
+
+
+class ChunkError(Exception):
+    """1回の Gemini 実行または出力抽出の失敗。"""
+
+
+@dataclass
+class ChunkResult:
+    chunk_index: int
+    status: str  # "ok" | "failed"
+    raw_path: str
+    topics_path: str
+    structure_path: str
+    attempts: int = 0
+    duration_sec: float = 0.0
+    error: str = ""
+    cached: bool = False
+    resumed: bool = False
+
+
+def manifest_hash(manifest: dict, prompt: str, source_name: str) -> str:
+    """プロンプト・チャンク境界・各チャンク本文から決まるハッシュ（ジャーナルの有効性判定用）。"""
+    h = hashlib.sha256()
+    h.update(json.dumps([prompt, source_name, manifest.get("chunk_count")], ensure_ascii=False).encode("utf-8"))
+    for chunk in sorted(manifest.get("chunks", []), key=lambda c: int(c["chunk_index"])):
+        head = [chunk["chunk_index"], chunk.get("start_page"), chunk.get("end_page")]
+        h.update(json.dumps(head).encode("utf-8"))
+        with open(chunk["path"], "rb") as f:
+            h.update(hashlib.sha256(f.read()).digest())
+    return h.hexdigest()
+
+
+class ChunkJournal:
+    """チャンク単位の進捗ジャーナル。manifest_hash が一致する既存ジャーナルだけを引き継ぐ。"""
+
+    def __init__(self, path: str | Path, digest: str):
+        self.path = Path(path)
+        self.manifest_hash = digest
+        self.chunks: dict[str, dict] = {}
+        self.reused = False
+        self._lock = threading.Lock()
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if data.get("version") == JOURNAL_VERSION and data.get("manifest_hash") == digest:
+            self.chunks = data.get("chunks", {})
+            self.reused = True
+
+    def completed(self, index: int) -> ChunkResult | None:
+        """ok として記録済みで出力ファイルが残っているチャンクの結果。"""
+        entry = self.chunks.get(str(index))
+        if not entry or entry.get("status") != "ok":
+            return None
+        res = ChunkResult(
+            index, "ok", entry["raw_path"], entry["topics_path"], entry["structure_path"],
+            attempts=entry.get("attempts", 0), duration_sec=entry.get("duration_sec", 0.0), resumed=True,
+        )
+        if not (Path(res.topics_path).exists() and Path(res.structure_path).exists()):
+            return None
+        return res
+
+    def record(self, result: ChunkResult) -> None:
+        entry = asdict(result)
+        del entry["chunk_index"], entry["resumed"]
+        entry["updated"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            self.chunks[str(result.chunk_index)] = entry
+            self.save()
+
+    def save(self) -> None:
+        ordered = dict(sorted(self.chunks.items(), key=lambda kv: int(kv[0])))
+        atomic_json_write(self.path, {"version": JOURNAL_VERSION, "manifest_hash": self.manifest_hash, "chunks": ordered})
+
+
+def chunk_output_paths(chunk_text_path: str | Path) -> tuple[Path, Path, Path]:
+    """chunk テキストのパスから (raw, topics, structure) のパスを導出する。"""
+    text_path = Path(chunk_text_path)
+    base = text_path.name
+    if base.endswith("_text.txt"):
+        base = base[: -len("_text.txt")]
+    parent = text_path.parent
+    return (
+        parent / f"{base}_gemini_raw.md",
+        parent / f"{base}_topics.json",
+        parent / f"{base}_structure.md",
+    )
+
+
+def build_chunk_prompt(prompt: str, source_name: str, index: int, count: int, relpath: str) -> str:
+    return f"{prompt}\n\n以下は「{source_name}」のテキスト抽出結果（チャンク {index}/{count}）です:\n\n@{relpath}"
+
+
+def _is_topics_payload(data: object) -> bool:
+    """{"topics": [...]} か topic の配列か（chunk_merger.TopicMerger.add が受ける形）。"""
+    if isinstance(data, dict):
+        data = data.get("topics")
+    return isinstance(data, list) and all(isinstance(t, dict) for t in data)
+
+
+def extract_gemini_output(raw: str) -> tuple[object, str]:
+    """Gemini 出力から ```json ブロックの値と、ブロックを除いた Markdown を返す。
+
+    ブロックが途中で切れていれば完結した要素までで復元する（lib/llm_json.py）。
+    ブロックがない・topics の形でない出力は ChunkError（再試行させ、キャッシュしない）。
+    """
+    try:
+        data, structure = split_json_block(raw)
+    except ValueError as e:
+        raise ChunkError(f"JSONブロックが見つかりませんでした: {e}") from e
+    if not _is_topics_payload(data):
+        raise ChunkError("JSONブロックが topics の形ではありません")
+    return data, structure
+
+
+def run_gemini(gemini_bin: str, prompt: str, cwd: Path, timeout: float) -> str:
+    """gemini -p を実行し stdout+stderr を返す。タイムアウト時はプロセスグループごと kill。"""
+    proc = subprocess.Popen(
+        [gemini_bin, "-p", prompt, "--yolo", "-o", "text"],
+        cwd=str(cwd),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        start_new_session=True,
+    )
+    try:
+        out, _ = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        out, _ = proc.communicate()
+        raise ChunkError(f"タイムアウト ({timeout:.0f}s)")
+    text = out.decode("utf-8", errors="replace")
+    if proc.returncode != 0:
+        raise ChunkError(f"gemini 終了コード {proc.returncode}")
+    return text
+
+
+def _write_outputs(result: ChunkResult, raw: str, data: object, structure: str) -> None:
+    Path(result.raw_path).write_text(raw, encoding="utf-8")
+    Path(result.topics_path).write_text(json.dumps(data, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    Path(result.structure_path).write_text(structure + "\n", encoding="utf-8")
+    result.status = "ok"
+    result.error = ""
+
+
+def process_chunk(
+    chunk: dict,
+    *,
+    chunk_count: int,
+    prompt: str,
+    source_name: str,
+    cwd: Path,
+    gemini_bin: str,
+    timeout: float,
+    retries: int,
+    backoff: float,
+    cache: LLMCache | None = None,
+) -> ChunkResult:
+    index = int(chunk["chunk_index"])
+    raw_path, topics_path, structure_path = chunk_output_paths(chunk["path"])
+    result = ChunkResult(index, "failed", str(raw_path), str(topics_path), str(structure_path))
+    relpath = os.path.relpath(Path(chunk["path"]).resolve(), cwd.resolve())
+    full_prompt = build_chunk_prompt(prompt, source_name, index, chunk_count, relpath)
+
+    started = time.monotonic()
+    key = None
+    if cache is not None:
+        key = cache_key("gemini", build_chunk_prompt(prompt, source_name, index, chunk_count, ""), Path(chunk["path"]))
+        cached = cache.get(key)
+        if cached is not None:
+            try:
+                data, structure = extract_gemini_output(cached)
+            except ChunkError:
+                pass
+            else:
+                _write_outputs(result, cached, data, structure)
+                result.cached = True
+                result.duration_sec = round(time.monotonic() - started, 2)
+                return result
+
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(backoff * (2 ** (attempt - 1)))
+        result.attempts = attempt + 1
+        raw = ""
+        try:
+            raw = run_gemini(gemini_bin, full_prompt, cwd, timeout)
+            data, structure = extract_gemini_output(raw)
+        except ChunkError as e:
+            result.error = str(e)
+            raw_path.write_text(raw, encoding="utf-8")
+            print(f"   ⚠️  chunk {index} 失敗 (試行 {attempt + 1}/{retries + 1}): {e}", file=sys.stderr)
+            continue
+        _write_outputs(result, raw, data, structure)
+        if key is not None:
+            cache.put(key, raw)
+        break
+
+    result.duration_sec = round(time.monotonic() - started, 2)
+    return result
+
+
+def run_chunks(
+    manifest: dict,
+    *,
+    prompt: str,
+    source_name: str,
+    cwd: Path,
+    gemini_bin: str = "gemini",
+    workers: int = DEFAULT_WORKERS,
+    timeout: float = 1200,
+    retries: int = DEFAULT_RETRIES,
+    backoff: float = DEFAULT_BACKOFF,
+    cache: LLMCache | None = None,
+    journal: ChunkJournal | None = None,
+) -> list[ChunkResult]:
+    """manifest の全チャンクを最大 workers 並列で処理し、chunk_index 順に結果を返す。
+
+    journal があれば ok 記録済みのチャンクは実行せず、完了したチャンクを逐次記録する。
+    """
+    chunks = sorted(manifest.get("chunks", []), key=lambda c: int(c["chunk_index"]))
+    count = int(manifest.get("chunk_count", len(chunks)))
+
+    def _run_one(chunk: dict) -> ChunkResult:
+        done = journal.completed(int(chunk["chunk_index"])) if journal else None
+        if done is not None:
+            return done
+        res = process_chunk(
+            chunk,
+            chunk_count=count,
+            prompt=prompt,
+            source_name=source_name,
+            cwd=cwd,
+            gemini_bin=gemini_bin,
+            timeout=timeout,
+            retries=retries,
+            backoff=backoff,
+            cache=cache,
+        )
+        if journal:
+            journal.record(res)
+        return res
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(_run_one, chunk) for chunk in chunks]
+        results = []
+        for fut in futures:
+            res = fut.result()
+            mark = "✅" if res.status == "ok" else "❌"
+            if res.resumed:
+                how = "ジャーナルから再開"
+            elif res.cached:
+                how = "キャッシュ"
+            else:
+                how = f"{res.attempts}回, {res.duration_sec}s"
+            print(f"   {mark} chunk {res.chunk_index}/{count} ({how})", file=sys.stderr)
+            results.append(res)
+    return results
+
+
+def replay_journal(manifest: dict, journal: ChunkJournal) -> list[ChunkResult]:
+    """Gemini を呼ばずにジャーナルから結果を復元する（未完了チャンクは failed）。"""
+    results = []
+    for chunk in sorted(manifest.get("chunks", []), key=lambda c: int(c["chunk_index"])):
+        index = int(chunk["chunk_index"])
+        res = journal.completed(index)
+        if res is None:
+            raw_path, topics_path, structure_path = chunk_output_paths(chunk["path"])
+            res = ChunkResult(index, "failed", str(raw_path), str(topics_path), str(structure_path), error="未完了")
+        results.append(res)
+    return results
+
+
+def write_combined(results: list[ChunkResult], count: int, raw_out: Path, structure_out: Path) -> None:
+    """チャンク順に raw / structure を連結する（ingest.sh の単発処理と同じ出力先）。"""
+    with open(raw_out, "w", encoding="utf-8") as raw_f, open(structure_out, "w", encoding="utf-8") as st_f:
+        for res in results:
+            raw_path = Path(res.raw_path)
+            raw_text = raw_path.read_text(encoding="utf-8") if raw_path.exists() else ""
+            raw_f.write(f"\n# chunk {res.chunk_index}/{count}\n\n{raw_text}\n")
+            if res.status == "ok":
+                structure = Path(res.structure_path).read_text(encoding="utf-8")
+                st_f.write(f"\n## チャンク {res.chunk_index}/{count}\n\n{structure}\n")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Process chunk_splitter manifest with Gemini in parallel")
+    parser.add_argument("--manifest", required=True, help="chunk_splitter.py manifest json")
+    parser.add_argument("--prompt-file", required=True, help="Prompt template (prompts/gemini_*.md)")
+    parser.add_argument("--source-name", required=True, help="Source (PDF) name shown in the prompt")
+    parser.add_argument("--cwd", required=True, help="Directory gemini runs in (@paths are relative to it)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Concurrent gemini processes")
+    parser.add_argument("--timeout", type=float, default=1200, help="Per-attempt timeout in seconds")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES, help="Retries per chunk")
+    parser.add_argument("--backoff", type=float, default=DEFAULT_BACKOFF, help="First retry delay (doubles)")
+    parser.add_argument("--gemini-bin", default=os.environ.get("GEMINI_BIN", "gemini"), help="gemini executable")
+    parser.add_argument("--journal", help="Per-chunk resume journal json (skip chunks recorded as ok)")
+    parser.add_argument("--merge-only", action="store_true", help="Do not run gemini; replay --journal")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the shared LLM cache")
+    parser.add_argument("--raw-out", help="Combined raw output path")
+    parser.add_argument("--structure-out", help="Combined structure.md path")
+    parser.add_argument("--results-out", help="Per-chunk result json path")
+    args = parser.parse_args()
+
+    manifest = json.loads(Path(args.manifest).read_text(encoding="utf-8"))
+    prompt = Path(args.prompt_file).read_text(encoding="utf-8").rstrip("\n")
+    journal = None
+    if args.journal:
+        journal = ChunkJournal(args.journal, manifest_hash(manifest, prompt, args.source_name))
+
+    if args.merge_only:
+        if journal is None or not journal.reused:
+            print("有効なジャーナルがありません（manifest/プロンプトが変わったか未実行）", file=sys.stderr)
+            return 1
+        results = replay_journal(manifest, journal)
+    else:
+        if journal is not None:
+            if journal.reused:
+                done = sum(1 for e in journal.chunks.values() if e.get("status") == "ok")
+                print(f"   ジャーナル再開: {done}チャンク完了済み", file=sys.stderr)
+            else:
+                journal.save()
+        results = run_chunks(
+            manifest,
+            prompt=prompt,
+            source_name=args.source_name,
+            cwd=Path(args.cwd),
+            gemini_bin=args.gemini_bin,
+            workers=args.workers,
+            timeout=args.timeout,
+            retries=max(0, args.retries),
+            backoff=args.backoff,
+            cache=None if args.no_cache else default_cache(),
+            journal=journal,
+        )
+
+    if args.raw_out and args.structure_out:
+        write_combined(results, int(manifest.get("chunk_count", len(results))), Path(args.raw_out), Path(args.structure_out))
+    if args.results_out:
+        Path(args.results_out).write_text(
+            json.dumps({"chunks": [asdict(r) for r in results]}, ensure_ascii=False, indent=2) + "\n",
+            encoding="utf-8",
+        )
+
+    for res in results:
+        if res.status == "ok":
+            print(res.topics_path)
+    return 0 if any(r.status == "ok" for r in results) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
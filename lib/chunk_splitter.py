@@ -4,18 +4,31 @@
 Input format expects repeated sections like:
 --- ページ 1 ---
 <page text>
+
+With --stream the input is mmapped instead of read into memory: only page
+byte offsets are kept, chapter headings are detected from the first lines of
+each page, and chunk files are written by copying byte ranges from the map.
+The chunk files are identical to the in-memory mode.
+
+With --budget-bytes / --budget-tokens chunks are packed up to a size budget
+instead of a page count: pages are never split, and a chapter start within
+--chapter-tolerance of the budget is preferred as the cut point.
 """
 
 from __future__ import annotations
 
 import argparse
 import json
+import mmap
 import re
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Iterable
 
 PAGE_HEADER_RE = re.compile(r"^--- ページ\s+(\d+)\s+---\s*$", re.MULTILINE)
+PAGE_HEADER_BYTES_RE = re.compile(PAGE_HEADER_RE.pattern.encode("utf-8"), re.MULTILINE)
+CHAPTER_SCAN_LINES = 30
+RELEASE_STEP = 32 * 1024 * 1024  # streaming mode: drop scanned map pages every 32MB
 CHAPTER_RE = re.compile(
     r"^(?:\s*(?:第[0-9０-９一二三四五六七八九十百千万]+(?:章|編)\b.*|(?:CHAPTER|Chapter)\s+\d+\b.*))$"
 )
@@ -27,6 +40,15 @@ class Page:
     text: str
 
 
+@dataclass
+class PageSpan:
+    """Byte range of a page body inside the mmapped input (streaming mode)."""
+
+    page_no: int
+    start: int
+    end: int
+
+
 def parse_pages(raw_text: str) -> list[Page]:
     matches = list(PAGE_HEADER_RE.finditer(raw_text))
     pages: list[Page] = []
@@ -50,13 +72,16 @@ def _normalized_lines(text: str, limit: int = 30) -> Iterable[str]:
             break
 
 
+def _has_chapter_heading(lines: Iterable[str]) -> bool:
+    return any(CHAPTER_RE.match(line) for line in lines)
+
+
 def detect_chapter_starts(pages: list[Page]) -> list[int]:
     if not pages:
         return []
     starts = [0]
     for idx, page in enumerate(pages[1:], start=1):
-        header_lines = list(_normalized_lines(page.text, limit=30))
-        if any(CHAPTER_RE.match(line) for line in header_lines):
+        if _has_chapter_heading(_normalized_lines(page.text, limit=CHAPTER_SCAN_LINES)):
             starts.append(idx)
     # remove duplicates while preserving order
     deduped: list[int] = []
@@ -103,11 +128,15 @@ def _expand_boundaries(boundaries: list[int], total_pages: int, max_pages: int)
 
 
 def build_chunks(pages: list[Page], pages_per_chunk: int) -> tuple[list[tuple[int, int]], str]:
-    total = len(pages)
+    return _chunks_from_starts(len(pages), detect_chapter_starts(pages), pages_per_chunk)
+
+
+def _chunks_from_starts(
+    total: int, chapter_starts: list[int], pages_per_chunk: int
+) -> tuple[list[tuple[int, int]], str]:
     if total == 0:
         return [], "empty"
 
-    chapter_starts = detect_chapter_starts(pages)
     max_reasonable_chunks = max(total // pages_per_chunk * 3, 30)
     if len(chapter_starts) <= 1 or len(chapter_starts) > max_reasonable_chunks:
         boundaries = _fallback_boundaries(total, pages_per_chunk)
@@ -126,6 +155,62 @@ def build_chunks(pages: list[Page], pages_per_chunk: int) -> tuple[list[tuple[in
     return chunks, mode
 
 
+# ─── budget mode ────────────────────────────────────────
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token estimate: ~4 ASCII chars per token, 1 token per other char."""
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def _header_weight(page_no: int, unit: str) -> int:
+    header = f"--- ページ {page_no} ---\n"
+    return len(header.encode("utf-8")) + 2 if unit == "bytes" else estimate_tokens(header)
+
+
+def page_weights(pages: list[Page], unit: str = "bytes") -> list[int]:
+    """Per-page size (header + body) in bytes or estimated tokens."""
+    if unit == "bytes":
+        return [_header_weight(p.page_no, unit) + len(p.text.encode("utf-8")) for p in pages]
+    return [_header_weight(p.page_no, unit) + estimate_tokens(p.text) for p in pages]
+
+
+def build_budget_chunks(
+    weights: list[int], chapter_starts: list[int], budget: int, tolerance: float = 0.2
+) -> tuple[list[tuple[int, int]], str]:
+    """Pack whole pages into chunks of about `budget`.
+
+    Each chunk takes as many pages as fit in the budget (at least one, so an
+    oversized page becomes its own chunk). If a chapter starts where the chunk
+    size would be within budget * (1 ± tolerance), the cut moves to the chapter
+    start closest to the budget.
+    """
+    total = len(weights)
+    if total == 0:
+        return [], "empty"
+
+    prefix = [0]
+    for w in weights:
+        prefix.append(prefix[-1] + w)
+    chapters = sorted(set(chapter_starts))
+    lo, hi = budget * (1 - tolerance), budget * (1 + tolerance)
+
+    chunks: list[tuple[int, int]] = []
+    start = 0
+    while start < total:
+        end = start + 1
+        while end < total and prefix[end + 1] - prefix[start] <= budget:
+            end += 1
+        if end < total:
+            near = [c for c in chapters if start < c < total and lo <= prefix[c] - prefix[start] <= hi]
+            if near:
+                end = min(near, key=lambda c: (abs(prefix[c] - prefix[start] - budget), c))
+        chunks.append((start, end))
+        start = end
+    return chunks, "budget"
+
+
 def chunk_to_text(pages: list[Page], start: int, end: int) -> str:
     blocks = []
     for page in pages[start:end]:
@@ -133,6 +218,200 @@ def chunk_to_text(pages: list[Page], start: int, end: int) -> str:
     return "\n".join(blocks).rstrip() + "\n"
 
 
+# ─── streaming (mmap) mode ──────────────────────────────
+
+
+def scan_page_spans(mm: mmap.mmap) -> list[PageSpan]:
+    """Record the body byte range of every page without decoding the text."""
+    spans: list[PageSpan] = []
+    prev: re.Match | None = None
+    released = 0
+    for m in PAGE_HEADER_BYTES_RE.finditer(mm):
+        if prev is not None:
+            spans.append(_page_span(mm, prev, m.start()))
+        prev = m
+        if m.start() - released >= RELEASE_STEP:
+            _release(mm, released, m.start())
+            released = m.start()
+    if prev is not None:
+        spans.append(_page_span(mm, prev, len(mm)))
+    return spans
+
+
+def _utf8_len(lead: int) -> int:
+    if lead < 0x80:
+        return 1
+    if lead < 0xE0:
+        return 2
+    if lead < 0xF0:
+        return 3
+    return 4
+
+
+def _header_end(mm: mmap.mmap, pos: int, end: int) -> int:
+    """Where PAGE_HEADER_RE (str mode) ends: its ``\\s*$`` also spans Unicode
+    whitespace such as U+3000 and blank lines, up to the last line end in the run."""
+    best = pos
+    while pos < end:
+        n = _utf8_len(mm[pos])
+        ch = mm[pos:pos + n].decode("utf-8", errors="replace")
+        if not ch.isspace():
+            return best
+        if ch == "\n":
+            best = pos
+        pos += n
+    return end if end == len(mm) else best
+
+
+def _page_span(mm: mmap.mmap, header: re.Match, end: int) -> PageSpan:
+    # same as parse_pages(): header match end, then str.strip("\n") on the body
+    start = _header_end(mm, header.end(), end)
+    while start < end and mm[start] == 0x0A:
+        start += 1
+    while end > start and mm[end - 1] == 0x0A:
+        end -= 1
+    return PageSpan(page_no=int(header.group(1)), start=start, end=end)
+
+
+def _span_lines(mm: mmap.mmap, span: PageSpan, limit: int = CHAPTER_SCAN_LINES) -> Iterable[str]:
+    """_normalized_lines() over a page span, decoding one line at a time."""
+    cnt = 0
+    pos = span.start
+    while pos < span.end:
+        nl = mm.find(b"\n", pos, span.end)
+        line_end = span.end if nl == -1 else nl
+        for line in mm[pos:line_end].decode("utf-8", errors="replace").splitlines():
+            s = line.strip()
+            if not s:
+                continue
+            yield s
+            cnt += 1
+            if cnt >= limit:
+                return
+        pos = line_end + 1
+
+
+def detect_chapter_starts_spans(mm: mmap.mmap, spans: list[PageSpan]) -> list[int]:
+    if not spans:
+        return []
+    starts = [0]
+    released = 0
+    for idx in range(1, len(spans)):
+        span = spans[idx]
+        if _has_chapter_heading(_span_lines(mm, span)):
+            starts.append(idx)
+        if span.end - released >= RELEASE_STEP:
+            _release(mm, released, span.end)
+            released = span.end
+    return starts
+
+
+def span_weights(mm: mmap.mmap, spans: list[PageSpan], unit: str = "bytes") -> list[int]:
+    """page_weights() for the streaming mode, decoding one page at a time."""
+    if unit == "bytes":
+        return [_header_weight(sp.page_no, unit) + sp.end - sp.start for sp in spans]
+    weights: list[int] = []
+    released = 0
+    for sp in spans:
+        text = mm[sp.start:sp.end].decode("utf-8", errors="replace")
+        weights.append(_header_weight(sp.page_no, unit) + estimate_tokens(text))
+        if sp.end - released >= RELEASE_STEP:
+            _release(mm, released, sp.end)
+            released = sp.end
+    return weights
+
+
+def _rstrip_end(mm: mmap.mmap, start: int, end: int) -> int:
+    """Byte offset where mm[start:end].decode().rstrip() would end."""
+    while end > start:
+        lo = max(start, end - 4096)
+        while lo > start and 0x80 <= mm[lo] < 0xC0:  # don't cut a UTF-8 sequence
+            lo -= 1
+        stripped = mm[lo:end].decode("utf-8", errors="replace").rstrip()
+        if stripped:
+            return lo + len(stripped.encode("utf-8"))
+        end = lo
+    return start
+
+
+_ASCII_BYTES = bytes(range(0x80))
+
+
+def _char_counts(data: bytes) -> tuple[int, int]:
+    """(ASCII chars, total chars) of a UTF-8 slice, so estimate_tokens() can be summed per slice."""
+    return len(data) - len(data.translate(None, _ASCII_BYTES)), len(data.decode("utf-8", errors="replace"))
+
+
+def write_chunk_from_map(mm: mmap.mmap, spans: list[PageSpan], start: int, end: int, out_path: Path) -> int:
+    """Write spans[start:end] in chunk_to_text() format by copying byte ranges.
+
+    Returns estimate_tokens() of the written text, counted page by page while writing
+    (the chunk is never read back as a whole)."""
+    ascii_chars = chars = 0
+
+    def emit(data: bytes) -> None:
+        nonlocal ascii_chars, chars
+        out.write(data)
+        a, c = _char_counts(data)
+        ascii_chars += a
+        chars += c
+
+    with open(out_path, "wb") as out:
+        for i in range(start, end):
+            span = spans[i]
+            body_end = span.end if i + 1 < end else _rstrip_end(mm, span.start, span.end)
+            if i > start:
+                emit(b"\n\n")
+            emit(f"--- ページ {span.page_no} ---".encode("utf-8"))
+            if body_end > span.start:
+                emit(b"\n")
+                emit(mm[span.start:body_end])
+            elif i + 1 < end:
+                emit(b"\n")
+        emit(b"\n")
+    return (ascii_chars + 3) // 4 + (chars - ascii_chars)
+
+
+def _release(mm: mmap.mmap, start: int = 0, end: int | None = None) -> None:
+    """Drop already-processed file pages from RSS (read-only map, so nothing is lost)."""
+    if not hasattr(mmap, "MADV_DONTNEED"):
+        return
+    end = len(mm) if end is None else end
+    start -= start % mmap.PAGESIZE
+    if end > start:
+        mm.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+
+def split_streaming(
+    in_path: Path,
+    out_dir: Path,
+    safe_name: str,
+    pages_per_chunk: int,
+    budget: int = 0,
+    budget_unit: str = "bytes",
+    tolerance: float = 0.2,
+) -> tuple[list[PageSpan], list[tuple[int, int]], str, list[Path], list[int]]:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    if in_path.stat().st_size == 0:
+        return [], [], "empty", [], []
+    with open(in_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        spans = scan_page_spans(mm)
+        chapter_starts = detect_chapter_starts_spans(mm, spans)
+        if budget > 0:
+            weights = span_weights(mm, spans, budget_unit)
+            chunks, mode = build_budget_chunks(weights, chapter_starts, budget, tolerance)
+        else:
+            chunks, mode = _chunks_from_starts(len(spans), chapter_starts, pages_per_chunk)
+        paths: list[Path] = []
+        est_tokens: list[int] = []
+        for idx, (start, end) in enumerate(chunks, start=1):
+            chunk_path = out_dir / f"{safe_name}_chunk_{idx}_text.txt"
+            est_tokens.append(write_chunk_from_map(mm, spans, start, end, chunk_path))
+            _release(mm, spans[start].start, spans[end - 1].end)
+            paths.append(chunk_path)
+    return spans, chunks, mode, paths, est_tokens
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(description="Split extracted text into chapter/page chunks")
     parser.add_argument("--input", required=True, help="Input extracted text file")
@@ -140,17 +419,45 @@ def main() -> int:
     parser.add_argument("--safe-name", required=True, help="Base safe file name")
     parser.add_argument("--manifest-out", required=True, help="Output manifest json path")
     parser.add_argument("--pages-per-chunk", type=int, default=50, help="Fallback/maximum pages per chunk")
+    parser.add_argument("--stream", action="store_true", help="mmap the input and copy byte ranges (flat memory)")
+    budget_group = parser.add_mutually_exclusive_group()
+    budget_group.add_argument("--budget-bytes", type=int, default=0, help="Target chunk size in bytes")
+    budget_group.add_argument("--budget-tokens", type=int, default=0, help="Target chunk size in estimated tokens")
+    parser.add_argument(
+        "--chapter-tolerance", type=float, default=0.2, help="Budget mode: cut at a chapter start within ±this ratio"
+    )
     args = parser.parse_args()
 
     in_path = Path(args.input)
     out_dir = Path(args.output_dir)
     manifest_path = Path(args.manifest_out)
+    pages_per_chunk = max(1, args.pages_per_chunk)
+    budget_unit = "tokens" if args.budget_tokens > 0 else "bytes"
+    budget = max(0, args.budget_tokens or args.budget_bytes)
 
-    raw = in_path.read_text(encoding="utf-8")
-    pages = parse_pages(raw)
-    chunks, mode = build_chunks(pages, max(1, args.pages_per_chunk))
+    if args.stream:
+        pages, chunks, mode, chunk_paths, chunk_tokens = split_streaming(
+            in_path, out_dir, args.safe_name, pages_per_chunk, budget, budget_unit, args.chapter_tolerance
+        )
+    else:
+        raw = in_path.read_text(encoding="utf-8")
+        pages = parse_pages(raw)
+        if budget > 0:
+            chunks, mode = build_budget_chunks(
+                page_weights(pages, budget_unit), detect_chapter_starts(pages), budget, args.chapter_tolerance
+            )
+        else:
+            chunks, mode = build_chunks(pages, pages_per_chunk)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        chunk_paths = []
+        chunk_tokens = []
+        for idx, (start, end) in enumerate(chunks, start=1):
+            chunk_path = out_dir / f"{args.safe_name}_chunk_{idx}_text.txt"
+            text = chunk_to_text(pages, start, end)
+            chunk_path.write_text(text, encoding="utf-8")
+            chunk_paths.append(chunk_path)
+            chunk_tokens.append(estimate_tokens(text))
 
-    out_dir.mkdir(parents=True, exist_ok=True)
     manifest = {
         "source": str(in_path),
         "mode": mode,
@@ -158,11 +465,10 @@ def main() -> int:
         "chunk_count": len(chunks),
         "chunks": [],
     }
+    if budget > 0:
+        manifest["budget"] = {"unit": budget_unit, "size": budget, "chapter_tolerance": args.chapter_tolerance}
 
-    for idx, (start, end) in enumerate(chunks, start=1):
-        file_name = f"{args.safe_name}_chunk_{idx}_text.txt"
-        chunk_path = out_dir / file_name
-        chunk_path.write_text(chunk_to_text(pages, start, end), encoding="utf-8")
+    for idx, ((start, end), chunk_path, tokens) in enumerate(zip(chunks, chunk_paths, chunk_tokens), start=1):
         manifest["chunks"].append(
             {
                 "chunk_index": idx,
@@ -170,6 +476,8 @@ def main() -> int:
                 "start_page": pages[start].page_no,
                 "end_page": pages[end - 1].page_no,
                 "page_count": end - start,
+                "bytes": chunk_path.stat().st_size,
+                "est_tokens": tokens,
             }
         )
 
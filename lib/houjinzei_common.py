@@ -3,10 +3,13 @@
 全スクリプトで共有する定数・frontmatter I/O・ユーティリティ関数。
 """
 
+import fcntl
 import json
 import os
 import sys
 import tempfile
+import time
+from contextlib import contextmanager
 from datetime import date, datetime
 from pathlib import Path
 
@@ -127,6 +130,37 @@ def atomic_json_write(path, data, indent=2) -> None:
         raise
 
 
+# ─── Vault ロック ────────────────────────────────────────
+
+VAULT_LOCK_TIMEOUT = 600  # 秒: コミット処理でロックを待つ上限
+
+
+@contextmanager
+def vault_lock(timeout=VAULT_LOCK_TIMEOUT, path=LOCKFILE):
+    """シェルの `exec 200>$LOCKFILE; flock 200` と同じ vault の排他ロック。
+
+    取得できるまで最大 timeout 秒待つ（None なら無期限）。取得できなければ
+    TimeoutError。HOUJINZEI_LOCK_HELD=1 の子プロセスからは取得しない。
+    """
+    if os.environ.get("HOUJINZEI_LOCK_HELD") == "1":
+        yield
+        return
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with open(path, "w") as f:
+        while True:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise TimeoutError(f"vault ロックを {timeout} 秒以内に取得できませんでした: {path}")
+                time.sleep(0.5)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
 # ─── Stage / Status ロジック ─────────────────────────────
 
 def compute_stage(status: str, kome_total: int, calc_correct: int, calc_wrong: int) -> str:
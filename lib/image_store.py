@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""画像ストアのマニフェストと差分アップロード（ページ画像・計算手順画像）。
+
+02_extracted/page_images/ と 02_extracted/calc_images/ のそれぞれに
+_manifest.json を置き、次の 3 つを記録する。
+
+  renders  "<book>/<page:03d>@<dpi>q<quality>" → {file, sha256, size[, crops]}
+           そのページ画像がどの描画条件で作られたか。crops は同じ描画で切り抜いた
+           問題 ID → bbox。extract_page_images.sh は条件・切り抜き・ファイル内容が
+           一致するページだけを描画し直さない（DPI や bbox を変えれば描き直す）。
+           今の問題一覧にない切り抜きは extract_page_images.sh が消し、prune で記録も落とす。
+           calc_images では render_calc_images.js が論点 ID → {file, source_sha256, ...} を書く。
+  files    相対パス → [size, mtime_ns, sha256]（ハッシュの再計算を省くメモ）
+  remote   送り先 → リモートキー → {sha256, size, file, uploaded_at}
+           送り先ごとに最後にアップロードした内容。ハッシュが変わったファイルだけを送る
+           （送り先は "r2:komekome-pages" や "dir:/path" で、検証用の送信は R2 の記録と混ざらない）。
+
+アップロードは BATCH 件ずつ、各バッチを WORKERS 本並行に送り、バッチごとに
+マニフェストを保存する（中断しても送れた分はやり直さない）。送り先は
+wrangler の R2（WranglerBucket）か、テスト用にローカルディレクトリ（DirectoryBucket）。
+
+使い方:
+  python3 lib/image_store.py upload pages [--dry-run] [--workers N] [--batch N] [--bucket-dir DIR]
+  python3 lib/image_store.py upload calc  [...]
+  python3 lib/image_store.py status pages|calc [--bucket-dir DIR]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Protocol
+
+from lib.houjinzei_common import VaultPaths, atomic_json_write
+from lib.page_render import crop_image_path
+
+MANIFEST_NAME = "_manifest.json"
+R2_BUCKET = "komekome-pages"
+UPLOAD_WORKERS = 4
+UPLOAD_BATCH = 50
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def render_key(book: str, page: int, dpi: int, quality: int) -> str:
+    return f"{book}/{page:03d}@{dpi}q{quality}"
+
+
+def _crop_record(crops: Iterable[tuple[str, Iterable[float]]]) -> dict[str, list[float]]:
+    """[(問題 ID, bbox)] → マニフェストに書く {問題 ID: [左, 上, 右, 下]}。"""
+    return {pid: list(bbox) for pid, bbox in crops}
+
+
+@dataclass
+class UploadItem:
+    path: Path
+    key: str
+    sha256: str
+    size: int
+
+
+class ImageManifest:
+    """画像ディレクトリ 1 つ分のマニフェスト。"""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.path = self.root / MANIFEST_NAME
+        self.data = {"version": 1, "renders": {}, "files": {}, "remote": {}}
+        if self.path.exists():
+            loaded = json.loads(self.path.read_text(encoding="utf-8"))
+            for section in ("renders", "files", "remote"):
+                self.data[section] = loaded.get(section, {})
+
+    def _rel(self, path: Path) -> str:
+        return Path(path).relative_to(self.root).as_posix()
+
+    def digest(self, path: Path) -> tuple[str, int]:
+        """(sha256, size)。サイズと mtime が記録と同じならハッシュを計算し直さない。"""
+        st = path.stat()
+        rel = self._rel(path)
+        memo = self.data["files"].get(rel)
+        if memo and memo[0] == st.st_size and memo[1] == st.st_mtime_ns:
+            return memo[2], st.st_size
+        sha = file_sha256(path)
+        self.data["files"][rel] = [st.st_size, st.st_mtime_ns, sha]
+        return sha, st.st_size
+
+    # ── 描画の記録 ──
+
+    def is_rendered(
+        self, book: str, page: int, dpi: int, quality: int, path: Path, crops: Iterable[tuple[str, Iterable[float]]] = ()
+    ) -> bool:
+        """path が (book, page, dpi, quality) で、切り抜き crops [(問題 ID, bbox)] とともに
+        描画したものそのままなら True。
+
+        マニフェスト導入前に作られた画像（どの条件の記録もない）は、今回の条件で
+        描画したものとして引き継ぐ。
+        """
+        if not path.exists():
+            return False
+        entry = self.data["renders"].get(render_key(book, page, dpi, quality))
+        if entry is None:
+            rel = self._rel(path)
+            if any(e.get("file") == rel for e in self.data["renders"].values()):
+                return False  # 別の条件で描画されている
+            self.record_render(book, page, dpi, quality, path, crops)
+            return True
+        return (
+            entry.get("file") == self._rel(path)
+            and entry.get("crops", {}) == _crop_record(crops)
+            and self.digest(path)[0] == entry.get("sha256")
+        )
+
+    def record_render(
+        self, book: str, page: int, dpi: int, quality: int, path: Path, crops: Iterable[tuple[str, Iterable[float]]] = ()
+    ) -> None:
+        rel = self._rel(path)
+        sha, size = self.digest(path)
+        renders = self.data["renders"]
+        for key in [k for k, e in renders.items() if e.get("file") == rel]:
+            del renders[key]  # 同じファイルの古い条件の記録は消す
+        entry = {"file": rel, "sha256": sha, "size": size}
+        crop_record = _crop_record(crops)
+        if crop_record:
+            entry["crops"] = crop_record
+        renders[render_key(book, page, dpi, quality)] = entry
+
+    def prune(self) -> int:
+        """消えたファイルの記録（ハッシュのメモ、描画記録の切り抜き）を落とし、落とした件数を返す。
+
+        送り先ごとの記録（remote）は送った内容の記録なので残す。
+        """
+        removed = 0
+        files = self.data["files"]
+        for rel in [rel for rel in files if not (self.root / rel).exists()]:
+            del files[rel]
+            removed += 1
+        for entry in self.data["renders"].values():
+            crops = entry.get("crops")
+            if not crops:
+                continue
+            full = self.root / entry.get("file", "")
+            try:
+                page = int(full.stem)
+            except ValueError:
+                continue
+            for pid in [pid for pid in crops if not crop_image_path(full.parent, page, pid).exists()]:
+                del crops[pid]
+                removed += 1
+            if not crops:
+                del entry["crops"]
+        return removed
+
+    # ── アップロードの記録 ──
+
+    def pending_uploads(self, files: Iterable[tuple[Path, str]], target: str) -> list[UploadItem]:
+        """(ローカルパス, リモートキー) のうち、target に送った内容と違うものだけを返す。"""
+        sent = self.data["remote"].get(target, {})
+        pending = []
+        for path, key in files:
+            sha, size = self.digest(path)
+            if sent.get(key, {}).get("sha256") != sha:
+                pending.append(UploadItem(path, key, sha, size))
+        return pending
+
+    def record_upload(self, item: UploadItem, target: str) -> None:
+        self.data["remote"].setdefault(target, {})[item.key] = {
+            "sha256": item.sha256,
+            "size": item.size,
+            "file": self._rel(item.path),
+            "uploaded_at": datetime.now().replace(microsecond=0).isoformat(),
+        }
+
+    def save(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        atomic_json_write(self.path, self.data, indent=None)
+
+
+# ── 送り先 ──
+
+
+class Bucket(Protocol):
+    name: str
+
+    def put(self, key: str, path: Path) -> None: ...
+
+
+class WranglerBucket:
+    """wrangler r2 object put で R2 に送る。"""
+
+    def __init__(self, wrangler_js: str, bucket: str = R2_BUCKET):
+        self.wrangler_js = wrangler_js
+        self.bucket = bucket
+        self.name = f"r2:{bucket}"
+
+    def put(self, key: str, path: Path) -> None:
+        cmd = [
+            "node", self.wrangler_js, "r2", "object", "put", f"{self.bucket}/{key}",
+            "--file", str(path), "--content-type", "image/webp", "--remote",
+        ]
+        proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        if proc.returncode != 0:
+            lines = (proc.stderr or "").strip().splitlines()
+            raise RuntimeError(lines[-1] if lines else f"exit {proc.returncode}")
+
+
+class DirectoryBucket:
+    """ローカルディレクトリをバケットの代わりにする（テスト・検証用）。"""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.name = f"dir:{self.root.resolve()}"
+
+    def put(self, key: str, path: Path) -> None:
+        dest = self.root / key
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dest.with_name(f".{dest.name}.tmp")
+        shutil.copyfile(path, tmp)
+        os.replace(tmp, dest)
+
+
+@dataclass
+class UploadResult:
+    uploaded: int
+    unchanged: int
+    failed: list[tuple[str, str]]
+
+
+def upload(
+    manifest: ImageManifest,
+    files: list[tuple[Path, str]],
+    bucket: Bucket,
+    *,
+    workers: int = UPLOAD_WORKERS,
+    batch: int = UPLOAD_BATCH,
+    dry_run: bool = False,
+) -> UploadResult:
+    """変更のあるファイルだけを並行に送り、送れたものをマニフェストに記録する。"""
+    pending = manifest.pending_uploads(files, bucket.name)
+    unchanged = len(files) - len(pending)
+    if dry_run:
+        for item in pending:
+            print(f"[dry-run] put {bucket.name}/{item.key} ({item.size} bytes)")
+        return UploadResult(len(pending), unchanged, [])
+
+    uploaded = 0
+    failed: list[tuple[str, str]] = []
+
+    def put(item: UploadItem):
+        try:
+            bucket.put(item.key, item.path)
+            return item, None
+        except Exception as e:
+            return item, str(e)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for start in range(0, len(pending), batch):
+            for item, error in pool.map(put, pending[start:start + batch]):
+                if error is None:
+                    manifest.record_upload(item, bucket.name)
+                    uploaded += 1
+                else:
+                    failed.append((item.key, error))
+                    print(f"\nエラー: アップロード失敗: {item.key}: {error}", file=sys.stderr)
+            manifest.save()
+            print(f"\r{uploaded}/{len(pending)} uploaded", end="", flush=True)
+    if pending:
+        print()
+    return UploadResult(uploaded, unchanged, failed)
+
+
+def page_image_files(root: Path) -> list[tuple[Path, str]]:
+    """page_images/<book>/<page>.webp → リモートキー "<book>/<page>.webp"。"""
+    return [(p, p.relative_to(root).as_posix()) for p in sorted(root.glob("*/*.webp"))]
+
+
+def calc_image_files(root: Path) -> list[tuple[Path, str]]:
+    """calc_images/<category>/<topic>.webp → リモートキー "calc_hints/<category>/<topic>.webp"。"""
+    return [(p, f"calc_hints/{p.relative_to(root).as_posix()}") for p in sorted(root.glob("*/*.webp"))]
+
+
+KINDS = {
+    "pages": ("page_images", page_image_files),
+    "calc": ("calc_images", calc_image_files),
+}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Incrementally upload rendered images to R2")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_up = sub.add_parser("upload", help="Upload new or changed images")
+    p_up.add_argument("kind", choices=sorted(KINDS))
+    p_up.add_argument("--dry-run", action="store_true")
+    p_up.add_argument("--workers", type=int, default=int(os.environ.get("UPLOAD_WORKERS", UPLOAD_WORKERS)))
+    p_up.add_argument("--batch", type=int, default=UPLOAD_BATCH)
+    p_up.add_argument("--bucket-dir", type=Path, help="Copy into this directory instead of R2")
+    p_status = sub.add_parser("status", help="Show how many images are pending upload")
+    p_status.add_argument("kind", choices=sorted(KINDS))
+    p_status.add_argument("--bucket-dir", type=Path)
+    args = parser.parse_args(argv)
+
+    dirname, list_files = KINDS[args.kind]
+    root = VaultPaths().extracted / dirname
+    if not root.is_dir():
+        print(f"エラー: 画像ディレクトリが見つかりません: {root}", file=sys.stderr)
+        return 1
+    manifest = ImageManifest(root)
+    files = list_files(root)
+
+    if args.bucket_dir:
+        bucket: Bucket = DirectoryBucket(args.bucket_dir)
+    else:
+        wrangler_js = os.environ.get("WRANGLER_JS", "")
+        if not wrangler_js and args.command == "upload" and not args.dry_run:
+            print("エラー: WRANGLER_JS が設定されていません", file=sys.stderr)
+            return 1
+        bucket = WranglerBucket(wrangler_js)
+
+    if args.command == "status":
+        pending = manifest.pending_uploads(files, bucket.name)
+        print(f"{args.kind}: {len(files)}ファイル, {bucket.name} に未送信 {len(pending)}件 ({sum(i.size for i in pending)} bytes)")
+        manifest.save()
+        return 0
+
+    print(f"アップロード対象: {len(files)}ファイル")
+    result = upload(manifest, files, bucket, workers=args.workers, batch=args.batch, dry_run=args.dry_run)
+    print(f"完了: {result.uploaded}ファイルアップロード, {result.unchanged}ファイル変更なし, {len(result.failed)}ファイル失敗")
+    return 1 if result.failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
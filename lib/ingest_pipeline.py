@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""PDF 取り込みパイプライン（ingest.sh の本体）。
+
+lib/stage_dag.py のステージとして宣言し、状態を 02_extracted/<SAFE_NAME>_pipeline.json
+に記録する。途中で失敗しても、再実行すると入力・パラメータが変わっていない
+ステージはスキップされる。
+
+  extract_text  pdfminer でページ並列テキスト抽出        → <SAFE>_text.txt
+  analyze       Gemini 構造分析（単発 or チャンク並列）  → <SAFE>_gemini_raw.md,
+                                                             <SAFE>_structure.md, <SAFE>_gemini_parts.json
+  merge         チャンク topics のマージ                 → <SAFE>_topics.json
+  notes         stage2.sh（Claude Code でノート生成）
+  record_index  ソースレジストリ（01_sources/_index.json）に取り込み済みを記録 [vault ロック]
+
+vault ロック（/tmp/houjinzei_vault.lock）は vault へ書き込む間だけ持つ。notes では
+stage2.sh がノート・ソースマップを書く直前に自分で取る（生成中は取らない）。
+テキスト抽出と Gemini 分析はロックなしで走るので、複数の PDF を並行に
+取り込め（lib/ingest_queue.py）、その間も generate_quiz.sh などは動ける。
+
+merge は lib/chunk_merger.py も入力に含むので、マージ処理を変更すると次回の実行で
+Gemini を呼ばずに再マージされる。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+from lib.chunk_merger import merge_files
+from lib.chunk_runner import ChunkError, extract_gemini_output, run_gemini
+from lib.houjinzei_common import VaultPaths, atomic_json_write, vault_lock
+from lib.llm_cache import cache_key, default_cache
+from lib.page_text_store import default_store, pdf_sha256
+from lib.pdf_text import page_count
+from lib.source_registry import SourceRegistry
+from lib.stage_dag import Pipeline, StageError
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+
+CHUNK_SIZE_THRESHOLD = 1_000_000  # bytes: これを超えるテキストはチャンク分割
+CHUNK_BUDGET_BYTES = 300_000  # 1チャンクの目標サイズ（ページ単位で詰め、章境界を優先）
+TIMEOUT_SINGLE = 1800
+TIMEOUT_CHUNK = 1200
+CHUNK_RETRIES = 2
+
+USAGE = """使い方: bash ingest.sh <PDFパス> <教材タイプ> [--resume | --remerge | --force]
+
+教材タイプ:
+  計算テキスト / 計算問題集 / 理論テキスト / 確認テスト / 模試 / 法令
+
+オプション:
+  --resume  （既定の動作）完了済みステージを再利用して途中から再開
+            （チャンク分割時は失敗・未実行のチャンクだけ再実行）
+  --remerge Geminiを呼ばず、チャンク結果から topics.json を再マージ
+  --force   記録を破棄して全ステージを再実行"""
+
+
+@dataclass
+class IngestJob:
+    vp: VaultPaths
+    pdf_path: Path
+    source_type: str
+    pdf_sha: str = ""  # ソースレジストリのキー（main で登録時に決まる）
+
+    @property
+    def pdf_filename(self) -> str:
+        name = self.pdf_path.name
+        return name[:-4] if name.endswith(".pdf") else name
+
+    @property
+    def safe_name(self) -> str:
+        return self.pdf_filename.replace(" ", "_")
+
+    def extracted(self, suffix: str) -> Path:
+        return self.vp.extracted / f"{self.safe_name}{suffix}"
+
+    @property
+    def prompt_file(self) -> Path:
+        return SCRIPTS_DIR / "prompts" / f"gemini_{self.source_type}.md"
+
+    @property
+    def text_file(self) -> Path:
+        return self.extracted("_text.txt")
+
+    @property
+    def raw_file(self) -> Path:
+        return self.extracted("_gemini_raw.md")
+
+    @property
+    def structure_file(self) -> Path:
+        return self.extracted("_structure.md")
+
+    @property
+    def topics_file(self) -> Path:
+        return self.extracted("_topics.json")
+
+    @property
+    def parts_file(self) -> Path:
+        return self.extracted("_gemini_parts.json")
+
+    @property
+    def chunk_manifest(self) -> Path:
+        return self.extracted("_chunk_manifest.json")
+
+    @property
+    def chunk_journal(self) -> Path:
+        return self.extracted("_chunk_journal.json")
+
+    @property
+    def state_file(self) -> Path:
+        return self.extracted("_pipeline.json")
+
+
+def _lib_script(name: str) -> str:
+    return str(SCRIPTS_DIR / "lib" / name)
+
+
+def _check_call(cmd: list[str], **kwargs) -> subprocess.CompletedProcess:
+    proc = subprocess.run(cmd, **kwargs)
+    if proc.returncode != 0:
+        raise StageError(f"{Path(cmd[1]).name} が終了コード {proc.returncode} で失敗しました")
+    return proc
+
+
+def already_ingested(job: IngestJob) -> str | None:
+    """内容が同じ PDF が取り込み済みなら、その記録上のファイル名を返す。"""
+    return SourceRegistry(job.vp).ingested_as(job.pdf_path)
+
+
+def register_source(job: IngestJob, **fields) -> None:
+    registry = SourceRegistry(job.vp)
+    with registry.transaction():
+        job.pdf_sha = registry.register(job.pdf_path, job.source_type, **fields)
+
+
+def record_text(job: IngestJob) -> None:
+    """抽出テキストのハッシュとページ数をレジストリに記録する。"""
+    store = default_store()
+    pages = store.page_count(job.pdf_sha, "pdfminer") if store else None
+    if pages is None:
+        pages = page_count(str(job.pdf_path), "pdfminer")
+    registry = SourceRegistry(job.vp)
+    with registry.transaction():
+        registry.update(job.pdf_sha, page_count=pages, text_sha256=pdf_sha256(job.text_file))
+
+
+def record_index(job: IngestJob) -> None:
+    registry = SourceRegistry(job.vp)
+    with registry.transaction():
+        registry.mark_ingested(
+            job.pdf_sha,
+            structure_file=job.structure_file.name,
+            topics_file=job.topics_file.name,
+        )
+
+
+def analyze_single(job: IngestJob, prompt: str, gemini_bin: str) -> list[str]:
+    """テキスト全体を 1 回の Gemini 呼び出しで分析し、topics の JSON パスを返す。"""
+    print(f"   方式: 単発処理（timeout={TIMEOUT_SINGLE}s）")
+    header = f"{prompt}\n\n以下は「{job.pdf_filename}」のテキスト抽出結果です:"
+    cache = default_cache()
+    key = cache_key("gemini", header, job.text_file)
+    raw = cache.get(key) if cache else None
+    if raw is not None:
+        print("   ♻️  LLMキャッシュ命中: Gemini 呼び出しを省略")
+    else:
+        relpath = os.path.relpath(job.text_file, job.vp.root)
+        try:
+            raw = run_gemini(gemini_bin, f"{header}\n\n@{relpath}", job.vp.root, TIMEOUT_SINGLE)
+        except ChunkError as e:
+            raise StageError(f"Gemini 実行に失敗しました: {e}") from e
+    job.raw_file.write_text(raw, encoding="utf-8")
+
+    try:
+        data, structure = extract_gemini_output(raw)
+    except ChunkError as e:
+        raise StageError(f"{e}（Geminiの出力を確認: {job.raw_file}）") from e
+    single_topics = job.extracted("_single_topics.json")
+    atomic_json_write(single_topics, data)
+    print("topics.json 抽出成功")
+    job.structure_file.write_text(structure, encoding="utf-8")
+    print("structure.md 抽出成功")
+    if cache:
+        cache.put(key, raw)
+    return [str(single_topics)]
+
+
+def analyze_chunks(job: IngestJob, gemini_bin: str) -> tuple[list[str], bool]:
+    """チャンク分割して並列に分析し、(成功したチャンクの topics パス, 全チャンク成功か) を返す。"""
+    print(f"   方式: チャンク分割処理（閾値 {CHUNK_SIZE_THRESHOLD} bytes 超）")
+    _check_call(
+        [
+            sys.executable, _lib_script("chunk_splitter.py"),
+            "--input", str(job.text_file),
+            "--output-dir", str(job.vp.extracted),
+            "--safe-name", job.safe_name,
+            "--manifest-out", str(job.chunk_manifest),
+            "--budget-bytes", str(CHUNK_BUDGET_BYTES),
+            "--stream",
+        ],
+        stdout=subprocess.DEVNULL,
+    )
+    count = int(json.loads(job.chunk_manifest.read_text(encoding="utf-8")).get("chunk_count", 0))
+    if count <= 0:
+        raise StageError(f"チャンク生成に失敗しました: {job.chunk_manifest}")
+    workers = os.environ.get("CHUNK_WORKERS", "3")
+    print(f"   チャンク数: {count}")
+    print(f"   Gemini実行: {count}チャンクを最大{workers}並列（timeout={TIMEOUT_CHUNK}s, 再試行{CHUNK_RETRIES}回）")
+    proc = subprocess.run(
+        [
+            sys.executable, _lib_script("chunk_runner.py"),
+            "--manifest", str(job.chunk_manifest),
+            "--journal", str(job.chunk_journal),
+            "--prompt-file", str(job.prompt_file),
+            "--source-name", job.pdf_filename,
+            "--cwd", str(job.vp.root),
+            "--gemini-bin", gemini_bin,
+            "--workers", workers,
+            "--timeout", str(TIMEOUT_CHUNK),
+            "--retries", str(CHUNK_RETRIES),
+            "--raw-out", str(job.raw_file),
+            "--structure-out", str(job.structure_file),
+        ],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    parts = [line for line in proc.stdout.splitlines() if line.strip()]
+    if not parts:
+        raise StageError("全チャンクのJSON抽出に失敗しました")
+    print(f"   成功チャンク: {len(parts)}/{count}")
+    return parts, len(parts) == count
+
+
+def build_pipeline(job: IngestJob, *, allow_gemini: bool = True) -> Pipeline:
+    pipe = Pipeline("ingest", job.state_file)
+    gemini_bin = os.environ.get("GEMINI_BIN", "gemini")
+
+    @pipe.stage(inputs=[job.pdf_path, _lib_script("pdf_text.py")], outputs=[job.text_file])
+    def extract_text():
+        print("   テキスト抽出中...")
+        _check_call(
+            [
+                sys.executable, _lib_script("pdf_text.py"),
+                "--input", str(job.pdf_path),
+                "--output", str(job.text_file),
+                "--backend", "pdfminer",
+                "--workers", os.environ.get("PDF_TEXT_WORKERS", "0"),
+            ]
+        )
+        print(f"   テキストサイズ: {job.text_file.stat().st_size} bytes")
+        record_text(job)
+
+    @pipe.stage(
+        inputs=[job.text_file, job.prompt_file],
+        outputs=[job.raw_file, job.structure_file, job.parts_file],
+        after=["extract_text"],
+        params={"threshold": CHUNK_SIZE_THRESHOLD, "budget_bytes": CHUNK_BUDGET_BYTES},
+    )
+    def analyze():
+        if not allow_gemini:
+            if job.parts_file.exists():
+                # 未完了のチャンクが残っていても、成功済みの分だけで再マージする
+                print("   --remerge: 既存のチャンク結果を使用")
+                return False
+            raise StageError("--remerge: 再利用できる Gemini 出力がありません（通常の実行で再開してください）")
+        prompt = job.prompt_file.read_text(encoding="utf-8").rstrip("\n")
+        if job.text_file.stat().st_size <= CHUNK_SIZE_THRESHOLD:
+            parts, mode, complete = analyze_single(job, prompt, gemini_bin), "single", True
+        else:
+            (parts, complete), mode = analyze_chunks(job, gemini_bin), "chunk"
+        atomic_json_write(job.parts_file, {"mode": mode, "parts": parts})
+        # 失敗チャンクが残っていれば次回の実行で（ジャーナルにより失敗分だけ）再実行する
+        return complete
+
+    def _parts() -> list[str]:
+        return json.loads(job.parts_file.read_text(encoding="utf-8"))["parts"]
+
+    @pipe.stage(
+        inputs=[job.parts_file, _parts, _lib_script("chunk_merger.py")],
+        outputs=[job.topics_file],
+        after=["analyze"],
+    )
+    def merge():
+        spec = json.loads(job.parts_file.read_text(encoding="utf-8"))
+        if spec["mode"] == "single":
+            shutil.copyfile(spec["parts"][0], job.topics_file)
+        else:
+            atomic_json_write(job.topics_file, merge_files(spec["parts"]))
+            print("topics.json マージ成功")
+        print("📂 出力:")
+        print(f"   構造: {job.structure_file}")
+        print(f"   論点: {job.topics_file}")
+
+    @pipe.stage(inputs=[job.topics_file, job.structure_file], after=["merge"])
+    def notes():
+        print("📝 STAGE 2: Claude Code でノート生成中...")
+        print("")
+        # vault ロックは stage2.sh が書き込みの間だけ取る（HOUJINZEI_LOCK_HELD はそのまま引き継ぐ）
+        if subprocess.run(["bash", str(SCRIPTS_DIR / "stage2.sh"), job.safe_name]).returncode != 0:
+            raise StageError("STAGE 2 でエラーが発生しました。")
+
+    @pipe.stage(after=["notes"], cache=False, name="record_index")
+    def _record_index():
+        # 失敗チャンクが残っている間は取り込み済みにしない（次回の実行で残りを再実行させる）
+        partial = [name for name in pipe.stages if name != "record_index" and pipe.recorded_status(name) == "partial"]
+        if partial:
+            print(f"⚠️  未完了のステージがあるため取り込み済みにしません: {', '.join(partial)}")
+            return False
+        with vault_lock():
+            record_index(job)
+
+    return pipe
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(usage=USAGE, add_help=False)
+    parser.add_argument("pdf", nargs="?")
+    parser.add_argument("source_type", nargs="?")
+    parser.add_argument("--resume", action="store_true")
+    parser.add_argument("--remerge", action="store_true")
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args(argv)
+    sys.stdout.reconfigure(line_buffering=True)  # 子プロセスの出力と順序を揃える
+    if not args.pdf or not args.source_type:
+        print(USAGE)
+        return 1
+
+    pdf_path = Path(args.pdf).resolve()
+    if not pdf_path.is_file():
+        print(f"❌ ファイルが見つかりません: {pdf_path}")
+        return 1
+    job = IngestJob(VaultPaths(), pdf_path, args.source_type)
+
+    print("==========================================")
+    print("📄 PDF取り込みパイプライン")
+    print("==========================================")
+    print(f"PDF:  {job.pdf_path}")
+    print(f"タイプ: {job.source_type}")
+    print(f"ID:   {job.safe_name}")
+    print("")
+
+    # --remerge / --force は取り込み済みのものをやり直すためのオプションなので止めない
+    ingested_as = already_ingested(job)
+    if ingested_as:
+        alias = "" if ingested_as == job.pdf_filename else f"（同じ内容の「{ingested_as}」として）"
+        print(f"⚠️  このPDFは取り込み済みです{alias}: {job.pdf_filename}")
+        if not (args.remerge or args.force):
+            print("   再マージは --remerge、全ステージの再実行は --force を付けてください。")
+            return 1
+        print(f"   {'--remerge' if args.remerge else '--force'} により再処理します")
+    if not job.prompt_file.is_file():
+        print(f"❌ プロンプトテンプレートがありません: {job.prompt_file}")
+        print("   対応タイプ:")
+        for p in sorted((SCRIPTS_DIR / "prompts").glob("gemini_*.md")):
+            print(f"     {p.stem[len('gemini_'):]}")
+        return 1
+
+    job.vp.extracted.mkdir(parents=True, exist_ok=True)
+    register_source(job, status="ingesting")
+    pipe = build_pipeline(job, allow_gemini=not args.remerge)
+    if args.force:
+        pipe.invalidate(*pipe.stages)
+        job.chunk_journal.unlink(missing_ok=True)
+    elif args.remerge:
+        pipe.invalidate("merge")
+
+    print("🔍 STAGE 1: Gemini CLI で構造分析中...")
+    print("")
+    try:
+        pipe.run()
+    except StageError as e:
+        register_source(job, status="failed")
+        print(f"❌ 取り込みに失敗しました: {e}")
+        print(f"   再実行すると完了済みのステージは再利用されます（状態: {job.state_file}）")
+        return 1
+
+    if pipe.recorded_status("record_index") == "partial":
+        print("")
+        print(f"⚠️  一部のチャンクが未完了です。再実行すると失敗したチャンクだけを処理します: {job.pdf_filename}")
+        return 1
+
+    print("")
+    print("==========================================")
+    print(f"🎉 取り込み完了: {job.pdf_filename}")
+    print("==========================================")
+    print("")
+    print("確認:")
+    print("  Obsidianで 10_論点/ を開いてノートを確認")
+    print("  30_ソース別/ にソースマップが作成されています")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""未取り込み PDF の並列取り込みキュー（catchup.sh から起動）。
+
+01_sources/ 配下でソースレジストリ（lib/source_registry.py）に未登録の PDF を探し、lib/ingest_pipeline.py を
+最大 INGEST_WORKERS 本（既定 2）並行に実行する。各取り込みはテキスト抽出と Gemini
+分析をロックなしで進め、vault を書き換える notes / record_index の間だけ vault
+ロックを持つので、取り込み中も generate_quiz.sh などは動ける。
+
+PDF ごとの進捗は
+  02_extracted/_ingest_queue.json        キュー上の状態（queued / running / done / failed）
+  02_extracted/<SAFE_NAME>_pipeline.json ステージごとの完了状況（lib/stage_dag.py）
+に残る。中断後に再実行すると、未完了の PDF は完了済みのステージを飛ばして再開する。
+同時に複数のキューは動かない（/tmp/houjinzei_ingest_queue.lock）。
+
+使い方:
+  python3 lib/ingest_queue.py scan     # 未取り込み PDF の一覧（PDF<TAB>教材タイプ）
+  python3 lib/ingest_queue.py run      # 取り込みを実行
+  python3 lib/ingest_queue.py status   # キューの状態を表示
+"""
+
+from __future__ import annotations
+
+import argparse
+import fcntl
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+from lib.houjinzei_common import VaultPaths, atomic_json_write
+from lib.source_registry import SourceRegistry
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+QUEUE_LOCKFILE = "/tmp/houjinzei_ingest_queue.lock"
+DEFAULT_WORKERS = 2  # 各取り込みが Gemini をチャンク並列で呼ぶので控えめにする
+
+
+@dataclass
+class PendingPdf:
+    path: Path
+    source_type: str
+
+    @property
+    def name(self) -> str:
+        return self.path.name
+
+    @property
+    def safe_name(self) -> str:
+        return self.path.stem.replace(" ", "_")
+
+
+def infer_source_type(filename: str) -> str:
+    if "計算テキスト" in filename:
+        return "計算テキスト"
+    if "計算問題集" in filename:
+        return "計算問題集"
+    if "理論テキスト" in filename or "理論問題集" in filename:
+        return "理論テキスト"
+    if "確認テスト" in filename:
+        return "確認テスト"
+    if "模試" in filename:
+        return "模試"
+    if any(k in filename for k in ("法人税法", "施行令", "施行規則", "通達", "措置法")):
+        return "法令"
+    return ""
+
+
+def scan_pending(vp: VaultPaths) -> tuple[list[PendingPdf], list[Path]]:
+    """(取り込み対象, 教材タイプを推定できなかった PDF) を返す。
+
+    取り込み済みかどうかはソースレジストリで内容（SHA-256）により判定するので、
+    改名・再ダウンロードした PDF や同じ内容のコピーは対象にならない。未取り込みの
+    同一内容のコピーが複数あれば最初の 1 つだけを対象にする。
+    """
+    registry = SourceRegistry(vp)
+    pending: list[PendingPdf] = []
+    unknown: list[Path] = []
+    queued: set[str] = set()
+    with registry.transaction():  # ハッシュ記録と従来エントリの移行を保存する
+        for root, _dirs, files in sorted(os.walk(vp.sources)):
+            for f in sorted(files):
+                if not f.lower().endswith(".pdf"):
+                    continue
+                path = Path(root) / f
+                source_type = infer_source_type(path.stem)
+                ingested_as = registry.ingested_as(path)
+                if ingested_as:
+                    entry = registry.get(registry.identify(path))
+                    if entry is None or path.stem not in entry["filenames"]:
+                        # ハッシュ未登録の従来エントリ、または同じ内容の別名
+                        registry.register(path, source_type, status="ingested")
+                    continue
+                if not source_type:
+                    unknown.append(path)
+                    continue
+                sha = registry.identify(path)
+                if sha in queued:
+                    print(f"⚠️  同じ内容のPDFが既に対象です（スキップ）: {f}", file=sys.stderr)
+                    continue
+                queued.add(sha)
+                pending.append(PendingPdf(path, source_type))
+    return pending, unknown
+
+
+class IngestQueue:
+    """取り込みジョブを並行に実行し、PDF ごとの状態を JSON に記録する。"""
+
+    def __init__(
+        self,
+        vp: VaultPaths,
+        workers: int = DEFAULT_WORKERS,
+        runner: Callable[[PendingPdf, Path], int] | None = None,
+    ):
+        self.vp = vp
+        self.workers = max(1, workers)
+        self.runner = runner or run_ingest
+        self.state_path = vp.extracted / "_ingest_queue.json"
+        self.log_dir = vp.root / "logs" / "ingest"
+        self._lock = threading.Lock()
+        try:
+            self.state = json.loads(self.state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self.state = {}
+        self.state.setdefault("jobs", {})
+
+    def _update(self, pdf: PendingPdf, **fields) -> None:
+        with self._lock:
+            job = self.state["jobs"].setdefault(str(pdf.path), {"source_type": pdf.source_type, "attempts": 0})
+            job.update(fields)
+            job["updated"] = time.strftime("%Y-%m-%d %H:%M:%S")
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            atomic_json_write(self.state_path, self.state)
+
+    def resumable_stages(self, pdf: PendingPdf) -> list[str]:
+        """前回までに完了しているステージ名（lib/stage_dag.py の状態ファイルから）。"""
+        try:
+            state = json.loads((self.vp.extracted / f"{pdf.safe_name}_pipeline.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return []
+        return [name for name, rec in state.get("stages", {}).items() if rec.get("status") == "done"]
+
+    def _run_one(self, pdf: PendingPdf) -> bool:
+        with self._lock:
+            attempts = self.state["jobs"].get(str(pdf.path), {}).get("attempts", 0) + 1
+        log_path = self.log_dir / f"{pdf.safe_name}_{time.strftime('%Y%m%d_%H%M%S')}.log"
+        done = self.resumable_stages(pdf)
+        resume = f"（再開: {', '.join(done)} は完了済み）" if done else ""
+        print(f"📄 取り込み開始: {pdf.name} ({pdf.source_type}){resume}", flush=True)
+        self._update(pdf, status="running", attempts=attempts, log=str(log_path), started=time.strftime("%Y-%m-%d %H:%M:%S"))
+
+        started = time.monotonic()
+        try:
+            returncode = self.runner(pdf, log_path)
+        except Exception as e:  # ランナー自体の失敗もジョブの失敗として記録する
+            returncode = -1
+            print(f"   {pdf.name}: {e}", flush=True)
+        duration = round(time.monotonic() - started, 1)
+
+        if returncode == 0:
+            self._update(pdf, status="done", returncode=0, duration_sec=duration)
+            print(f"✅ 取り込み完了: {pdf.name} ({duration}s)", flush=True)
+            return True
+        self._update(pdf, status="failed", returncode=returncode, duration_sec=duration)
+        print(f"❌ 取り込み失敗: {pdf.name} → ログを確認してください: {log_path}", flush=True)
+        return False
+
+    def run(self, pdfs: list[PendingPdf]) -> tuple[int, int]:
+        """全 PDF を処理し (成功数, 失敗数) を返す。"""
+        if not pdfs:
+            return 0, 0
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        for pdf in pdfs:
+            self._update(pdf, status="queued")
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(pdfs))) as pool:
+            results = list(pool.map(self._run_one, pdfs))
+        ok = sum(results)
+        return ok, len(results) - ok
+
+
+def run_ingest(pdf: PendingPdf, log_path: Path) -> int:
+    """lib/ingest_pipeline.py を子プロセスで実行し、終了コードを返す。"""
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(log_path, "ab") as log:
+        return subprocess.run(
+            [sys.executable, str(SCRIPTS_DIR / "lib" / "ingest_pipeline.py"), str(pdf.path), pdf.source_type],
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        ).returncode
+
+
+def _acquire_queue_lock():
+    f = open(QUEUE_LOCKFILE, "w")
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        f.close()
+        return None
+    return f
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Ingest pending PDFs concurrently")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("scan", help="List pending PDFs as PATH<TAB>SOURCE_TYPE")
+    p_run = sub.add_parser("run", help="Ingest all pending PDFs")
+    p_run.add_argument("--workers", type=int, default=int(os.environ.get("INGEST_WORKERS", DEFAULT_WORKERS)))
+    sub.add_parser("status", help="Show per-PDF queue state")
+    args = parser.parse_args()
+
+    vp = VaultPaths()
+    if args.command == "status":
+        queue = IngestQueue(vp)
+        for path, job in sorted(queue.state["jobs"].items()):
+            print(f"{job.get('status', '?'):8} {Path(path).name} (試行{job.get('attempts', 0)}回, {job.get('updated', '')})")
+        return 0
+
+    pending, unknown = scan_pending(vp)
+    for path in unknown:
+        print(f"⚠️  source_type 推定不可: {path.name} → 手動で ingest.sh を実行してください", file=sys.stderr)
+    if args.command == "scan":
+        for pdf in pending:
+            print(f"{pdf.path}\t{pdf.source_type}")
+        return 0
+
+    lock = _acquire_queue_lock()
+    if lock is None:
+        print("取り込みキューは既に実行中です")
+        return 0
+    with lock:
+        if not pending:
+            print("未取り込みPDFなし")
+            return 0
+        print(f"未取り込みPDF {len(pending)}件を最大{args.workers}並列で取り込みます")
+        ok, failed = IngestQueue(vp, args.workers).run(pending)
+        print(f"取り込みキュー完了: 成功 {ok} / 失敗 {failed}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+"""コメコメ Workers API のクライアント（komekome_sync.sh の本体）。
+
+サブコマンドごとに curl を起動して TLS 接続を張り直していたのをやめ、
+1 プロセスの中で次を行う。
+
+  - keep-alive の接続プール（http.client。接続を使い回す）
+  - 独立したキーの push を並行に送る（差分 push は lib/komekome_push.py）。
+    schedule は PUT でサーバーが today_problems を作り直すので、ほかが終わってから送る
+  - pull した結果の処理済みマークを PUT /api/komekome/result にまとめる
+    （一括 PUT のない古いデプロイで 404 / 405 なら、セッションごとの PUT に戻る）
+  - 接続エラーと 429 / 5xx はバックオフして再試行する（Retry-After があれば従う）。
+    ここで送るのは KV への put と処理済みマークだけで、同じ内容を送り直しても
+    結果は変わらない（PATCH の応答が失われた場合は再試行が 409 になり、全体を送り直す）
+  - リクエストごとの所要時間・試行回数・送受信バイト数を記録する（--timings で JSONL に追記）
+
+使い方（API_URL / API_TOKEN / VAULT は環境変数。komekome_sync.sh から呼ぶ）:
+  python3 lib/komekome_client.py push NAME [NAME ...] [--optional NAME ...] [--force]
+      --optional はファイルがあるときだけ送り、失敗しても警告にとどめる
+  python3 lib/komekome_client.py pull --results FILE --backup-dir DIR
+      取り込む結果がなければ終了コード 3（writeback は不要）
+  python3 lib/komekome_client.py pull-schedule
+  python3 lib/komekome_client.py status
+  共通: --timings FILE（リクエストごとの記録を JSONL で追記）
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+from urllib.parse import urlsplit
+
+from lib.houjinzei_common import VaultPaths, atomic_json_write
+from lib.komekome_push import (
+    COMPRESS_MIN_BYTES,
+    ENDPOINTS,
+    PushError,
+    PushResult,
+    PushState,
+    accepted_encodings,
+    compress,
+    decompress,
+    describe,
+    encode_json,
+    push,
+)
+
+USER_AGENT = "komekome-sync/1.0"
+POOL_SIZE = 4
+PUSH_WORKERS = 4
+MAX_ATTEMPTS = 4
+BACKOFF_BASE = 0.5  # 秒。0.5, 1, 2, ... に揺らぎを掛ける
+BACKOFF_MAX = 8.0
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+MARK_BATCH = 100  # result.js の MARK_BATCH_MAX
+SEQUENTIAL_ENDPOINTS = ("schedule",)  # ほかの push が終わってから送る
+EXIT_NOTHING = 3
+
+
+class ClientError(RuntimeError):
+    """再試行しても応答を得られなかった。"""
+
+
+@dataclass
+class Timing:
+    method: str
+    path: str
+    status: int | None  # None は接続エラーで終わった
+    attempts: int
+    sent: int  # 送った本文のバイト数（圧縮後・1 回分）
+    received: int  # 受け取った本文のバイト数（圧縮後・全試行）
+    seconds: float
+    reused: bool  # 最初の試行で keep-alive の接続を使い回した
+
+
+class KomekomeClient:
+    """keep-alive の接続プールで Workers API を呼ぶ（komekome_push.Transport を満たす）。"""
+
+    def __init__(
+        self,
+        api_url: str,
+        token: str,
+        *,
+        pool_size: int = POOL_SIZE,
+        timeout: float = 60,
+        encoding: str | None = "gzip",
+        max_attempts: int = MAX_ATTEMPTS,
+        backoff: float = BACKOFF_BASE,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        parts = urlsplit(api_url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"API_URL が不正です: {api_url}")
+        self.api_url = api_url.rstrip("/")
+        self._connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self._host = parts.hostname
+        self._port = parts.port
+        self._prefix = parts.path.rstrip("/")
+        self.token = token
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.encoding = encoding  # None なら本文を圧縮しない
+        self.max_attempts = max(1, max_attempts)
+        self.backoff = backoff
+        self.sleep = sleep
+        self._idle: list[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+        self.timings: list[Timing] = []
+
+    # ── 接続プール ──
+
+    def _acquire(self) -> tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+            self.connections_opened += 1
+        return self._connection_class(self._host, self._port, timeout=self.timeout), False
+
+    def _release(self, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def __enter__(self) -> KomekomeClient:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ── リクエスト ──
+
+    def _delay(self, attempt: int, retry_after: str | None) -> float:
+        if retry_after:
+            try:
+                return min(BACKOFF_MAX, max(0.0, float(retry_after)))
+            except ValueError:
+                pass  # HTTP 日付形式は使われないので指数バックオフにする
+        return min(BACKOFF_MAX, self.backoff * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+
+    def request(self, method: str, path: str, body: bytes | None = None, headers: dict | None = None) -> tuple[int, bytes]:
+        """(ステータス, 展開した本文)。429 / 5xx は再試行し、最後の応答を返す。"""
+        headers = {
+            "Authorization": f"Bearer {self.token}",
+            "Content-Type": "application/json",
+            "Accept-Encoding": ", ".join(accepted_encodings()),
+            "User-Agent": USER_AGENT,
+            **(headers or {}),
+        }
+        if body is not None and self.encoding and len(body) >= COMPRESS_MIN_BYTES:
+            body = compress(body, self.encoding)
+            headers["Content-Encoding"] = self.encoding
+        started = time.perf_counter()
+        received = 0
+        reused_first = False
+        error: Exception | None = None
+
+        for attempt in range(1, self.max_attempts + 1):
+            conn, reused = self._acquire()
+            if attempt == 1:
+                reused_first = reused
+            retry_after = None
+            try:
+                conn.request(method, self._prefix + path, body=body, headers=headers)
+                resp = conn.getresponse()
+                raw = resp.read()
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                error = e
+                # 使い回した接続がサーバー側で閉じられていただけなら、待たずに張り直す
+                delay = 0.0 if reused else self._delay(attempt, None)
+            else:
+                if resp.will_close:
+                    conn.close()
+                else:
+                    self._release(conn)
+                received += len(raw)
+                if resp.status not in RETRY_STATUSES or attempt == self.max_attempts:
+                    self._record(method, path, resp.status, attempt, len(body or b""), received, started, reused_first)
+                    return resp.status, decompress(raw, resp.getheader("Content-Encoding"))
+                error = None
+                retry_after = resp.getheader("Retry-After")
+                delay = self._delay(attempt, retry_after)
+            if attempt < self.max_attempts:
+                self.sleep(delay)
+
+        self._record(method, path, None, self.max_attempts, len(body or b""), received, started, reused_first)
+        raise ClientError(f"{method} {path}: {self.max_attempts}回試行しても接続できませんでした: {error}")
+
+    def _record(self, method, path, status, attempts, sent, received, started, reused) -> None:
+        timing = Timing(method, path, status, attempts, sent, received, round(time.perf_counter() - started, 4), reused)
+        with self._lock:
+            self.timings.append(timing)
+
+    def get_json(self, path: str) -> dict:
+        status, body = self.request("GET", path)
+        if status != 200:
+            raise ClientError(f"GET {path} 失敗 (HTTP {status}): {body.decode('utf-8', 'replace')[:200]}")
+        return json.loads(body)
+
+    # ── 記録 ──
+
+    def summary(self) -> str:
+        with self._lock:
+            timings = list(self.timings)
+        sent = sum(t.sent * t.attempts for t in timings)
+        received = sum(t.received for t in timings)
+        retries = sum(t.attempts - 1 for t in timings)
+        seconds = sum(t.seconds for t in timings)
+        return (
+            f"通信: {len(timings)}リクエスト（再試行 {retries}回, 接続 {self.connections_opened}本）"
+            f" 送信 {sent:,} / 受信 {received:,} バイト, 合計 {seconds:.2f}秒"
+        )
+
+    def write_timings(self, path: Path, command: str) -> None:
+        at = datetime.now().replace(microsecond=0).isoformat()
+        with self._lock:
+            lines = [json.dumps({"at": at, "command": command, **asdict(t)}, ensure_ascii=False) for t in self.timings]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.writelines(line + "\n" for line in lines)
+
+
+# ── push ──
+
+
+@dataclass
+class PushOutcome:
+    name: str
+    result: PushResult | None
+    error: str | None = None
+    optional: bool = False
+
+
+def push_many(
+    client: KomekomeClient,
+    names: list[str],
+    export_dir: Path,
+    *,
+    optional: list[str] | tuple[str, ...] = (),
+    force: bool = False,
+    workers: int = PUSH_WORKERS,
+) -> list[PushOutcome]:
+    """names（と、ファイルがあれば optional）を並行に push する。"""
+    state = PushState(export_dir / "_sync")
+    todo = list(dict.fromkeys(names))
+    todo += [n for n in dict.fromkeys(optional) if n not in todo and (export_dir / ENDPOINTS[n].filename).exists()]
+    optional_set = set(optional) - set(names)
+
+    def one(name: str) -> PushOutcome:
+        endpoint = ENDPOINTS[name]
+        path = export_dir / endpoint.filename
+        is_optional = name in optional_set
+        if not path.exists():
+            return PushOutcome(name, None, f"{path} が見つかりません", is_optional)
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+            return PushOutcome(name, push(endpoint, payload, client, state, force=force), None, is_optional)
+        except (PushError, ClientError, ValueError) as e:
+            return PushOutcome(name, None, str(e), is_optional)
+
+    parallel = [n for n in todo if n not in SEQUENTIAL_ENDPOINTS]
+    outcomes: list[PushOutcome] = []
+    if parallel:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(parallel)))) as pool:
+            outcomes.extend(pool.map(one, parallel))
+    outcomes.extend(one(n) for n in todo if n in SEQUENTIAL_ENDPOINTS)
+    return outcomes
+
+
+# ── pull ──
+
+
+def mark_processed(client: KomekomeClient, session_ids: list[str]) -> list[str]:
+    """セッションを処理済みにして、処理済みにできた ID を返す。"""
+    ids = [sid for sid in dict.fromkeys(session_ids) if sid]
+    done: list[str] = []
+    for start in range(0, len(ids), MARK_BATCH):
+        chunk = ids[start:start + MARK_BATCH]
+        status, body = client.request("PUT", "/api/komekome/result", encode_json({"session_ids": chunk}))
+        if status in (404, 405):
+            done.extend(_mark_each(client, chunk))
+            continue
+        if status != 200:
+            print(f"警告: processed マーク失敗 (HTTP {status}): {body.decode('utf-8', 'replace')[:200]}", file=sys.stderr)
+            continue
+        data = json.loads(body)
+        done.extend(data.get("processed", []))
+        for sid in data.get("missing", []):
+            print(f"警告: processed マーク失敗 ({sid}): 見つかりません", file=sys.stderr)
+    return done
+
+
+def _mark_each(client: KomekomeClient, ids: list[str]) -> list[str]:
+    """一括 PUT のない古いデプロイ向け。セッションごとの PUT を並行に送る。"""
+
+    def one(sid: str) -> str | None:
+        try:
+            status, _ = client.request("PUT", f"/api/komekome/result/{sid}/processed", b"{}")
+        except ClientError as e:
+            print(f"警告: processed マーク失敗 ({sid}): {e}", file=sys.stderr)
+            return None
+        if status != 200:
+            print(f"警告: processed マーク失敗 ({sid}): HTTP {status}", file=sys.stderr)
+            return None
+        return sid
+
+    with ThreadPoolExecutor(max_workers=client.pool_size) as pool:
+        return [sid for sid in pool.map(one, ids) if sid]
+
+
+def pull_results(client: KomekomeClient, results_file: Path, backup_dir: Path, timestamp: str) -> int:
+    """未処理の結果をまとめて results_file（とバックアップ）に書き、処理済みにする。取得件数を返す。"""
+    all_results = client.get_json("/api/komekome/result").get("results", [])
+    merged = [r for session in all_results for r in session.get("results", [])]
+    if not merged:
+        print("pull: 未処理の結果なし（スキップ）")
+        return 0
+
+    merged_data = {
+        "session_date": all_results[-1].get("session_date"),
+        "session_id": all_results[-1].get("session_id"),
+        "results": merged,
+    }
+    backup_dir.mkdir(parents=True, exist_ok=True)
+    atomic_json_write(backup_dir / f"komekome_results_{timestamp}.json", merged_data)
+    atomic_json_write(results_file, merged_data)
+    print(f"pull: {len(merged)}件の結果を取得")
+
+    done = mark_processed(client, [s.get("session_id", "") for s in all_results])
+    print(f"pull: {len(done)}セッションを処理済みにマーク")
+    return len(merged)
+
+
+def pull_schedule(client: KomekomeClient, schedule_file: Path) -> None:
+    atomic_json_write(schedule_file, client.get_json("/api/komekome/schedule"))
+
+
+def print_status(client: KomekomeClient) -> None:
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        import_future = pool.submit(client.get_json, "/api/komekome/import")
+        result_future = pool.submit(client.get_json, "/api/komekome/result")
+        import_data, result_data = import_future.result(), result_future.result()
+
+    print("=== コメコメ Workers API 同期ステータス ===")
+    print(f"API_URL: {client.api_url}")
+    print()
+    print("import データ:")
+    print(f"  生成日: {import_data.get('generated_date') or '不明'}")
+    print(f"  問題数: {len(import_data.get('questions', []))}")
+    print()
+    results = result_data.get("results", [])
+    print("未処理 results:")
+    print(f"  セッション数: {len(results)}")
+    print(f"  総件数: {sum(len(r.get('results', [])) for r in results)}")
+
+
+# ── CLI ──
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Sync client for the komekome Workers API")
+    parser.add_argument("--timings", type=Path, help="Append per-request timings to this JSONL file")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_push = sub.add_parser("push", help="Push export payloads (independent keys in parallel)")
+    p_push.add_argument("names", nargs="+", choices=sorted(ENDPOINTS))
+    p_push.add_argument("--optional", action="append", default=[], choices=sorted(ENDPOINTS),
+                        help="Push only if the file exists; failures are warnings")
+    p_push.add_argument("--force", action="store_true", help="Send whole payloads even if unchanged")
+    p_pull = sub.add_parser("pull", help="Fetch unprocessed results and mark them processed")
+    p_pull.add_argument("--results", type=Path, required=True)
+    p_pull.add_argument("--backup-dir", type=Path, required=True)
+    sub.add_parser("pull-schedule", help="Download weekly_schedule.json")
+    sub.add_parser("status", help="Show import and result status")
+    args = parser.parse_args(argv)
+
+    api_url = os.environ.get("API_URL", "")
+    token = os.environ.get("API_TOKEN", "")
+    if not api_url or not token:
+        print("エラー: API_URL / API_TOKEN が設定されていません", file=sys.stderr)
+        return 1
+
+    vp = VaultPaths()
+    rc = 0
+    with KomekomeClient(api_url, token) as client:
+        try:
+            if args.command == "push":
+                for o in push_many(client, args.names, vp.export, optional=args.optional, force=args.force):
+                    if o.error is None:
+                        print(describe(o.result))
+                    elif o.optional:
+                        print(f"警告: {o.name}: {o.error}", file=sys.stderr)
+                    else:
+                        print(f"エラー: {o.name}: {o.error}", file=sys.stderr)
+                        rc = 1
+            elif args.command == "pull":
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                if pull_results(client, args.results, args.backup_dir, timestamp) == 0:
+                    rc = EXIT_NOTHING
+            elif args.command == "pull-schedule":
+                pull_schedule(client, vp.export / "weekly_schedule.json")
+                print("pull-schedule 完了: Workers API → weekly_schedule.json")
+            else:
+                print_status(client)
+        except (ClientError, OSError, ValueError) as e:
+            print(f"エラー: {args.command} 失敗: {e}", file=sys.stderr)
+            rc = 1
+        print(client.summary(), file=sys.stderr)
+        if args.timings:
+            client.write_timings(args.timings, args.command)
+    return rc
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
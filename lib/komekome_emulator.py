@@ -0,0 +1,682 @@
+#!/usr/bin/env python3
+"""コメコメ Workers API（Pages Functions + KV / R2）のローカル代替。
+
+komekome-pwa/functions/api/komekome/ の各ファイル（problems / today / topics /
+dashboard / theory / import / schedule / result / attempts / page-image）を、
+同じステータスコード・同じ検証で Python で再現する
+（トークン認証 401、JSON 不正 400、PATCH の base 不一致 409、未登録 404）。
+リクエスト本文の Content-Encoding（gzip / deflate）の展開と、Accept-Encoding に
+応じた応答の圧縮も同じ。schedule の PUT / POST は schedule.js と同じく
+problems_master と attempts_all から today_problems を作り直す。
+
+KV は値を文字列で、メタデータと一緒に持つ。KVStore はメモリ上、SqliteKVStore は
+SQLite ファイルに保存する（止めても残る）。R2（ページ画像）はディレクトリで代える
+（image_store.py upload --bucket-dir と同じ配置）。
+
+テストや検証では serve() でスレッドに HTTP サーバーを立て、komekome_sync.sh の
+API_URL をそこに向ける（KOMEKOME_CONF で設定ファイルを差し替える）。
+本物の functions を Node で動かす komekome-pwa/local_functions.mjs とは
+tests/test_komekome_emulator.py で同じ応答になることを確かめている。
+
+使い方:
+  python3 lib/komekome_emulator.py --port 8787 --token TOKEN [--kv kv.sqlite3] [--pages-dir DIR]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sqlite3
+import subprocess
+import threading
+import zlib
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from lib.komekome_push import COMPRESS_MIN_BYTES, PatchError, accepted_encodings, apply_patch, compress, decompress
+
+ALLOWED_ORIGIN = "https://komekome.pages.dev"
+LOCAL_FUNCTIONS = Path(__file__).resolve().parent.parent / "komekome-pwa" / "local_functions.mjs"
+MARK_BATCH_MAX = 100  # result.js と同じ
+
+
+class KVStore:
+    """Workers KV の代わり（メモリ上）。値は文字列、メタデータは put ごとに置き換わる（省略すれば消える）。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: dict[str, tuple[str, dict | None]] = {}
+
+    def get(self, key: str) -> str | None:
+        return self.get_with_metadata(key)[0]
+
+    def get_json(self, key: str):
+        value = self.get(key)
+        return json.loads(value) if value is not None else None
+
+    def get_with_metadata(self, key: str) -> tuple[str | None, dict | None]:
+        with self._lock:
+            return self._data.get(key, (None, None))
+
+    def list(self, prefix: str = "") -> list[str]:
+        """KV の list と同じくキーの辞書順（UTF-8 のバイト順）。"""
+        with self._lock:
+            return sorted(k for k in self._data if k.startswith(prefix))
+
+    def put(self, key: str, value: str, metadata: dict | None = None) -> None:
+        with self._lock:
+            self._data[key] = (value, metadata)
+
+
+class SqliteKVStore(KVStore):
+    """KV を SQLite ファイルに保存する。put ごとに全体を書き直さないので、結果が溜まっても遅くならない。"""
+
+    def __init__(self, path: Path | str):
+        super().__init__()
+        self.path = Path(path)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, metadata TEXT)")
+
+    def get_with_metadata(self, key: str) -> tuple[str | None, dict | None]:
+        with self._lock:
+            row = self._db.execute("SELECT value, metadata FROM kv WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None, None
+        return row[0], json.loads(row[1]) if row[1] else None
+
+    def list(self, prefix: str = "") -> list[str]:
+        # TEXT の既定の比較（BINARY）は UTF-8 のバイト順なので KV の list と同じ並び
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key FROM kv WHERE substr(key, 1, ?) = ? ORDER BY key", (len(prefix), prefix)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def put(self, key: str, value: str, metadata: dict | None = None) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO kv (key, value, metadata) VALUES (?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET value = excluded.value, metadata = excluded.metadata",
+                (key, value, json.dumps(metadata, ensure_ascii=False) if metadata is not None else None),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def js_truthy(value) -> bool:
+    """JavaScript の真偽（{} や [] は真）。"""
+    return value not in (None, False, 0, "") if not isinstance(value, (dict, list)) else True
+
+
+def _js_json(data) -> bytes:
+    """JSON.stringify と同じ形（空白なし、非 ASCII はそのまま）。"""
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _read_json(headers: dict, body: bytes):
+    """functions の readJson と同じく gzip / deflate だけを展開する（br は Workers で展開できない）。"""
+    encoding = headers.get("content-encoding", "identity").lower()
+    if encoding not in ("identity", "gzip", "deflate"):
+        raise ValueError(f"Unsupported Content-Encoding: {encoding}")
+    return json.loads(decompress(body, encoding))
+
+
+def _response_encoding(headers: dict) -> str | None:
+    accepted = []
+    for part in headers.get("accept-encoding", "").split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip() not in ("q=0", "q=0.0"):
+            accepted.append(name.strip().lower())
+    return next((e for e in accepted_encodings() if e in accepted), None)
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def _today() -> str:
+    """schedule.js の todayStr（UTC の日付）。"""
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+@dataclass
+class Response:
+    status: int
+    body: bytes = b""
+    headers: dict | None = None
+
+
+@dataclass(frozen=True)
+class Collection:
+    kv_key: str
+    default: dict
+    validate: Callable[[object], bool]
+    error: str
+    summary: Callable[[dict], dict]
+    patch: bool = False
+    stores_hash: bool = True  # X-Komekome-Hash をメタデータに保存し GET ?hash に答える
+
+
+COLLECTIONS = {
+    "/api/komekome/problems": Collection(
+        "problems_master",
+        {"version": 0, "total": 0, "problems": {}},
+        lambda b: isinstance(b, dict) and js_truthy(b.get("problems")),
+        "Request body must contain problems",
+        lambda b: {"total": len(b["problems"])},
+        patch=True,
+    ),
+    "/api/komekome/today": Collection(
+        "today_problems",
+        {"version": 0, "total": 0, "problems": {}},
+        lambda b: isinstance(b, dict) and isinstance(b.get("topics"), list),
+        "Request body must contain topics array",
+        lambda b: {"total_topics": len(b["topics"])},
+    ),
+    "/api/komekome/topics": Collection(
+        "topics_data",
+        {"version": 0, "total": 0, "categories": [], "topics": []},
+        lambda b: isinstance(b, dict) and js_truthy(b.get("topics")),
+        "Request body must contain topics",
+        lambda b: {"total": len(b["topics"])},
+        patch=True,
+    ),
+    "/api/komekome/dashboard": Collection(
+        "learning_dashboard_v1",
+        {
+            "version": 1,
+            "generated_at": "",
+            "generated_date": "",
+            "totals": {"topics": 0, "attempted_topics": 0, "graduated_topics": 0, "overall_accuracy": 0},
+            "categories": [],
+        },
+        lambda b: isinstance(b, dict) and isinstance(b.get("categories"), list) and isinstance(b.get("totals"), dict),
+        "Request body must contain totals object and categories array",
+        lambda b: {"total_categories": len(b["categories"])},
+    ),
+    "/api/komekome/theory": Collection(
+        "theory_bank",
+        {"version": 0, "total": 0, "questions": []},
+        lambda b: isinstance(b, dict) and isinstance(b.get("questions"), list),
+        "Request body must contain questions array",
+        lambda b: {"total": len(b["questions"])},
+        stores_hash=False,
+    ),
+    "/api/komekome/import": Collection(
+        "import_latest",
+        {"questions": [], "generated_date": None},
+        lambda b: isinstance(b, dict),
+        "Request body must be a JSON object",
+        lambda b: {},
+        stores_hash=False,
+    ),
+}
+
+_PROCESSED_PATH = re.compile(r"/api/komekome/result/([^/]+)/processed")
+_PAGE_IMAGE_PATH = re.compile(r"/api/komekome/page-image(?:/(.*))?")
+_METHOD_ORDER = ("GET", "POST", "PUT", "PATCH")
+_BODY_ERRORS = (ValueError, OSError, EOFError, zlib.error)
+
+
+# ── schedule.js の問題選び（同じ順位・同じ形の today_problems を作る）──
+
+
+def _attempt_stats(attempts: list) -> dict[str, dict]:
+    stats: dict[str, dict] = {}
+    for a in attempts:
+        s = stats.setdefault(a.get("problem_id"), {"wrong": 0, "correct": 0, "total": 0, "lastDate": ""})
+        s["total"] += 1
+        if a.get("result") == "○":
+            s["correct"] += 1
+        else:
+            s["wrong"] += 1
+        if isinstance(a.get("date"), str) and a["date"] > s["lastDate"]:
+            s["lastDate"] = a["date"]
+    return stats
+
+
+def _score_problem(problem: dict, stats: dict[str, dict], today: date) -> float:
+    """未着手 > 間違いが多い > ランク A > 日が空いた、の順に効く点数。"""
+    s = stats.get(problem.get("id")) or {"wrong": 0, "correct": 0, "total": 0, "lastDate": ""}
+    rank = problem.get("rank")
+    rank_score = 30 if rank == "A" else 20 if rank == "B" else 10
+    unattempted = 10000 if s["total"] == 0 else 0
+    wrong_score = min(s["wrong"], 20) * 100
+    gap_bonus = min(max(s["wrong"] - s["correct"], 0), 10) * 50
+    days = 30
+    if s["lastDate"]:
+        try:
+            last = date.fromisoformat(s["lastDate"][:10])
+        except ValueError:
+            pass  # JS では NaN になり並びが崩れる。ここでは間が空いた扱いにする
+        else:
+            days = max(0, min((today - last).days, 30))
+    return unattempted + wrong_score + gap_bonus + rank_score + days
+
+
+def _select_problems(problems: list[dict], categories: list, stats: dict, calc_count: int, theory_count: int) -> list[dict]:
+    scope = set(categories)
+    filtered = [p for p in problems if p.get("parent_category") in scope]
+    today = date.fromisoformat(_today())
+
+    def by_score(pool: list[dict]) -> list[dict]:
+        return sorted(pool, key=lambda p: -_score_problem(p, stats, today))  # 安定ソート（Array.sort と同じ）
+
+    calc = by_score([p for p in filtered if p.get("type") == "計算"])[:calc_count]
+    theory = by_score([p for p in filtered if p.get("type") == "理論"])[:theory_count]
+    return calc + theory
+
+
+# JSON.stringify は undefined の項目を落とすので、問題にない項目は出さない
+_TODAY_PROBLEM_FIELDS = (
+    ("problem_id", "id"), ("book", "book"), ("number", "number"), ("title", "title"), ("type", "type"),
+    ("scope", "scope"), ("page", "page"), ("time_min", "time_min"), ("rank", "rank"),
+)
+
+
+def _build_today(selected: list[dict], schedule: dict) -> dict:
+    topics: dict[str, dict] = {}
+    for p in selected:
+        normalized = p.get("normalized_topics")
+        key = (normalized[0] if normalized else None) or p.get("title")
+        if key not in topics:
+            topics[key] = {
+                "topic_id": f"{p.get('parent_category')}/{key}",
+                "topic_name": key,
+                "category": p.get("parent_category"),
+                "reason": "schedule",
+                "problems": [],
+            }
+        entry = {out: p[src] for out, src in _TODAY_PROBLEM_FIELDS if src in p}
+        page = p.get("page")
+        entry["page_image_key"] = f"{p.get('book')}/{str(page).zfill(3)}.webp" if js_truthy(page) else None
+        topics[key]["problems"].append(entry)
+
+    now = datetime.now(timezone.utc)
+    return {
+        "generated_date": now.date().isoformat(),
+        "generated_at": now.strftime("%Y-%m-%d %H:%M:%S"),
+        "schema_version": 4,
+        "selection_policy": "worker-schedule-smart",
+        "carryover_count": 0,
+        "total_topics": len(topics),
+        "total_problems": len(selected),
+        "weekly_schedule": {
+            "week_start": schedule.get("week_start") or "",
+            "scope_categories": schedule.get("scope_categories") or [],
+        },
+        "topics": list(topics.values()),
+    }
+
+
+class Emulator:
+    """Pages Functions の代わりにリクエストを処理する。"""
+
+    def __init__(self, token: str, kv: KVStore | None = None, pages_dir: Path | None = None):
+        self.token = token
+        self.kv = kv or KVStore()
+        self.pages_dir = Path(pages_dir) if pages_dir else None  # R2 の代わり（None なら空のバケット）
+
+    def _cors(self, headers: dict, methods: str) -> dict:
+        origin = headers.get("origin", "")
+        return {
+            "Access-Control-Allow-Origin": ALLOWED_ORIGIN if origin in ("", ALLOWED_ORIGIN) else origin,
+            "Access-Control-Allow-Methods": methods,
+            "Access-Control-Allow-Headers": "Authorization, Content-Type, X-Komekome-Hash",
+        }
+
+    def _routes(self, path: str) -> dict[str, Callable] | None:
+        """パスに対応する {メソッド: ハンドラ}（functions のファイル 1 つ分）。"""
+        c = COLLECTIONS.get(path)
+        if c is not None:
+            routes = {
+                "GET": lambda *a: self._get(c, *a),
+                "POST": lambda *a: self._post(c, *a),
+            }
+            if c.patch:
+                routes["PATCH"] = lambda *a: self._patch(c, *a)
+            return routes
+        if path == "/api/komekome/schedule":
+            return {"GET": self._schedule_get, "PUT": self._schedule_put, "POST": self._schedule_put}
+        if path == "/api/komekome/result":
+            return {"GET": self._results, "POST": self._result_post, "PUT": self._mark_processed}
+        if path == "/api/komekome/attempts":
+            return {"GET": self._attempts_get, "POST": self._attempts_post, "PUT": self._attempts_put}
+        m = _PROCESSED_PATH.fullmatch(path)
+        if m:
+            session_id = unquote(m.group(1))
+            return {"PUT": lambda *a: self._mark_one(session_id, *a)}
+        m = _PAGE_IMAGE_PATH.fullmatch(path)
+        if m:
+            segments = [unquote(p) for p in (m.group(1) or "").split("/") if p]
+            return {"GET": lambda *a: self._page_image(segments, *a)}
+        return None
+
+    def handle(self, method: str, url: str, headers: dict, body: bytes = b"") -> Response:
+        headers = {k.lower(): v for k, v in headers.items()}
+        parts = urlsplit(url)
+        routes = self._routes(parts.path.rstrip("/"))
+        if routes is None:
+            return Response(404, _js_json({"error": "Not found"}), {"Content-Type": "application/json"})
+        cors = self._cors(headers, ", ".join([m for m in _METHOD_ORDER if m in routes] + ["OPTIONS"]))
+
+        def reply(data, status=200) -> Response:
+            body = _js_json(data)
+            resp_headers = {"Content-Type": "application/json", **cors}
+            encoding = _response_encoding(headers) if len(body) >= COMPRESS_MIN_BYTES else None
+            if encoding:
+                body = compress(body, encoding)
+                resp_headers.update({"Content-Encoding": encoding, "Vary": "Accept-Encoding"})
+            return Response(status, body, resp_headers)
+
+        if method == "OPTIONS":
+            return Response(200, b"", cors)
+        handler = routes.get(method)
+        if handler is None:
+            return Response(405, b"", cors)
+        token = headers.get("authorization", "")
+        token = token[7:] if token.lower().startswith("bearer ") else token
+        if not token or token != self.token:
+            return reply({"error": "Unauthorized"}, 401)
+        return handler(parse_qs(parts.query, keep_blank_values=True), headers, body, reply)
+
+    def _get(self, c: Collection, query, headers, body, reply) -> Response:
+        if c.stores_hash and "hash" in query:
+            _, metadata = self.kv.get_with_metadata(c.kv_key)
+            return reply({"hash": (metadata or {}).get("hash")})
+        data = self.kv.get_json(c.kv_key)
+        return reply(data if data else c.default)
+
+    def _post(self, c: Collection, query, headers, body, reply) -> Response:
+        try:
+            data = _read_json(headers, body)
+        except _BODY_ERRORS:
+            return reply({"error": "Invalid JSON body"}, 400)
+        if not c.validate(data):
+            return reply({"error": c.error}, 400)
+        digest = headers.get("x-komekome-hash") if c.stores_hash else None
+        self.kv.put(c.kv_key, _js_json(data).decode("utf-8"), {"hash": digest} if digest else None)
+        return reply({"ok": True, **c.summary(data), "stored_at": _now()})
+
+    def _patch(self, c: Collection, query, headers, body, reply) -> Response:
+        try:
+            req = _read_json(headers, body)
+        except _BODY_ERRORS:
+            return reply({"error": "Invalid JSON body"}, 400)
+        if (
+            not isinstance(req, dict)
+            or not isinstance(req.get("base"), str)
+            or not isinstance(req.get("hash"), str)
+            or not isinstance(req.get("ops"), list)
+        ):
+            return reply({"error": "Request body must contain base, hash and ops"}, 400)
+        value, metadata = self.kv.get_with_metadata(c.kv_key)
+        current = (metadata or {}).get("hash")
+        if not value or current != req["base"]:
+            return reply({"error": "Base hash mismatch", "hash": current}, 409)
+        try:
+            patched = apply_patch(json.loads(value), req["ops"])
+        except PatchError as e:
+            return reply({"error": f"Invalid patch: {e}"}, 400)
+        if not c.validate(patched):
+            return reply({"error": c.error}, 400)
+        self.kv.put(c.kv_key, _js_json(patched).decode("utf-8"), {"hash": req["hash"]})
+        return reply({"ok": True, **c.summary(patched), "applied": len(req["ops"]), "stored_at": _now()})
+
+    # ── schedule.js ──
+
+    def _schedule_get(self, query, headers, body, reply) -> Response:
+        data = self.kv.get_json("weekly_schedule")
+        return reply(data if data else {"week_start": "", "scope_categories": [], "updated_at": None})
+
+    def _schedule_put(self, query, headers, body, reply) -> Response:
+        try:
+            data = _read_json(headers, body)
+        except _BODY_ERRORS:
+            return reply({"error": "Invalid JSON body"}, 400)
+        if not isinstance(data, dict):
+            return reply({"error": "Request body must be an object"}, 400)
+        data["updated_at"] = _now()
+        self.kv.put("weekly_schedule", _js_json(data).decode("utf-8"))
+        try:
+            today = self._regenerate_today(data)
+        except (TypeError, ValueError, KeyError, AttributeError) as e:
+            # schedule.js と同じく保存は済んでいるので 200（作り直しだけ失敗）
+            return reply({"ok": True, "stored_at": data["updated_at"], "regenerated": False, "error": str(e)})
+        return reply({
+            "ok": True,
+            "stored_at": data["updated_at"],
+            "regenerated": today is not None,
+            "total_problems": today["total_problems"] if today else 0,
+        })
+
+    def _regenerate_today(self, schedule: dict) -> dict | None:
+        """schedule.js の regenerateToday。範囲の問題から点数順に選び、today_problems を置き換える。"""
+        calc_count = schedule.get("calc_count") if js_truthy(schedule.get("calc_count")) else 20
+        theory_count = schedule.get("theory_count") if js_truthy(schedule.get("theory_count")) else 10
+        categories = schedule.get("scope_categories") or []
+        if len(categories) == 0:
+            return None
+        master = self.kv.get_json("problems_master")
+        if not master or not js_truthy(master.get("problems")):
+            return None
+
+        stats = _attempt_stats(self.kv.get_json("attempts_all") or [])
+        problems = list(master["problems"].values())
+        selected = _select_problems(problems, categories, stats, calc_count, theory_count)
+
+        # 卒業済みのローテーション: 範囲内で最後に解いたのが古いものから 2 問
+        scope = set(categories)
+        selected_ids = {p.get("id") for p in selected}
+
+        def graduated(p: dict) -> bool:
+            s = stats.get(p.get("id"))
+            return bool(s) and s["total"] >= 3 and s["correct"] >= 2
+
+        pool = [p for p in problems if p.get("id") not in selected_ids and p.get("parent_category") in scope and graduated(p)]
+        selected += sorted(pool, key=lambda p: stats[p["id"]]["lastDate"])[:2]
+
+        today = _build_today(selected, schedule)
+        self.kv.put("today_problems", _js_json(today).decode("utf-8"))
+        return today
+
+    # ── attempts.js ──
+
+    def _attempts_get(self, query, headers, body, reply) -> Response:
+        return reply({"attempts": self.kv.get_json("attempts_all") or []})
+
+    def _attempts_post(self, query, headers, body, reply) -> Response:
+        try:
+            data = _read_json(headers, body)
+        except _BODY_ERRORS:
+            return reply({"error": "Invalid JSON body"}, 400)
+        new = data if isinstance(data, list) else data.get("attempts") if isinstance(data, dict) else None
+        if not isinstance(new, list) or len(new) == 0:
+            return reply({"error": "Must provide attempts array"}, 400)
+        existing = self.kv.get_json("attempts_all") or []
+        existing_ids = {a.get("id") for a in existing}
+        # attempts.js と同じく既存 ID とだけ突き合わせる（送った配列の中の重複はそのまま足す）
+        to_add = [a for a in new if isinstance(a, dict) and js_truthy(a.get("id")) and a["id"] not in existing_ids]
+        merged = existing + to_add
+        self.kv.put("attempts_all", _js_json(merged).decode("utf-8"))
+        return reply({"ok": True, "added": len(to_add), "total": len(merged)})
+
+    def _attempts_put(self, query, headers, body, reply) -> Response:
+        try:
+            data = _read_json(headers, body)
+        except _BODY_ERRORS:
+            return reply({"error": "Invalid JSON body"}, 400)
+        if not isinstance(data, dict) or not js_truthy(data.get("id")):
+            return reply({"error": "Must provide attempt id"}, 400)
+        existing = self.kv.get_json("attempts_all") or []
+        idx = next((i for i, a in enumerate(existing) if a.get("id") == data["id"]), None)
+        if idx is None:
+            return reply({"error": "Attempt not found"}, 404)
+        existing[idx] = {**existing[idx], **data}
+        self.kv.put("attempts_all", _js_json(existing).decode("utf-8"))
+        return reply({"ok": True, "updated": existing[idx]})
+
+    # ── page-image/[[path]].js ──
+
+    def _page_image(self, segments: list[str], query, headers, body, reply) -> Response:
+        if not segments:
+            return reply({"error": "Path required"}, 400)
+        data = self._read_page(segments)
+        if data is None:
+            return reply({"error": "Not found"}, 404)
+        return Response(200, data, {
+            "Content-Type": "image/webp",
+            "Cache-Control": "public, max-age=31536000, immutable",
+            **self._cors(headers, "GET, OPTIONS"),
+        })
+
+    def _read_page(self, segments: list[str]) -> bytes | None:
+        if self.pages_dir is None or any(s in (".", "..") or "/" in s for s in segments):
+            return None  # R2 のキーにはならないパスでディレクトリの外を読ませない
+        path = self.pages_dir.joinpath(*segments)
+        return path.read_bytes() if path.is_file() else None
+
+    # ── result.js / result/[id]/processed.js ──
+
+    def _results(self, query, headers, body, reply) -> Response:
+        results = []
+        for key in self.kv.list("result:"):
+            data = self.kv.get_json(key)
+            if data and not data.get("processed"):
+                results.append(data)
+        return reply({"results": results})
+
+    def _result_post(self, query, headers, body, reply) -> Response:
+        try:
+            data = _read_json(headers, body)
+        except _BODY_ERRORS:
+            return reply({"error": "Invalid JSON body"}, 400)
+        if not isinstance(data, dict):
+            return reply({"error": "Request body must be a JSON object"}, 400)
+        session_id = data.get("session_id") or f"s_{int(datetime.now().timestamp() * 1000):x}"
+        record = {**data, "session_id": session_id, "processed": False, "stored_at": _now()}
+        self.kv.put(f"result:{session_id}", _js_json(record).decode("utf-8"))
+        return reply({"ok": True, "session_id": session_id})
+
+    def _set_processed(self, session_id: str, processed_at: str) -> bool:
+        key = f"result:{session_id}"
+        data = self.kv.get_json(key)
+        if not data:
+            return False
+        if not data.get("processed"):
+            data.update(processed=True, processed_at=processed_at)
+            self.kv.put(key, _js_json(data).decode("utf-8"))
+        return True
+
+    def _mark_processed(self, query, headers, body, reply) -> Response:
+        try:
+            req = _read_json(headers, body)
+        except _BODY_ERRORS:
+            return reply({"error": "Invalid JSON body"}, 400)
+        ids = req.get("session_ids") if isinstance(req, dict) else None
+        if not isinstance(ids, list) or not all(isinstance(i, str) and i for i in ids):
+            return reply({"error": "Request body must contain session_ids array"}, 400)
+        if len(ids) > MARK_BATCH_MAX:
+            return reply({"error": f"Too many session_ids (max {MARK_BATCH_MAX})"}, 400)
+        now = _now()
+        found = [self._set_processed(i, now) for i in ids]
+        return reply({
+            "ok": True,
+            "processed": [i for i, f in zip(ids, found) if f],
+            "missing": [i for i, f in zip(ids, found) if not f],
+        })
+
+    def _mark_one(self, session_id: str, query, headers, body, reply) -> Response:
+        if not self._set_processed(session_id, _now()):
+            return reply({"error": "Not found"}, 404)
+        return reply({"ok": True, "session_id": session_id})
+
+
+class _Handler(BaseHTTPRequestHandler):
+    emulator: Emulator
+    protocol_version = "HTTP/1.1"  # keep-alive（応答には必ず Content-Length を付ける）
+    # ヘッダーと本文を 1 回で送る（別々に送ると Nagle と遅延 ACK で 1 往復 40ms 待つことがある）
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def _dispatch(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        resp = self.emulator.handle(self.command, self.path, dict(self.headers), body)
+        self.send_response(resp.status)
+        for k, v in (resp.headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(resp.body)))
+        self.end_headers()
+        self.wfile.write(resp.body)
+
+    do_GET = do_POST = do_PATCH = do_PUT = do_DELETE = do_OPTIONS = _dispatch
+
+    def log_message(self, format, *args):  # noqa: A002  テストの出力を汚さない
+        pass
+
+
+def serve(emulator: Emulator, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """別スレッドで HTTP サーバーを起動して返す（server.url にベース URL。止めるときは shutdown()）。"""
+    handler = type("Handler", (_Handler,), {"emulator": emulator})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.url = f"http://{host}:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class FunctionsServer:
+    """本物の functions を local_functions.mjs（Node）で動かす子プロセス。serve() の戻り値と同じく url と shutdown() を持つ。"""
+
+    def __init__(self, token: str, *, pages_dir: Path | None = None, host: str = "127.0.0.1", port: int = 0, node: str = "node"):
+        cmd = [node, str(LOCAL_FUNCTIONS), "--token", token, "--host", host, "--port", str(port)]
+        if pages_dir:
+            cmd += ["--pages-dir", str(pages_dir)]
+        self._proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+        line = self._proc.stdout.readline()
+        m = re.search(r"http://\S+", line)
+        if not m:
+            self.shutdown()
+            raise RuntimeError(f"local_functions.mjs を起動できませんでした: {line.strip() or '出力なし'}")
+        self.url = m.group(0)
+
+    def shutdown(self) -> None:
+        self._proc.terminate()
+        try:
+            self._proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self._proc.kill()
+            self._proc.wait()
+        self._proc.stdout.close()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Local stand-in for the komekome Pages Functions, KV and R2")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--token", required=True)
+    parser.add_argument("--kv", type=Path, help="Persist KV to this SQLite file (default: in memory)")
+    parser.add_argument("--pages-dir", type=Path, help="Serve page images from this directory (R2 stand-in)")
+    args = parser.parse_args(argv)
+
+    kv = SqliteKVStore(args.kv) if args.kv else KVStore()
+    server = serve(Emulator(args.token, kv, args.pages_dir), args.host, args.port)
+    print(f"komekome emulator: {server.url}（Ctrl-C で停止）", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
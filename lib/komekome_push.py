@@ -0,0 +1,316 @@
+"""Workers API への差分 push（problems / today / topics / dashboard ほか）。
+
+KV のキーごとに最後に push した内容のハッシュとスナップショットを
+50_エクスポート/_sync/ に残し、次のように送る。
+
+  - 内容が前回と同じなら送らない（generated / generated_at は比較から除く）
+  - problems / topics のような大きいコレクションは、前回のスナップショットとの
+    差分を JSON Patch（RFC 6902 の add / remove / replace）にして PATCH で送る。
+    本文に前回のハッシュ（base）を入れ、サーバーの保存値と一致しなければ
+    409 が返るので全体を POST し直す。差分が全体の PATCH_MAX_RATIO を超えるときも全体を送る。
+  - 全体の POST には X-Komekome-Hash ヘッダーでハッシュを付け、サーバーは KV の
+    メタデータに保存する（次の PATCH の base と照合する）。
+
+本文は空白なしの JSON にし、COMPRESS_MIN_BYTES 以上なら gzip で圧縮して
+Content-Encoding: gzip を付ける（functions 側は DecompressionStream で展開する。
+Workers では br を展開できないので送信は gzip のみ）。応答は Accept-Encoding で
+gzip（brotli モジュールがあれば br も）を受け取って展開する。
+
+today_problems は schedule.js がサーバー側で作り直すことがあるので、スキップする前に
+GET ?hash=1 でサーバーのハッシュを確かめる（remote_check）。weekly_schedule は
+PUT のたびにサーバーが today_problems を作り直すので、変わっていなくても送る（skip=False）。
+
+送信そのものは Transport（lib/komekome_client.py の KomekomeClient）が行う。
+"""
+
+from __future__ import annotations
+
+import copy
+import gzip
+import hashlib
+import json
+import threading
+import zlib
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Protocol
+
+from lib.houjinzei_common import atomic_json_write
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+VOLATILE_KEYS = ("generated", "generated_at")
+PATCH_MAX_RATIO = 0.5
+COMPRESS_MIN_BYTES = 1024  # これより小さい本文は圧縮しない（functions/_shared/http.js と同じ）
+GZIP_LEVEL = 6
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    name: str  # コマンド名
+    kv_key: str
+    path: str
+    filename: str  # 50_エクスポート/ のファイル
+    patch: bool = False  # 差分 PATCH を使う
+    remote_check: bool = False  # スキップ前にサーバーのハッシュを確かめる
+    method: str = "POST"  # 全体を送るメソッド
+    skip: bool = True  # 変わっていなければ送らない
+
+
+ENDPOINTS = {
+    e.name: e
+    for e in (
+        Endpoint("problems", "problems_master", "/api/komekome/problems", "problems_master.json", patch=True),
+        Endpoint("today", "today_problems", "/api/komekome/today", "today_problems.json", remote_check=True),
+        Endpoint("topics", "topics_data", "/api/komekome/topics", "topics_data.json", patch=True),
+        Endpoint("dashboard", "learning_dashboard_v1", "/api/komekome/dashboard", "dashboard_data.json"),
+        Endpoint("theory", "theory_bank", "/api/komekome/theory", "theory_bank.json"),
+        Endpoint("import", "import_latest", "/api/komekome/import", "komekome_import.json"),
+        Endpoint("schedule", "weekly_schedule", "/api/komekome/schedule", "weekly_schedule.json", method="PUT", skip=False),
+    )
+}
+
+
+def encode_json(data) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+# ── 圧縮 ──
+
+
+def accepted_encodings() -> list[str]:
+    return ["br", "gzip"] if brotli else ["gzip"]
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    if encoding == "deflate":
+        return zlib.compress(body, GZIP_LEVEL)
+    if encoding == "br" and brotli:
+        return brotli.compress(body)
+    raise ValueError(f"未対応の Content-Encoding です: {encoding}")
+
+
+def decompress(body: bytes, encoding: str | None) -> bytes:
+    encoding = (encoding or "identity").lower()
+    if encoding == "identity":
+        return body
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    if encoding == "deflate":
+        return zlib.decompress(body)
+    if encoding == "br" and brotli:
+        return brotli.decompress(body)
+    raise ValueError(f"未対応の Content-Encoding です: {encoding}")
+
+
+def content_hash(payload) -> str:
+    """生成時刻を除いた内容のハッシュ（キー順に依らない）。"""
+    if isinstance(payload, dict):
+        payload = {k: v for k, v in payload.items() if k not in VOLATILE_KEYS}
+    canonical = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+# ── JSON Patch ──
+
+
+class PatchError(ValueError):
+    pass
+
+
+def _escape(token: str) -> str:
+    return token.replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def diff(old, new, path: str = "", depth: int = 2) -> list[dict]:
+    """old → new の JSON Patch。depth 段まではオブジェクトのキーごと・同じ長さの配列の要素ごとに比べる。"""
+    if old == new:
+        return []
+    if depth > 0 and isinstance(old, dict) and isinstance(new, dict):
+        ops: list[dict] = []
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        for key, value in new.items():
+            child = f"{path}/{_escape(key)}"
+            if key not in old:
+                ops.append({"op": "add", "path": child, "value": value})
+            else:
+                ops.extend(diff(old[key], value, child, depth - 1))
+        return ops
+    if depth > 0 and isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        ops = []
+        for i, (a, b) in enumerate(zip(old, new)):
+            ops.extend(diff(a, b, f"{path}/{i}", depth - 1))
+        return ops
+    return [{"op": "replace", "path": path, "value": new}]
+
+
+def apply_patch(doc, ops: list[dict]):
+    """doc に JSON Patch を当てた新しい値を返す（doc は変えない）。
+
+    パスの辿り方とエラーの文言は functions/_shared/patch.js の applyPatch と同じ
+    （komekome_emulator が 400 の応答にそのまま載せる）。
+    """
+    doc = copy.deepcopy(doc)
+    for op in ops:
+        kind, path = (op.get("op"), op.get("path")) if isinstance(op, dict) else (None, None)
+        if kind not in ("add", "remove", "replace") or not isinstance(path, str):
+            raise PatchError(f"Unsupported operation: {json.dumps(op, ensure_ascii=False, separators=(',', ':'))}")
+        if path == "":
+            if kind == "remove":
+                raise PatchError("Cannot remove the root")
+            doc = copy.deepcopy(op.get("value"))
+            continue
+        if not path.startswith("/"):
+            raise PatchError(f"Path must start with /: {path}")
+        *parents, last = [_unescape(t) for t in path[1:].split("/")]
+        target = doc
+        for token in parents:
+            if isinstance(target, list):
+                target = target[int(token)] if token.isdigit() and int(token) < len(target) else None
+            else:
+                target = target.get(token) if isinstance(target, dict) else None
+            if not isinstance(target, (dict, list)):
+                raise PatchError(f"Path not found: {path}")
+        if isinstance(target, dict):
+            if kind != "add" and last not in target:
+                raise PatchError(f"Path not found: {path}")
+            if kind == "remove":
+                del target[last]
+            else:
+                target[last] = copy.deepcopy(op.get("value"))
+        elif isinstance(target, list):
+            index = len(target) if last == "-" else int(last) if last.isdigit() else -1
+            if not 0 <= index <= len(target) - (kind != "add"):
+                raise PatchError(f"Index out of range: {path}")
+            if kind == "add":
+                target.insert(index, copy.deepcopy(op.get("value")))
+            elif kind == "remove":
+                del target[index]
+            else:
+                target[index] = copy.deepcopy(op.get("value"))
+        else:
+            raise PatchError(f"Path not found: {path}")
+    return doc
+
+
+# ── 送信 ──
+
+
+class Transport(Protocol):
+    def request(self, method: str, path: str, body: bytes | None = None, headers: dict | None = None) -> tuple[int, bytes]: ...
+
+
+class PushError(RuntimeError):
+    pass
+
+
+class PushState:
+    """キーごとの最後に push したハッシュ（state.json）と内容（<kv_key>.json）。"""
+
+    def __init__(self, sync_dir: Path):
+        self.dir = Path(sync_dir)
+        self.path = self.dir / "state.json"
+        self.entries: dict[str, dict] = {}
+        self._lock = threading.Lock()  # 複数のキーを並行に push するため
+        if self.path.exists():
+            self.entries = json.loads(self.path.read_text(encoding="utf-8"))
+
+    def hash(self, key: str) -> str | None:
+        return self.entries.get(key, {}).get("hash")
+
+    def snapshot(self, key: str):
+        path = self.dir / f"{key}.json"
+        if not path.exists():
+            return None
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    def record(self, key: str, payload, digest: str, mode: str, sent: int, keep_snapshot: bool) -> None:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        if keep_snapshot:
+            atomic_json_write(self.dir / f"{key}.json", payload, indent=None)
+        with self._lock:
+            self.entries[key] = {
+                "hash": digest,
+                "mode": mode,
+                "bytes": sent,
+                "pushed_at": datetime.now().replace(microsecond=0).isoformat(),
+            }
+            atomic_json_write(self.path, self.entries)
+
+    def forget(self, key: str) -> None:
+        with self._lock:
+            if self.entries.pop(key, None) is not None:
+                atomic_json_write(self.path, self.entries)
+
+
+@dataclass
+class PushResult:
+    endpoint: str
+    mode: str  # "skipped" / "patched" / "posted"
+    sent: int  # 送った本文のバイト数
+    full: int  # 全体を送った場合のバイト数
+    ops: int = 0
+    response: dict | None = None
+
+
+def _json_or_text(body: bytes) -> dict:
+    try:
+        data = json.loads(body or b"{}")
+        return data if isinstance(data, dict) else {"data": data}
+    except ValueError:
+        return {"error": body.decode("utf-8", "replace")[:200]}
+
+
+def remote_hash(transport: Transport, endpoint: Endpoint) -> str | None:
+    status, body = transport.request("GET", endpoint.path + "?hash=1")
+    return _json_or_text(body).get("hash") if status == 200 else None
+
+
+def push(endpoint: Endpoint, payload, transport: Transport, state: PushState, force: bool = False) -> PushResult:
+    """payload を送る。変わっていなければ送らず、差分で足りれば PATCH にする。"""
+    digest = content_hash(payload)
+    full = encode_json(payload)
+    previous = state.hash(endpoint.kv_key)
+
+    if endpoint.skip and not force and previous == digest:
+        if not endpoint.remote_check or remote_hash(transport, endpoint) == digest:
+            return PushResult(endpoint.name, "skipped", 0, len(full))
+
+    if endpoint.patch and previous and not force:
+        old = state.snapshot(endpoint.kv_key)
+        if old is not None:
+            ops = diff(old, payload)
+            body = encode_json({"base": previous, "hash": digest, "ops": ops})
+            if len(body) <= len(full) * PATCH_MAX_RATIO:
+                status, resp = transport.request("PATCH", endpoint.path, body)
+                if status == 200:
+                    state.record(endpoint.kv_key, payload, digest, "patched", len(body), keep_snapshot=True)
+                    return PushResult(endpoint.name, "patched", len(body), len(full), len(ops), _json_or_text(resp))
+                if status != 409:  # 409 はサーバーの値が前回と違う → 全体を送り直す
+                    raise PushError(f"{endpoint.name}: PATCH 失敗 (HTTP {status}): {_json_or_text(resp)}")
+
+    status, resp = transport.request(endpoint.method, endpoint.path, full, {"X-Komekome-Hash": digest})
+    if status != 200:
+        raise PushError(f"{endpoint.name}: push 失敗 (HTTP {status}): {_json_or_text(resp)}")
+    state.record(endpoint.kv_key, payload, digest, "posted", len(full), keep_snapshot=endpoint.patch)
+    return PushResult(endpoint.name, "posted", len(full), len(full), response=_json_or_text(resp))
+
+
+def describe(result: PushResult) -> str:
+    if result.mode == "skipped":
+        return f"{result.endpoint}: 変更なし（送信スキップ）"
+    if result.mode == "patched":
+        return f"{result.endpoint}: 差分 {result.ops}件を送信 ({result.sent:,} / {result.full:,} バイト)"
+    return f"{result.endpoint}: 全体を送信 ({result.sent:,} バイト)"
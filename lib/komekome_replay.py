@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""コメコメ同期の 1 か月分を、ローカルの API 相手に再生する（結合テストとベンチマーク用）。
+
+MonthScenario は乱数の種から決まる利用を一時 vault と API に起こす。毎日:
+
+  朝  vault 側: 問題集が増え（月曜と木曜）、論点ノートが充実し（ときどき）、
+      today_problems / dashboard_data を書き出して komekome_sync.sh push-all
+  昼  PWA: 解答記録（attempts）と演習セッションの結果（result）を送る。
+      月曜にはスケジュールを変える（schedule PUT でサーバーが today を作り直す）
+  夜  komekome_sync.sh pull（結果を取り込み komekome_writeback.sh で論点ノートへ
+      書き戻し、続けて pull-schedule）
+
+vault 側は本番と同じ komekome_sync.sh を KOMEKOME_CONF で API に向けて呼び、
+リクエストごとの記録を KOMEKOME_TIMINGS で集める。PWA 側は KomekomeClient を
+圧縮なしで使う。API には komekome_emulator の serve()（Python 版）か
+FunctionsServer（本物の functions を Node で動かす）の URL を渡す。
+
+  report = replay(vault, server.url, token, days=30)
+  report.expected_kome   送った kome_count の論点ごとの合計（書き戻しの検証用）
+  report.by_command()    コマンドごとのリクエスト数・バイト数・接続数・所要時間
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import random
+import shlex
+import subprocess
+import tempfile
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from pathlib import Path
+
+from lib.houjinzei_common import VaultPaths, atomic_json_write, read_frontmatter, write_frontmatter
+from lib.komekome_client import KomekomeClient
+from lib.problems_master import ProblemsMaster
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+START_DATE = date(2026, 10, 1)
+CATEGORIES = ("所得計算", "税額計算", "組織再編")
+BOOK_DAYS = (0, 3)  # 月曜と木曜に問題集が 1 冊増える
+PROBLEMS_PER_BOOK = 40
+
+_WORDS = "益金 損金 交際費 寄附金 減価償却 引当金 繰越欠損金 受取配当 税額控除 申告調整 別表四 別表五".split()
+
+
+class ReplayError(RuntimeError):
+    """komekome_sync.sh や API 呼び出しが失敗した。"""
+
+
+@dataclass
+class Topic:
+    topic_id: str  # 10_論点 からの相対パス（.md なし）。writeback が突き合わせる形
+    name: str
+    category: str
+    path: Path
+    enriched: bool
+
+
+@dataclass
+class ReplayReport:
+    days: int
+    sessions: int
+    results: int
+    attempts: int
+    expected_kome: dict[str, int]
+    wall: dict[str, list[float]]  # komekome_sync.sh のコマンド → 日ごとの所要秒（bash と python の起動を含む）
+    requests: list[dict] = field(default_factory=list)  # KOMEKOME_TIMINGS の行（PWA 側は command="pwa"）
+
+    def by_command(self) -> dict[str, dict]:
+        """client のコマンド（push / pull / pull-schedule / pwa）ごとの集計。"""
+        rows: dict[str, dict] = {}
+        for r in self.requests:
+            row = rows.setdefault(
+                r["command"],
+                {"requests": 0, "sent": 0, "received": 0, "connections": 0, "seconds": 0.0, "statuses": Counter()},
+            )
+            row["requests"] += 1
+            row["sent"] += r["sent"] * r["attempts"]
+            row["received"] += r["received"]
+            row["connections"] += 0 if r["reused"] else 1
+            row["seconds"] += r["seconds"]
+            row["statuses"][r["status"]] += 1
+        return rows
+
+
+class MonthScenario:
+    """乱数の種から決まる 1 か月分の vault の変化と PWA の操作。"""
+
+    def __init__(self, vault: Path, *, seed: int = 0, topics: int = 36, start: date = START_DATE):
+        self.vp = VaultPaths(vault)
+        self.rng = random.Random(seed)
+        self.n_topics = topics
+        self.start = start
+        self.topics: list[Topic] = []
+        self.master = ProblemsMaster(self.vp.export)
+        self.books = 0
+        self.today_ids: list[str] = []
+        self.expected_kome: dict[str, int] = defaultdict(int)
+        self.sessions = 0
+        self.results = 0
+        self.attempts = 0
+
+    # ── vault 側 ──
+
+    def setup(self) -> None:
+        for d in (self.vp.topics, self.vp.export, self.vp.exercise_log):
+            d.mkdir(parents=True, exist_ok=True)
+        for i in range(self.n_topics):
+            category = CATEGORIES[i % len(CATEGORIES)]
+            name = f"{self.rng.choice(_WORDS)}{i:02d}"
+            path = self.vp.topics / category / f"{name}.md"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            topic = Topic(f"{category}/{name}", name, category, path, enriched=i % 3 != 2)
+            self.topics.append(topic)
+            fm = {
+                "topic": name,
+                "category": category,
+                "importance": self.rng.choice("ABC"),
+                "keywords": self.rng.sample(_WORDS, 3),
+                "status": "未着手",
+                "kome_total": 0,
+                "interval_index": 0,
+            }
+            write_frontmatter(path, fm, self._body(topic))
+        self._add_book(theory=True)
+        self._add_book()
+        self._add_book()
+
+    def _sentence(self, words: int) -> str:
+        return "、".join(self.rng.choice(_WORDS) for _ in range(words)) + "。"
+
+    def _body(self, topic: Topic) -> str:
+        if not topic.enriched:
+            return f"\n# {topic.name}\n"
+        return (
+            f"\n# {topic.name}\n\n## 概要\n{self._sentence(40)}\n\n## 計算手順\n"
+            + "\n".join(f"{n}. {self._sentence(8)}" for n in range(1, 4))
+            + f"\n\n## 間違えやすいポイント\n- **{self.rng.choice(_WORDS)}の集計漏れ** {self._sentence(5)}\n"
+        )
+
+    def _enrich_one(self) -> None:
+        stubs = [t for t in self.topics if not t.enriched]
+        if not stubs:
+            return
+        topic = self.rng.choice(stubs)
+        topic.enriched = True
+        fm, _ = read_frontmatter(topic.path)
+        write_frontmatter(topic.path, fm, self._body(topic))
+
+    def _add_book(self, *, theory: bool = False) -> None:
+        if theory:
+            book, prefix, kind = "理論", "theory", "理論"
+        else:
+            self.books += 1
+            book, prefix, kind = f"計算4-{self.books}", f"calc-4-{self.books}", "計算"
+        problems = []
+        for j in range(1, PROBLEMS_PER_BOOK + 1):
+            topic = self.rng.choice(self.topics)
+            problems.append({
+                "id": f"{prefix}-{j:03d}",
+                "book": book,
+                "number": f"問題{j}",
+                "title": f"{topic.name}の{kind}{j}",
+                "type": kind,
+                "topics": [topic.name],
+                "page": j // 2 + 1,
+                "time_min": self.rng.choice([5, 10, 15]),
+                "rank": self.rng.choice(["A", "B", "C"]),
+                "scope": self.rng.choice(["個別", "総合"]),
+                "normalized_topics": [topic.name],
+                "parent_category": topic.category,
+            })
+        self.master.merge(problems)
+
+    def morning(self, day: date) -> None:
+        """問題集の追加・ノートの充実と、today / dashboard の書き出し（generate_quiz.sh の代わり）。"""
+        if day != self.start and day.weekday() in BOOK_DAYS:
+            self._add_book()
+        if self.rng.random() < 0.3:
+            self._enrich_one()
+
+        ids = sorted(self.master)
+        self.today_ids = self.rng.sample(ids, min(10, len(ids)))
+        topics: dict[str, dict] = {}
+        for pid in self.today_ids:
+            p = self.master[pid]
+            key = p["normalized_topics"][0]
+            entry = topics.setdefault(key, {
+                "topic_id": f"{p['parent_category']}/{key}",
+                "topic_name": key,
+                "category": p["parent_category"],
+                "reason": "review",
+                "problems": [],
+            })
+            entry["problems"].append({
+                "problem_id": pid,
+                "book": p["book"],
+                "page": p["page"],
+                "page_image_key": f"{p['book']}/{p['page']:03d}.webp",
+            })
+        atomic_json_write(self.vp.export / "today_problems.json", {
+            "version": 1,
+            "generated_date": day.isoformat(),
+            "total_topics": len(topics),
+            "total_problems": len(self.today_ids),
+            "topics": list(topics.values()),
+        })
+
+        attempted = [t for t in self.topics if self.expected_kome.get(t.topic_id)]
+        atomic_json_write(self.vp.export / "dashboard_data.json", {
+            "version": 1,
+            "generated_at": f"{day.isoformat()}T06:00:00",
+            "generated_date": day.isoformat(),
+            "totals": {
+                "topics": len(self.topics),
+                "attempted_topics": len(attempted),
+                "graduated_topics": 0,
+                "overall_accuracy": round(self.rng.uniform(0.5, 0.9), 3),
+            },
+            "categories": [
+                {"category": c, "topics": sum(t.category == c for t in self.topics), "attempted": sum(t.category == c for t in attempted)}
+                for c in CATEGORIES
+            ],
+        })
+
+    # ── PWA 側 ──
+
+    def daytime(self, day: date, pwa: KomekomeClient) -> None:
+        d = day.isoformat()
+        if day.weekday() == 0:
+            scope = self.rng.sample(CATEGORIES, 2)
+            self._send(pwa, "PUT", "/api/komekome/schedule", {
+                "week_start": d, "scope_categories": scope, "calc_count": 8, "theory_count": 3,
+            })
+
+        attempts = [
+            {
+                "id": f"a_{d}_{i}",
+                "date": d,
+                "problem_id": pid,
+                "result": "○" if self.rng.random() < 0.65 else "×",
+                "time_min": self.rng.randint(3, 20),
+                "mistakes": [],
+                "memo": "",
+            }
+            for i, pid in enumerate(self.rng.sample(self.today_ids, self.rng.randint(3, len(self.today_ids))))
+        ]
+        self._send(pwa, "POST", "/api/komekome/attempts", attempts)
+        if self.rng.random() < 0.2:
+            self._send(pwa, "POST", "/api/komekome/attempts", attempts[:2])  # 未送信分の再送（重複は足されない）
+        self.attempts += len(attempts)
+
+        enriched = [t for t in self.topics if t.enriched]
+        sessions = 0 if self.rng.random() < 0.15 else self.rng.randint(1, 2)
+        for k in range(sessions):
+            results = []
+            for topic in self.rng.sample(enriched, min(len(enriched), self.rng.randint(4, 10))):
+                correct = self.rng.random() < 0.7
+                kome = self.rng.randint(0, 3)
+                self.expected_kome[topic.topic_id] += kome
+                results.append({
+                    "topic_id": topic.topic_id,
+                    "kome_count": kome,
+                    "correct": correct,
+                    "time_seconds": self.rng.randint(20, 300),
+                    "mistakes": [] if correct else [f"{self.rng.choice(_WORDS)}の集計漏れ"],
+                })
+            self._send(pwa, "POST", "/api/komekome/result", {"session_id": f"kk_{d}_{k}", "session_date": d, "results": results})
+            self.sessions += 1
+            self.results += len(results)
+
+    @staticmethod
+    def _send(pwa: KomekomeClient, method: str, path: str, data) -> None:
+        status, body = pwa.request(method, path, json.dumps(data, ensure_ascii=False).encode("utf-8"))
+        if status != 200:
+            raise ReplayError(f"PWA {method} {path} 失敗 (HTTP {status}): {body.decode('utf-8', 'replace')[:200]}")
+
+
+def replay(
+    vault: Path,
+    api_url: str,
+    token: str,
+    *,
+    days: int = 30,
+    seed: int = 0,
+    force: bool = False,
+    scripts_dir: Path = SCRIPTS_DIR,
+) -> ReplayReport:
+    """空の vault に MonthScenario を起こし、days 日分の push-all / PWA の送信 / pull を流す。
+
+    force=True なら PUSH_FORCE=1（差分を使わず毎回全体を送る）で push する。
+    """
+    scenario = MonthScenario(Path(vault), seed=seed)
+    scenario.setup()
+    wall: dict[str, list[float]] = defaultdict(list)
+
+    with tempfile.TemporaryDirectory(prefix="komekome_replay_") as tmp:
+        conf = Path(tmp) / "komekome_cf.conf"
+        conf.write_text(f"API_URL={shlex.quote(api_url)}\nAPI_TOKEN={shlex.quote(token)}\n", encoding="utf-8")
+        timings = Path(tmp) / "timings.jsonl"
+        env = {**os.environ, "VAULT": str(vault), "KOMEKOME_CONF": str(conf), "KOMEKOME_TIMINGS": str(timings)}
+        env.pop("PUSH_FORCE", None)
+        if force:
+            env["PUSH_FORCE"] = "1"
+
+        def sync(command: str) -> None:
+            started = time.perf_counter()
+            proc = subprocess.run(
+                ["bash", str(scripts_dir / "komekome_sync.sh"), command], env=env, capture_output=True, text=True
+            )
+            wall[command].append(time.perf_counter() - started)
+            if proc.returncode != 0:
+                raise ReplayError(f"komekome_sync.sh {command} 失敗 (exit {proc.returncode}): {proc.stderr.strip()[-800:]}")
+
+        with KomekomeClient(api_url, token, encoding=None) as pwa:
+            for n in range(days):
+                day = scenario.start + timedelta(days=n)
+                scenario.morning(day)
+                sync("push-all")
+                scenario.daytime(day, pwa)
+                sync("pull")
+            pwa_rows = [{"command": "pwa", **vars(t)} for t in pwa.timings]
+
+        requests = [json.loads(line) for line in timings.read_text(encoding="utf-8").splitlines() if line]
+
+    return ReplayReport(
+        days=days,
+        sessions=scenario.sessions,
+        results=scenario.results,
+        attempts=scenario.attempts,
+        expected_kome=dict(scenario.expected_kome),
+        wall=dict(wall),
+        requests=requests + pwa_rows,
+    )
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""gemini / claude 応答のコンテンツアドレス型キャッシュ。
+
+キーは (エンジン, プロンプトテンプレート, 入力本文) のハッシュ。@path で渡す
+入力はパスではなくファイル内容をハッシュするので、同じテキストを別名で再取り込み
+しても命中する。応答は <root>/<key[:2]>/<key> に生のまま保存し、合計サイズが
+上限を超えたら最終アクセス（mtime）の古い順に削除する（LRU）。
+
+合計サイズは <root>/.size に概算で持ち、put のたびに足し込む（flock で排他）。
+キャッシュ全体を走査するのはこの値が上限を超えたとき（または .size がないとき）
+だけで、走査後に実際の合計で書き直す。
+
+保存先は LLM_CACHE_DIR（既定: <vault>/.cache/llm）、上限は LLM_CACHE_MAX_MB
+（既定 512）。LLM_CACHE=0 で無効化。呼び出し側は応答の抽出・検証に成功してから
+put すること（壊れた応答をキャッシュしない）。
+
+シェルからの使い方:
+  KEY=$(python3 lib/llm_cache.py key --engine gemini --template "$PROMPT" --input-file text.txt)
+  python3 lib/llm_cache.py get "$KEY" > raw.md   # 命中しなければ終了コード 1
+  python3 lib/llm_cache.py put "$KEY" < raw.md
+"""
+
+from __future__ import annotations
+
+import argparse
+import fcntl
+import hashlib
+import os
+import sys
+from pathlib import Path
+
+from lib.houjinzei_common import VaultPaths
+
+DEFAULT_MAX_MB = 512
+SIZE_NAME = ".size"
+_READ_BLOCK = 1 << 20
+
+
+def cache_key(engine: str, template: str, *inputs: str | bytes | Path) -> str:
+    """(engine, template, inputs...) の sha256。Path はファイル内容をハッシュする。"""
+    h = hashlib.sha256()
+
+    def _part(data: bytes) -> None:
+        h.update(f"{len(data)}:".encode("ascii"))
+        h.update(data)
+
+    _part(engine.encode("utf-8"))
+    _part(template.encode("utf-8"))
+    for item in inputs:
+        if isinstance(item, Path):
+            h.update(f"file:{item.stat().st_size}:".encode("ascii"))
+            with open(item, "rb") as f:
+                for block in iter(lambda: f.read(_READ_BLOCK), b""):
+                    h.update(block)
+        else:
+            _part(item.encode("utf-8") if isinstance(item, str) else item)
+    return h.hexdigest()
+
+
+class LLMCache:
+    """ディスク上の LRU キャッシュ。複数プロセスから同時に使ってよい。"""
+
+    def __init__(self, root: str | Path, max_bytes: int = DEFAULT_MAX_MB << 20):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def get_bytes(self, key: str) -> bytes | None:
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)  # LRU: 最終アクセスを更新
+        except OSError:
+            return None
+        return data
+
+    def get(self, key: str) -> str | None:
+        data = self.get_bytes(key)
+        return None if data is None else data.decode("utf-8", errors="replace")
+
+    def put(self, key: str, value: str | bytes) -> None:
+        data = value.encode("utf-8") if isinstance(value, str) else value
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            old_size = path.stat().st_size
+        except OSError:
+            old_size = 0
+        tmp = path.with_name(f".{key}.{os.getpid()}.tmp")
+        try:
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+            raise
+        total = self._update_size(len(data) - old_size)
+        if total is None or total > self.max_bytes:
+            self.evict()
+
+    def _update_size(self, delta: int | None = None, total: int | None = None) -> int | None:
+        """.size に delta を足す（total を渡せばその値で置き換える）。記録がなければ None。"""
+        fd = os.open(self.root / SIZE_NAME, os.O_RDWR | os.O_CREAT, 0o644)
+        with os.fdopen(fd, "r+", encoding="ascii") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            if total is None:
+                try:
+                    total = int(f.read()) + delta
+                except ValueError:
+                    return None
+            f.seek(0)
+            f.truncate()
+            f.write(str(max(0, total)))
+        return total
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        entries = []
+        if not self.root.is_dir():
+            return entries
+        for sub in self.root.iterdir():
+            if not sub.is_dir():
+                continue
+            for path in sub.iterdir():
+                if path.name.startswith("."):
+                    continue
+                try:
+                    st = path.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def stats(self) -> tuple[int, int]:
+        """(エントリ数, 合計バイト数)。"""
+        entries = self._entries()
+        return len(entries), sum(size for _, size, _ in entries)
+
+    def evict(self) -> int:
+        """合計サイズが max_bytes 以下になるまで古いエントリを削除し、削除数を返す。"""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        if self.root.is_dir():
+            self._update_size(total=total)
+        return removed
+
+
+def default_cache() -> LLMCache | None:
+    """環境変数に従った共有キャッシュ。LLM_CACHE=0 なら None。"""
+    if os.environ.get("LLM_CACHE", "1").lower() in ("0", "off", "false", "no"):
+        return None
+    root = os.environ.get("LLM_CACHE_DIR") or VaultPaths().root / ".cache" / "llm"
+    max_mb = int(os.environ.get("LLM_CACHE_MAX_MB", DEFAULT_MAX_MB))
+    return LLMCache(root, max_mb << 20)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Content-addressed cache for LLM CLI outputs")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_key = sub.add_parser("key", help="Print cache key for engine + prompt template + inputs")
+    p_key.add_argument("--engine", required=True, help="e.g. gemini, claude:claude-sonnet-4-5")
+    tmpl = p_key.add_mutually_exclusive_group(required=True)
+    tmpl.add_argument("--template", help="Prompt template text")
+    tmpl.add_argument("--template-file", help="Prompt template file")
+    p_key.add_argument("--input-file", action="append", default=[], help="Input passed via @path (hashed by content)")
+
+    p_get = sub.add_parser("get", help="Write cached output to stdout (exit 1 on miss)")
+    p_get.add_argument("key")
+    p_put = sub.add_parser("put", help="Store stdin as the output for key")
+    p_put.add_argument("key")
+    sub.add_parser("stats", help="Show entry count and size")
+    sub.add_parser("evict", help="Evict entries over the size limit")
+    args = parser.parse_args()
+
+    if args.command == "key":
+        template = args.template
+        if args.template_file:
+            template = Path(args.template_file).read_text(encoding="utf-8")
+        print(cache_key(args.engine, template, *(Path(p) for p in args.input_file)))
+        return 0
+
+    cache = default_cache()
+    if args.command == "get":
+        data = cache.get_bytes(args.key) if cache else None
+        if data is None:
+            return 1
+        sys.stdout.buffer.write(data)
+        return 0
+    if args.command == "put":
+        data = sys.stdin.buffer.read()
+        if cache and data:
+            cache.put(args.key, data)
+        return 0
+    if cache is None:
+        print("LLM cache disabled (LLM_CACHE=0)")
+        return 0
+    if args.command == "stats":
+        count, size = cache.stats()
+        print(f"{cache.root}: {count} entries, {size / (1 << 20):.1f} MB / {cache.max_bytes / (1 << 20):.0f} MB")
+    else:
+        print(f"evicted {cache.evict()} entries")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,261 @@
+"""LLM 出力からの JSON 抽出（1 パス・線形時間）。
+
+LLM の応答は前置きの文章・```json フェンス・途中で切れた配列などが混ざる。
+ここでは出力全体を 1 回だけ走査し、文字列・エスケープの状態と括弧の深さを
+追ってトップレベルの配列 / オブジェクトの候補を切り出す。各候補は重ならないので
+json.loads の合計コストも出力長に比例する。
+
+全体または ```json ブロックの中身がそのまま解析できる（よくある）場合は走査しない。
+候補の選び方:
+  - 求める型（list / dict）に一致するもののうち、```json フェンス内のものを優先し、
+    その中で最も長いものを採る（前置きの "[1]" などより本体が優先される）。
+  - 閉じていない候補（出力の打ち切り）は、最後に完結した要素の直後で切り、
+    開いている括弧を閉じて復元する。末尾カンマも取り除く。
+
+    find_json(text, list)    → 値（見つからなければ ValueError）
+    split_json_block(text)   → (```json ブロックの値, ブロックを除いた本文)
+                               ブロックがなければ ValueError（unfenced=True なら本文全体から探す）
+
+トップレベル候補の開始は、直後が JSON の値として始まり得る "[" / "{" に限る
+（"[注意]" のような見出しを候補にしない）。候補が括弧の不一致で壊れた場合は
+そこで打ち切って先へ進むため、壊れた候補の内側に入れ子になった JSON は拾わない。
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass
+from typing import Iterator
+
+_TOKEN_RE = re.compile(r'[\[\]{}",`]')
+_OUTER_RE = re.compile(r"[\[{`]")
+_STRING_RE = re.compile(r'"(?:[^"\\]|\\.)*"', re.DOTALL)
+_NONSPACE_RE = re.compile(r"\S")
+# 文字列はそのまま残し（\1）、閉じ括弧の直前のカンマだけを消す
+_TRAILING_COMMA_RE = re.compile(r'("(?:[^"\\]|\\.)*")|,(?=\s*[\]}])', re.DOTALL)
+_CLOSERS = {"[": "]", "{": "}"}
+_ARRAY_VALUE_START = frozenset('[{"-0123456789tfn]')
+_OBJECT_VALUE_START = frozenset('"}')
+
+
+@dataclass
+class Candidate:
+    start: int
+    end: int
+    complete: bool
+    fenced: bool
+    cut: tuple[int, str] | None = None  # 打ち切り時: (最後に要素が完結した位置, 閉じ括弧列)
+
+    def text(self, source: str) -> str:
+        if self.complete:
+            return source[self.start:self.end]
+        if self.cut is None:
+            return ""
+        pos, closers = self.cut
+        return source[self.start:pos] + closers
+
+
+def scan(text: str) -> Iterator[Candidate]:
+    """トップレベルの配列 / オブジェクト候補を出現順に返す。"""
+    stack: list[str] = []
+    start = 0
+    # 最後に要素が完結した位置とその時の深さ。以降に深さがそれ未満へ戻ると必ず
+    # 更新されるので、stack[:cut_depth] はその時点の括弧と同じ
+    cut_pos = cut_depth = -1
+    in_fence = False
+    fence_is_json = False
+    cand_fenced = False
+
+    def truncated(end: int) -> Candidate:
+        cut = None if cut_pos < 0 else (cut_pos, "".join(reversed(stack[:cut_depth])))
+        return Candidate(start, end, False, cand_fenced, cut)
+
+    pos = 0
+    n = len(text)
+    while pos < n:
+        m = (_TOKEN_RE if stack else _OUTER_RE).search(text, pos)
+        if m is None:
+            break
+        i = m.start()
+        ch = m.group()
+        pos = i + 1
+
+        if ch == "`":
+            if not text.startswith("```", i):
+                continue
+            pos = i + 3
+            if stack:
+                # 閉じる前にフェンスが来た = 応答が途中で切れている
+                yield truncated(i)
+                stack.clear()
+            if in_fence:
+                in_fence = False
+            else:
+                in_fence = True
+                fence_is_json = text[i + 3:i + 7].lower() == "json"
+            continue
+
+        if not stack:
+            nxt = _NONSPACE_RE.search(text, pos)
+            allowed = _ARRAY_VALUE_START if ch == "[" else _OBJECT_VALUE_START
+            if nxt is None or nxt.group() not in allowed:
+                continue
+            stack.append(_CLOSERS[ch])
+            start, cut_pos, cut_depth = i, -1, -1
+            cand_fenced = in_fence and fence_is_json
+            continue
+
+        if ch == '"':
+            sm = _STRING_RE.match(text, i)
+            if sm is None:
+                break  # 文字列の途中で打ち切られている
+            pos = sm.end()
+        elif ch in _CLOSERS:
+            stack.append(_CLOSERS[ch])
+        elif ch == ",":
+            cut_pos, cut_depth = i, len(stack)
+        else:
+            if ch != stack[-1]:
+                stack.clear()  # 括弧の不一致: JSON ではない
+                continue
+            stack.pop()
+            if not stack:
+                yield Candidate(start, i + 1, True, cand_fenced)
+                continue
+            cut_pos, cut_depth = i + 1, len(stack)
+
+    if stack:
+        yield truncated(n)
+
+
+def strip_trailing_commas(s: str) -> str:
+    """文字列の外にある "," のうち、直後（空白を除く）が "]" / "}" のものを取り除く。"""
+    return _TRAILING_COMMA_RE.sub(r"\1", s)
+
+
+def _loads(s: str):
+    """json.loads。入れ子が深すぎる入力の RecursionError も ValueError にそろえる。"""
+    try:
+        return json.loads(s)
+    except RecursionError:
+        raise ValueError("JSONの入れ子が深すぎます") from None
+
+
+def parse_candidate(source: str, cand: Candidate):
+    """候補を解析する。失敗したら末尾カンマを除いて再試行し、それでも駄目なら ValueError。"""
+    s = cand.text(source)
+    if not s:
+        raise ValueError("打ち切られた候補に完結した要素がありません")
+    try:
+        return _loads(s)
+    except ValueError:
+        return _loads(strip_trailing_commas(s))
+
+
+def _quick(text: str, want) -> tuple[object, int, int] | None:
+    """全体、または ```json ブロックの中身がそのまま JSON なら走査せずに返す（C 実装で速い）。"""
+    stripped = text.strip()
+    if stripped[:1] in ("[", "{"):
+        try:
+            value = _loads(stripped)
+        except ValueError:
+            pass
+        else:
+            if isinstance(value, want):
+                start = text.index(stripped[0])
+                return value, start, start + len(stripped)
+    for _, _, body_start, body_end in json_block_spans(text):
+        try:
+            value = _loads(text[body_start:body_end])
+        except ValueError:
+            continue
+        if isinstance(value, want):
+            return value, body_start, body_end
+    return None
+
+
+def find_json_span(text: str, want: type | tuple[type, ...] = (list, dict)) -> tuple[object, int, int]:
+    """find_json と同じ値と、その候補の text 上の範囲 (start, end) を返す。"""
+    quick = _quick(text, want)
+    if quick is not None:
+        return quick
+    best = None
+    for cand in scan(text):
+        try:
+            value = parse_candidate(text, cand)
+        except ValueError:
+            continue
+        if not isinstance(value, want):
+            continue
+        rank = (cand.fenced, cand.complete, cand.end - cand.start)
+        if best is None or rank > best[0]:
+            best = (rank, value, cand.start, cand.end)
+    if best is None:
+        raise ValueError("JSONを抽出できませんでした")
+    return best[1], best[2], best[3]
+
+
+def find_json(text: str, want: type | tuple[type, ...] = (list, dict)):
+    """text 中の JSON 値（want の型）を返す。見つからなければ ValueError。"""
+    return find_json_span(text, want)[0]
+
+
+def json_block_spans(text: str) -> Iterator[tuple[int, int, int, int]]:
+    """```json ブロックの (ブロック開始, ブロック終了, 本文開始, 本文終了) を返す。
+
+    開きフェンスの後は改行が必要で、閉じフェンスは行頭の ```。閉じフェンスが
+    なければ（出力の打ち切り）テキスト末尾までをブロックとする。
+    """
+    pos = 0
+    while True:
+        start = text.find("```json", pos)
+        if start == -1:
+            return
+        body = start + 7
+        ws = _NONSPACE_RE.search(text, body)
+        ws_end = ws.start() if ws else len(text)
+        newline = text.rfind("\n", body, ws_end)
+        if newline == -1:
+            pos = body
+            continue
+        close = text.find("\n```", newline + 1)
+        if close == -1:
+            yield start, len(text), newline + 1, len(text)
+            return
+        yield start, close + 4, newline + 1, close
+        pos = close + 4
+
+
+def split_json_block(
+    text: str, want: type | tuple[type, ...] = (list, dict), *, unfenced: bool = False
+) -> tuple[object, str]:
+    """最初に解析できた ```json ブロックの値と、全 ```json ブロックを除いた本文を返す。
+
+    ブロックがなければ ValueError。unfenced=True のときだけ本文全体から find_json で探し、
+    その範囲を除いた本文を返す（普通の文章中の "[1]" なども拾うので、呼び出し側で形を確かめる）。
+    """
+    spans = list(json_block_spans(text))
+    value = None
+    found = False
+    for _, _, body_start, body_end in spans:
+        try:
+            value = find_json(text[body_start:body_end], want)
+            found = True
+            break
+        except ValueError:
+            continue
+    if not found:
+        if spans:
+            raise ValueError("JSONブロックを解析できませんでした")
+        if not unfenced:
+            raise ValueError("```json ブロックがありません")
+        value, start, end = find_json_span(text, want)
+        return value, (text[:start] + text[end:]).strip()
+    parts = []
+    last = 0
+    for start, end, _, _ in spans:
+        parts.append(text[last:start])
+        last = end
+    parts.append(text[last:])
+    return value, "".join(parts).strip()
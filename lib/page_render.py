@@ -0,0 +1,291 @@
+"""PDF ページ画像（WebP）の並列レンダリング（extract_page_images.sh から使う）。
+
+pypdfium2 のラスタライズと WebP エンコードはどちらも CPU 律速なので、
+(問題集, ページ) を CHUNK_PAGES ページずつのチャンクに分けてプロセスプールで
+並列に処理する。各ワーカープロセスは自分で PdfDocument を開き（同じ PDF の
+チャンクが続けば開いたものを使い回す）、一時ファイルに書いてから os.replace
+するので、中断しても途中まで書かれた .webp は残らない。
+
+1 回の描画から縮小版（thumb / medium）と原寸（full）、問題の bbox が分かっていれば
+その切り抜き（crop）も書く（VARIANTS）。PWA は小さいものから順に読み込む。
+
+描き直さなくてよいページは計画の段階で除く。既定は「全バリアントがあればスキップ」で、
+extract_page_images.sh はさらに image_store のマニフェストで描画条件（DPI・品質）と
+内容、切り抜いた bbox まで一致するかを判定し、描画できたページを on_rendered で
+マニフェストに記録する。
+
+    jobs, existing = plan_chunks(pages_needed, find_pdf, output_dir, is_current=..., crops=...)
+    stats = render_chunks(jobs, dpi=200, workers=4, on_rendered=...)
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+WEBP_QUALITY = 85
+CROP_QUALITY = 80
+CHUNK_PAGES = 8  # 1 タスクのページ数（小さいほど負荷が均等、大きいほど PDF を開く回数が減る）
+
+BBox = tuple[float, float, float, float]  # (左, 上, 右, 下) をページ幅・高さに対する割合で
+
+
+@dataclass(frozen=True)
+class Variant:
+    name: str
+    suffix: str  # ファイル名の拡張子前（"" は原寸で、従来の <page>.webp のまま）
+    width: int | None  # 最大幅 px（None は縮小しない）
+    quality: int
+
+
+VARIANTS = (
+    Variant("thumb", ".thumb", 320, 60),
+    Variant("medium", ".medium", 960, 75),
+    Variant("full", "", None, WEBP_QUALITY),
+)
+CROP_WIDTH = 960  # 切り抜きも medium と同じ幅までに縮める
+
+
+@dataclass
+class RenderChunk:
+    book: str
+    pdf_path: Path
+    pages: list[int]
+    out_dir: Path
+    crops: dict[int, list[tuple[str, BBox]]] = field(default_factory=dict)  # ページ → [(問題 ID, bbox)]
+
+
+@dataclass
+class RenderStats:
+    rendered: int = 0
+    existing: int = 0
+    skipped: int = 0
+    seconds: float = 0.0
+    errors: list[str] = field(default_factory=list)
+
+    @property
+    def pages_per_sec(self) -> float:
+        return self.rendered / self.seconds if self.seconds > 0 else 0.0
+
+
+def page_image_path(out_dir: Path, page: int, variant: str = "full") -> Path:
+    suffix = next(v.suffix for v in VARIANTS if v.name == variant)
+    return out_dir / f"{page:03d}{suffix}.webp"
+
+
+def crop_image_path(out_dir: Path, page: int, problem_id: str) -> Path:
+    return out_dir / f"{page:03d}.crop-{problem_id}.webp"
+
+
+def expected_outputs(out_dir: Path, page: int, crops: list[tuple[str, BBox]] = ()) -> list[Path]:
+    """1 ページの描画で書かれるファイル（全バリアントと切り抜き）。"""
+    paths = [page_image_path(out_dir, page, v.name) for v in VARIANTS]
+    return paths + [crop_image_path(out_dir, page, pid) for pid, _ in crops]
+
+
+def remove_stale_crops(
+    out_dir: Path, crops: dict[int, list[tuple[str, BBox]]], page: int | None = None
+) -> list[Path]:
+    """out_dir の切り抜きのうち crops（ページ → [(問題 ID, bbox)]）にないものを消し、消したパスを返す。
+
+    bbox を消した・問題を削除したあとの切り抜きが残ると、アップロードの対象になり続ける。
+    page を渡せばそのページの切り抜きだけを見る。
+    """
+    pattern = f"{page:03d}.crop-*.webp" if page is not None else "*.crop-*.webp"
+    removed = []
+    for path in sorted(out_dir.glob(pattern)):
+        head, _, rest = path.name.partition(".crop-")
+        try:
+            crop_page = int(head)
+        except ValueError:
+            continue
+        if rest.removesuffix(".webp") in {pid for pid, _ in crops.get(crop_page, [])}:
+            continue
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            continue
+        removed.append(path)
+    return removed
+
+
+def plan_chunks(
+    pages_needed: dict[str, set[int]],
+    find_pdf: Callable[[str], Path | None],
+    output_dir: Path,
+    chunk_pages: int = CHUNK_PAGES,
+    is_current: Callable[[str, int, Path, list[tuple[str, BBox]]], bool] | None = None,
+    crops: dict[str, dict[int, list[tuple[str, BBox]]]] | None = None,
+) -> tuple[list[RenderChunk], RenderStats]:
+    """描画が必要なページをチャンクに分ける。既存・PDF なしの件数は RenderStats に入れて返す。
+
+    全バリアント・切り抜きがそろい、is_current(book, page, 原寸のパス, そのページの切り抜き)
+    も True のページは描き直さない。crops は 問題集 → ページ → [(問題 ID, bbox)]。
+    bbox を直したときに切り抜きを作り直すかどうかは is_current が決める。
+    """
+    crops = crops or {}
+    stats = RenderStats()
+    chunks: list[RenderChunk] = []
+    for book, pages in sorted(pages_needed.items()):
+        pdf_path = find_pdf(book)
+        if not pdf_path:
+            print(f"警告: PDF not found for '{book}', skipping {len(pages)} pages")
+            stats.skipped += len(pages)
+            continue
+        out_dir = output_dir / book
+        book_crops = crops.get(book, {})
+
+        def current(page: int) -> bool:
+            page_crops = book_crops.get(page, [])
+            if not all(path.exists() for path in expected_outputs(out_dir, page, page_crops)):
+                return False
+            return is_current is None or is_current(book, page, page_image_path(out_dir, page), page_crops)
+
+        todo = [p for p in sorted(pages) if not current(p)]
+        stats.existing += len(pages) - len(todo)
+        if not todo:
+            continue
+        out_dir.mkdir(parents=True, exist_ok=True)
+        print(f"処理予定: {book} ({len(todo)}/{len(pages)}ページ) from {pdf_path.name}")
+        for i in range(0, len(todo), chunk_pages):
+            part = todo[i:i + chunk_pages]
+            part_crops = {p: book_crops[p] for p in part if p in book_crops}
+            chunks.append(RenderChunk(book, pdf_path, part, out_dir, part_crops))
+    return chunks, stats
+
+
+def atomic_save_webp(image, path: Path, quality: int = WEBP_QUALITY) -> None:
+    """PIL 画像を同じディレクトリの一時ファイルに書いてから置き換える。"""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp", prefix=f".{path.stem}_")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            image.save(f, "WEBP", quality=quality)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def save_variants(
+    image, out_dir: Path, page: int, quality: int = WEBP_QUALITY, crops: list[tuple[str, BBox]] = ()
+) -> None:
+    """1 枚の描画結果から切り抜きと全バリアントを書く。原寸は最後（そろった目印になる）。
+
+    このページの切り抜きのうち crops にないもの（前回の描画の残り）は消す。
+    """
+    width, height = image.size
+    for problem_id, (x0, y0, x1, y1) in crops:
+        region = image.crop((round(x0 * width), round(y0 * height), round(x1 * width), round(y1 * height)))
+        region.thumbnail((CROP_WIDTH, region.size[1]))
+        atomic_save_webp(region, crop_image_path(out_dir, page, problem_id), CROP_QUALITY)
+    remove_stale_crops(out_dir, {page: list(crops)}, page)
+    for v in VARIANTS:
+        if v.width is None:
+            atomic_save_webp(image, page_image_path(out_dir, page, v.name), quality)
+            continue
+        small = image.copy()
+        small.thumbnail((v.width, height))  # 縦横比を保って幅だけ抑える
+        atomic_save_webp(small, page_image_path(out_dir, page, v.name), v.quality)
+
+
+# ワーカープロセスごとに開いた PdfDocument（パス → 文書）
+_open_docs: dict[str, object] = {}
+
+
+def _document(pdf_path: Path):
+    import pypdfium2 as pdfium
+
+    key = str(pdf_path)
+    doc = _open_docs.get(key)
+    if doc is None:
+        for old in _open_docs.values():
+            old.close()  # 別の PDF に移ったら前の文書は閉じる（チャンクは問題集順に流れる）
+        _open_docs.clear()
+        doc = _open_docs[key] = pdfium.PdfDocument(key)
+    return doc
+
+
+def render_chunk(chunk: RenderChunk, dpi: int, quality: int = WEBP_QUALITY) -> tuple[list[int], list[str]]:
+    """チャンクのページを描画して (描画したページ, エラー・警告メッセージ) を返す（ワーカーで実行）。
+
+    既存の出力は上書きする（描き直すかどうかは plan_chunks が決めている）。
+    """
+    rendered: list[int] = []
+    messages: list[str] = []
+    try:
+        doc = _document(chunk.pdf_path)
+    except Exception as e:
+        return [], [f"エラー: {chunk.pdf_path}: {e}"]
+    for page_num in chunk.pages:
+        page_idx = page_num - 1  # pypdfium2 は 0 始まり
+        if page_idx < 0 or page_idx >= len(doc):
+            messages.append(f"警告: {chunk.book} ページ {page_num} は範囲外 (max={len(doc)})")
+            continue
+        try:
+            image = doc[page_idx].render(scale=dpi / 72).to_pil()
+            save_variants(image, chunk.out_dir, page_num, quality, chunk.crops.get(page_num, []))
+            rendered.append(page_num)
+        except Exception as e:
+            messages.append(f"エラー: {chunk.book} page {page_num}: {e}")
+    return rendered, messages
+
+
+def render_chunks(
+    chunks: list[RenderChunk],
+    dpi: int,
+    workers: int | None = None,
+    quality: int = WEBP_QUALITY,
+    stats: RenderStats | None = None,
+    render: Callable[[RenderChunk, int, int], tuple[list[int], list[str]]] = render_chunk,
+    on_rendered: Callable[[RenderChunk, list[int]], None] | None = None,
+) -> RenderStats:
+    """チャンクをプロセスプールで描画する。workers=1 ならこのプロセスで順に処理する。
+
+    on_rendered(chunk, pages) はチャンクが終わるたびにこのプロセスで呼ばれる。
+    """
+    stats = stats or RenderStats()
+    total = sum(len(c.pages) for c in chunks)
+    if not total:
+        return stats
+    workers = max(1, min(workers or os.cpu_count() or 1, len(chunks)))
+    started = time.monotonic()
+    done = 0
+
+    def record(chunk: RenderChunk, rendered: list[int], messages: list[str]) -> None:
+        nonlocal done
+        done += len(chunk.pages)
+        stats.rendered += len(rendered)
+        stats.skipped += len(chunk.pages) - len(rendered)
+        if on_rendered and rendered:
+            on_rendered(chunk, rendered)
+        stats.errors.extend(messages)
+        for m in messages:
+            print(f"  {m}", file=sys.stderr)
+        elapsed = time.monotonic() - started
+        rate = stats.rendered / elapsed if elapsed > 0 else 0.0
+        print(f"  [{done}/{total}] {chunk.book} p{chunk.pages[0]}-{chunk.pages[-1]} ({rate:.1f} ページ/秒)", flush=True)
+
+    if workers == 1:
+        for chunk in chunks:
+            record(chunk, *render(chunk, dpi, quality))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(render, chunk, dpi, quality): chunk for chunk in chunks}
+            for future in as_completed(futures):
+                chunk = futures[future]
+                try:
+                    rendered, messages = future.result()
+                except Exception as e:  # ワーカーの異常終了など
+                    rendered, messages = [], [f"エラー: {chunk.book} p{chunk.pages[0]}-{chunk.pages[-1]}: {e}"]
+                record(chunk, rendered, messages)
+    stats.seconds += time.monotonic() - started
+    return stats
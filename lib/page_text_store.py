@@ -0,0 +1,90 @@
+"""PDF ページテキストのコンテンツアドレス型ストア。
+
+キーは (PDF の SHA-256, バックエンド, ページ番号)。ファイル名や置き場所が変わっても
+中身が同じ PDF なら命中するので、ingest（pdfminer）・extract_problems（pypdf）・
+extract_page_images が同じ本を何度処理してもページ単位で再利用できる。
+
+  <root>/<sha[:2]>/<sha>/meta.json               {"pages": {"pdfminer": 512, ...}}
+  <root>/<sha[:2]>/<sha>/<backend>/<page:05d>.txt
+
+保存先は PAGE_TEXT_STORE_DIR（既定: <vault>/.cache/page_text）。PAGE_TEXT_STORE=0 で無効。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from lib.houjinzei_common import VaultPaths
+
+_READ_BLOCK = 1 << 20
+
+
+def pdf_sha256(pdf_path: str | Path) -> str:
+    h = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        for block in iter(lambda: f.read(_READ_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _atomic_write_text(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        tmp.write_text(text, encoding="utf-8")
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+        raise
+
+
+class PageTextStore:
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+
+    def _dir(self, sha: str) -> Path:
+        return self.root / sha[:2] / sha
+
+    def _page_path(self, sha: str, backend: str, page_no: int) -> Path:
+        return self._dir(sha) / backend / f"{page_no:05d}.txt"
+
+    def get(self, sha: str, backend: str, page_no: int) -> str | None:
+        """1 始まりのページ番号のテキスト。未登録なら None。"""
+        try:
+            return self._page_path(sha, backend, page_no).read_text(encoding="utf-8")
+        except OSError:
+            return None
+
+    def put(self, sha: str, backend: str, page_no: int, text: str) -> None:
+        _atomic_write_text(self._page_path(sha, backend, page_no), text)
+
+    def page_count(self, sha: str, backend: str) -> int | None:
+        try:
+            meta = json.loads((self._dir(sha) / "meta.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        count = meta.get("pages", {}).get(backend)
+        return int(count) if count is not None else None
+
+    def set_page_count(self, sha: str, backend: str, count: int) -> None:
+        meta_path = self._dir(sha) / "meta.json"
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            meta = {}
+        meta.setdefault("pages", {})[backend] = count
+        _atomic_write_text(meta_path, json.dumps(meta, ensure_ascii=False, indent=2) + "\n")
+
+
+def default_store() -> PageTextStore | None:
+    """環境変数に従った共有ストア。PAGE_TEXT_STORE=0 なら None。"""
+    if os.environ.get("PAGE_TEXT_STORE", "1").lower() in ("0", "off", "false", "no"):
+        return None
+    root = os.environ.get("PAGE_TEXT_STORE_DIR") or VaultPaths().root / ".cache" / "page_text"
+    return PageTextStore(root)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""ページ画像バリアントの payload 生成と、日次セットの転送量レポート。
+
+extract_page_images.sh（lib/page_render.py）は 1 ページから thumb / medium / full と、
+bbox が分かっている問題の crop を書く。generate_quiz.sh はローカルにあるものだけを
+today_problems.json の各問題に page_images として載せ、PWA は
+thumb → crop（なければ medium）の順に表示して、full は拡大したいときだけ読む。
+
+リモートキーは page_images/ からの相対パス（upload_page_images.sh と同じ）。
+
+使い方:
+  python3 lib/page_variants.py report [TODAY_JSON ...]
+    各日次セットについて、従来（問題ごとに full）と、バリアント導入後の初期表示
+    （thumb + crop/medium）の転送バイト数を比べる。既定は 50_エクスポート/today_problems.json。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable
+
+from lib.houjinzei_common import VaultPaths
+from lib.page_render import crop_image_path, page_image_path
+
+VARIANT_ORDER = ("thumb", "crop", "medium", "full")  # 小さい順（PWA が読む順）
+
+
+def page_image_variants(image_dir: Path, book: str, page: int, problem_id: str | None = None) -> dict[str, str]:
+    """ローカルにあるバリアントだけを {名前: リモートキー} で返す（小さい順）。"""
+    if not book or not page:
+        return {}
+    out_dir = image_dir / book
+    paths = {
+        "thumb": page_image_path(out_dir, page, "thumb"),
+        "crop": crop_image_path(out_dir, page, problem_id) if problem_id else None,
+        "medium": page_image_path(out_dir, page, "medium"),
+        "full": page_image_path(out_dir, page),
+    }
+    return {
+        name: paths[name].relative_to(image_dir).as_posix()
+        for name in VARIANT_ORDER
+        if paths[name] is not None and paths[name].exists()
+    }
+
+
+@dataclass
+class SetBytes:
+    problems: int
+    before: int  # 問題ごとに full を 1 回ずつ（同じページは 1 回）
+    initial: int  # thumb + crop/medium（同じキーは 1 回）
+    with_full: int  # initial に、全問題で full も開いた場合を足したもの
+    missing: int  # 画像が手元にないキーの数
+
+    @property
+    def saved_ratio(self) -> float:
+        return 1 - self.initial / self.before if self.before else 0.0
+
+
+def _problems(payload: dict) -> Iterable[dict]:
+    for topic in payload.get("topics", []):
+        for prob in topic.get("problems", []):
+            if isinstance(prob, dict):
+                yield prob
+
+
+def daily_set_bytes(payload: dict, image_dir: Path) -> SetBytes:
+    """today_problems.json 1 日分の画像転送量を見積もる（ブラウザのキャッシュで同じキーは 1 回）。"""
+    missing: set[str] = set()
+
+    def size(keys: set[str]) -> int:
+        total = 0
+        for key in keys:
+            path = image_dir / key
+            if path.exists():
+                total += path.stat().st_size
+            else:
+                missing.add(key)
+        return total
+
+    full_keys: set[str] = set()
+    initial_keys: set[str] = set()
+    count = 0
+    for prob in _problems(payload):
+        count += 1
+        variants = prob.get("page_images") or page_image_variants(
+            image_dir, prob.get("book", ""), prob.get("page", 0), prob.get("problem_id")
+        )
+        full = variants.get("full") or prob.get("page_image_key")
+        if not full:
+            continue
+        full_keys.add(full)
+        if "thumb" in variants:
+            initial_keys.add(variants["thumb"])
+        initial_keys.add(variants.get("crop") or variants.get("medium") or full)
+
+    before = size(full_keys)
+    initial = size(initial_keys)
+    return SetBytes(count, before, initial, size(initial_keys | full_keys), len(missing))
+
+
+def _kb(n: int) -> str:
+    return f"{n / 1024:,.0f} KB"
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Report page image bytes per daily set")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_report = sub.add_parser("report", help="Compare full-page vs. progressive bytes per daily set")
+    p_report.add_argument("today", nargs="*", type=Path)
+    args = parser.parse_args(argv)
+
+    vp = VaultPaths()
+    image_dir = vp.extracted / "page_images"
+    paths = args.today or [vp.export / "today_problems.json"]
+
+    print("| 日付 | 問題数 | 従来 (full) | 初期表示 | 削減 | full も全部開いた場合 |")
+    print("|---|---:|---:|---:|---:|---:|")
+    for path in paths:
+        if not path.exists():
+            print(f"エラー: {path} が見つかりません", file=sys.stderr)
+            return 1
+        payload = json.loads(path.read_text(encoding="utf-8"))
+        r = daily_set_bytes(payload, image_dir)
+        print(
+            f"| {payload.get('generated_date', path.stem)} | {r.problems} | {_kb(r.before)} | {_kb(r.initial)}"
+            f" | {r.saved_ratio:.0%} | {_kb(r.with_full)} |"
+        )
+        if r.missing:
+            print(f"  注意: 手元にない画像 {r.missing}件（未抽出）は 0 バイトとして数えています", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
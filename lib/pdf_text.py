@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""PDF のページ単位テキスト抽出（ProcessPoolExecutor で並列化）。
+
+ページ範囲を連続したバッチに分けて各ワーカーに渡し、ワーカーはそれぞれ PDF を
+自分で開いて担当ページだけを処理する。結果はページ順に受け取り、従来と同じ
+
+    --- ページ N ---
+    <本文>
+
+形式で書き出す（本文が空白だけのページは出力しない）。
+
+バックエンド:
+  pdfminer  pdfminer.six の TextConverter + LAParams（CJK のレイアウト解析が正確だが遅い）
+  pypdf     pypdf の extract_text（速いが段組み・縦書きに弱い）
+
+store（lib/page_text_store.py）を渡すと、PDF の SHA-256 + ページ + バックエンドで
+登録済みのページは読み出すだけにし、未登録のページだけをワーカーに回して登録する。
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator
+
+from lib.page_text_store import PageTextStore, default_store, pdf_sha256
+
+BACKENDS = ("pdfminer", "pypdf")
+BATCHES_PER_WORKER = 4  # ワーカーあたりのバッチ数（重いページの偏りをならす）
+MIN_PAGES_PER_BATCH = 4
+
+
+def page_count(pdf_path: str, backend: str = "pdfminer") -> int:
+    if backend == "pypdf":
+        from pypdf import PdfReader
+
+        return len(PdfReader(pdf_path).pages)
+
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfpage import PDFPage
+    from pdfminer.pdfparser import PDFParser
+
+    with open(pdf_path, "rb") as fp:
+        document = PDFDocument(PDFParser(fp))
+        return sum(1 for _ in PDFPage.create_pages(document))
+
+
+def _extract_pdfminer(pdf_path: str, start: int, end: int) -> list[str]:
+    from pdfminer.converter import TextConverter
+    from pdfminer.layout import LAParams
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
+    from pdfminer.pdfparser import PDFParser
+
+    rsrcmgr = PDFResourceManager()
+    laparams = LAParams()
+    texts = []
+    with open(pdf_path, "rb") as fp:
+        document = PDFDocument(PDFParser(fp))
+        for page in islice(PDFPage.create_pages(document), start, end):
+            buf = io.StringIO()
+            device = TextConverter(rsrcmgr, buf, laparams=laparams)
+            PDFPageInterpreter(rsrcmgr, device).process_page(page)
+            texts.append(buf.getvalue())
+            device.close()
+    return texts
+
+
+def _extract_pypdf(pdf_path: str, start: int, end: int) -> list[str]:
+    from pypdf import PdfReader
+
+    reader = PdfReader(pdf_path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def extract_range(pdf_path: str, backend: str, start: int, end: int) -> list[str]:
+    """0 始まりのページ範囲 [start, end) のテキストを返す（ワーカー側で PDF を開く）。"""
+    if backend == "pypdf":
+        return _extract_pypdf(pdf_path, start, end)
+    return _extract_pdfminer(pdf_path, start, end)
+
+
+def page_batches(total: int, workers: int, pages: Iterable[int] | None = None) -> list[tuple[int, int]]:
+    """0 始まりのページ（既定: 全ページ）を連続範囲ごとに [start, end) のバッチへ分ける。"""
+    todo = sorted(pages) if pages is not None else range(total)
+    size = max(MIN_PAGES_PER_BATCH, -(-len(todo) // max(1, workers * BATCHES_PER_WORKER)))
+    batches: list[tuple[int, int]] = []
+    for idx in todo:
+        if batches and batches[-1][1] == idx and idx - batches[-1][0] < size:
+            batches[-1] = (batches[-1][0], idx + 1)
+        else:
+            batches.append((idx, idx + 1))
+    return batches
+
+
+def _run_batches(pdf_path: str, backend: str, workers: int, batches: list[tuple[int, int]]) -> Iterator[tuple[int, str]]:
+    """バッチを（可能なら並列に）処理し、(0 始まりのページ, テキスト) をバッチ順に返す。"""
+    if workers <= 1 or len(batches) <= 1:
+        results = (extract_range(pdf_path, backend, s, e) for s, e in batches)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=min(workers, len(batches)))
+        results = pool.map(
+            extract_range,
+            [pdf_path] * len(batches),
+            [backend] * len(batches),
+            [s for s, _ in batches],
+            [e for _, e in batches],
+        )
+    try:
+        for (start, _), texts in zip(batches, results):
+            for offset, text in enumerate(texts):
+                yield start + offset, text
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
+def extract_pages(
+    pdf_path: str,
+    backend: str = "pdfminer",
+    workers: int | None = None,
+    store: PageTextStore | None = None,
+) -> Iterator[tuple[int, str]]:
+    """(1 始まりのページ番号, テキスト) をページ順に返す。"""
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown backend: {backend}")
+    workers = workers or os.cpu_count() or 1
+
+    if store is None:
+        total = page_count(pdf_path, backend)
+        for idx, text in _run_batches(pdf_path, backend, workers, page_batches(total, workers)):
+            yield idx + 1, text
+        return
+
+    sha = pdf_sha256(pdf_path)
+    total = store.page_count(sha, backend)
+    if total is None:
+        total = page_count(pdf_path, backend)
+        store.set_page_count(sha, backend, total)
+    cached = {}
+    for idx in range(total):
+        text = store.get(sha, backend, idx + 1)
+        if text is not None:
+            cached[idx] = text
+    missing = [idx for idx in range(total) if idx not in cached]
+    fresh = _run_batches(pdf_path, backend, workers, page_batches(total, workers, missing))
+    for idx in range(total):
+        if idx in cached:
+            yield idx + 1, cached.pop(idx)
+            continue
+        fidx, text = next(fresh)
+        store.put(sha, backend, fidx + 1, text)
+        yield fidx + 1, text
+
+
+def page_texts(
+    pdf_path: str,
+    page_numbers: Iterable[int],
+    backend: str = "pypdf",
+    store: PageTextStore | None = None,
+) -> dict[int, str]:
+    """指定ページ（1 始まり、範囲外は無視）のテキスト。store にあれば PDF を解析しない。"""
+    wanted = sorted(set(page_numbers))
+    sha = pdf_sha256(pdf_path) if store is not None else ""
+    total = store.page_count(sha, backend) if store is not None else None
+    if total is None:
+        total = page_count(pdf_path, backend)
+        if store is not None:
+            store.set_page_count(sha, backend, total)
+    out: dict[int, str] = {}
+    missing = []
+    for page_no in wanted:
+        if not 1 <= page_no <= total:
+            continue
+        text = store.get(sha, backend, page_no) if store is not None else None
+        if text is None:
+            missing.append(page_no - 1)
+        else:
+            out[page_no] = text
+    for idx, text in _run_batches(pdf_path, backend, 1, page_batches(total, 1, missing)):
+        if store is not None:
+            store.put(sha, backend, idx + 1, text)
+        out[idx + 1] = text
+    return out
+
+
+def write_page_text(
+    pdf_path: str,
+    out_path: str,
+    backend: str = "pdfminer",
+    workers: int | None = None,
+    store: PageTextStore | None = None,
+) -> int:
+    """全ページを `--- ページ N ---` 形式で out_path に書き出し、ページ数を返す。"""
+    pages = 0
+    with open(out_path, "w", encoding="utf-8") as outf:
+        for page_no, text in extract_pages(pdf_path, backend, workers, store):
+            if text.strip():
+                outf.write(f"--- ページ {page_no} ---\n{text}\n\n")
+            pages += 1
+    return pages
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Extract PDF text page by page with a process pool")
+    parser.add_argument("--input", required=True, help="PDF path")
+    parser.add_argument("--output", required=True, help="Output text path")
+    parser.add_argument("--backend", choices=BACKENDS, default="pdfminer")
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes (0 = CPU count)")
+    parser.add_argument("--no-store", action="store_true", help="Bypass the shared page-text store")
+    args = parser.parse_args()
+
+    store = None if args.no_store else default_store()
+    pages = write_page_text(args.input, args.output, args.backend, args.workers or None, store)
+    print(f"   {pages}ページ抽出完了 → {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""問題集をまたぐ類似問題の検出（MinHash + LSH）と duplicate_group の付与。
+
+同じ演習が大原の複数の問題集や理論問題集に重ねて載っているので、問題ごとに
+タイトルの文字 2-gram と normalized_topics を shingle にして MinHash 署名を作り、
+LSH（NUM_PERM = BANDS × ROWS の帯分割）で同じバケットに入った問題だけを
+比べる。候補は shingle の Jaccard 係数が THRESHOLD 以上、問題集が異なり、
+type（計算 / 理論）が同じものに限る。確定した組を union-find でまとめ、
+2 問以上のグループに duplicate_group = "dup:<グループ内で最小の ID>" を付ける。
+
+バケット内では (問題集, type) ごとに最初の問題を代表として残し、新しい問題は
+type が同じで問題集が異なる代表とだけ比べる。比較回数は問題数 × 帯数 × 問題集数
+で頭打ちになる（同じ論点に問題が集中してもバケット内の全組み合わせは作らない）。
+先頭の問題が比べられない相手（同じ問題集・別の type）でも、ほかの組は落とさない。
+
+署名は 50_エクスポート/problems/_minhash.json に shingle の digest と一緒に
+保存し、次回は digest が変わった問題（新しくマージされた問題集など）だけ
+計算し直す。duplicate_group が変わった問題集のシャードだけを書き直す。
+
+使い方:
+  python3 lib/problem_dedup.py            # 差分更新（vault ロックを取る）
+  python3 lib/problem_dedup.py --rebuild  # 署名を作り直す
+  python3 lib/problem_dedup.py --dry-run  # グループを表示するだけ
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import hashlib
+import json
+import random
+import re
+import unicodedata
+from array import array
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+from pathlib import Path
+
+from lib.houjinzei_common import VaultPaths, atomic_json_write, vault_lock
+from lib.problems_master import ProblemsMaster
+
+NUM_PERM = 60
+BANDS = 20
+ROWS = NUM_PERM // BANDS  # 3 行 × 20 帯: Jaccard 0.6 の組を 99% 以上の確率で候補にする
+THRESHOLD = 0.6
+SEED = 20260219
+CACHE_NAME = "_minhash.json"
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_rng = random.Random(SEED)
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+# 「問題 3」「(1)」などの番号・括弧・記号は比較に使わない
+_NOISE_RE = re.compile(r"問題\s*[0-9\-－]+|[\s()（）［］\[\]【】「」『』・、。,.:：]")
+
+
+def _normalize_title(title: str) -> str:
+    return _NOISE_RE.sub("", unicodedata.normalize("NFKC", title or ""))
+
+
+def shingles(problem: Mapping) -> set[str]:
+    """タイトルの文字 2-gram と "#正規化論点" の集合。"""
+    title = _normalize_title(str(problem.get("title", "")))
+    grams = {title[i:i + 2] for i in range(len(title) - 1)} or ({title} if title else set())
+    topics = problem.get("normalized_topics") or problem.get("topics") or []
+    return grams | {f"#{t}" for t in topics if t}
+
+
+def shingle_digest(sh: set[str]) -> str:
+    return hashlib.blake2b("\n".join(sorted(sh)).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def minhash(sh: Iterable[str]) -> array:
+    """NUM_PERM 個の 32bit 最小ハッシュ値。"""
+    xs = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in sh]
+    if not xs:
+        return array("I", [_MAX_HASH] * NUM_PERM)
+    return array("I", [min([(a * x + b) % _PRIME for x in xs]) & _MAX_HASH for a, b in _PERMS])
+
+
+def jaccard(a: set, b: set) -> float:
+    if not a and not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class SignatureCache:
+    """{ID: (shingle digest, 署名)} をファイルに保持する。パラメータが変われば空から作り直す。"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.entries: dict[str, tuple[str, array]] = {}
+        self.computed = 0
+        self.params = {"num_perm": NUM_PERM, "seed": SEED}
+        if path.exists():
+            data = json.loads(path.read_text(encoding="utf-8"))
+            if data.get("params") == self.params:
+                for pid, (digest, packed) in data.get("signatures", {}).items():
+                    self.entries[pid] = (digest, array("I", base64.b64decode(packed)))
+
+    def signature(self, pid: str, sh: set[str]) -> array:
+        digest = shingle_digest(sh)
+        cached = self.entries.get(pid)
+        if cached is not None and cached[0] == digest:
+            return cached[1]
+        sig = minhash(sh)
+        self.entries[pid] = (digest, sig)
+        self.computed += 1
+        return sig
+
+    def save(self, keep: Iterable[str]) -> None:
+        keep = set(keep)
+        signatures = {
+            pid: [digest, base64.b64encode(sig.tobytes()).decode("ascii")]
+            for pid, (digest, sig) in self.entries.items()
+            if pid in keep
+        }
+        atomic_json_write(self.path, {"params": self.params, "signatures": signatures}, indent=None)
+
+
+def find_duplicate_groups(problems: Mapping[str, dict], cache: SignatureCache | None = None) -> dict[str, str]:
+    """{ID: duplicate_group}（2 問以上のグループに属する問題だけ）を返す。"""
+    ids = list(problems)
+    sh = [shingles(problems[pid]) for pid in ids]
+    sigs = [cache.signature(pid, s) if cache else minhash(s) for pid, s in zip(ids, sh)]
+
+    parent = list(range(len(ids)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for band in range(BANDS):
+        lo = band * ROWS
+        # バケット → {(問題集, type): 代表の添字}
+        buckets: dict[tuple, dict[tuple, int]] = {}
+        for i, sig in enumerate(sigs):
+            if not sh[i]:
+                continue
+            reps = buckets.setdefault(tuple(sig[lo:lo + ROWS]), {})
+            q = problems[ids[i]]
+            book, kind = q.get("book"), q.get("type")
+            for (rep_book, rep_kind), rep in reps.items():
+                if rep_book == book or rep_kind != kind:
+                    continue
+                ri, rj = find(rep), find(i)
+                if ri != rj and jaccard(sh[rep], sh[i]) >= THRESHOLD:
+                    parent[rj] = ri
+            reps.setdefault((book, kind), i)
+
+    members: dict[int, list[str]] = {}
+    for i, pid in enumerate(ids):
+        members.setdefault(find(i), []).append(pid)
+    groups: dict[str, str] = {}
+    for pids in members.values():
+        if len(pids) > 1:
+            label = f"dup:{min(pids)}"
+            for pid in pids:
+                groups[pid] = label
+    return groups
+
+
+@dataclass
+class DedupResult:
+    groups: int
+    grouped: int  # グループに属する問題数
+    changed: int  # duplicate_group が変わった問題数
+    computed: int  # 署名を計算し直した問題数
+
+
+def update_duplicate_groups(master: ProblemsMaster, *, rebuild: bool = False) -> DedupResult:
+    """master 全体の duplicate_group を付け直す。書き込むときは呼び出し側が vault ロックを持つ。"""
+    cache = SignatureCache(master.dir / CACHE_NAME)
+    if rebuild:
+        cache.entries.clear()
+    problems = {pid: p for pid, p in master.items() if isinstance(p, dict)}
+    groups = find_duplicate_groups(problems, cache)
+
+    changed = [
+        {**p, "duplicate_group": groups.get(pid)}
+        for pid, p in problems.items()
+        if p.get("duplicate_group") != groups.get(pid)
+    ]
+    if changed:
+        master.merge(changed)
+    if master.sharded and problems:
+        cache.save(problems)
+    return DedupResult(len(set(groups.values())), len(groups), len(changed), cache.computed)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Assign duplicate_group to near-identical problems across books")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute every MinHash signature")
+    parser.add_argument("--dry-run", action="store_true", help="Print groups without writing")
+    args = parser.parse_args(argv)
+
+    vp = VaultPaths()
+    if args.dry_run:
+        master = ProblemsMaster(vp.export)
+        problems = {pid: p for pid, p in master.items() if isinstance(p, dict)}
+        groups = find_duplicate_groups(problems, SignatureCache(master.dir / CACHE_NAME))
+        by_group: dict[str, list[str]] = {}
+        for pid, label in groups.items():
+            by_group.setdefault(label, []).append(pid)
+        for label, pids in sorted(by_group.items()):
+            titles = " / ".join(f"{pid}「{master[pid].get('title', '')}」" for pid in sorted(pids))
+            print(f"{label}: {titles}")
+        print(f"類似グループ {len(by_group)}件（{len(groups)}問）")
+        return 0
+
+    with vault_lock():
+        result = update_duplicate_groups(ProblemsMaster(vp.export), rebuild=args.rebuild)
+    print(
+        f"類似グループ {result.groups}件（{result.grouped}問）: "
+        f"更新 {result.changed}問 / 署名計算 {result.computed}問"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
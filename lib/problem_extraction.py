@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""PDF 問題抽出パイプライン（extract_problems.sh の本体）。
+
+lib/stage_dag.py のステージとして宣言し、状態を
+02_extracted/<BOOK_SAFE>_problems_pipeline.json に記録する。再実行時は入力が
+変わっていないステージをスキップするので、たとえば topic マップを直しただけなら
+Gemini を呼ばずに normalize 以降だけが走る。
+
+  extract_text  pypdf でテキスト抽出（サイズ判定用）    → <BOOK_SAFE>_pdf_text.txt
+  gemini        Gemini で問題リスト抽出（LLM キャッシュ）→ <BOOK_SAFE>_gemini_raw.txt
+  parse         JSON 配列を整形・スキーマ検証           → 50_エクスポート/problems_<BOOK>.json
+  normalize     topics 正規化                           → <BOOK_SAFE>_normalized.json
+  merge_master  スキーマ検証して問題マスタの該当シャードへマージ（この間だけ vault ロックを持つ）
+  dedupe        問題集をまたぐ類似問題に duplicate_group を付与（lib/problem_dedup.py、差分更新）
+  push          komekome_sync.sh push（--dry-run 時は宣言しない）
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+from lib.chunk_runner import ChunkError, run_gemini
+from lib.houjinzei_common import (
+    GEMINI_TIMEOUT_LARGE,
+    GEMINI_TIMEOUT_SMALL,
+    PDF_TEXT_SIZE_THRESHOLD,
+    VaultPaths,
+    atomic_json_write,
+    vault_lock,
+)
+from lib.llm_cache import cache_key, default_cache
+from lib.llm_json import find_json
+from lib.problem_dedup import BANDS, NUM_PERM, THRESHOLD, update_duplicate_groups
+from lib.problem_schema import SCHEMA_PATH, SchemaError, validate_problems
+from lib.problems_master import ProblemsMaster
+from lib.stage_dag import Pipeline, StageError
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+
+TEXT_HEADER = "以下は教材PDFから抽出したテキストです:"
+
+
+def id_prefix_for(book_name: str, problem_type: str) -> str:
+    if problem_type == "理論":
+        return "theory"
+    m = re.search(r"([0-9]+)[-ー−‐]([0-9]+)", book_name)
+    if not m:
+        raise ValueError(f"計算の book_name から巻番号を抽出できませんでした（例: 法人計算問題集4-1）: {book_name}")
+    return f"calc-{m.group(1)}-{m.group(2)}"
+
+
+def build_prompt(book_name: str, problem_type: str, id_prefix: str) -> str:
+    return f"""以下のPDFは法人税法の{problem_type}問題集「{book_name}」です。
+各問題について以下のJSON配列を出力してください:
+[
+  {{
+    "id": "{id_prefix}-NNN",
+    "book": "{book_name}",
+    "number": "問題 N",
+    "title": "問題タイトル",
+    "type": "{problem_type}",
+    "scope": "個別" or "総合",
+    "topics": ["トピック名"],
+    "page": ページ番号,
+    "time_min": 目安時間(分),
+    "rank": "A" or "B" or "C"
+  }}
+]
+IDプレフィックスは理論なら"theory"、計算なら"{id_prefix}"とする。
+問題文がページの一部だけを占める場合は "bbox": [左, 上, 右, 下] にその範囲を
+ページの幅・高さに対する割合（0〜1）で入れる。分からなければ bbox は省略する。
+出力はJSON配列のみ。説明不要。"""
+
+
+def _to_int(v, default=0):
+    try:
+        return int(str(v).strip())
+    except Exception:
+        return default
+
+
+def _to_bbox(v) -> list[float] | None:
+    """[左, 上, 右, 下]（0〜1 の割合）として正しければ丸めて返す。おかしければ None（切り抜かない）。"""
+    if not isinstance(v, (list, tuple)) or len(v) != 4:
+        return None
+    try:
+        x0, y0, x1, y1 = (float(x) for x in v)
+    except (TypeError, ValueError):
+        return None
+    if not (0 <= x0 < x1 <= 1 and 0 <= y0 < y1 <= 1):
+        return None
+    return [round(x0, 4), round(y0, 4), round(x1, 4), round(y1, 4)]
+
+
+def parse_problems(raw: str, book_name: str, problem_type: str, id_prefix: str) -> list[dict]:
+    """Gemini の生出力から問題リストを取り出し、ID・scope・rank などを整える。"""
+    try:
+        arr = find_json(raw, list)
+    except ValueError:
+        raise ValueError("JSON配列を抽出できませんでした") from None
+    if not arr:
+        raise ValueError("問題配列が空です")
+
+    problems = []
+    seen = set()
+    for idx, item in enumerate(arr, start=1):
+        if not isinstance(item, dict):
+            raise ValueError(f"{idx}件目がオブジェクトではありません")
+
+        candidate_id = str(item.get("id", "")).strip()
+        m = re.match(rf"^{re.escape(id_prefix)}-(\d+)$", candidate_id)
+        seq = int(m.group(1)) if m else idx
+        problem_id = f"{id_prefix}-{seq:03d}"
+        if problem_id in seen:
+            raise ValueError(f"抽出結果内でID重複: {problem_id}")
+        seen.add(problem_id)
+
+        title = str(item.get("title", "")).strip()
+        number = str(item.get("number", f"問題 {idx}")).strip()
+
+        scope = str(item.get("scope", "")).strip()
+        if scope not in ("個別", "総合"):
+            scope = "総合" if "総合" in f"{number} {title}" else "個別"
+
+        topics = item.get("topics")
+        if not isinstance(topics, list):
+            topics = []
+        topics = [str(t).strip() for t in topics if str(t).strip()]
+
+        rank = str(item.get("rank", "")).strip().upper()
+        if rank not in ("A", "B", "C"):
+            rank = ""
+
+        problem = {
+            "id": problem_id,
+            "book": book_name,
+            "number": number or f"問題 {idx}",
+            "title": title,
+            "type": problem_type,
+            "scope": scope,
+            "topics": topics,
+            "page": max(0, _to_int(item.get("page", 0), 0)),
+            "time_min": max(0, _to_int(item.get("time_min", 0), 0)),
+            "rank": rank,
+        }
+        bbox = _to_bbox(item.get("bbox"))
+        if bbox:
+            problem["bbox"] = bbox
+        problems.append(problem)
+    _raise_schema_errors(validate_problems(problems))
+    return problems
+
+
+def _raise_schema_errors(errors: list[SchemaError]) -> None:
+    if errors:
+        raise ValueError(f"スキーマ違反 {len(errors)}件:\n" + "\n".join(f"  {e}" for e in errors))
+
+
+def normalize_problems(problems: list[dict]) -> None:
+    """normalized_topics / parent_category / duplicate_group をその場で付与する。"""
+    from lib.topic_normalize import (
+        FUZZY_MIN_CONFIDENCE,
+        get_parent_category,
+        is_known_topic,
+        normalize_topic,
+        suggest_topic,
+    )
+
+    # マップ未登録の topic は fuzzy 提案を表示（信頼度が閾値以上なら採用）
+    unknown = sorted({t for p in problems for t in (p.get("topics") or []) if not is_known_topic(t)})
+    for t in unknown:
+        s = suggest_topic(t)
+        if s is None:
+            print(f"  未登録topic: {t}（候補なし）")
+        elif s.confidence >= FUZZY_MIN_CONFIDENCE:
+            print(f"  fuzzy採用: {t} → {s.matched} → {s.normalized} (信頼度 {s.confidence:.2f})")
+        else:
+            print(f"  未登録topic: {t}（候補: {s.matched} → {s.normalized}, 信頼度 {s.confidence:.2f}）")
+
+    for p in problems:
+        normalized_topics = [normalize_topic(t, fuzzy=True) for t in p.get("topics") or []]
+        p["normalized_topics"] = normalized_topics
+        p["parent_category"] = get_parent_category(normalized_topics[0]) if normalized_topics else "その他"
+        p["duplicate_group"] = None
+
+
+def merge_into_master(export_dir: Path, new_problems: list[dict]) -> int:
+    """問題マスタ（lib/problems_master.py）に追加して合計件数を返す。
+
+    同じ ID が別の問題集に既にあればエラー。同じ問題集のエントリは置き換える
+    （正規化だけをやり直した再実行のため）。書き直すのはその問題集のシャードだけ。
+    """
+    return ProblemsMaster(export_dir).merge(new_problems)
+
+
+@dataclass
+class ProblemJob:
+    vp: VaultPaths
+    pdf_path: Path
+    book_name: str
+    problem_type: str
+
+    @property
+    def book_safe(self) -> str:
+        return self.book_name.replace(" ", "_").replace("/", "_")
+
+    @property
+    def id_prefix(self) -> str:
+        return id_prefix_for(self.book_name, self.problem_type)
+
+    @property
+    def text_file(self) -> Path:
+        return self.vp.extracted / f"{self.book_safe}_pdf_text.txt"
+
+    @property
+    def raw_file(self) -> Path:
+        return self.vp.extracted / f"{self.book_safe}_gemini_raw.txt"
+
+    @property
+    def extracted_json(self) -> Path:
+        return self.vp.export / f"problems_{self.book_name}.json"
+
+    @property
+    def normalized_json(self) -> Path:
+        return self.vp.extracted / f"{self.book_safe}_normalized.json"
+
+    @property
+    def state_file(self) -> Path:
+        return self.vp.extracted / f"{self.book_safe}_problems_pipeline.json"
+
+
+def _llm_request(job: ProblemJob, prompt: str) -> tuple[str, str, int]:
+    """(キャッシュキー, Gemini に渡すプロンプト, timeout) を返す。小さい PDF は PDF を直接渡す。"""
+    if job.text_file.stat().st_size < PDF_TEXT_SIZE_THRESHOLD:
+        key = cache_key("gemini", prompt, job.pdf_path)
+        relpath = os.path.relpath(job.pdf_path, job.vp.root)
+        return key, f"{prompt}\n\n@{relpath}", GEMINI_TIMEOUT_SMALL
+    template = f"{prompt}\n\n{TEXT_HEADER}"
+    key = cache_key("gemini", template, job.text_file)
+    relpath = os.path.relpath(job.text_file, job.vp.root)
+    return key, f"{template}\n\n@{relpath}", GEMINI_TIMEOUT_LARGE
+
+
+def build_pipeline(job: ProblemJob, *, push: bool = True) -> Pipeline:
+    pipe = Pipeline("extract_problems", job.state_file)
+    gemini_bin = os.environ.get("GEMINI_BIN", "gemini")
+    prompt = build_prompt(job.book_name, job.problem_type, job.id_prefix)
+    cache = default_cache()
+
+    @pipe.stage(inputs=[job.pdf_path, str(SCRIPTS_DIR / "lib" / "pdf_text.py")], outputs=[job.text_file])
+    def extract_text():
+        print("[1/5] PDFテキスト抽出量を計測中...")
+        cmd = [
+            sys.executable, str(SCRIPTS_DIR / "lib" / "pdf_text.py"),
+            "--input", str(job.pdf_path),
+            "--output", str(job.text_file),
+            "--backend", "pypdf",
+        ]
+        if subprocess.run(cmd).returncode != 0:
+            raise StageError("pypdf でテキスト抽出に失敗しました")
+        print(f"  抽出テキストサイズ: {job.text_file.stat().st_size} bytes")
+
+    @pipe.stage(
+        inputs=[job.pdf_path, job.text_file],
+        outputs=[job.raw_file],
+        after=["extract_text"],
+        params={"prompt": prompt, "threshold": PDF_TEXT_SIZE_THRESHOLD},
+    )
+    def gemini():
+        print("[2/5] Gemini で問題リスト抽出中...")
+        key, request, timeout = _llm_request(job, prompt)
+        raw = cache.get(key) if cache else None
+        if raw is not None:
+            print("  LLMキャッシュ命中: Gemini 呼び出しを省略")
+        else:
+            mode = "PDF直接" if timeout == GEMINI_TIMEOUT_SMALL else "抽出テキスト渡し"
+            print(f"  方式: {mode} (@構文, timeout={timeout}s)")
+            try:
+                raw = run_gemini(gemini_bin, request, job.vp.root, timeout)
+            except ChunkError as e:
+                raise StageError(f"Gemini 実行に失敗しました: {e}") from e
+        job.raw_file.write_text(raw, encoding="utf-8")
+
+    @pipe.stage(
+        inputs=[job.raw_file, SCHEMA_PATH],
+        outputs=[job.extracted_json],
+        after=["gemini"],
+        params={"book": job.book_name, "type": job.problem_type, "id_prefix": job.id_prefix},
+    )
+    def parse():
+        print("[3/5] Gemini出力をJSON整形中...")
+        raw = job.raw_file.read_text(encoding="utf-8")
+        try:
+            problems = parse_problems(raw, job.book_name, job.problem_type, job.id_prefix)
+        except ValueError as e:
+            raise StageError(f"Gemini出力の整形に失敗しました: {e}（生出力: {job.raw_file}）") from e
+        atomic_json_write(job.extracted_json, {"book": job.book_name, "problems": problems})
+        print(f"extracted: {len(problems)}")
+        # 整形できた出力だけをキャッシュする（壊れた応答を再利用しない）
+        if cache:
+            key, _, _ = _llm_request(job, prompt)
+            cache.put(key, raw)
+
+    @pipe.stage(
+        # マップの実体は lib/data/topic_normalize.json（table_cache 経由で読む）
+        inputs=[
+            job.extracted_json,
+            str(SCRIPTS_DIR / "lib" / "topic_normalize.py"),
+            str(SCRIPTS_DIR / "lib" / "data" / "topic_normalize.json"),
+            str(SCRIPTS_DIR / "lib" / "table_cache.py"),
+        ],
+        outputs=[job.normalized_json],
+        after=["parse"],
+    )
+    def normalize():
+        print("[4/5] topics 正規化中...")
+        src = json.loads(job.extracted_json.read_text(encoding="utf-8"))
+        problems = src.get("problems", [])
+        if not isinstance(problems, list):
+            raise StageError("problems が配列ではありません")
+        normalize_problems(problems)
+        atomic_json_write(job.normalized_json, src)
+        print(f"normalized: {len(problems)}")
+
+    @pipe.stage(inputs=[job.normalized_json, SCHEMA_PATH], after=["normalize"])
+    def merge_master():
+        print("[5/5] 問題マスタへマージ中...")
+        new_problems = json.loads(job.normalized_json.read_text(encoding="utf-8")).get("problems")
+        if not isinstance(new_problems, list):
+            raise StageError("新規データの problems が配列ではありません")
+        try:
+            _raise_schema_errors(validate_problems(new_problems))
+            with vault_lock():
+                total = merge_into_master(job.vp.export, new_problems)
+        except ValueError as e:
+            raise StageError(f"問題マスタへのマージに失敗しました: {e}") from e
+        print(f"merged: +{len(new_problems)} -> total={total}")
+
+    @pipe.stage(after=["merge_master"], params={"num_perm": NUM_PERM, "bands": BANDS, "threshold": THRESHOLD})
+    def dedupe():
+        print("類似問題グループを更新中...")
+        with vault_lock():
+            result = update_duplicate_groups(ProblemsMaster(job.vp.export))
+        print(f"duplicate groups: {result.groups} ({result.grouped}問, 更新 {result.changed}問)")
+
+    if push:
+
+        @pipe.stage(after=["dedupe"], cache=False)
+        def push_master():
+            print("push 実行中...")
+            if subprocess.run(["bash", str(SCRIPTS_DIR / "komekome_sync.sh"), "push"]).returncode != 0:
+                raise StageError("komekome_sync.sh push に失敗しました")
+
+    return pipe
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Extract a problem list from a workbook PDF")
+    parser.add_argument("pdf")
+    parser.add_argument("book_name")
+    parser.add_argument("type", choices=("計算", "理論"))
+    parser.add_argument("--dry-run", action="store_true", help="Skip komekome_sync.sh push")
+    parser.add_argument("--force", action="store_true", help="Discard recorded stages and run everything")
+    args = parser.parse_args(argv)
+    sys.stdout.reconfigure(line_buffering=True)  # 子プロセスの出力と順序を揃える
+
+    vp = VaultPaths()
+    job = ProblemJob(vp, Path(args.pdf).resolve(), args.book_name, args.type)
+    try:
+        job.id_prefix
+    except ValueError as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        return 1
+    vp.extracted.mkdir(parents=True, exist_ok=True)
+    vp.export.mkdir(parents=True, exist_ok=True)
+
+    print("==========================================")
+    print("PDF問題抽出パイプライン")
+    print("==========================================")
+    print(f"PDF:      {job.pdf_path}")
+    print(f"BOOK:     {job.book_name}")
+    print(f"TYPE:     {job.problem_type}")
+    if args.dry_run:
+        print("MODE:     dry-run")
+    print()
+
+    pipe = build_pipeline(job, push=not args.dry_run)
+    if args.force:
+        pipe.invalidate(*pipe.stages)
+    try:
+        pipe.run()
+    except StageError as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        print(f"  再実行すると完了済みのステージは再利用されます（状態: {job.state_file}）", file=sys.stderr)
+        return 1
+
+    if args.dry_run:
+        print("push は --dry-run によりスキップしました")
+    print()
+    print("完了")
+    print(f"  抽出JSON:   {job.extracted_json}")
+    print(f"  正規化JSON: {job.normalized_json}")
+    print(f"  マスタ:      {job.vp.export / 'problems'}/")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
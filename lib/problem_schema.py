@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""問題データのスキーマ検証（extract_problems_schema.json をコンパイルして使う）。
+
+extract_problems_schema.json の problems.items に、problems_master.json の
+エントリが持つ項目（id / book と normalize で付く項目）を足したものを
+「問題レコード」のスキーマとし、一度だけ検査関数（クロージャ）の木に
+コンパイルする。配列全体を 1 パスで検査し、エラーは打ち切らずに
+件目（master なら ID）とフィールドの位置つきですべて返す。
+
+対応するキーワード: type / enum / pattern / minimum / maximum / minLength /
+minItems / maxItems / items / properties / required /
+additionalProperties（false のみ意味を持つ）。
+配列をまたぐ検査として ID の重複も同じパスで見る。
+
+    validate_problems(problems)  → list[SchemaError]（空なら妥当）
+    validate_master(master)      → list[SchemaError]
+
+使い方:
+  python3 lib/problem_schema.py 50_エクスポート/problems_master.json
+  python3 lib/problem_schema.py 50_エクスポート/problems_法人計算問題集4-1.json
+エラーがあればすべて標準エラーに出し、終了コード 1 を返す。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Iterable
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+SCHEMA_PATH = SCRIPTS_DIR / "extract_problems_schema.json"
+
+# problem_extraction.id_prefix_for が作る ID（theory-001, calc-4-1-001）
+ID_PATTERN = r"^(?:theory|calc-[0-9]+-[0-9]+)-[0-9]{3,}$"
+
+# Gemini の出力項目に加えて master のエントリが持つ項目
+RECORD_PROPERTIES = {
+    "id": {"type": "string", "pattern": ID_PATTERN},
+    "book": {"type": "string", "minLength": 1},
+    "normalized_topics": {"type": "array", "items": {"type": "string"}},
+    "parent_category": {"type": "string"},
+    "duplicate_group": {"type": ["string", "null"]},
+}
+RECORD_REQUIRED = ("id", "book")
+
+_TYPE_TESTS: dict[str, Callable[[object], bool]] = {
+    "string": lambda v: isinstance(v, str),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+    "array": lambda v: isinstance(v, list),
+    "object": lambda v: isinstance(v, dict),
+    "null": lambda v: v is None,
+}
+
+
+@dataclass(frozen=True)
+class SchemaError:
+    index: int | str  # 配列なら 0 始まりの位置、master なら問題 ID
+    field: str  # "rank" / "topics[2]"（レコード自体なら ""）
+    message: str
+
+    def __str__(self) -> str:
+        where = f"[{self.index}]" if isinstance(self.index, int) else f"[{json.dumps(self.index, ensure_ascii=False)}]"
+        if self.field:
+            where += f".{self.field}"
+        return f"problems{where}: {self.message}"
+
+
+Check = Callable[[object, "int | str", str, list], None]
+
+
+def _child(path: str, key: str) -> str:
+    return f"{path}.{key}" if path else key
+
+
+def _short(value: object) -> str:
+    s = json.dumps(value, ensure_ascii=False)
+    return s if len(s) <= 40 else s[:37] + "..."
+
+
+def compile_schema(schema: dict) -> Check:
+    """スキーマを check(value, index, path, errors) に変換する。"""
+    subs: list[Check] = []
+
+    if "enum" in schema:
+        allowed = list(schema["enum"])
+        label = " / ".join(json.dumps(a, ensure_ascii=False) for a in allowed)
+
+        def check_enum(value, index, path, errors):
+            if value not in allowed:
+                errors.append(SchemaError(index, path, f"{_short(value)} は {label} のいずれでもありません"))
+
+        subs.append(check_enum)
+
+    if "pattern" in schema:
+        pattern = re.compile(schema["pattern"])
+
+        def check_pattern(value, index, path, errors):
+            if isinstance(value, str) and pattern.search(value) is None:
+                errors.append(SchemaError(index, path, f"{_short(value)} が形式 {pattern.pattern} に一致しません"))
+
+        subs.append(check_pattern)
+
+    if "minimum" in schema:
+        minimum = schema["minimum"]
+
+        def check_minimum(value, index, path, errors):
+            if isinstance(value, (int, float)) and value < minimum:
+                errors.append(SchemaError(index, path, f"{value} は {minimum} 未満です"))
+
+        subs.append(check_minimum)
+
+    if "maximum" in schema:
+        maximum = schema["maximum"]
+
+        def check_maximum(value, index, path, errors):
+            if isinstance(value, (int, float)) and value > maximum:
+                errors.append(SchemaError(index, path, f"{value} は {maximum} を超えています"))
+
+        subs.append(check_maximum)
+
+    if "minLength" in schema:
+        min_length = schema["minLength"]
+
+        def check_min_length(value, index, path, errors):
+            if isinstance(value, str) and len(value) < min_length:
+                errors.append(SchemaError(index, path, f"{min_length} 文字以上が必要です"))
+
+        subs.append(check_min_length)
+
+    if "minItems" in schema or "maxItems" in schema:
+        min_items = schema.get("minItems", 0)
+        max_items = schema.get("maxItems")
+
+        def check_item_count(value, index, path, errors):
+            if not isinstance(value, list):
+                return
+            if len(value) < min_items:
+                errors.append(SchemaError(index, path, f"要素が {min_items} 個以上必要です（{len(value)} 個）"))
+            elif max_items is not None and len(value) > max_items:
+                errors.append(SchemaError(index, path, f"要素は {max_items} 個までです（{len(value)} 個）"))
+
+        subs.append(check_item_count)
+
+    if "items" in schema:
+        check_item = compile_schema(schema["items"])
+
+        def check_items(value, index, path, errors):
+            if isinstance(value, list):
+                for j, v in enumerate(value):
+                    check_item(v, index, f"{path}[{j}]", errors)
+
+        subs.append(check_items)
+
+    if "properties" in schema or "required" in schema:
+        props = {k: compile_schema(v) for k, v in schema.get("properties", {}).items()}
+        required = tuple(schema.get("required", ()))
+        closed = schema.get("additionalProperties", True) is False
+
+        def check_object(value, index, path, errors):
+            if not isinstance(value, dict):
+                return
+            for key in required:
+                if key not in value:
+                    errors.append(SchemaError(index, _child(path, key), "必須キーがありません"))
+            for key, v in value.items():
+                check = props.get(key)
+                if check is not None:
+                    check(v, index, _child(path, key), errors)
+                elif closed:
+                    errors.append(SchemaError(index, _child(path, key), "スキーマにないキーです"))
+
+        subs.append(check_object)
+
+    types = schema.get("type")
+    if types is None:
+        type_ok = None
+    else:
+        names = [types] if isinstance(types, str) else list(types)
+        tests = [_TYPE_TESTS[t] for t in names]
+        type_ok = tests[0] if len(tests) == 1 else (lambda v: any(t(v) for t in tests))
+        type_label = " / ".join(names)
+
+    def check(value, index, path, errors):
+        if type_ok is not None and not type_ok(value):
+            errors.append(SchemaError(index, path, f"型が {type_label} ではありません: {_short(value)}"))
+            return
+        for sub in subs:
+            sub(value, index, path, errors)
+
+    return check
+
+
+def record_schema(schema_path: Path = SCHEMA_PATH) -> dict:
+    """extract_problems_schema.json の items に RECORD_PROPERTIES を足したスキーマ。"""
+    schema = json.loads(schema_path.read_text(encoding="utf-8"))
+    items = schema["properties"]["problems"]["items"]
+    record = dict(items)
+    record["properties"] = {**items.get("properties", {}), **RECORD_PROPERTIES}
+    record["required"] = list(items.get("required", ())) + [k for k in RECORD_REQUIRED if k not in items.get("required", ())]
+    return record
+
+
+class ProblemValidator:
+    """コンパイル済みの問題レコード検査。"""
+
+    def __init__(self, schema: dict):
+        self._check = compile_schema(schema)
+
+    def validate(self, items: Iterable[tuple[int | str, object]]) -> list[SchemaError]:
+        """(index, レコード) 列を 1 パスで検査する。ID の重複もここで見る。"""
+        check = self._check
+        errors: list[SchemaError] = []
+        seen: dict[str, int | str] = {}
+        for index, item in items:
+            check(item, index, "", errors)
+            if isinstance(item, dict):
+                pid = item.get("id")
+                if isinstance(pid, str) and pid:
+                    first = seen.setdefault(pid, index)
+                    if first != index:
+                        errors.append(SchemaError(index, "id", f"ID重複: {pid}（{first} と同じ）"))
+        return errors
+
+
+@lru_cache(maxsize=None)
+def problem_validator() -> ProblemValidator:
+    return ProblemValidator(record_schema())
+
+
+def validate_problems(problems: list) -> list[SchemaError]:
+    """問題レコードの配列を検査する（index は 0 始まり）。"""
+    if not isinstance(problems, list):
+        return [SchemaError(0, "", "problems が配列ではありません")]
+    return problem_validator().validate(enumerate(problems))
+
+
+def validate_master(master: object) -> list[SchemaError]:
+    """problems_master.json（{"problems": {ID: レコード}}）を検査する。"""
+    problems = master.get("problems") if isinstance(master, dict) else None
+    if not isinstance(problems, dict):
+        return [SchemaError("", "", "master の problems がオブジェクトではありません")]
+    errors = problem_validator().validate(problems.items())
+    for key, item in problems.items():
+        if isinstance(item, dict) and item.get("id") != key:
+            errors.append(SchemaError(key, "id", f"キーと id が一致しません: {_short(item.get('id'))}"))
+    return errors
+
+
+def validate_file(path: Path) -> list[SchemaError]:
+    """master（problems がオブジェクト）・抽出結果（problems が配列）・素の配列のどれでも検査する。"""
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if isinstance(data, dict) and isinstance(data.get("problems"), dict):
+        return validate_master(data)
+    if isinstance(data, dict):
+        return validate_problems(data.get("problems"))
+    return validate_problems(data)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Validate problem records against extract_problems_schema.json")
+    parser.add_argument("files", nargs="+", type=Path)
+    args = parser.parse_args(argv)
+
+    failed = False
+    for path in args.files:
+        try:
+            errors = validate_file(path)
+        except (OSError, ValueError) as e:
+            print(f"{path}: 読み込めません: {e}", file=sys.stderr)
+            failed = True
+            continue
+        for err in errors:
+            print(f"{path.name}: {err}", file=sys.stderr)
+        if errors:
+            print(f"{path.name}: スキーマ違反 {len(errors)}件", file=sys.stderr)
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
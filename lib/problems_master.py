@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""問題マスタ（問題集ごとのシャード + マニフェスト）。
+
+problems_master.json 1 ファイルだと、1 冊マージするたびに全体を書き直し、
+1 問を引くだけの利用側も全体を読むことになる。ここでは問題集（book）ごとに
+シャードへ分け、小さなマニフェストで件数・ハッシュ・ID プレフィックスを持つ。
+
+  50_エクスポート/problems/_manifest.json
+      {"version": 2, "generated": ..., "total": N,
+       "shards": {book: {"file", "sha256", "count", "id_prefixes"}}}
+  50_エクスポート/problems/<BOOK_SAFE>.json
+      {"book": book, "problems": {ID: レコード}}
+
+ProblemsMaster は {ID: レコード} の Mapping として振る舞い、シャードは必要に
+なった時点で読む。get(ID) は ID プレフィックス（calc-4-1 / theory）が一致する
+シャードだけ、book(名前) はその問題集だけを読む。len() と count() は
+マニフェストだけで答える。
+
+マニフェストがなく従来の problems_master.json だけがある vault では、
+それを読み込んだ読み取り専用のビューになる（最初の merge でシャードへ移行し、
+古くなる従来ファイルは消す）。Workers への push 用には export_legacy() で
+従来形式を書き出す。
+書き込み（merge / migrate）は呼び出し側が vault ロックを持って行う。
+
+使い方:
+  python3 lib/problems_master.py status            # 問題集ごとの件数とハッシュ検証
+  python3 lib/problems_master.py migrate           # 従来ファイルをシャードへ分割
+  python3 lib/problems_master.py export [--force]  # 従来形式 problems_master.json を書き出す
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+from collections.abc import Iterable, Iterator, Mapping
+from datetime import datetime
+from pathlib import Path
+
+from lib.houjinzei_common import VaultPaths, atomic_json_write
+
+SHARD_DIR_NAME = "problems"
+MANIFEST_NAME = "_manifest.json"
+EXPORTED_NAME = "_exported.json"  # 書き出し先ごとの {パス: [シャード digest, size, mtime_ns]}
+LEGACY_NAME = "problems_master.json"
+MANIFEST_VERSION = 2
+
+
+def id_prefix(pid: str) -> str:
+    """"calc-4-1-007" → "calc-4-1"、"theory-012" → "theory"。"""
+    return pid.rsplit("-", 1)[0]
+
+
+def shard_filename(book: str) -> str:
+    return book.replace(" ", "_").replace("/", "_") + ".json"
+
+
+def _now() -> str:
+    return datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+
+
+def _atomic_write_bytes(path: Path, data: bytes) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp", prefix=".pm_")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class ProblemsMaster(Mapping):
+    """シャード化した問題マスタの {ID: レコード} ビュー（遅延読み込み）。"""
+
+    def __init__(self, export_dir: Path | str, *, legacy_path: Path | str | None = None):
+        export_dir = Path(export_dir)
+        self.dir = export_dir / SHARD_DIR_NAME
+        self.manifest_path = self.dir / MANIFEST_NAME
+        self.legacy_path = Path(legacy_path) if legacy_path else export_dir / LEGACY_NAME
+        self._shards: dict[str, dict[str, dict]] = {}
+        self._legacy = False
+        self.found = True
+        if legacy_path is None and self.manifest_path.exists():
+            self.manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        else:
+            self.manifest = {"version": MANIFEST_VERSION, "generated": "", "total": 0, "shards": {}}
+            if self.legacy_path.exists():
+                self._load_legacy()
+            else:
+                self.found = False  # まだ 1 冊もマージされていない
+        self._index_prefixes()
+
+    @classmethod
+    def open(cls, path: Path | str | None = None) -> ProblemsMaster:
+        """エクスポートディレクトリ（既定は vault の 50_エクスポート）か従来形式のファイルを開く。"""
+        if path is None:
+            return cls(VaultPaths().export)
+        path = Path(path)
+        if path.suffix == ".json":
+            return cls(path.parent, legacy_path=path)
+        return cls(path)
+
+    # ── 読み込み ──
+
+    @property
+    def sharded(self) -> bool:
+        return not self._legacy
+
+    def _load_legacy(self) -> None:
+        data = json.loads(self.legacy_path.read_text(encoding="utf-8"))
+        problems = data.get("problems") if isinstance(data, dict) else None
+        if not isinstance(problems, dict):
+            raise ValueError(f"{self.legacy_path.name} の problems がオブジェクトではありません")
+        for pid, rec in problems.items():
+            book = rec.get("book", "") if isinstance(rec, dict) else ""
+            self._shards.setdefault(book, {})[pid] = rec
+        self.manifest["shards"] = {book: self._entry(book, recs, None) for book, recs in self._shards.items()}
+        self.manifest["total"] = len(problems)
+        self.manifest["generated"] = data.get("generated", "")
+        self._legacy = True
+
+    def _index_prefixes(self) -> None:
+        self._by_prefix: dict[str, list[str]] = {}
+        for book, entry in self.manifest["shards"].items():
+            for prefix in entry.get("id_prefixes", ()):
+                self._by_prefix.setdefault(prefix, []).append(book)
+
+    @staticmethod
+    def _entry(book: str, records: dict, sha256: str | None) -> dict:
+        return {
+            "file": shard_filename(book),
+            "sha256": sha256,
+            "count": len(records),
+            "id_prefixes": sorted({id_prefix(pid) for pid in records}),
+        }
+
+    def books(self) -> list[str]:
+        return list(self.manifest["shards"])
+
+    def count(self, book: str | None = None) -> int:
+        if book is None:
+            return self.manifest["total"]
+        entry = self.manifest["shards"].get(book)
+        return entry["count"] if entry else 0
+
+    def book(self, name: str) -> dict[str, dict]:
+        """問題集 1 冊分の {ID: レコード}（未登録なら空）。"""
+        records = self._shards.get(name)
+        if records is not None:
+            return records
+        entry = self.manifest["shards"].get(name)
+        if entry is None:
+            return {}
+        data = json.loads((self.dir / entry["file"]).read_text(encoding="utf-8"))
+        records = data.get("problems", {})
+        self._shards[name] = records
+        return records
+
+    def __getitem__(self, pid: str) -> dict:
+        if isinstance(pid, str):
+            for book in self._by_prefix.get(id_prefix(pid), ()):
+                rec = self.book(book).get(pid)
+                if rec is not None:
+                    return rec
+        raise KeyError(pid)
+
+    def __iter__(self) -> Iterator[str]:
+        for book in self.books():
+            yield from self.book(book)
+
+    def __len__(self) -> int:
+        return self.manifest["total"]
+
+    def items(self):
+        return ((pid, rec) for book in self.books() for pid, rec in self.book(book).items())
+
+    def values(self):
+        return (rec for book in self.books() for rec in self.book(book).values())
+
+    def to_dict(self) -> dict[str, dict]:
+        """全問題を 1 つの dict にまとめる（従来の master["problems"] と同じ形）。"""
+        return dict(self.items())
+
+    def digest(self) -> str:
+        """全シャードのハッシュから作る master 全体の digest（シャード化前は空文字）。"""
+        if self._legacy:
+            return ""
+        h = hashlib.sha256()
+        for book in sorted(self.manifest["shards"]):
+            h.update(f"{book}\0{self.manifest['shards'][book]['sha256']}\n".encode("utf-8"))
+        return h.hexdigest()
+
+    def verify(self) -> list[str]:
+        """マニフェストとハッシュが一致しない（または欠けている）シャードの問題集名を返す。"""
+        bad = []
+        for book, entry in self.manifest["shards"].items():
+            path = self.dir / entry["file"]
+            if not path.exists() or hashlib.sha256(path.read_bytes()).hexdigest() != entry["sha256"]:
+                bad.append(book)
+        return bad
+
+    # ── 書き込み（vault ロック下で呼ぶ） ──
+
+    def migrate(self) -> bool:
+        """従来ファイルの内容をシャードへ書き出し、従来ファイルを消す。移行したら True。
+
+        残しておくと、以降の merge が反映されない古い内容が push の元になり得る。
+        必要になれば export_legacy() がシャードから書き出し直す。
+        """
+        if not self._legacy:
+            return False
+        self.dir.mkdir(parents=True, exist_ok=True)
+        for book, records in self._shards.items():
+            self._write_shard(book, records)
+        self._legacy = False
+        self._save_manifest()
+        if self.legacy_path == self.dir.parent / LEGACY_NAME:  # open() で明示したファイルは消さない
+            self.legacy_path.unlink(missing_ok=True)
+        return True
+
+    def merge(self, problems: Iterable[dict]) -> int:
+        """問題を ID で追加・置き換えし、合計件数を返す。書き直すのは該当する問題集のシャードだけ。
+
+        同じ ID が別の問題集に既にあれば ValueError（何も書き換えない）。
+        """
+        by_book: dict[str, list[dict]] = {}
+        for p in problems:
+            pid = p.get("id")
+            if not pid:
+                raise ValueError("id が空の問題があります")
+            by_book.setdefault(p.get("book", ""), []).append(p)
+        for book, items in by_book.items():
+            for p in items:
+                for other in self._by_prefix.get(id_prefix(p["id"]), ()):
+                    if other != book and p["id"] in self.book(other):
+                        raise ValueError(f"ID重複: {p['id']}")
+
+        self.migrate()
+        self.dir.mkdir(parents=True, exist_ok=True)
+        for book, items in by_book.items():
+            records = dict(self.book(book))
+            for p in items:
+                records[p["id"]] = p
+            self._write_shard(book, records)
+        self._save_manifest()
+        return len(self)
+
+    def _write_shard(self, book: str, records: dict[str, dict]) -> None:
+        body = json.dumps({"book": book, "problems": records}, ensure_ascii=False, indent=2) + "\n"
+        data = body.encode("utf-8")
+        entry = self._entry(book, records, hashlib.sha256(data).hexdigest())
+        other = next((b for b, e in self.manifest["shards"].items() if e["file"] == entry["file"] and b != book), None)
+        if other is not None:
+            raise ValueError(f"シャードのファイル名が衝突します: {book} / {other}")
+        _atomic_write_bytes(self.dir / entry["file"], data)
+        self._shards[book] = records
+        self.manifest["shards"][book] = entry
+
+    def _save_manifest(self) -> None:
+        self.manifest["version"] = MANIFEST_VERSION
+        self.manifest["total"] = sum(e["count"] for e in self.manifest["shards"].values())
+        self.manifest["generated"] = _now()
+        atomic_json_write(self.manifest_path, self.manifest)
+        self._index_prefixes()
+
+    def export_legacy(self, path: Path | str | None = None, *, force: bool = False) -> bool:
+        """従来形式の problems_master.json を書き出す。前回から変わっていなければ書かずに False。
+
+        書き出し先ごとに、書いた時のシャード digest とファイルの size / mtime を記録し、
+        どちらかが変わっていれば（別の人がファイルを書き換えた場合も）書き直す。
+        """
+        path = Path(path) if path else self.legacy_path
+        if self._legacy:
+            return False  # 従来ファイルそのものが正本
+        digest = self.digest()
+        marker = self.dir / EXPORTED_NAME
+        try:
+            exported = json.loads(marker.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            exported = {}
+        key = str(path.resolve())
+        if not force and path.exists():
+            st = path.stat()
+            if exported.get(key) == [digest, st.st_size, st.st_mtime_ns]:
+                return False
+        atomic_json_write(
+            path,
+            {
+                "version": 1,
+                "generated": self.manifest.get("generated", ""),
+                "total": len(self),
+                "shards_digest": digest,
+                "problems": self.to_dict(),
+            },
+        )
+        st = path.stat()
+        exported[key] = [digest, st.st_size, st.st_mtime_ns]
+        atomic_json_write(marker, exported)
+        return True
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Manage the per-book problems master shards")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="List books and verify shard hashes")
+    sub.add_parser("migrate", help="Split the legacy problems_master.json into shards")
+    p_export = sub.add_parser("export", help="Write the legacy problems_master.json")
+    p_export.add_argument("--output", type=Path)
+    p_export.add_argument("--force", action="store_true", help="Write even if nothing changed")
+    args = parser.parse_args(argv)
+
+    master = ProblemsMaster(VaultPaths().export)
+    if args.command == "status":
+        if not master.sharded:
+            print(f"未移行: {master.legacy_path}（{len(master)}問）")
+            return 0
+        bad = set(master.verify())
+        for book in master.books():
+            print(f"{'NG' if book in bad else 'ok'} {master.count(book):5d} {book}")
+        print(f"合計 {len(master)}問 / {len(master.books())}冊 digest={master.digest()[:12]}")
+        return 1 if bad else 0
+
+    if args.command == "migrate":
+        from lib.houjinzei_common import vault_lock
+
+        with vault_lock():
+            master = ProblemsMaster(VaultPaths().export)
+            if master.migrate():
+                print(f"移行完了: {len(master)}問 → {len(master.books())}シャード")
+            else:
+                print("移行済み（または従来ファイルなし）")
+        return 0
+
+    if master.export_legacy(args.output, force=args.force):
+        print(f"書き出し: {args.output or master.legacy_path}（{len(master)}問）")
+    else:
+        print("従来形式ファイルは最新です")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
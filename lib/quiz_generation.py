@@ -186,3 +186,25 @@ def filter_scope_candidates(
     """Filter records to only those matching scope_categories."""
     scope_set = set(scope_categories)
     return [r for r in records if r.get("category", "") in scope_set]
+
+
+def drop_duplicate_problems(
+    problem_ids: list[str],
+    problems_db,
+    seen_groups: set[str],
+) -> list[str]:
+    """Drop problems whose duplicate_group was already served today.
+
+    seen_groups is updated in place, so call this for each topic in output
+    order with one shared set per daily payload.
+    """
+    kept = []
+    for pid in problem_ids:
+        prob = problems_db.get(pid)
+        group = prob.get("duplicate_group") if isinstance(prob, dict) else None
+        if group:
+            if group in seen_groups:
+                continue
+            seen_groups.add(group)
+        kept.append(pid)
+    return kept
@@ -0,0 +1,160 @@
+"""PDF ソースのレジストリ（01_sources/_index.json）。
+
+PDF の SHA-256 をキーに、ファイル名の別名・ページ数・抽出テキストのハッシュ・
+取り込み状態を記録する。ファイル名ではなく内容で同一性を判定するので、改名や
+再ダウンロードした PDF、別名のコピーも取り込み済みとして扱える。
+
+  {
+    "processed": [...],                      # 従来形式（ファイル名単位）。互換のため維持
+    "sources": {
+      "<sha256>": {
+        "filenames": ["計算問題集①", ...],   # 拡張子なしのファイル名（別名）
+        "source_type": "計算問題集",
+        "status": "ingesting" | "ingested" | "failed",
+        "page_count": 512,
+        "text_sha256": "...",
+        "registered_at": "...", "ingested_at": "...", "updated": "..."
+      }
+    },
+    "files": {"<vault 相対パス>": [size, mtime_ns, sha256]}   # ハッシュ計算の省略用
+  }
+
+読み込み時にファイル名 → SHA の索引を作るので、参照は O(1)。更新は
+transaction() の中で行い、ロックファイル（01_sources/.index.lock）で排他した上で
+最新の内容を読み直し、atomic_json_write で書き戻す。
+"""
+
+from __future__ import annotations
+
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from lib.houjinzei_common import VaultPaths, atomic_json_write
+from lib.page_text_store import pdf_sha256
+
+STATUSES = ("ingesting", "ingested", "failed")
+
+
+class SourceRegistry:
+    def __init__(self, vp: VaultPaths):
+        self.vp = vp
+        self.path = vp.index_json
+        self._load()
+
+    # --- 読み込み ---
+
+    def _load(self) -> None:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            data = {}
+        data.setdefault("processed", [])
+        data.setdefault("sources", {})
+        data.setdefault("files", {})
+        self.data = data
+        self._by_name: dict[str, str] = {}
+        for sha, entry in data["sources"].items():
+            for name in entry.get("filenames", []):
+                self._by_name[name] = sha
+        self._legacy = {e.get("filename", "") for e in data["processed"]}
+
+    def _relpath(self, pdf_path: Path) -> str:
+        try:
+            return str(Path(pdf_path).resolve().relative_to(self.vp.root.resolve()))
+        except ValueError:
+            return str(Path(pdf_path).resolve())
+
+    def identify(self, pdf_path: str | Path) -> str:
+        """PDF の SHA-256。(size, mtime_ns) が記録と同じならハッシュを計算しない。"""
+        st = os.stat(pdf_path)
+        key = self._relpath(Path(pdf_path))
+        memo = self.data["files"].get(key)
+        if memo and memo[0] == st.st_size and memo[1] == st.st_mtime_ns:
+            return memo[2]
+        sha = pdf_sha256(pdf_path)
+        self.data["files"][key] = [st.st_size, st.st_mtime_ns, sha]
+        return sha
+
+    def get(self, sha: str) -> dict | None:
+        return self.data["sources"].get(sha)
+
+    def lookup_name(self, filename: str) -> dict | None:
+        """拡張子なしのファイル名（別名を含む）からエントリを引く。"""
+        sha = self._by_name.get(filename)
+        return self.data["sources"].get(sha) if sha else None
+
+    def ingested_as(self, pdf_path: str | Path) -> str | None:
+        """取り込み済みなら記録されているファイル名、未取り込みなら None。
+
+        内容（SHA-256）で一致を見る。ハッシュ未登録の従来エントリはファイル名で判定する。
+        """
+        entry = self.get(self.identify(pdf_path))
+        if entry and entry.get("status") == "ingested":
+            return entry["filenames"][0]
+        stem = Path(pdf_path).stem
+        if stem in self._legacy:
+            return stem
+        return None
+
+    # --- 更新 ---
+
+    @contextmanager
+    def transaction(self):
+        """排他ロック下で最新の内容を読み直し、ブロックを抜けたら書き戻す。
+
+        identify() で更新したハッシュ記録はロック取得前のものも引き継ぐ。
+        """
+        files = dict(self.data["files"])
+        lock_path = self.path.parent / ".index.lock"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(lock_path, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self._load()
+                self.data["files"].update(files)
+                yield self
+                atomic_json_write(self.path, self.data)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def register(self, pdf_path: str | Path, source_type: str, **fields) -> str:
+        """PDF を登録（既存なら別名を追加）してフィールドを更新し、SHA を返す。"""
+        sha = self.identify(pdf_path)
+        now = datetime.now().isoformat(timespec="seconds")
+        entry = self.data["sources"].setdefault(sha, {"filenames": [], "registered_at": now})
+        stem = Path(pdf_path).stem
+        if stem not in entry["filenames"]:
+            entry["filenames"].append(stem)
+        self._by_name[stem] = sha
+        if source_type:
+            entry["source_type"] = source_type
+        self.update(sha, **fields)
+        return sha
+
+    def update(self, sha: str, **fields) -> None:
+        status = fields.get("status")
+        if status is not None and status not in STATUSES:
+            raise ValueError(f"unknown status: {status}")
+        entry = self.data["sources"][sha]
+        entry.update(fields)
+        entry["updated"] = datetime.now().isoformat(timespec="seconds")
+
+    def mark_ingested(self, sha: str, **fields) -> None:
+        """取り込み完了を記録する。従来形式の processed にも追加する。"""
+        entry = self.data["sources"][sha]
+        now = datetime.now().isoformat(timespec="seconds")
+        self.update(sha, status="ingested", ingested_at=now, **fields)
+        filename = entry["filenames"][0]
+        if filename not in self._legacy:
+            self.data["processed"].append({
+                "filename": filename,
+                "source_type": entry.get("source_type", ""),
+                "processed_at": now,
+                "structure_file": fields.get("structure_file", ""),
+                "topics_file": fields.get("topics_file", ""),
+            })
+            self._legacy.add(filename)
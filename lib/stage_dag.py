@@ -0,0 +1,274 @@
+"""宣言的なステージ DAG ランナー（チェックポイント付き）。
+
+パイプラインの各ステージを関数として宣言し、入力ファイル・パラメータ・上流ステージ
+から決まるフィンガープリントを状態ファイルに記録する。再実行時は
+
+  - フィンガープリントが前回成功時と同じ
+  - 宣言した出力ファイルがすべて残っていて、内容も前回記録と同じ
+
+ステージを実行せずにスキップする。依存関係のないステージはスレッドプールで並行に
+実行する（重い処理は subprocess で行う前提）。ステージ関数が False を返すと
+「一部だけ成功」として下流は続行し、次回の実行ではそのステージを再実行する。
+
+    pipe = Pipeline("ingest", state_path)
+
+    @pipe.stage(inputs=[pdf], outputs=[text])
+    def extract_text():
+        ...
+
+    @pipe.stage(inputs=[text, prompt], outputs=[raw], after=["extract_text"])
+    def analyze():
+        ...
+
+    pipe.run()
+
+inputs / outputs にはパス、またはパスのリストを返す callable を渡せる（callable は
+上流ステージの完了後に評価される）。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterable, Union
+
+from lib.houjinzei_common import atomic_json_write
+
+PathSpec = Union[str, Path, Callable[[], Iterable[Union[str, Path]]]]
+
+STATE_VERSION = 1
+_READ_BLOCK = 1 << 20
+
+
+class StageError(Exception):
+    """ステージの失敗。メッセージはそのまま利用者に表示する。"""
+
+
+@dataclass
+class Stage:
+    name: str
+    func: Callable[[], Any]
+    inputs: list[PathSpec] = field(default_factory=list)
+    outputs: list[PathSpec] = field(default_factory=list)
+    after: list[str] = field(default_factory=list)
+    params: dict = field(default_factory=dict)
+    cache: bool = True
+
+
+@dataclass
+class StageResult:
+    name: str
+    status: str  # "done" | "partial" | "cached" | "failed" | "blocked"
+    duration_sec: float = 0.0
+    error: str = ""
+
+
+def _resolve(specs: list[PathSpec]) -> list[Path]:
+    paths: list[Path] = []
+    for spec in specs:
+        if callable(spec):
+            paths.extend(Path(p) for p in spec())
+        else:
+            paths.append(Path(spec))
+    return paths
+
+
+class Pipeline:
+    def __init__(self, name: str, state_path: str | Path, workers: int = 4):
+        self.name = name
+        self.state_path = Path(state_path)
+        self.workers = workers
+        self.stages: dict[str, Stage] = {}
+        self._lock = threading.Lock()
+        self._state = self._load_state()
+
+    # --- 宣言 ---
+
+    def stage(
+        self,
+        *,
+        inputs: Iterable[PathSpec] = (),
+        outputs: Iterable[PathSpec] = (),
+        after: Iterable[str] = (),
+        params: dict | None = None,
+        cache: bool = True,
+        name: str | None = None,
+    ):
+        def decorator(func: Callable[[], Any]):
+            stage_name = name or func.__name__
+            for dep in after:
+                if dep not in self.stages:
+                    raise ValueError(f"{stage_name}: unknown upstream stage {dep!r} (declare it first)")
+            self.stages[stage_name] = Stage(stage_name, func, list(inputs), list(outputs), list(after), dict(params or {}), cache)
+            return func
+
+        return decorator
+
+    # --- 状態 ---
+
+    def _load_state(self) -> dict:
+        try:
+            state = json.loads(self.state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            state = {}
+        if state.get("version") != STATE_VERSION:
+            state = {"version": STATE_VERSION, "pipeline": self.name, "stages": {}, "files": {}}
+        return state
+
+    def _save_state(self) -> None:
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_json_write(self.state_path, self._state)
+
+    def file_digest(self, path: Path) -> str | None:
+        """ファイル内容の sha256。(size, mtime_ns) が前回と同じなら記録済みの値を使う。"""
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        key = str(path)
+        with self._lock:
+            memo = self._state["files"].get(key)
+        if memo and memo[0] == st.st_size and memo[1] == st.st_mtime_ns:
+            return memo[2]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(_READ_BLOCK), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        with self._lock:
+            self._state["files"][key] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+    def _fingerprint(self, stage: Stage) -> str:
+        inputs = []
+        for path in _resolve(stage.inputs):
+            digest = self.file_digest(path)
+            if digest is None:
+                raise StageError(f"{stage.name}: 入力ファイルがありません: {path}")
+            inputs.append([str(path), digest])
+        # 上流は出力内容で効かせる（再実行しても出力が同じなら下流は再利用できる）。
+        # 出力を宣言していない上流はフィンガープリントで代用する。
+        with self._lock:
+            upstream = []
+            for dep in stage.after:
+                record = self._state["stages"].get(dep, {})
+                upstream.append([dep, record.get("outputs") or record.get("fingerprint", "")])
+        payload = json.dumps(
+            {"stage": stage.name, "params": stage.params, "inputs": inputs, "after": upstream},
+            ensure_ascii=False,
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _outputs_digest(self, stage: Stage) -> dict[str, str] | None:
+        digests = {}
+        for path in _resolve(stage.outputs):
+            digest = self.file_digest(path)
+            if digest is None:
+                return None
+            digests[str(path)] = digest
+        return digests
+
+    def is_fresh(self, stage: Stage, fingerprint: str) -> bool:
+        if not stage.cache:
+            return False
+        with self._lock:
+            record = self._state["stages"].get(stage.name, {})
+        if record.get("status") != "done" or record.get("fingerprint") != fingerprint:
+            return False
+        return self._outputs_digest(stage) == record.get("outputs")
+
+    def recorded_status(self, name: str) -> str | None:
+        """状態ファイルに記録されたステージの状態（"done" / "partial" / "failed"、未実行なら None）。"""
+        with self._lock:
+            return self._state["stages"].get(name, {}).get("status")
+
+    def invalidate(self, *names: str) -> None:
+        """指定ステージの記録を消し、次回の run で必ず実行させる。"""
+        with self._lock:
+            for name in names:
+                self._state["stages"].pop(name, None)
+            self._save_state()
+
+    # --- 実行 ---
+
+    def _run_stage(self, stage: Stage) -> StageResult:
+        started = time.monotonic()
+        try:
+            fingerprint = self._fingerprint(stage)
+            if self.is_fresh(stage, fingerprint):
+                print(f"⏩ {stage.name}: 前回の結果を再利用")
+                return StageResult(stage.name, "cached")
+            print(f"▶ {stage.name}")
+            complete = stage.func() is not False
+            outputs = self._outputs_digest(stage)
+            if outputs is None:
+                missing = [str(p) for p in _resolve(stage.outputs) if not p.exists()]
+                raise StageError(f"{stage.name}: 出力ファイルが作成されませんでした: {', '.join(missing)}")
+        except Exception as e:
+            duration = round(time.monotonic() - started, 2)
+            with self._lock:
+                self._state["stages"][stage.name] = {
+                    "status": "failed",
+                    "error": str(e),
+                    "duration_sec": duration,
+                    "updated": time.strftime("%Y-%m-%d %H:%M:%S"),
+                }
+                self._save_state()
+            return StageResult(stage.name, "failed", duration, str(e))
+
+        duration = round(time.monotonic() - started, 2)
+        with self._lock:
+            self._state["stages"][stage.name] = {
+                "status": "done" if complete else "partial",
+                "fingerprint": fingerprint,
+                "outputs": outputs,
+                "duration_sec": duration,
+                "updated": time.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            self._save_state()
+        print(f"{'✅' if complete else '⚠️ '} {stage.name} ({duration}s{'' if complete else ', 一部未完了'})")
+        return StageResult(stage.name, "done" if complete else "partial", duration)
+
+    def run(self) -> dict[str, StageResult]:
+        """全ステージを依存順に実行する。失敗があれば StageError を送出する。"""
+        results: dict[str, StageResult] = {}
+        pending = dict(self.stages)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as pool:
+            while pending or running:
+                # 失敗したステージの下流だけを止め、独立した枝は続ける
+                blocked = True
+                while blocked:
+                    blocked = False
+                    for name, stage in list(pending.items()):
+                        if any(results.get(dep, StageResult(dep, "")).status in ("failed", "blocked") for dep in stage.after):
+                            results[name] = StageResult(name, "blocked")
+                            del pending[name]
+                            blocked = True
+                for name, stage in list(pending.items()):
+                    if all(results.get(dep, StageResult(dep, "")).status in ("done", "partial", "cached") for dep in stage.after):
+                        running[pool.submit(self._run_stage, stage)] = name
+                        del pending[name]
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    res = fut.result()
+                    results[running.pop(fut)] = res
+                    if res.status == "failed":
+                        print(f"❌ {res.name}: {res.error}")
+
+        for name in pending:
+            results[name] = StageResult(name, "blocked")
+        if any(r.status == "failed" for r in results.values()):
+            failures = [r for r in results.values() if r.status == "failed"]
+            raise StageError("; ".join(f"{r.name}: {r.error}" for r in failures))
+        return results
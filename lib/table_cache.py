@@ -0,0 +1,46 @@
+"""正規化テーブルの遅延ロード。
+
+テーブル本体は lib/data/<name>.json に置き、初回ロード時に同じディレクトリへ
+marshal キャッシュ (<name>.marshal) を書き出す。以降は JSON の mtime/サイズが
+一致する限りキャッシュから読む。キャッシュが書けない環境では JSON を毎回読む。
+"""
+
+from __future__ import annotations
+
+import marshal
+import os
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+def load_table(name: str, data_dir: str = DATA_DIR):
+    """lib/data/<name>.json を（可能なら marshal キャッシュ経由で）ロードする。"""
+    src = os.path.join(data_dir, f"{name}.json")
+    cache = os.path.join(data_dir, f"{name}.marshal")
+    st = os.stat(src)
+    stamp = (st.st_mtime_ns, st.st_size)
+
+    try:
+        with open(cache, "rb") as f:
+            cached_stamp, data = marshal.load(f)
+        if tuple(cached_stamp) == stamp:
+            return data
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+
+    import json  # キャッシュヒット時は json を import しない
+
+    with open(src, encoding="utf-8") as f:
+        data = json.load(f)
+
+    tmp = f"{cache}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            marshal.dump((stamp, data), f)
+        os.replace(tmp, cache)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+    return data
@@ -1,6 +1,6 @@
 """論点→問題マッピングモジュール。
 
-論点ノートの topic フィールドと problems_master.json の normalized_topics を接合する。
+論点ノートの topic フィールドと問題マスタ（lib/problems_master.py）の normalized_topics を接合する。
 3段階フォールバック: normalized_topic一致 → parent_category一致 → titleキーワード部分一致
 """
 
@@ -10,6 +10,7 @@ import json
 from pathlib import Path
 
 from lib.houjinzei_common import VaultPaths, atomic_json_write, read_frontmatter
+from lib.problems_master import ProblemsMaster
 from lib.topic_normalize import get_parent_category, normalize_topic
 
 
@@ -86,12 +87,8 @@ def build_topic_problem_map(
     """
     vp = VaultPaths(vault_root)
 
-    if problems_master_path is None:
-        problems_master_path = vp.export / "problems_master.json"
-
-    with open(problems_master_path, encoding="utf-8") as f:
-        master = json.load(f)
-    problems = master.get("problems", {})
+    # 既定は問題マスタのシャード。従来形式のファイルを直接渡すこともできる
+    problems = ProblemsMaster.open(problems_master_path or vp.export).to_dict()
 
     norm_to_pids, cat_to_pids = _build_reverse_indexes(problems)
 
@@ -1,7 +1,17 @@
 #!/usr/bin/env node
 'use strict';
 
+// 論点ノートの「## 計算手順」を KaTeX + Puppeteer で WebP にする。
+// 使い方: node render_calc_images.js [--pages N] [--force] [--category CAT] [--max N] [--vault PATH]
+//   --pages  1 つのブラウザで並行に描画するタブ数（既定: CALC_RENDER_PAGES または min(4, CPU 数)）
+//   --force  ハッシュが一致していても描き直す
+// 02_extracted/calc_images/_manifest.json（lib/image_store.py と共有）の renders に
+// ノートごとの計算手順と HTML テンプレートのハッシュを記録し、どちらも同じで画像が
+// あるノートは描き直さない。--resume は互換のために受け付けるだけ（常にこの動作）。
+
+const crypto = require('crypto');
 const fs = require('fs');
+const os = require('os');
 const path = require('path');
 
 const MODULE_PATH = path.join(__dirname, 'komekome-pwa', 'node_modules');
@@ -11,22 +21,35 @@ const katex = require(path.join(MODULE_PATH, 'katex'));
 
 const marked = markedModule.marked || markedModule;
 
+const MANIFEST_NAME = '_manifest.json';
+const VIEWPORT = { width: 400, height: 800, deviceScaleFactor: 2 };
+const WEBP_QUALITY = 85;
+const MANIFEST_SAVE_EVERY = 10; // 描画 N 件ごとにマニフェストを保存（中断しても描いた分は残る）
+
 function parseArgs() {
   const args = process.argv.slice(2);
-  let resume = false;
+  let force = false;
   let max = Infinity;
   let category = null;
   let vaultPath = null;
+  let pages = parseInt(process.env.CALC_RENDER_PAGES || '', 10);
 
   for (let i = 0; i < args.length; i++) {
-    if (args[i] === '--resume') resume = true;
+    if (args[i] === '--resume') continue;
+    else if (args[i] === '--force') force = true;
     else if (args[i] === '--max') max = parseInt(args[++i], 10);
     else if (args[i] === '--category') category = args[++i];
     else if (args[i] === '--vault') vaultPath = args[++i];
+    else if (args[i] === '--pages') pages = parseInt(args[++i], 10);
   }
 
   if (!Number.isFinite(max) || max <= 0) max = Infinity;
-  return { resume, max, category, vaultPath };
+  if (!Number.isFinite(pages) || pages <= 0) pages = Math.max(1, Math.min(4, os.cpus().length));
+  return { force, max, category, vaultPath, pages };
+}
+
+function sha256(text) {
+  return crypto.createHash('sha256').update(text).digest('hex');
 }
 
 function walkMdFiles(rootDir, out = []) {
@@ -170,6 +193,53 @@ function saveProgress(progressPath, progress) {
   fs.writeFileSync(progressPath, JSON.stringify(progress, null, 2), 'utf8');
 }
 
+function writeFileAtomic(filePath, data) {
+  fs.mkdirSync(path.dirname(filePath), { recursive: true });
+  const tmp = path.join(path.dirname(filePath), `.${path.basename(filePath)}.${process.pid}.tmp`);
+  fs.writeFileSync(tmp, data);
+  fs.renameSync(tmp, filePath);
+}
+
+// lib/image_store.py の ImageManifest と同じファイル。renders 以外の項目はそのまま残す。
+function loadManifest(outRoot) {
+  const manifestPath = path.join(outRoot, MANIFEST_NAME);
+  let data = {};
+  try {
+    data = JSON.parse(fs.readFileSync(manifestPath, 'utf8'));
+  } catch (_err) {
+    data = {};
+  }
+  return {
+    version: 1, files: {}, remote: {}, ...data,
+    renders: data.renders && typeof data.renders === 'object' ? data.renders : {}
+  };
+}
+
+function saveManifest(outRoot, manifest) {
+  writeFileAtomic(path.join(outRoot, MANIFEST_NAME), JSON.stringify(manifest));
+}
+
+function isUpToDate(manifest, item, templateHash) {
+  const entry = manifest.renders[item.topicId];
+  return Boolean(
+    entry &&
+    entry.source_sha256 === item.sourceHash &&
+    entry.template_sha256 === templateHash &&
+    fs.existsSync(item.outPath)
+  );
+}
+
+async function renderOne(page, item, katexCss) {
+  const latexProcessed = processLatex(item.calcMd);
+  const htmlContent = marked.parse(latexProcessed);
+  const html = renderHtml(htmlContent, katexCss);
+
+  await page.setContent(html, { waitUntil: 'domcontentloaded' });
+  const el = await page.$('#content');
+  if (!el) throw new Error('Missing #content element');
+  return el.screenshot({ type: 'webp', quality: WEBP_QUALITY });
+}
+
 async function main() {
   const opts = parseArgs();
   const home = process.env.HOME || '/home/masa';
@@ -180,6 +250,9 @@ async function main() {
   const progress = loadProgress(progressPath);
   const processedSet = new Set(progress.processed);
   const katexCss = loadKatexCss();
+  const manifest = loadManifest(outRoot);
+  // テンプレート・CSS・描画設定が変わればすべて描き直す
+  const templateHash = sha256(renderHtml('', katexCss) + JSON.stringify(VIEWPORT) + WEBP_QUALITY);
 
   let files = walkMdFiles(notesRoot).sort();
   if (opts.category) {
@@ -188,88 +261,118 @@ async function main() {
   }
 
   const candidates = [];
+  let found = 0;
+  let unchanged = 0;
   for (const file of files) {
     const topicId = toTopicId(notesRoot, file);
     const outPath = path.join(outRoot, topicId + '.webp');
-    if (opts.resume && (processedSet.has(topicId) || fs.existsSync(outPath))) continue;
     // Pre-check: only include files with valid calc section
     const text = fs.readFileSync(file, 'utf8');
     const calcMd = extractCalcSection(text);
     if (!calcMd) continue;
-    candidates.push({ file, topicId, outPath, calcMd });
-    if (candidates.length >= opts.max) break;
+    found++;
+    const item = { file, topicId, outPath, calcMd, sourceHash: sha256(calcMd) };
+    if (!opts.force && isUpToDate(manifest, item, templateHash)) {
+      unchanged++;
+      continue;
+    }
+    if (candidates.length < opts.max) candidates.push(item);
   }
 
-  console.log(`Found ${candidates.length} notes with 計算手順 (100+ chars)`);
+  console.log(`Found ${found} notes with 計算手順 (100+ chars): ${unchanged} unchanged, ${candidates.length} to render`);
+  if (candidates.length === 0) return;
 
+  const poolSize = Math.min(opts.pages, candidates.length);
   let browser;
-  let page;
+  const pages = [];
   let interrupted = false;
+  let next = 0;
+  let done = 0;
+  let rendered = 0;
+  let sinceSave = 0;
+  const started = Date.now();
+
+  const persist = () => {
+    saveManifest(outRoot, manifest);
+    saveProgress(progressPath, progress);
+    sinceSave = 0;
+  };
   const onInterrupt = () => {
     interrupted = true;
-    try { saveProgress(progressPath, progress); } catch (_err) {}
+    try { persist(); } catch (_err) {}
   };
   process.on('SIGINT', onInterrupt);
   process.on('SIGTERM', onInterrupt);
 
-  try {
-    browser = await puppeteer.launch({
-      headless: 'new',
-      args: [
-        '--no-sandbox',
-        '--disable-setuid-sandbox',
-        '--disable-dev-shm-usage',
-        '--disable-breakpad',
-        '--disable-crash-reporter'
-      ]
-    });
-    page = await browser.newPage();
-    await page.setViewport({ width: 400, height: 800, deviceScaleFactor: 2 });
-
-    for (let i = 0; i < candidates.length; i++) {
-      if (interrupted) break;
-      const item = candidates[i];
+  // 各タブがキューから 1 件ずつ取って描く（node は単一スレッドなので next++ は競合しない）
+  const worker = async (page) => {
+    while (!interrupted && next < candidates.length) {
+      const item = candidates[next++];
       const start = Date.now();
       try {
-        const latexProcessed = processLatex(item.calcMd);
-        const htmlContent = marked.parse(latexProcessed);
-        const html = renderHtml(htmlContent, katexCss);
-
-        await page.setContent(html, { waitUntil: 'domcontentloaded' });
-        const el = await page.$('#content');
-        if (!el) throw new Error('Missing #content element');
-
-        const screenshot = await el.screenshot({ type: 'webp', quality: 85 });
-        fs.mkdirSync(path.dirname(item.outPath), { recursive: true });
-        fs.writeFileSync(item.outPath, screenshot);
+        const screenshot = await renderOne(page, item, katexCss);
+        writeFileAtomic(item.outPath, screenshot);
 
+        manifest.renders[item.topicId] = {
+          file: item.topicId + '.webp',
+          source_sha256: item.sourceHash,
+          template_sha256: templateHash,
+          sha256: crypto.createHash('sha256').update(screenshot).digest('hex'),
+          size: screenshot.length
+        };
         if (!processedSet.has(item.topicId)) {
           progress.processed.push(item.topicId);
           processedSet.add(item.topicId);
         }
         delete progress.errors[item.topicId];
-        saveProgress(progressPath, progress);
+        rendered++;
 
         const relOut = path.relative(outRoot, item.outPath).replace(/\\/g, '/');
         const secs = ((Date.now() - start) / 1000).toFixed(1);
-        console.log(`[${i + 1}/${candidates.length}] ${relOut} (${secs}s)`);
+        console.log(`[${++done}/${candidates.length}] ${relOut} (${secs}s)`);
       } catch (err) {
+        done++;
         progress.errors[item.topicId] = err && err.message ? err.message : String(err);
-        saveProgress(progressPath, progress);
         console.error(`Error: ${item.topicId}: ${progress.errors[item.topicId]}`);
       }
+      if (++sinceSave >= MANIFEST_SAVE_EVERY) persist();
+    }
+  };
+
+  try {
+    browser = await puppeteer.launch({
+      headless: 'new',
+      args: [
+        '--no-sandbox',
+        '--disable-setuid-sandbox',
+        '--disable-dev-shm-usage',
+        '--disable-breakpad',
+        '--disable-crash-reporter'
+      ]
+    });
+    for (let i = 0; i < poolSize; i++) {
+      const page = await browser.newPage();
+      await page.setViewport(VIEWPORT);
+      pages.push(page);
     }
+    await Promise.all(pages.map(worker));
   } finally {
     process.off('SIGINT', onInterrupt);
     process.off('SIGTERM', onInterrupt);
-    saveProgress(progressPath, progress);
-    if (page) {
+    persist();
+    for (const page of pages) {
       try { await page.close(); } catch (_err) {}
     }
     if (browser) {
       try { await browser.close(); } catch (_err) {}
     }
   }
+
+  const secs = (Date.now() - started) / 1000;
+  const rate = secs > 0 ? (rendered / secs).toFixed(2) : '0';
+  const errors = candidates.length - rendered;
+  console.log(`Done: ${rendered} rendered with ${poolSize} pages in ${secs.toFixed(1)}s (${rate} notes/s)` +
+    (errors ? `, ${errors} not rendered` : ''));
 }
 
 main().catch((err) => {
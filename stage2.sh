@@ -161,6 +161,13 @@ PYEOF
   exit 0
 fi
 
+# vault への書き込み（ノート・ソースマップ）の間だけ vault ロックを持つ。
+# ロックを持つ親から呼ばれたとき（HOUJINZEI_LOCK_HELD=1）は取らない
+if [ "${HOUJINZEI_LOCK_HELD:-}" != "1" ]; then
+  exec 200>"/tmp/houjinzei_vault.lock"
+  flock -w 600 200 || { echo "❌ vault ロックを取得できませんでした（600秒）"; exit 1; }
+fi
+
 export TOPICS_FILE VAULT SOURCE_TYPE_PROMPT
 python3 - <<'PYEOF'
 import datetime
@@ -1,6 +1,11 @@
 """chunk_merger のテスト。"""
 
-from lib.chunk_merger import merge_payloads
+import json
+import os
+import subprocess
+import sys
+
+from lib.chunk_merger import merge_files, merge_payloads
 
 
 def test_merge_payloads_dedupes_and_expands_page_range():
@@ -81,3 +86,39 @@ def test_merge_payloads_keeps_order_and_counts_topics():
     assert merged["total_topics"] == 3
     assert [t["topic_id"] for t in merged["topics"]] == ["t1", "t2", "t3"]
     assert merged["topics"][1]["page_range"] == "3-8"
+
+
+def test_dedupe_keys_follow_json_equality():
+    p1 = {"topics": [{"topic_id": "t", "conditions": [{"a": 1, "b": [True]}, "1"], "keywords": ["x", "x"]}]}
+    p2 = {"topics": [{"topic_id": "t", "conditions": [{"b": [True], "a": 1}, {"a": 1, "b": [1]}, 1]}]}
+    p3 = {"topics": [{"topic_id": "t", "conditions": [{"a": 1.0, "b": [1]}, "2"], "type": "理論"}]}
+
+    # 初出だけのトピックは重複除去しない（従来どおり）
+    assert merge_payloads([p1])["topics"][0]["keywords"] == ["x", "x"]
+
+    topic = merge_payloads([p1, p2, p3])["topics"][0]
+    # キー順違いの dict は同一、True と 1 / 1 と 1.0 は別、スカラーは str() で比較
+    assert topic["conditions"] == [{"a": 1, "b": [True]}, "1", {"a": 1, "b": [1]}, {"a": 1.0, "b": [1]}, "2"]
+    assert topic["keywords"] == ["x"]
+    assert topic["type"] == ["理論"]
+
+
+def test_cli_streams_files_and_writes_same_bytes(tmp_path):
+    payloads = [
+        {"source_name": "本", "source_type": "理論", "publisher": "P", "topics": [{"topic_id": f"t{i % 3}", "keywords": [f"k{i}"], "page_range": f"{i}-{i + 1}"}]}
+        for i in range(6)
+    ]
+    paths = []
+    for i, payload in enumerate(payloads):
+        path = tmp_path / f"chunk_{i}_topics.json"
+        path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+        paths.append(str(path))
+    out = tmp_path / "topics.json"
+
+    env = dict(os.environ, PYTHONPATH=os.getcwd())
+    subprocess.run([sys.executable, "lib/chunk_merger.py", "--output", str(out), *paths], env=env, check=True)
+
+    expected = json.dumps(merge_payloads(payloads), ensure_ascii=False, indent=2) + "\n"
+    assert out.read_text(encoding="utf-8") == expected
+    assert merge_files(paths) == merge_payloads(payloads)
+    assert [t["page_range"] for t in json.loads(expected)["topics"]] == ["0-4", "1-5", "2-6"]
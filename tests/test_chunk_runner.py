@@ -0,0 +1,222 @@
+"""chunk_runner のテスト（sleep して定型 JSON を返す偽 gemini を使用）。"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from lib.chunk_runner import ChunkError, ChunkJournal, extract_gemini_output, manifest_hash, run_chunks
+from lib.llm_cache import LLMCache
+
+FAKE_GEMINI = r'''#!/usr/bin/env python3
+import os, re, sys, time
+prompt = sys.argv[sys.argv.index("-p") + 1]
+idx = re.search(r"チャンク (\d+)/(\d+)", prompt).group(1)
+state = os.environ.get("FAKE_STATE_DIR")
+if state:
+    counter = os.path.join(state, f"calls_{idx}")
+    n = int(open(counter).read()) if os.path.exists(counter) else 0
+    open(counter, "w").write(str(n + 1))
+    if idx in os.environ.get("FAKE_FAIL_ONCE", "").split(",") and n == 0:
+        print("quota exceeded")
+        sys.exit(1)
+    if idx in os.environ.get("FAKE_HANG", "").split(","):
+        time.sleep(30)
+time.sleep(float(os.environ.get("FAKE_SLEEP", "0.3")))
+assert prompt.rstrip().endswith(f"@chunk_{idx}_text.txt"), prompt
+print(f"# 構造 {idx}\n\n```json\n{{\"topics\": [{{\"topic_id\": \"t{idx}\"}}]}}\n```")
+'''
+
+
+@pytest.fixture
+def chunk_env(tmp_path, monkeypatch):
+    fake = tmp_path / "gemini"
+    fake.write_text(FAKE_GEMINI, encoding="utf-8")
+    fake.chmod(0o755)
+    state = tmp_path / "state"
+    state.mkdir()
+    monkeypatch.setenv("FAKE_STATE_DIR", str(state))
+
+    chunks = []
+    for i in range(1, 5):
+        p = tmp_path / f"chunk_{i}_text.txt"
+        p.write_text(f"--- ページ {i} ---\n本文{i}\n", encoding="utf-8")
+        chunks.append({"chunk_index": i, "path": str(p)})
+    manifest = {"chunk_count": 4, "chunks": chunks}
+    return tmp_path, fake, manifest, state
+
+
+def _run(tmp_path, fake, manifest, **kwargs):
+    opts = dict(prompt="PROMPT", source_name="本", cwd=tmp_path, gemini_bin=str(fake), backoff=0.01)
+    opts.update(kwargs)
+    return run_chunks(manifest, **opts)
+
+
+def test_chunks_run_concurrently_and_write_topics(chunk_env):
+    tmp_path, fake, manifest, _ = chunk_env
+    started = time.monotonic()
+    results = _run(tmp_path, fake, manifest, workers=4)
+    elapsed = time.monotonic() - started
+
+    assert [r.status for r in results] == ["ok"] * 4
+    assert elapsed < 4 * 0.3  # serial would take >= 1.2s
+    for i, res in enumerate(results, start=1):
+        assert res.chunk_index == i
+        assert json.loads((tmp_path / f"chunk_{i}_topics.json").read_text(encoding="utf-8")) == {
+            "topics": [{"topic_id": f"t{i}"}]
+        }
+        assert (tmp_path / f"chunk_{i}_structure.md").read_text(encoding="utf-8") == f"# 構造 {i}\n"
+
+
+def test_failed_attempt_is_retried(chunk_env, monkeypatch):
+    tmp_path, fake, manifest, state = chunk_env
+    monkeypatch.setenv("FAKE_FAIL_ONCE", "2")
+    results = _run(tmp_path, fake, manifest, workers=2, retries=1)
+
+    assert all(r.status == "ok" for r in results)
+    assert results[1].attempts == 2
+    assert (state / "calls_2").read_text() == "2"
+
+
+def test_timeout_marks_chunk_failed(chunk_env, monkeypatch):
+    tmp_path, fake, manifest, _ = chunk_env
+    monkeypatch.setenv("FAKE_HANG", "3")
+    results = _run(tmp_path, fake, manifest, workers=4, timeout=1, retries=1)
+
+    assert [r.status for r in results] == ["ok", "ok", "failed", "ok"]
+    assert results[2].attempts == 2
+    assert "タイムアウト" in results[2].error
+
+
+def test_cached_chunks_skip_gemini(chunk_env):
+    tmp_path, fake, manifest, state = chunk_env
+    cache = LLMCache(tmp_path / "llm_cache")
+    first = _run(tmp_path, fake, manifest, workers=4, cache=cache)
+    assert not any(r.cached for r in first)
+
+    (tmp_path / "chunk_2_topics.json").unlink()
+    second = _run(tmp_path, fake, manifest, workers=4, cache=cache)
+    assert all(r.status == "ok" and r.cached for r in second)
+    assert (state / "calls_2").read_text() == "1"
+    assert json.loads((tmp_path / "chunk_2_topics.json").read_text(encoding="utf-8"))["topics"][0]["topic_id"] == "t2"
+
+    # チャンク本文が変われば別キー
+    (tmp_path / "chunk_3_text.txt").write_text("--- ページ 3 ---\n改訂\n", encoding="utf-8")
+    third = _run(tmp_path, fake, manifest, workers=4, cache=cache)
+    assert [r.cached for r in third] == [True, True, False, True]
+
+
+def test_journal_resumes_only_failed_chunks(chunk_env, monkeypatch):
+    tmp_path, fake, manifest, state = chunk_env
+    journal_path = tmp_path / "journal.json"
+    digest = manifest_hash(manifest, "PROMPT", "本")
+
+    monkeypatch.setenv("FAKE_HANG", "3")
+    first = _run(tmp_path, fake, manifest, workers=4, timeout=1, retries=0, journal=ChunkJournal(journal_path, digest))
+    assert [r.status for r in first] == ["ok", "ok", "failed", "ok"]
+    recorded = json.loads(journal_path.read_text(encoding="utf-8"))
+    assert recorded["manifest_hash"] == digest
+    assert recorded["chunks"]["3"]["status"] == "failed"
+    assert recorded["chunks"]["1"]["attempts"] == 1
+
+    monkeypatch.delenv("FAKE_HANG")
+    journal = ChunkJournal(journal_path, digest)
+    assert journal.reused
+    second = _run(tmp_path, fake, manifest, workers=4, journal=journal)
+    assert [r.status for r in second] == ["ok"] * 4
+    assert [r.resumed for r in second] == [True, True, False, True]
+    assert [(state / f"calls_{i}").read_text() for i in range(1, 5)] == ["1", "1", "2", "1"]
+
+    # チャンク本文が変わればジャーナルは引き継がない
+    (tmp_path / "chunk_1_text.txt").write_text("--- ページ 1 ---\n改訂\n", encoding="utf-8")
+    assert not ChunkJournal(journal_path, manifest_hash(manifest, "PROMPT", "本")).reused
+
+
+def test_cli_merge_only_replays_journal_without_gemini(chunk_env):
+    tmp_path, fake, manifest, state = chunk_env
+    journal_path = tmp_path / "journal.json"
+    _run(tmp_path, fake, manifest, workers=4, journal=ChunkJournal(journal_path, manifest_hash(manifest, "PROMPT", "本")))
+    (tmp_path / "manifest.json").write_text(json.dumps(manifest), encoding="utf-8")
+    (tmp_path / "prompt.md").write_text("PROMPT\n", encoding="utf-8")
+
+    cmd = [
+        sys.executable,
+        "lib/chunk_runner.py",
+        "--manifest", str(tmp_path / "manifest.json"),
+        "--prompt-file", str(tmp_path / "prompt.md"),
+        "--source-name", "本",
+        "--cwd", str(tmp_path),
+        "--gemini-bin", str(tmp_path / "no-such-gemini"),
+        "--journal", str(journal_path),
+        "--merge-only",
+        "--raw-out", str(tmp_path / "raw.md"),
+        "--structure-out", str(tmp_path / "structure.md"),
+    ]
+    env = dict(os.environ, PYTHONPATH=os.getcwd(), LLM_CACHE="0")
+    proc = subprocess.run(cmd, env=env, capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.split() == [str(tmp_path / f"chunk_{i}_topics.json") for i in range(1, 5)]
+    assert "チャンク 4/4" in (tmp_path / "structure.md").read_text(encoding="utf-8")
+
+    (tmp_path / "prompt.md").write_text("PROMPT v2\n", encoding="utf-8")
+    assert subprocess.run(cmd, env=env, capture_output=True).returncode == 1
+
+
+def test_cli_prints_successful_topics_in_order(chunk_env):
+    tmp_path, fake, manifest, _ = chunk_env
+    (tmp_path / "manifest.json").write_text(json.dumps(manifest), encoding="utf-8")
+    (tmp_path / "prompt.md").write_text("PROMPT\n", encoding="utf-8")
+    env = dict(os.environ, PYTHONPATH=os.getcwd(), FAKE_SLEEP="0", LLM_CACHE_DIR=str(tmp_path / "llm_cache"))
+    proc = subprocess.run(
+        [
+            sys.executable,
+            "lib/chunk_runner.py",
+            "--manifest", str(tmp_path / "manifest.json"),
+            "--prompt-file", str(tmp_path / "prompt.md"),
+            "--source-name", "本",
+            "--cwd", str(tmp_path),
+            "--gemini-bin", str(fake),
+            "--raw-out", str(tmp_path / "raw.md"),
+            "--structure-out", str(tmp_path / "structure.md"),
+        ],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert proc.stdout.split() == [str(tmp_path / f"chunk_{i}_topics.json") for i in range(1, 5)]
+    structure = (tmp_path / "structure.md").read_text(encoding="utf-8")
+    assert structure.index("チャンク 1/4") < structure.index("チャンク 4/4")
+
+
+def test_extract_gemini_output_requires_json_block():
+    data, md = extract_gemini_output('# 見出し\n```json\n[{"topic_id": "t1"}]\n```\n末尾')
+    assert data == [{"topic_id": "t1"}]
+    assert md == "# 見出し\n\n末尾"
+    assert extract_gemini_output('```json\n{"topics": []}\n```')[0] == {"topics": []}
+    with pytest.raises(ChunkError):
+        extract_gemini_output("JSONなし")
+    # フェンスのない文章中の "[1]" を topics として受け取らない
+    with pytest.raises(ChunkError):
+        extract_gemini_output("ファイルを読み込めませんでした。詳細は [1] を参照してください。")
+    with pytest.raises(ChunkError):
+        extract_gemini_output("```json\n[1, 2]\n```")
+    with pytest.raises(ChunkError):
+        extract_gemini_output('```json\n{"topics": "なし"}\n```')
+
+
+def test_prose_output_is_retried_and_not_cached(chunk_env, monkeypatch):
+    tmp_path, fake, manifest, state = chunk_env
+    prose = tmp_path / "gemini_prose"
+    prose.write_text("#!/bin/sh\necho '読み込めませんでした。詳細は [1] を参照してください。'\n", encoding="utf-8")
+    prose.chmod(0o755)
+    cache = LLMCache(tmp_path / "llm_cache")
+    results = _run(tmp_path, prose, manifest, workers=4, cache=cache, retries=1)
+    assert all(r.status == "failed" and r.attempts == 2 for r in results)
+    assert not (tmp_path / "chunk_1_topics.json").exists()
+
+    again = _run(tmp_path, fake, manifest, workers=4, cache=cache)
+    assert all(r.status == "ok" and not r.cached for r in again)
@@ -66,3 +66,78 @@ def test_cli_creates_manifest_and_chunk_files(tmp_path):
     assert data["chunk_count"] == 2
     assert (out_dir / "sample_chunk_1_text.txt").exists()
     assert (out_dir / "sample_chunk_2_text.txt").exists()
+
+
+def test_stream_mode_matches_in_memory_chunks(tmp_path):
+    from lib.chunk_splitter import chunk_to_text, estimate_tokens, split_streaming
+
+    raw = (
+        "--- ページ 1 ---\n第1章 総則\nA\n\n"
+        "--- ページ 2 ---\n　\n\nB　\n\n"
+        "--- ページ 3 ---\n第2章 各論\nC\n\n"
+        "--- ページ 4 ---\nD  \n\n\n"
+    )
+    in_file = tmp_path / "book_text.txt"
+    in_file.write_text(raw, encoding="utf-8")
+
+    pages = parse_pages(raw)
+    expected_chunks, expected_mode = build_chunks(pages, 50)
+
+    spans, chunks, mode, paths, tokens = split_streaming(in_file, tmp_path / "out", "sample", 50)
+    assert (chunks, mode) == (expected_chunks, expected_mode) == ([(0, 2), (2, 4)], "chapters")
+    assert [s.page_no for s in spans] == [1, 2, 3, 4]
+    for (start, end), path, est in zip(chunks, paths, tokens):
+        assert path.read_text(encoding="utf-8") == chunk_to_text(pages, start, end)
+        assert est == estimate_tokens(chunk_to_text(pages, start, end))
+
+
+def test_budget_chunks_never_split_pages_and_prefer_chapters():
+    from lib.chunk_splitter import build_budget_chunks
+
+    weights = [30, 30, 30, 30, 30, 30, 30]
+    # budget 100 fits 3 pages; chapter at 4 (size 120) is within ±20% → cut there
+    chunks, mode = build_budget_chunks(weights, [0, 4], budget=100, tolerance=0.2)
+    assert mode == "budget"
+    assert chunks == [(0, 4), (4, 7)]
+
+    # no chapter in range → greedy fill
+    chunks, _ = build_budget_chunks(weights, [0], budget=100, tolerance=0.2)
+    assert chunks == [(0, 3), (3, 6), (6, 7)]
+
+    # an oversized page becomes its own chunk
+    chunks, _ = build_budget_chunks([10, 500, 10], [0], budget=100)
+    assert chunks == [(0, 1), (1, 2), (2, 3)]
+
+
+def test_cli_budget_mode_records_chunk_sizes(tmp_path):
+    import subprocess
+
+    in_file = tmp_path / "book_text.txt"
+    in_file.write_text("".join(f"--- ページ {i} ---\n{'本文' * 50}\n\n" for i in range(1, 11)), encoding="utf-8")
+    manifest = tmp_path / "manifest.json"
+    subprocess.run(
+        [
+            "python3",
+            "lib/chunk_splitter.py",
+            "--input",
+            str(in_file),
+            "--output-dir",
+            str(tmp_path / "out"),
+            "--safe-name",
+            "sample",
+            "--manifest-out",
+            str(manifest),
+            "--budget-bytes",
+            "700",
+        ],
+        check=True,
+        capture_output=True,
+    )
+
+    data = json.loads(manifest.read_text(encoding="utf-8"))
+    assert data["mode"] == "budget"
+    assert data["budget"] == {"unit": "bytes", "size": 700, "chapter_tolerance": 0.2}
+    assert sum(c["page_count"] for c in data["chunks"]) == 10
+    for chunk in data["chunks"]:
+        assert 0 < chunk["bytes"] <= 700
+        assert chunk["est_tokens"] > 0
@@ -0,0 +1,124 @@
+"""image_store のテスト。"""
+
+import os
+
+from lib.image_store import DirectoryBucket, ImageManifest, calc_image_files, page_image_files, upload
+
+
+def _write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return path
+
+
+def test_render_key_tracks_dpi_and_content(tmp_path):
+    root = tmp_path / "page_images"
+    img = _write(root / "計算1-1" / "003.webp", b"200dpi")
+    manifest = ImageManifest(root)
+
+    # マニフェスト導入前の画像は今回の条件で描いたものとして引き継ぐ
+    assert manifest.is_rendered("計算1-1", 3, 200, 85, img)
+    assert not manifest.is_rendered("計算1-1", 3, 150, 85, img)  # DPI が違えば描き直す
+    assert not manifest.is_rendered("計算1-1", 4, 200, 85, root / "計算1-1" / "004.webp")
+
+    img.write_bytes(b"150dpi")
+    manifest.record_render("計算1-1", 3, 150, 85, img)
+    manifest.save()
+    reopened = ImageManifest(root)
+    assert reopened.is_rendered("計算1-1", 3, 150, 85, img)
+    assert not reopened.is_rendered("計算1-1", 3, 200, 85, img)
+
+    img.write_bytes(b"edited by hand")
+    assert not reopened.is_rendered("計算1-1", 3, 150, 85, img)
+
+
+def test_render_record_tracks_crop_bboxes(tmp_path):
+    root = tmp_path / "page_images"
+    img = _write(root / "計算1-1" / "005.webp", b"page")
+    manifest = ImageManifest(root)
+    crops = [("calc-1-1-009", (0, 0, 1, 0.5))]
+    manifest.record_render("計算1-1", 5, 200, 85, img, crops)
+    manifest.save()
+
+    reopened = ImageManifest(root)
+    assert reopened.is_rendered("計算1-1", 5, 200, 85, img, crops)
+    # bbox を直した・切り抜きが増減したら描き直す
+    assert not reopened.is_rendered("計算1-1", 5, 200, 85, img, [("calc-1-1-009", (0, 0.1, 1, 0.5))])
+    assert not reopened.is_rendered("計算1-1", 5, 200, 85, img, crops + [("calc-1-1-010", (0, 0.5, 1, 1))])
+    assert not reopened.is_rendered("計算1-1", 5, 200, 85, img)
+
+
+def test_prune_drops_records_of_removed_crops(tmp_path):
+    root = tmp_path / "page_images"
+    img = _write(root / "計算1-1" / "005.webp", b"page")
+    keep = _write(root / "計算1-1" / "005.crop-calc-1-1-009.webp", b"crop")
+    gone = _write(root / "計算1-1" / "005.crop-calc-1-1-010.webp", b"crop")
+    manifest = ImageManifest(root)
+    crops = [("calc-1-1-009", (0, 0, 1, 0.5)), ("calc-1-1-010", (0, 0.5, 1, 1))]
+    manifest.record_render("計算1-1", 5, 200, 85, img, crops)
+    manifest.pending_uploads(page_image_files(root), "dir:x")  # ハッシュのメモを作る
+
+    gone.unlink()
+    assert manifest.prune() == 2
+    assert set(manifest.data["files"]) == {"計算1-1/005.webp", "計算1-1/005.crop-calc-1-1-009.webp"}
+    assert manifest.is_rendered("計算1-1", 5, 200, 85, img, crops[:1])
+    assert [path for path, _ in page_image_files(root)] == [keep, img]
+
+
+def test_upload_sends_only_new_or_changed_files(tmp_path):
+    root = tmp_path / "page_images"
+    bucket_dir = tmp_path / "bucket"
+    a = _write(root / "計算1-1" / "001.webp", b"a")
+    _write(root / "計算1-1" / "002.webp", b"b")
+    _write(root / "理論" / "010.webp", b"c")
+
+    first = upload(ImageManifest(root), page_image_files(root), DirectoryBucket(bucket_dir), workers=3, batch=2)
+    assert (first.uploaded, first.unchanged, first.failed) == (3, 0, [])
+    assert (bucket_dir / "計算1-1" / "001.webp").read_bytes() == b"a"
+    assert (bucket_dir / "理論" / "010.webp").read_bytes() == b"c"
+
+    second = upload(ImageManifest(root), page_image_files(root), DirectoryBucket(bucket_dir))
+    assert (second.uploaded, second.unchanged) == (0, 3)
+
+    a.write_bytes(b"a2")
+    os.utime(a, ns=(1, 1))  # mtime が変わっても変わらなくても内容で判定する
+    _write(root / "計算1-1" / "003.webp", b"d")
+    third = upload(ImageManifest(root), page_image_files(root), DirectoryBucket(bucket_dir))
+    assert (third.uploaded, third.unchanged) == (2, 2)
+    assert (bucket_dir / "計算1-1" / "001.webp").read_bytes() == b"a2"
+
+
+class _FlakyBucket(DirectoryBucket):
+    def put(self, key, path):
+        if key.endswith("002.webp"):
+            raise RuntimeError("network error")
+        super().put(key, path)
+
+
+def test_failed_uploads_are_retried_next_time(tmp_path, capsys):
+    root = tmp_path / "calc_images"
+    bucket_dir = tmp_path / "bucket"
+    _write(root / "所得計算" / "001.webp", b"x")
+    _write(root / "所得計算" / "002.webp", b"y")
+    files = calc_image_files(root)
+    assert [key for _, key in files] == ["calc_hints/所得計算/001.webp", "calc_hints/所得計算/002.webp"]
+
+    result = upload(ImageManifest(root), files, _FlakyBucket(bucket_dir))
+    assert result.uploaded == 1
+    assert result.failed == [("calc_hints/所得計算/002.webp", "network error")]
+    assert "アップロード失敗" in capsys.readouterr().err
+
+    retry = upload(ImageManifest(root), files, DirectoryBucket(bucket_dir))
+    assert (retry.uploaded, retry.unchanged) == (1, 1)
+    assert (bucket_dir / "calc_hints" / "所得計算" / "002.webp").read_bytes() == b"y"
+
+
+def test_upload_records_are_kept_per_destination(tmp_path):
+    root = tmp_path / "page_images"
+    _write(root / "計算1-1" / "001.webp", b"a")
+    files = page_image_files(root)
+    upload(ImageManifest(root), files, DirectoryBucket(tmp_path / "stand-in"))
+
+    manifest = ImageManifest(root)
+    assert manifest.pending_uploads(files, DirectoryBucket(tmp_path / "stand-in").name) == []
+    assert [i.key for i in manifest.pending_uploads(files, "r2:komekome-pages")] == ["計算1-1/001.webp"]
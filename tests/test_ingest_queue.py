@@ -0,0 +1,112 @@
+"""ingest_queue と vault_lock のテスト。"""
+
+import fcntl
+import json
+import threading
+import time
+
+import pytest
+
+from lib.houjinzei_common import VaultPaths, vault_lock
+from lib.ingest_queue import IngestQueue, infer_source_type, scan_pending
+
+
+def test_infer_source_type():
+    assert infer_source_type("大原_計算問題集①") == "計算問題集"
+    assert infer_source_type("理論問題集2") == "理論テキスト"
+    assert infer_source_type("法人税法施行令") == "法令"
+    assert infer_source_type("メモ") == ""
+
+
+def test_scan_pending_skips_processed(tmp_vault):
+    vp = VaultPaths(tmp_vault)
+    (vp.sources / "大原").mkdir()
+    for name in ("計算問題集①.pdf", "計算問題集②.pdf", "メモ.pdf", "notes.txt"):
+        (vp.sources / "大原" / name).write_bytes(f"%PDF {name}".encode())
+    vp.index_json.write_text(json.dumps({"processed": [{"filename": "計算問題集①"}]}), encoding="utf-8")
+
+    pending, unknown = scan_pending(vp)
+    assert [(p.name, p.source_type) for p in pending] == [("計算問題集②.pdf", "計算問題集")]
+    assert [p.name for p in unknown] == ["メモ.pdf"]
+
+
+def _pending(vp, *names):
+    for name in names:
+        (vp.sources / name).write_bytes(f"%PDF {name}".encode())
+    return scan_pending(vp)[0]
+
+
+def test_queue_runs_jobs_concurrently_and_records_state(tmp_vault):
+    vp = VaultPaths(tmp_vault)
+    pdfs = _pending(vp, "計算問題集A.pdf", "計算問題集B.pdf", "計算問題集C.pdf")
+    barrier = threading.Barrier(3, timeout=5)
+
+    def runner(pdf, log_path):
+        barrier.wait()  # 3 件が同時に走っていなければタイムアウトする
+        return 1 if pdf.name == "計算問題集B.pdf" else 0
+
+    ok, failed = IngestQueue(vp, workers=3, runner=runner).run(pdfs)
+    assert (ok, failed) == (2, 1)
+
+    state = json.loads((vp.extracted / "_ingest_queue.json").read_text(encoding="utf-8"))
+    statuses = {p.rsplit("/", 1)[-1]: j["status"] for p, j in state["jobs"].items()}
+    assert statuses == {"計算問題集A.pdf": "done", "計算問題集B.pdf": "failed", "計算問題集C.pdf": "done"}
+
+
+def test_queue_counts_attempts_and_reports_resumable_stages(tmp_vault, capsys):
+    vp = VaultPaths(tmp_vault)
+    [pdf] = _pending(vp, "計算問題集A.pdf")
+    IngestQueue(vp, runner=lambda p, log: 1).run([pdf])
+
+    (vp.extracted / "計算問題集A_pipeline.json").write_text(
+        json.dumps({"stages": {"extract_text": {"status": "done"}, "analyze": {"status": "failed"}}}),
+        encoding="utf-8",
+    )
+    queue = IngestQueue(vp, runner=lambda p, log: 0)
+    assert queue.resumable_stages(pdf) == ["extract_text"]
+    assert queue.run([pdf]) == (1, 0)
+    assert "再開: extract_text は完了済み" in capsys.readouterr().out
+    job = queue.state["jobs"][str(pdf.path)]
+    assert job["attempts"] == 2
+    assert job["status"] == "done"
+
+
+def test_runner_exception_is_recorded_as_failure(tmp_vault):
+    vp = VaultPaths(tmp_vault)
+    [pdf] = _pending(vp, "模試1.pdf")
+
+    def runner(pdf, log_path):
+        raise OSError("no python")
+
+    queue = IngestQueue(vp, runner=runner)
+    assert queue.run([pdf]) == (0, 1)
+    assert queue.state["jobs"][str(pdf.path)]["status"] == "failed"
+
+
+def test_vault_lock_waits_and_times_out(tmp_path):
+    lockfile = tmp_path / "vault.lock"
+    holder = open(lockfile, "w")
+    fcntl.flock(holder, fcntl.LOCK_EX)
+    try:
+        with pytest.raises(TimeoutError):
+            with vault_lock(timeout=0.2, path=str(lockfile)):
+                pass
+
+        threading.Timer(0.3, lambda: fcntl.flock(holder, fcntl.LOCK_UN)).start()
+        started = time.monotonic()
+        with vault_lock(timeout=5, path=str(lockfile)):
+            assert time.monotonic() - started >= 0.25
+    finally:
+        holder.close()
+
+
+def test_vault_lock_skipped_when_parent_holds_it(tmp_path, monkeypatch):
+    lockfile = tmp_path / "vault.lock"
+    holder = open(lockfile, "w")
+    fcntl.flock(holder, fcntl.LOCK_EX)
+    monkeypatch.setenv("HOUJINZEI_LOCK_HELD", "1")
+    try:
+        with vault_lock(timeout=0, path=str(lockfile)):
+            pass
+    finally:
+        holder.close()
@@ -0,0 +1,164 @@
+"""komekome_client のテスト（komekome_emulator を相手に実際に HTTP で送る）。"""
+
+import json
+import socket
+
+import pytest
+
+from lib.komekome_client import ClientError, KomekomeClient, mark_processed, pull_results, push_many
+from lib.komekome_emulator import Emulator, Response, serve
+
+TOKEN = "test-token"
+
+
+class FlakyEmulator(Emulator):
+    """最初の failures 回だけ 503 を返す。"""
+
+    def __init__(self, token, failures, retry_after=None):
+        super().__init__(token)
+        self.failures = failures
+        self.retry_after = retry_after
+        self.calls = 0
+
+    def handle(self, method, url, headers, body=b""):
+        self.calls += 1
+        if self.calls <= self.failures:
+            headers = {"Retry-After": self.retry_after} if self.retry_after else {}
+            return Response(503, b'{"error":"busy"}', headers)
+        return super().handle(method, url, headers, body)
+
+
+class LegacyEmulator(Emulator):
+    """一括の処理済みマーク（PUT /result）がない古いデプロイ。"""
+
+    def _routes(self, path):
+        routes = super()._routes(path)
+        if path == "/api/komekome/result":
+            routes.pop("PUT")
+        return routes
+
+
+@pytest.fixture
+def running():
+    servers = []
+
+    def start(emulator):
+        server = serve(emulator)
+        servers.append(server)
+        return server.url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def _export(tmp_path, **payloads):
+    export = tmp_path / "50_エクスポート"
+    export.mkdir(exist_ok=True)
+    for filename, payload in payloads.items():
+        (export / f"{filename}.json").write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    return export
+
+
+def test_connections_are_reused(running):
+    url = running(Emulator(TOKEN))
+    with KomekomeClient(url, TOKEN) as client:
+        for _ in range(5):
+            assert client.request("GET", "/api/komekome/today")[0] == 200
+        assert client.connections_opened == 1
+        assert [t.reused for t in client.timings] == [False, True, True, True, True]
+
+
+def test_retries_with_backoff_and_retry_after(running):
+    emulator = FlakyEmulator(TOKEN, failures=2, retry_after="0.25")
+    delays = []
+    with KomekomeClient(running(emulator), TOKEN, sleep=delays.append) as client:
+        status, _ = client.request("GET", "/api/komekome/today")
+    assert status == 200
+    assert delays == [0.25, 0.25]
+    assert client.timings[-1].attempts == 3
+
+    emulator = FlakyEmulator(TOKEN, failures=10)
+    delays = []
+    with KomekomeClient(running(emulator), TOKEN, max_attempts=3, backoff=1, sleep=delays.append) as client:
+        status, _ = client.request("GET", "/api/komekome/today")
+    assert status == 503  # 最後の応答をそのまま返す
+    assert len(delays) == 2
+    assert 0.5 <= delays[0] <= 1 and 1 <= delays[1] <= 2
+
+
+def test_connection_errors_raise_after_retries():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]  # 閉じたポート
+    delays = []
+    client = KomekomeClient(f"http://127.0.0.1:{port}", TOKEN, max_attempts=3, sleep=delays.append)
+    with pytest.raises(ClientError):
+        client.request("GET", "/api/komekome/today")
+    assert len(delays) == 2
+    assert client.timings[-1].status is None
+
+
+def test_push_many_sends_keys_in_parallel_and_skips_unchanged(running, tmp_path):
+    emulator = Emulator(TOKEN)
+    export = _export(
+        tmp_path,
+        problems_master={"version": 1, "problems": {"p1": {"book": "計算1-1"}}},
+        today_problems={"version": 1, "topics": []},
+        topics_data={"version": 1, "topics": [{"id": "t1"}]},
+        dashboard_data={"version": 1, "totals": {}, "categories": []},
+        weekly_schedule={"week_start": "2026-10-19", "scope_categories": ["所得計算"]},
+    )
+    names = ["problems", "today", "topics", "dashboard", "schedule"]
+    with KomekomeClient(running(emulator), TOKEN) as client:
+        first = push_many(client, names, export, optional=["import"])
+        assert [(o.name, o.error) for o in first][-1] == ("schedule", None)  # schedule は最後
+        assert {o.name: o.result.mode for o in first} == dict.fromkeys(names, "posted")
+        assert emulator.kv.get_json("weekly_schedule")["week_start"] == "2026-10-19"
+
+        second = push_many(client, names, export)
+        assert {o.name: o.result.mode for o in second} == {
+            "problems": "skipped",
+            "today": "posted",  # 直前の schedule PUT でサーバーが作り直したので送り直す
+            "topics": "skipped",
+            "dashboard": "skipped",
+            "schedule": "posted",  # PUT でサーバーが today を作り直すので毎回送る
+        }
+        assert client.connections_opened <= 4
+
+        missing = push_many(client, ["theory"], export)
+        assert missing[0].error and not missing[0].optional
+
+
+def _seed_results(client, n):
+    for i in range(n):
+        body = {"session_id": f"s{i:03d}", "session_date": "2026-10-19", "results": [{"topic_id": "t1", "answer": i}]}
+        assert client.request("POST", "/api/komekome/result", json.dumps(body).encode())[0] == 200
+
+
+def test_pull_marks_sessions_processed_in_one_request(running, tmp_path):
+    emulator = Emulator(TOKEN)
+    with KomekomeClient(running(emulator), TOKEN) as client:
+        _seed_results(client, 5)
+        client.timings.clear()
+
+        results_file = tmp_path / "komekome_results.json"
+        assert pull_results(client, results_file, tmp_path / "backup", "20261019_000000") == 5
+        merged = json.loads(results_file.read_text(encoding="utf-8"))
+        assert merged["session_id"] == "s004"
+        assert [r["answer"] for r in merged["results"]] == [0, 1, 2, 3, 4]
+        assert (tmp_path / "backup" / "komekome_results_20261019_000000.json").exists()
+        assert [(t.method, t.path) for t in client.timings] == [
+            ("GET", "/api/komekome/result"),
+            ("PUT", "/api/komekome/result"),
+        ]
+
+        assert pull_results(client, results_file, tmp_path / "backup", "20261019_000001") == 0
+
+
+def test_mark_processed_falls_back_to_per_session_requests(running, capsys):
+    with KomekomeClient(running(LegacyEmulator(TOKEN)), TOKEN) as client:
+        _seed_results(client, 3)
+        assert sorted(mark_processed(client, ["s000", "s001", "s002", "nope"])) == ["s000", "s001", "s002"]
+        assert "processed マーク失敗 (nope)" in capsys.readouterr().err
+        assert client.get_json("/api/komekome/result")["results"] == []
@@ -0,0 +1,210 @@
+"""komekome_emulator のテスト（Python 版と、本物の functions を Node で動かす local_functions.mjs の両方に同じ検証をする）。"""
+
+import gzip
+import json
+import shutil
+from urllib.parse import quote
+
+import pytest
+
+from lib.komekome_client import KomekomeClient
+from lib.komekome_emulator import Emulator, FunctionsServer, SqliteKVStore, serve
+
+TOKEN = "test-token"
+HAS_NODE = shutil.which("node") is not None
+BACKENDS = ["python", pytest.param("node", marks=pytest.mark.skipif(not HAS_NODE, reason="node がない"))]
+
+
+def _start(backend, pages_dir):
+    if backend == "python":
+        return serve(Emulator(TOKEN, pages_dir=pages_dir))
+    return FunctionsServer(TOKEN, pages_dir=pages_dir)
+
+
+@pytest.fixture(params=BACKENDS)
+def api(request, tmp_path):
+    pages = tmp_path / "pages"
+    pages.mkdir()
+    server = _start(request.param, pages)
+    with KomekomeClient(server.url, TOKEN) as client:
+        yield client, pages
+    server.shutdown()
+
+
+def _send(client, method, path, data=None, **headers):
+    body = None if data is None else json.dumps(data, ensure_ascii=False).encode("utf-8")
+    status, raw = client.request(method, path, body, headers)
+    return status, json.loads(raw) if raw else None
+
+
+def test_auth_routes_and_methods(api):
+    client, _ = api
+    bad = KomekomeClient(client.api_url, "wrong")
+    assert _send(bad, "GET", "/api/komekome/today") == (401, {"error": "Unauthorized"})
+    assert _send(client, "GET", "/api/komekome/nope")[0] == 404
+    assert client.request("DELETE", "/api/komekome/today")[0] == 405
+    assert client.request("OPTIONS", "/api/komekome/attempts")[0] == 200
+    assert _send(client, "GET", "/api/komekome/theory") == (200, {"version": 0, "total": 0, "questions": []})
+
+
+def test_attempts_append_dedup_and_update(api):
+    client, _ = api
+    a1 = {"id": "a1", "date": "2026-10-01", "problem_id": "calc-4-1-001", "result": "○"}
+    a2 = {"id": "a2", "date": "2026-10-01", "problem_id": "calc-4-1-002", "result": "×"}
+    assert _send(client, "POST", "/api/komekome/attempts", [a1, a2])[1] == {"ok": True, "added": 2, "total": 2}
+    assert _send(client, "POST", "/api/komekome/attempts", {"attempts": [a2, {"date": "x"}]})[1] == {"ok": True, "added": 0, "total": 2}
+    assert _send(client, "POST", "/api/komekome/attempts", [])[0] == 400
+
+    status, data = _send(client, "PUT", "/api/komekome/attempts", {"id": "a2", "memo": "再計算"})
+    assert status == 200 and data["updated"] == {**a2, "memo": "再計算"}
+    assert _send(client, "PUT", "/api/komekome/attempts", {"id": "nope"})[0] == 404
+    assert _send(client, "PUT", "/api/komekome/attempts", {"memo": "x"})[0] == 400
+    assert [a["id"] for a in _send(client, "GET", "/api/komekome/attempts")[1]["attempts"]] == ["a1", "a2"]
+
+
+def _problem(pid, kind, category, rank, topic, page=3, **extra):
+    return {
+        "id": pid, "book": "計算4-1", "number": "問題1", "title": f"{topic}の問題", "type": kind,
+        "page": page, "time_min": 10, "rank": rank, "scope": "個別",
+        "normalized_topics": [topic], "parent_category": category, **extra,
+    }
+
+
+def test_schedule_put_regenerates_today_like_schedule_js(api):
+    client, _ = api
+    problems = [
+        _problem("calc-4-1-001", "計算", "所得計算", "A", "交際費"),
+        _problem("calc-4-1-002", "計算", "所得計算", "C", "寄附金", page=12),
+        _problem("calc-4-1-003", "計算", "所得計算", "B", "減価償却"),  # 2 回間違えている
+        _problem("calc-4-1-004", "計算", "所得計算", "A", "引当金"),  # 卒業済み（3 回中 2 回正解）
+        _problem("calc-4-1-005", "計算", "税額計算", "A", "税額控除"),  # 範囲外
+        _problem("theory-001", "理論", "所得計算", "B", "受取配当", page=0),
+    ]
+    del problems[-1]["scope"]  # JSON.stringify と同じく、ない項目は today にも出さない
+    _send(client, "POST", "/api/komekome/problems", {"version": 1, "problems": {p["id"]: p for p in problems}})
+    attempts = [
+        {"id": f"a{i}", "date": "2026-01-0" + str(i), "problem_id": pid, "result": result}
+        for i, (pid, result) in enumerate([
+            ("calc-4-1-003", "×"), ("calc-4-1-003", "×"),
+            ("calc-4-1-004", "○"), ("calc-4-1-004", "×"), ("calc-4-1-004", "○"),
+        ], 1)
+    ]
+    _send(client, "POST", "/api/komekome/attempts", attempts)
+
+    schedule = {"week_start": "2026-10-19", "scope_categories": ["所得計算"], "calc_count": 2, "theory_count": 1}
+    status, data = _send(client, "PUT", "/api/komekome/schedule", schedule)
+    assert status == 200 and data["regenerated"] is True and data["total_problems"] == 4
+
+    today = _send(client, "GET", "/api/komekome/today")[1]
+    assert today["selection_policy"] == "worker-schedule-smart"
+    assert today["weekly_schedule"] == {"week_start": "2026-10-19", "scope_categories": ["所得計算"]}
+    picked = [p for t in today["topics"] for p in t["problems"]]
+    # 未着手（ランク A が先）→ 理論 → 卒業済みのローテーション
+    assert [p["problem_id"] for p in picked] == ["calc-4-1-001", "calc-4-1-002", "theory-001", "calc-4-1-004"]
+    assert picked[1]["page_image_key"] == "計算4-1/012.webp"
+    assert picked[2]["page_image_key"] is None and "scope" not in picked[2]
+    assert today["topics"][0]["topic_id"] == "所得計算/交際費"
+
+    schedule_back = _send(client, "GET", "/api/komekome/schedule")[1]
+    assert schedule_back["calc_count"] == 2 and schedule_back["updated_at"]
+
+    status, data = _send(client, "POST", "/api/komekome/schedule", {"scope_categories": []})
+    assert (status, data["regenerated"], data["total_problems"]) == (200, False, 0)
+
+
+def test_page_images_come_from_the_pages_directory(api):
+    client, pages = api
+    (pages / "計算4-1").mkdir()
+    (pages / "計算4-1" / "003.webp").write_bytes(b"RIFF....WEBP")
+    (pages.parent / "secret.webp").write_bytes(b"x")
+
+    status, body = client.request("GET", "/api/komekome/page-image/" + quote("計算4-1/003.webp"))
+    assert (status, body) == (200, b"RIFF....WEBP")
+    assert client.request("GET", "/api/komekome/page-image/" + quote("計算4-1/999.webp"))[0] == 404
+    assert client.request("GET", "/api/komekome/page-image/%2E%2E/secret.webp")[0] == 404
+    assert _send(client, "GET", "/api/komekome/page-image") == (400, {"error": "Path required"})
+
+
+# 時刻や自動採番のように実行ごとに変わる値
+_VOLATILE = {"stored_at", "updated_at", "processed_at", "generated_at", "generated_date"}
+
+
+def _normalize(value):
+    if isinstance(value, dict):
+        return {k: "<t>" if k in _VOLATILE else _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def _conversation(client):
+    """コマンド・PWA が使う操作を一通り送り、(ステータス, 応答) の列を返す。"""
+    topics = {"version": 1, "categories": ["所得計算"], "topics": [{"id": f"t{i}", "body": "論点" * 300} for i in range(3)]}
+    steps = [
+        ("POST", "/api/komekome/topics", topics, {"X-Komekome-Hash": "h1"}),
+        ("GET", "/api/komekome/topics?hash", None, {}),
+        ("PATCH", "/api/komekome/topics", {"base": "h1", "hash": "h2", "ops": [{"op": "replace", "path": "/topics/0/body", "value": "短い"}]}, {}),
+        ("PATCH", "/api/komekome/topics", {"base": "h1", "hash": "h3", "ops": []}, {}),
+        ("PATCH", "/api/komekome/topics", {"base": "h2", "hash": "h3", "ops": [{"op": "remove", "path": "/nope"}]}, {}),
+        ("GET", "/api/komekome/topics", None, {}),
+        ("POST", "/api/komekome/today", {"topics": "x"}, {}),
+        ("POST", "/api/komekome/dashboard", {"totals": {}, "categories": []}, {}),
+        ("GET", "/api/komekome/dashboard", None, {}),
+        ("POST", "/api/komekome/import", {"questions": [1], "generated_date": "2026-10-19"}, {}),
+        ("GET", "/api/komekome/import", None, {}),
+        ("POST", "/api/komekome/result", {"session_id": "s1", "results": [{"topic_id": "t0"}]}, {}),
+        ("POST", "/api/komekome/result", {"session_id": "s2", "results": []}, {}),
+        ("PUT", "/api/komekome/result", {"session_ids": ["s1", "zz"]}, {}),
+        ("PUT", "/api/komekome/result", {"session_ids": [""]}, {}),
+        ("PUT", "/api/komekome/result/zz/processed", {}, {}),
+        ("GET", "/api/komekome/result", None, {}),
+        ("POST", "/api/komekome/attempts", [{"id": "a1", "problem_id": "p", "result": "○", "date": "2026-10-01"}], {}),
+        ("PUT", "/api/komekome/schedule", {"scope_categories": ["所得計算"]}, {}),
+        ("GET", "/api/komekome/schedule", None, {}),
+    ]
+    seen = [_send(client, method, path, data, **headers) for method, path, data, headers in steps]
+    # 本文の符号化: gzip は展開し、Workers で展開できない br と壊れた本文は 400
+    raw = json.dumps({"topics": []}).encode()
+    for encoding, body in (("gzip", gzip.compress(raw)), ("br", raw), ("gzip", b"not gzip")):
+        status, resp = client.request("POST", "/api/komekome/today", body, {"Content-Encoding": encoding})
+        seen.append((status, json.loads(resp)))
+    return _normalize(seen)
+
+
+@pytest.mark.skipif(not HAS_NODE, reason="node がない")
+def test_python_emulator_matches_the_real_functions(tmp_path):
+    answers = []
+    for backend in ("python", "node"):
+        server = _start(backend, None)
+        try:
+            with KomekomeClient(server.url, TOKEN) as client:
+                answers.append(_conversation(client))
+        finally:
+            server.shutdown()
+    python, node = answers
+    assert [s for s, _ in python] == [s for s, _ in node]
+    assert python == node
+
+
+def test_sqlite_kv_persists_values_metadata_and_key_order(tmp_path):
+    path = tmp_path / "kv.sqlite3"
+    kv = SqliteKVStore(path)
+    kv.put("result:s_b", '{"n":2}')
+    kv.put("result:s_a", '{"n":1}', {"hash": "h"})
+    kv.put("results_other", "{}")
+    kv.put("result:s_a", '{"n":3}', {"hash": "h2"})
+    kv.close()
+
+    kv = SqliteKVStore(path)
+    assert kv.get_with_metadata("result:s_a") == ('{"n":3}', {"hash": "h2"})
+    assert kv.get_with_metadata("result:s_b") == ('{"n":2}', None)
+    assert kv.get_json("missing") is None
+    assert kv.list("result:") == ["result:s_a", "result:s_b"]
+
+    server = serve(Emulator(TOKEN, kv))
+    try:
+        with KomekomeClient(server.url, TOKEN) as client:
+            assert [r["n"] for r in client.get_json("/api/komekome/result")["results"]] == [3, 2]
+    finally:
+        server.shutdown()
+        kv.close()
@@ -0,0 +1,155 @@
+"""komekome_push のテスト（komekome_emulator を相手に KomekomeClient で実際に HTTP で送る）。"""
+
+import json
+import random
+
+import pytest
+
+from lib.komekome_client import KomekomeClient
+from lib.komekome_emulator import Emulator, serve
+from lib.komekome_push import (
+    ENDPOINTS,
+    PushState,
+    apply_patch,
+    compress,
+    content_hash,
+    diff,
+    encode_json,
+    push,
+)
+
+TOKEN = "test-token"
+
+
+@pytest.fixture
+def api():
+    emulator = Emulator(TOKEN)
+    server = serve(emulator)
+    with KomekomeClient(server.url, TOKEN) as client:
+        yield emulator, client
+    server.shutdown()
+
+
+def _problems(n):
+    return {
+        "version": 1,
+        "generated_at": "2026-01-01T00:00:00",
+        "problems": {f"p{i:03d}": {"book": "計算1-1", "page": i, "answer": "x" * 40} for i in range(n)},
+    }
+
+
+def test_diff_roundtrip():
+    rng = random.Random(0)
+    for _ in range(100):
+        old = {f"k{i}": rng.choice([i, [i, i + 1], {"a": i, "b": [1, 2]}]) for i in range(rng.randint(0, 6))}
+        new = {k: v for k, v in old.items() if rng.random() > 0.3}
+        new.update({f"n{i}": {"x/y~": i} for i in range(rng.randint(0, 2))})
+        if "k1" in new and isinstance(new["k1"], dict):
+            new["k1"] = {**new["k1"], "b": [1, 3]}
+        assert apply_patch(old, diff(old, new)) == new
+
+
+def test_content_hash_ignores_generated_time_and_key_order():
+    a = {"topics": [1], "generated_at": "2026-01-01", "x": 1}
+    b = {"x": 1, "generated_at": "2026-02-01", "topics": [1]}
+    assert content_hash(a) == content_hash(b)
+    assert content_hash(a) != content_hash({**a, "x": 2})
+
+
+def test_unchanged_payload_is_skipped_and_small_change_is_patched(api, tmp_path):
+    emulator, transport = api
+    state = PushState(tmp_path / "_sync")
+    endpoint = ENDPOINTS["problems"]
+    payload = _problems(50)
+
+    first = push(endpoint, payload, transport, state)
+    assert first.mode == "posted"
+    assert first.response["total"] == 50
+
+    again = push(endpoint, {**payload, "generated_at": "2026-01-02T00:00:00"}, transport, state)
+    assert again.mode == "skipped"
+
+    payload["problems"]["p007"]["answer"] = "changed"
+    del payload["problems"]["p010"]
+    patched = push(endpoint, payload, transport, PushState(tmp_path / "_sync"))
+    assert (patched.mode, patched.ops) == ("patched", 2)
+    assert patched.sent < patched.full / 10
+    assert emulator.kv.get_json("problems_master") == payload
+
+
+def test_patch_falls_back_to_post_when_server_value_changed(api, tmp_path):
+    emulator, transport = api
+    state = PushState(tmp_path / "_sync")
+    endpoint = ENDPOINTS["topics"]
+    payload = {"version": 1, "categories": ["法人税"], "topics": [{"id": f"t{i}", "name": "論点"} for i in range(30)]}
+    push(endpoint, payload, transport, state)
+
+    # 別の端末などから全体が書き換えられた（ハッシュなし）
+    status, _ = transport.request("POST", endpoint.path, b'{"topics": []}')
+    assert status == 200
+
+    payload["topics"][0]["name"] = "変更"
+    result = push(endpoint, payload, transport, state)
+    assert result.mode == "posted"
+    assert emulator.kv.get_json("topics_data") == payload
+
+
+def test_today_is_resent_when_server_regenerated_it(api, tmp_path):
+    emulator, transport = api
+    state = PushState(tmp_path / "_sync")
+    endpoint = ENDPOINTS["today"]
+    payload = {"version": 1, "topics": [{"topic_id": "t1", "problems": []}]}
+    assert push(endpoint, payload, transport, state).mode == "posted"
+    assert push(endpoint, payload, transport, state).mode == "skipped"
+
+    # schedule.js がメタデータなしで today_problems を作り直した
+    emulator.kv.put("today_problems", '{"topics":[]}')
+    assert push(endpoint, payload, transport, state).mode == "posted"
+    assert emulator.kv.get_json("today_problems") == payload
+
+
+def test_emulator_rejects_bad_token_and_invalid_patch(api, tmp_path):
+    emulator, transport = api
+    bad = KomekomeClient(transport.api_url, "wrong")
+    assert bad.request("GET", "/api/komekome/problems")[0] == 401
+
+    state = PushState(tmp_path / "_sync")
+    push(ENDPOINTS["problems"], _problems(3), transport, state)
+    base = state.hash("problems_master")
+    body = b'{"base": "%s", "hash": "h", "ops": [{"op": "remove", "path": "/nope"}]}' % base.encode()
+    status, resp = transport.request("PATCH", "/api/komekome/problems", body)
+    assert status == 400
+    assert b"Invalid patch" in resp
+
+
+def test_compressed_round_trip(api, tmp_path):
+    emulator, transport = api
+    payload = {
+        "version": 1,
+        "categories": ["所得計算"],
+        "topics": [{"id": f"t{i}", "body": f"交際費の損金不算入（論点{i}）。" * 20} for i in range(50)],
+    }
+    full = len(json.dumps(payload, ensure_ascii=False, indent=2).encode("utf-8"))
+
+    result = push(ENDPOINTS["topics"], payload, transport, PushState(tmp_path / "_sync"))
+    assert result.mode == "posted"
+    assert transport.timings[-1].sent < full / 5
+    assert emulator.kv.get_json("topics_data") == payload
+
+    status, body = transport.request("GET", "/api/komekome/topics")
+    assert status == 200
+    assert json.loads(body) == payload
+    assert transport.timings[-1].received < len(body) / 5  # 応答も圧縮されて届く
+
+    plain = KomekomeClient(transport.api_url, TOKEN, encoding=None)
+    assert plain.request("POST", "/api/komekome/topics", encode_json(payload))[0] == 200
+    assert plain.timings[-1].sent == len(encode_json(payload))
+
+
+def test_emulator_rejects_undecodable_bodies():
+    headers = {"Authorization": f"Bearer {TOKEN}", "Content-Encoding": "br"}
+    resp = Emulator(TOKEN).handle("POST", "/api/komekome/today", headers, compress(b'{"topics": []}', "gzip"))
+    assert resp.status == 400
+    headers["Content-Encoding"] = "gzip"
+    assert Emulator(TOKEN).handle("POST", "/api/komekome/today", headers, b"not gzip").status == 400
+    assert Emulator(TOKEN).handle("POST", "/api/komekome/today", headers, compress(b'{"topics": []}', "gzip")).status == 200
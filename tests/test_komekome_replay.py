@@ -0,0 +1,60 @@
+"""komekome_replay のテスト（komekome_sync.sh push-all / pull と writeback を、ローカルの API 相手に 1 週間分流す）。"""
+
+import json
+import re
+import shutil
+
+import pytest
+
+from lib.houjinzei_common import VaultPaths, read_frontmatter
+from lib.komekome_client import KomekomeClient
+from lib.komekome_emulator import Emulator, FunctionsServer, serve
+from lib.komekome_push import content_hash
+from lib.komekome_replay import replay
+
+TOKEN = "test-token"
+DAYS = 7  # 2026-10-01（木）から。月曜のスケジュール変更と問題集の追加を含む
+
+pytestmark = pytest.mark.skipif(shutil.which("flock") is None, reason="flock がない")
+
+
+@pytest.fixture(params=["python", pytest.param("node", marks=pytest.mark.skipif(shutil.which("node") is None, reason="node がない"))])
+def server(request):
+    server = serve(Emulator(TOKEN)) if request.param == "python" else FunctionsServer(TOKEN)
+    yield server
+    server.shutdown()
+
+
+def test_week_of_sync_round_trips_through_the_vault(server, tmp_path):
+    vault = tmp_path / "vault"
+    report = replay(vault, server.url, TOKEN, days=DAYS)
+    vp = VaultPaths(vault)
+    assert report.sessions > 0 and report.attempts > 0
+
+    # PWA が送った kome_count が、pull → writeback で論点ノートに積み上がっている
+    for path in vp.topics.rglob("*.md"):
+        fm, _ = read_frontmatter(path)
+        topic_id = path.relative_to(vp.topics).with_suffix("").as_posix()
+        assert fm["kome_total"] == report.expected_kome.get(topic_id, 0), topic_id
+
+    logs = [p.read_text(encoding="utf-8") for p in (vp.exercise_log / "komekome").glob("*.md")]
+    assert sum(int(re.search(r"^total_questions: (\d+)$", text, re.M).group(1)) for text in logs) == report.results
+
+    with KomekomeClient(server.url, TOKEN) as client:
+        assert client.get_json("/api/komekome/result")["results"] == []
+        for path, filename in (("problems", "problems_master.json"), ("topics", "topics_data.json"), ("dashboard", "dashboard_data.json")):
+            local = json.loads((vp.export / filename).read_text(encoding="utf-8"))
+            assert content_hash(client.get_json(f"/api/komekome/{path}")) == content_hash(local), path
+        schedule = client.get_json("/api/komekome/schedule")
+        assert schedule["scope_categories"]
+        assert json.loads((vp.export / "weekly_schedule.json").read_text(encoding="utf-8")) == schedule
+        assert len(client.get_json("/api/komekome/attempts")["attempts"]) == report.attempts
+
+    rows = report.by_command()
+    assert all(set(row["statuses"]) == {200} for row in rows.values())
+    # 問題集の追加や論点の書き戻しは差分で送り、変わらない日のキーは送らない
+    push = [r for r in report.requests if r["command"] == "push"]
+    assert any(r["method"] == "PATCH" for r in push)
+    assert sum(r["method"] != "GET" for r in push) < 4 * DAYS
+    assert DAYS <= rows["pull"]["requests"] <= 2 * DAYS  # 毎日 GET、結果があれば一括の処理済みマーク 1 回
+    assert len(report.wall["push-all"]) == len(report.wall["pull"]) == DAYS
@@ -0,0 +1,88 @@
+"""llm_cache のテスト。"""
+
+import os
+import subprocess
+import sys
+
+from lib.llm_cache import LLMCache, cache_key
+
+
+def test_cache_key_depends_on_engine_template_and_file_content(tmp_path):
+    a = tmp_path / "a.txt"
+    b = tmp_path / "b.txt"
+    a.write_text("本文", encoding="utf-8")
+    b.write_text("本文", encoding="utf-8")
+
+    base = cache_key("gemini", "PROMPT", a)
+    assert cache_key("gemini", "PROMPT", b) == base  # パスではなく内容で決まる
+    assert cache_key("claude", "PROMPT", a) != base
+    assert cache_key("gemini", "PROMPT2", a) != base
+    assert cache_key("gemini", "PROMPT", "本文") != base
+    # 区切りが曖昧にならない
+    assert cache_key("gemini", "ab", "c") != cache_key("gemini", "a", "bc")
+
+    b.write_text("本文2", encoding="utf-8")
+    assert cache_key("gemini", "PROMPT", b) != base
+
+
+def test_get_put_roundtrip(tmp_path):
+    cache = LLMCache(tmp_path)
+    key = cache_key("gemini", "p", "x")
+    assert cache.get(key) is None
+    cache.put(key, "応答\n```json\n[]\n```\n")
+    assert cache.get(key) == "応答\n```json\n[]\n```\n"
+    assert cache.stats() == (1, len("応答\n```json\n[]\n```\n".encode("utf-8")))
+
+
+def test_eviction_removes_least_recently_used(tmp_path):
+    cache = LLMCache(tmp_path, max_bytes=250)
+    keys = [cache_key("gemini", "p", str(i)) for i in range(3)]
+    for i, key in enumerate(keys[:2]):
+        cache.put(key, "x" * 100)
+        path = cache._path(key)
+        os.utime(path, (1000 + i, 1000 + i))
+
+    cache.get(keys[0])  # keys[0] が最近使われた
+    cache.put(keys[2], "y" * 100)
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == "x" * 100
+    assert cache.get(keys[2]) == "y" * 100
+
+
+def test_cli_key_get_put(tmp_path):
+    env = dict(os.environ, PYTHONPATH=os.getcwd(), LLM_CACHE_DIR=str(tmp_path / "cache"))
+    src = tmp_path / "text.txt"
+    src.write_text("--- ページ 1 ---\n", encoding="utf-8")
+
+    def cli(*args, **kw):
+        return subprocess.run([sys.executable, "lib/llm_cache.py", *args], env=env, capture_output=True, **kw)
+
+    key = cli("key", "--engine", "gemini", "--template", "P", "--input-file", str(src), text=True).stdout.strip()
+    assert key == cache_key("gemini", "P", src)
+    assert cli("get", key).returncode == 1
+    assert cli("put", key, input=b"raw output").returncode == 0
+    hit = cli("get", key)
+    assert hit.returncode == 0 and hit.stdout == b"raw output"
+
+    off = dict(env, LLM_CACHE="0")
+    assert subprocess.run([sys.executable, "lib/llm_cache.py", "get", key], env=off).returncode == 1
+
+
+def test_put_walks_cache_only_when_running_size_exceeds_limit(tmp_path, monkeypatch):
+    cache = LLMCache(tmp_path, max_bytes=1000)
+    cache.put(cache_key("gemini", "p", "0"), "x" * 100)  # .size がないので一度だけ走査する
+
+    walks = []
+    entries = LLMCache._entries
+    monkeypatch.setattr(LLMCache, "_entries", lambda self: walks.append(1) or entries(self))
+    for i in range(1, 9):
+        cache.put(cache_key("gemini", "p", str(i)), "x" * 100)
+    cache.put(cache_key("gemini", "p", "1"), "x" * 100)  # 上書きは差分だけ数える
+    assert walks == []
+    assert (tmp_path / ".size").read_text() == "900"
+
+    cache.put(cache_key("gemini", "p", "9"), "x" * 200)
+    assert walks == [1]
+    assert cache.stats()[1] <= 1000
+    assert (tmp_path / ".size").read_text() == str(cache.stats()[1])
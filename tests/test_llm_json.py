@@ -0,0 +1,89 @@
+"""llm_json のテスト。"""
+
+import json
+
+import pytest
+
+from lib.llm_json import find_json, split_json_block, strip_trailing_commas
+
+
+def test_plain_and_fenced_json():
+    assert find_json('[{"id": 1}]') == [{"id": 1}]
+    assert find_json('説明です。\n```json\n{"a": [1, 2]}\n```\n以上') == {"a": [1, 2]}
+
+
+def test_prefers_fenced_then_longest_candidate():
+    text = '参考 [1] と [2, 3]。\n```json\n[{"id": "x"}]\n```\n補足 [4, 5, 6, 7]'
+    assert find_json(text, list) == [{"id": "x"}]
+    assert find_json("参考 [1] と本体 [1, 2, 3, 4]", list) == [1, 2, 3, 4]
+
+
+def test_brackets_inside_strings_and_escapes():
+    text = '前置き [注意] {見出し}\n[{"t": "[第1章] {x}", "q": "\\"]\\" ,"}]'
+    assert find_json(text, list) == [{"t": "[第1章] {x}", "q": '"]" ,'}]
+
+
+def test_wanted_type_filters_candidates():
+    text = '{"meta": 1}\n[1, 2]'
+    assert find_json(text, list) == [1, 2]
+    assert find_json(text, dict) == {"meta": 1}
+    with pytest.raises(ValueError):
+        find_json("JSON はありません [注意]", list)
+
+
+def test_repairs_trailing_comma():
+    assert find_json('[{"a": 1,}, {"b": [2, 3,],},]') == [{"a": 1}, {"b": [2, 3]}]
+    assert strip_trailing_commas('["a,]", 1,]') == '["a,]", 1]'
+
+
+def test_repairs_truncated_output():
+    items = [{"id": f"calc-4-1-{i:03d}", "topics": ["減価償却", "交際費"]} for i in range(1, 6)]
+    full = json.dumps(items, ensure_ascii=False)
+    # 最後の要素の途中で切れた出力（閉じフェンスもない）
+    truncated = "```json\n" + full[: full.index('{"id": "calc-4-1-005"') + 20]
+    assert find_json(truncated, list) == items[:4]
+    # 入れ子の途中で切れた場合は完結した要素だけを残して閉じる
+    assert find_json('[[1, 2], [3, 4', list) == [[1, 2], [3]]
+    assert find_json('{"topics": [{"a": 1}, {"b"', dict) == {"topics": [{"a": 1}]}
+
+
+def test_fence_inside_candidate_ends_it():
+    text = '[{"id": 1}, {"id": 2\n```\n本文'
+    assert find_json(text, list) == [{"id": 1}]
+
+
+def test_too_deep_nesting_is_value_error():
+    with pytest.raises(ValueError):
+        find_json("[" * 5000)
+    with pytest.raises(ValueError):
+        find_json("[" * 5000 + "]" * 5000)
+    # 深すぎる候補は飛ばし、ほかの候補を採る
+    assert find_json("x " + "[" * 5000 + "1" + "]" * 5000 + " 本体 [3]", list) == [3]
+
+
+def test_split_json_block_removes_block():
+    data, md = split_json_block("# 見出し\n```json\n[1, 2]\n```\n末尾")
+    assert data == [1, 2]
+    assert md == "# 見出し\n\n末尾"
+
+    data, md = split_json_block('# 構造\n\n```json\n{"topics": [1, 2,\n')
+    assert data == {"topics": [1, 2]}
+    assert md == "# 構造"
+
+
+def test_split_json_block_without_fence():
+    with pytest.raises(ValueError):
+        split_json_block('# 構造\n[{"a": 1}]\n本文')
+    data, md = split_json_block('# 構造\n[{"a": 1}]\n本文', unfenced=True)
+    assert data == [{"a": 1}]
+    assert md == "# 構造\n\n本文"
+    with pytest.raises(ValueError):
+        split_json_block("# 構造のみ", unfenced=True)
+
+
+def test_large_output_is_linear():
+    body = json.dumps([{"t": "[x] {y}", "n": i, "l": [i, [i]]} for i in range(40000)])
+    text = "前置き [\n" * 2000 + "```json\n" + body[:-5]
+    value = find_json(text, list)
+    assert len(value) == 40000
+    assert value[-1] == {"t": "[x] {y}", "n": 39999, "l": [39999]}  # 完結したフィールドまで残る
@@ -0,0 +1,141 @@
+"""page_render のテスト。"""
+
+import os
+
+import pytest
+
+from lib.page_render import (
+    VARIANTS,
+    RenderChunk,
+    atomic_save_webp,
+    crop_image_path,
+    page_image_path,
+    plan_chunks,
+    remove_stale_crops,
+    render_chunks,
+    save_variants,
+)
+
+
+def fake_render(chunk, dpi, quality):
+    """pypdfium2 の代わりにページ番号と PID を書く（プロセスプールから呼ばれる）。"""
+    rendered = []
+    messages = []
+    for page in chunk.pages:
+        if page > 50:
+            messages.append(f"警告: {chunk.book} ページ {page} は範囲外 (max=50)")
+            continue
+        page_image_path(chunk.out_dir, page).write_text(f"{page} {dpi} {os.getpid()}")
+        rendered.append(page)
+    return rendered, messages
+
+
+def _write_variants(out_dir, page):
+    for v in VARIANTS:
+        page_image_path(out_dir, page, v.name).write_bytes(b"old")
+
+
+def test_plan_skips_existing_outputs_and_missing_pdfs(tmp_path):
+    out = tmp_path / "page_images"
+    (out / "計算1-1").mkdir(parents=True)
+    _write_variants(out / "計算1-1", 2)
+    _write_variants(out / "計算1-1", 5)
+    crop_image_path(out / "計算1-1", 5, "calc-1-1-009").write_bytes(b"old")
+    page_image_path(out / "計算1-1", 3).write_bytes(b"old")  # バリアントがない旧出力は描き直す
+    pdfs = {"計算1-1": tmp_path / "計算1-1.pdf"}
+    crops = {"計算1-1": {5: [("calc-1-1-009", (0, 0, 1, 0.5))], 2: [("calc-1-1-004", (0, 0.5, 1, 1))]}}
+
+    chunks, stats = plan_chunks({"計算1-1": set(range(1, 12)), "不明": {1, 2}}, pdfs.get, out, chunk_pages=4, crops=crops)
+    assert [c.pages for c in chunks] == [[1, 2, 3, 4], [6, 7, 8, 9], [10, 11]]
+    assert chunks[0].crops == {2: [("calc-1-1-004", (0, 0.5, 1, 1))]}  # 切り抜きが足りないので描き直す
+    assert (stats.existing, stats.skipped) == (1, 2)
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_render_chunks_counts_and_reports(tmp_path, workers, capsys):
+    out = tmp_path / "計算1-1"
+    out.mkdir()
+    chunks = [RenderChunk("計算1-1", tmp_path / "x.pdf", pages, out) for pages in ([1, 2], [3, 4], [49, 50, 51])]
+
+    stats = render_chunks(chunks, dpi=150, workers=workers, render=fake_render)
+    assert (stats.rendered, stats.skipped) == (6, 1)
+    assert stats.errors == ["警告: 計算1-1 ページ 51 は範囲外 (max=50)"]
+    assert sorted(p.name for p in out.iterdir()) == ["001.webp", "002.webp", "003.webp", "004.webp", "049.webp", "050.webp"]
+    assert "[7/7]" in capsys.readouterr().out
+
+
+class _Image:
+    """PIL.Image の代わり（size / crop / copy / thumbnail / save だけ）。"""
+
+    def __init__(self, fail=False, size=(1600, 2200)):
+        self.fail = fail
+        self.size = size
+
+    def crop(self, box):
+        return _Image(self.fail, (box[2] - box[0], box[3] - box[1]))
+
+    def copy(self):
+        return _Image(self.fail, self.size)
+
+    def thumbnail(self, box):
+        scale = min(box[0] / self.size[0], box[1] / self.size[1], 1)
+        self.size = (round(self.size[0] * scale), round(self.size[1] * scale))
+
+    def save(self, f, fmt, quality):
+        f.write(f"{self.size[0]}x{self.size[1]} q{quality}".encode())
+        if self.fail:
+            raise OSError("disk full")
+
+
+def test_atomic_save_leaves_no_partial_file(tmp_path):
+    target = tmp_path / "001.webp"
+    atomic_save_webp(_Image(), target)
+    assert target.read_bytes() == b"1600x2200 q85"
+
+    with pytest.raises(OSError):
+        atomic_save_webp(_Image(fail=True), tmp_path / "002.webp")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["001.webp"]
+
+
+def test_is_current_and_on_rendered_hooks(tmp_path):
+    out = tmp_path / "page_images"
+    (out / "計算1-1").mkdir(parents=True)
+    for page in (1, 3):
+        _write_variants(out / "計算1-1", page)  # 1 は条件違いなので描き直す
+    chunks, stats = plan_chunks(
+        {"計算1-1": {1, 2, 3}}, lambda _: tmp_path / "x.pdf", out, is_current=lambda book, page, path, crops: page == 3
+    )
+    assert [c.pages for c in chunks] == [[1, 2]]
+    assert stats.existing == 1
+
+    recorded = []
+    render_chunks(chunks, dpi=200, workers=1, render=fake_render, on_rendered=lambda c, pages: recorded.extend(pages))
+    assert recorded == [1, 2]
+    assert page_image_path(out / "計算1-1", 1).read_text().startswith("1 200 ")
+
+
+def test_save_variants_writes_all_sizes_and_crops_from_one_render(tmp_path):
+    save_variants(_Image(), tmp_path, 7, crops=[("calc-1-1-002", (0.0, 0.5, 1.0, 1.0))])
+    sizes = {p.name: p.read_text() for p in tmp_path.iterdir()}
+    assert sizes == {
+        "007.thumb.webp": "320x440 q60",
+        "007.medium.webp": "960x1320 q75",
+        "007.webp": "1600x2200 q85",
+        "007.crop-calc-1-1-002.webp": "960x660 q80",
+    }
+
+
+def test_recut_removes_crops_no_longer_in_the_crop_set(tmp_path):
+    save_variants(_Image(), tmp_path, 7, crops=[("calc-1-1-002", (0, 0, 1, 0.5)), ("calc-1-1-003", (0, 0.5, 1, 1))])
+    save_variants(_Image(), tmp_path, 17, crops=[("calc-1-1-009", (0, 0, 1, 1))])
+    # calc-1-1-003 の bbox を消して 7 ページを描き直す。ほかのページの切り抜きは残す
+    save_variants(_Image(), tmp_path, 7, crops=[("calc-1-1-002", (0, 0, 1, 0.5))])
+    assert sorted(p.name for p in tmp_path.glob("*.crop-*")) == [
+        "007.crop-calc-1-1-002.webp",
+        "017.crop-calc-1-1-009.webp",
+    ]
+
+    # 描き直さないページの分は一覧と突き合わせて消す（問題ごと削除された場合など）
+    removed = remove_stale_crops(tmp_path, {7: [("calc-1-1-002", (0, 0, 1, 0.5))]})
+    assert [p.name for p in removed] == ["017.crop-calc-1-1-009.webp"]
+    assert crop_image_path(tmp_path, 7, "calc-1-1-002").exists()
@@ -0,0 +1,60 @@
+"""page_variants のテスト。"""
+
+from lib.houjinzei_common import VaultPaths
+from lib.page_variants import daily_set_bytes, main, page_image_variants
+
+
+def _write(path, size):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+
+
+def _images(root):
+    _write(root / "計算1-1" / "012.thumb.webp", 10)
+    _write(root / "計算1-1" / "012.medium.webp", 100)
+    _write(root / "計算1-1" / "012.webp", 1000)
+    _write(root / "計算1-1" / "012.crop-calc-1-1-003.webp", 40)
+    _write(root / "理論" / "005.webp", 800)  # バリアント導入前の出力
+
+
+def test_variants_list_only_local_files_smallest_first(tmp_path):
+    _images(tmp_path)
+    v = page_image_variants(tmp_path, "計算1-1", 12, "calc-1-1-003")
+    assert list(v) == ["thumb", "crop", "medium", "full"]
+    assert v["crop"] == "計算1-1/012.crop-calc-1-1-003.webp"
+    assert page_image_variants(tmp_path, "計算1-1", 12, "calc-1-1-004") == {
+        "thumb": "計算1-1/012.thumb.webp",
+        "medium": "計算1-1/012.medium.webp",
+        "full": "計算1-1/012.webp",
+    }
+    assert page_image_variants(tmp_path, "理論", 5) == {"full": "理論/005.webp"}
+    assert page_image_variants(tmp_path, "計算1-1", 0) == {}
+
+
+def test_daily_set_bytes_before_and_after(tmp_path):
+    _images(tmp_path)
+    payload = {"topics": [{"problems": [
+        {"problem_id": "calc-1-1-003", "book": "計算1-1", "page": 12, "page_image_key": "計算1-1/012.webp"},
+        {"problem_id": "calc-1-1-004", "book": "計算1-1", "page": 12, "page_image_key": "計算1-1/012.webp"},
+        {"problem_id": "theory-001", "book": "理論", "page": 5, "page_image_key": "理論/005.webp"},
+        {"problem_id": "theory-002", "book": "理論", "page": 9, "page_image_key": "理論/009.webp"},
+    ]}]}
+    r = daily_set_bytes(payload, tmp_path)
+    assert r.problems == 4
+    assert r.before == 1000 + 800  # 同じページの full は 1 回
+    assert r.initial == 10 + 40 + 100 + 800  # thumb + crop / medium、バリアントがなければ full
+    assert r.with_full == r.initial + 1000
+    assert r.missing == 1
+
+
+def test_report_cli_prints_markdown_table(tmp_path, monkeypatch, capsys):
+    vault = tmp_path / "vault"
+    _images(vault / "02_extracted" / "page_images")
+    today = tmp_path / "today_problems.json"
+    today.write_text('{"generated_date": "2026-10-19", "topics": [{"problems": '
+                     '[{"problem_id": "calc-1-1-003", "book": "計算1-1", "page": 12}]}]}', encoding="utf-8")
+    monkeypatch.setattr("lib.page_variants.VaultPaths", lambda: VaultPaths(vault))
+    assert main(["report", str(today)]) == 0
+    out = capsys.readouterr().out
+    assert "| 2026-10-19 | 1 |" in out
+    assert "95%" in out
@@ -0,0 +1,117 @@
+"""pdf_text のテスト。"""
+
+import shutil
+
+import pytest
+
+import lib.pdf_text as pdf_text
+from lib.page_text_store import PageTextStore, pdf_sha256
+from lib.pdf_text import page_batches, page_texts, write_page_text
+
+
+def _make_pdf(path, page_texts):
+    """ASCII テキストを 1 行ずつ置いた最小構成の PDF を書く（空文字のページは白紙）。"""
+    n = len(page_texts)
+    objs = [b"<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(n))
+    objs.append(f"<< /Type /Pages /Kids [{kids}] /Count {n} >>".encode())
+    font_id = 3 + 2 * n
+    for i, text in enumerate(page_texts):
+        content_id = 4 + 2 * i
+        objs.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents {content_id} 0 R "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> >>".encode()
+        )
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode() if text else b""
+        objs.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objs.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objs, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    for off in offsets:
+        out += b"%010d 00000 n \n" % off
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref)
+    path.write_bytes(bytes(out))
+    return path
+
+
+@pytest.fixture
+def sample_pdf(tmp_path):
+    texts = [f"Page {i} body" if i % 5 else "" for i in range(1, 31)]
+    return _make_pdf(tmp_path / "sample.pdf", texts)
+
+
+def test_page_batches_cover_all_pages_in_order():
+    batches = page_batches(101, 4)
+    assert batches[0][0] == 0 and batches[-1][1] == 101
+    assert all(a[1] == b[0] for a, b in zip(batches, batches[1:]))
+    assert page_batches(0, 4) == []
+    assert page_batches(20, 1, [0, 1, 2, 7, 8, 19]) == [(0, 3), (7, 9), (19, 20)]
+
+
+@pytest.mark.parametrize("backend", ["pypdf", "pdfminer"])
+def test_parallel_output_matches_serial(sample_pdf, tmp_path, backend):
+    pytest.importorskip(backend)
+    serial = tmp_path / "serial.txt"
+    parallel = tmp_path / "parallel.txt"
+
+    assert write_page_text(str(sample_pdf), str(serial), backend, workers=1) == 30
+    assert write_page_text(str(sample_pdf), str(parallel), backend, workers=3) == 30
+
+    text = serial.read_text(encoding="utf-8")
+    assert parallel.read_text(encoding="utf-8") == text
+    headers = [line for line in text.splitlines() if line.startswith("--- ページ")]
+    assert headers == [f"--- ページ {i} ---" for i in range(1, 31) if i % 5]  # 白紙ページは出力しない
+    assert "Page 29 body" in text
+
+
+def test_store_hits_skip_extraction_across_paths(sample_pdf, tmp_path, monkeypatch):
+    pytest.importorskip("pypdf")
+    store = PageTextStore(tmp_path / "store")
+    first = tmp_path / "first.txt"
+    write_page_text(str(sample_pdf), str(first), "pypdf", workers=1, store=store)
+
+    sha = pdf_sha256(sample_pdf)
+    assert store.page_count(sha, "pypdf") == 30
+    assert "Page 2 body" in store.get(sha, "pypdf", 2)
+    assert store.get(sha, "pdfminer", 2) is None  # バックエンドごとに別キー
+
+    def _no_extract(*args):
+        raise AssertionError("should be served from the store")
+
+    monkeypatch.setattr(pdf_text, "extract_range", _no_extract)
+    monkeypatch.setattr(pdf_text, "page_count", _no_extract)
+    renamed = shutil.copy(sample_pdf, tmp_path / "renamed.pdf")
+    second = tmp_path / "second.txt"
+    assert write_page_text(str(renamed), str(second), "pypdf", workers=1, store=store) == 30
+    assert second.read_bytes() == first.read_bytes()
+    assert page_texts(str(renamed), [2, 99], "pypdf", store) == {2: store.get(sha, "pypdf", 2)}
+
+
+def test_partial_store_extracts_only_missing_pages(sample_pdf, tmp_path, monkeypatch):
+    pytest.importorskip("pypdf")
+    store = PageTextStore(tmp_path / "store")
+    texts = page_texts(str(sample_pdf), [3, 4, 12], "pypdf", store)
+    assert sorted(texts) == [3, 4, 12]
+
+    calls = []
+    real = pdf_text.extract_range
+
+    def _tracking(path, backend, start, end):
+        calls.append((start, end))
+        return real(path, backend, start, end)
+
+    monkeypatch.setattr(pdf_text, "extract_range", _tracking)
+    out = tmp_path / "out.txt"
+    write_page_text(str(sample_pdf), str(out), "pypdf", workers=1, store=store)
+    extracted = {i for start, end in calls for i in range(start, end)}
+    assert extracted == set(range(30)) - {2, 3, 11}
+
+    reference = tmp_path / "reference.txt"
+    write_page_text(str(sample_pdf), str(reference), "pypdf", workers=1)
+    assert out.read_bytes() == reference.read_bytes()
@@ -0,0 +1,100 @@
+"""problem_dedup のテスト。"""
+
+import random
+
+from lib.problem_dedup import find_duplicate_groups, jaccard, shingles, update_duplicate_groups
+from lib.problems_master import ProblemsMaster
+
+
+def _p(pid, book, title, topics, type_="計算"):
+    return {"id": pid, "book": book, "title": title, "type": type_, "normalized_topics": topics, "duplicate_group": None}
+
+
+def test_shingles_ignore_numbering_and_brackets():
+    a = shingles({"title": "問題 3 受取配当金の益金不算入（基本）", "normalized_topics": ["受取配当等"]})
+    b = shingles({"title": "受取配当金の益金不算入 基本", "normalized_topics": ["受取配当等"]})
+    assert a == b
+    assert "#受取配当等" in a
+
+
+def test_groups_near_duplicates_across_books_only():
+    problems = {
+        p["id"]: p
+        for p in [
+            _p("calc-1-1-001", "計算1-1", "受取配当金の益金不算入", ["受取配当等"]),
+            _p("calc-2-1-004", "計算2-1", "受取配当金の益金不算入（応用）", ["受取配当等"]),
+            _p("calc-2-1-005", "計算2-1", "受取配当金の益金不算入（応用2）", ["受取配当等"]),  # 同じ問題集内は比べない
+            _p("theory-010", "理論", "受取配当金の益金不算入", ["受取配当等"], "理論"),  # type が違う
+            _p("calc-1-1-002", "計算1-1", "交際費等の損金不算入", ["交際費"]),
+        ]
+    }
+    groups = find_duplicate_groups(problems)
+    assert groups["calc-1-1-001"] == groups["calc-2-1-004"] == "dup:calc-1-1-001"
+    assert "theory-010" not in groups
+    assert "calc-1-1-002" not in groups
+    # 計算2-1 同士は直接比べないが、計算1-1 を介して同じグループになり得る
+    assert groups.get("calc-2-1-005") in (None, "dup:calc-1-1-001")
+
+
+def test_pairs_are_found_when_first_bucket_member_is_ineligible():
+    # 同じ shingle なので全帯で同じバケットに入る。先頭は type 違い、2 番目は同じ問題集の別問題
+    problems = {
+        p["id"]: p
+        for p in [
+            _p("theory-010", "理論", "受取配当金の益金不算入", ["受取配当等"], "理論"),
+            _p("calc-1-1-001", "計算1-1", "受取配当金の益金不算入", ["受取配当等"]),
+            _p("calc-1-1-002", "計算1-1", "受取配当金の益金不算入", ["受取配当等"]),
+            _p("calc-2-1-004", "計算2-1", "受取配当金の益金不算入", ["受取配当等"]),
+            _p("calc-3-1-007", "計算3-1", "受取配当金の益金不算入", ["受取配当等"]),
+        ]
+    }
+    groups = find_duplicate_groups(problems)
+    assert "theory-010" not in groups
+    assert groups["calc-1-1-001"] == groups["calc-2-1-004"] == groups["calc-3-1-007"] == "dup:calc-1-1-001"
+    # 計算1-1 の 2 問目は代表ではないので、ほかの問題集とは直接比べない
+    assert groups.get("calc-1-1-002") in (None, "dup:calc-1-1-001")
+
+
+def test_lsh_finds_pairs_above_threshold_in_large_master():
+    rng = random.Random(0)
+    vocab = "減価償却交際費寄附金受取配当租税公課役員給与貸倒引当金圧縮記帳繰越欠損金"
+    problems = {}
+    twins = []
+    for i in range(1500):
+        title = "".join(rng.choice(vocab) for _ in range(14))
+        topic = f"論点{i % 97}"
+        problems[f"calc-1-1-{i:04d}"] = _p(f"calc-1-1-{i:04d}", "計算1-1", title, [topic])
+        if i % 10 == 0:
+            twin = f"calc-2-1-{i:04d}"
+            problems[twin] = _p(twin, "計算2-1", title[:-1] + "額", [topic])
+            twins.append((f"calc-1-1-{i:04d}", twin))
+
+    groups = find_duplicate_groups(problems)
+    found = sum(1 for a, b in twins if groups.get(a) is not None and groups.get(a) == groups.get(b))
+    assert found >= len(twins) * 0.95
+    for a, b in twins:
+        if a in groups:
+            assert jaccard(shingles(problems[a]), shingles(problems[b])) >= 0.6
+
+
+def test_update_is_incremental_and_writes_changed_shards_only(tmp_path):
+    master = ProblemsMaster(tmp_path)
+    master.merge([
+        _p("calc-1-1-001", "計算1-1", "受取配当金の益金不算入", ["受取配当等"]),
+        _p("calc-1-1-002", "計算1-1", "交際費等の損金不算入", ["交際費"]),
+        _p("theory-001", "理論", "役員給与の損金不算入", ["役員給与"], "理論"),
+    ])
+    first = update_duplicate_groups(ProblemsMaster(tmp_path))
+    assert (first.groups, first.computed, first.changed) == (0, 3, 0)
+
+    theory_shard = tmp_path / "problems" / "理論.json"
+    before = theory_shard.stat().st_mtime_ns
+    ProblemsMaster(tmp_path).merge([_p("calc-2-1-001", "計算2-1", "受取配当金の益金不算入", ["受取配当等"])])
+    second = update_duplicate_groups(ProblemsMaster(tmp_path))
+    assert (second.groups, second.grouped, second.changed, second.computed) == (1, 2, 2, 1)
+    assert theory_shard.stat().st_mtime_ns == before
+
+    reopened = ProblemsMaster(tmp_path)
+    assert reopened["calc-2-1-001"]["duplicate_group"] == "dup:calc-1-1-001"
+    assert reopened["calc-1-1-001"]["duplicate_group"] == "dup:calc-1-1-001"
+    assert update_duplicate_groups(reopened).changed == 0
@@ -0,0 +1,59 @@
+"""problem_extraction のテスト。"""
+
+import json
+
+import pytest
+
+from lib.problem_extraction import id_prefix_for, merge_into_master, parse_problems
+from lib.problems_master import ProblemsMaster
+
+
+def test_id_prefix():
+    assert id_prefix_for("法人計算問題集4-1", "計算") == "calc-4-1"
+    assert id_prefix_for("理論問題集", "理論") == "theory"
+    with pytest.raises(ValueError):
+        id_prefix_for("法人計算問題集", "計算")
+
+
+def test_parse_problems_normalizes_fields():
+    raw = "出力です\n```json\n" + json.dumps([
+        {"id": "calc-4-1-7", "number": "問題 7", "title": "総合問題", "scope": "?", "topics": ["減価償却", " "], "page": "12", "rank": "a"},
+        {"title": "交際費", "time_min": "x"},
+    ], ensure_ascii=False) + "\n```\n"
+    problems = parse_problems(raw, "法人計算問題集4-1", "計算", "calc-4-1")
+    assert [p["id"] for p in problems] == ["calc-4-1-007", "calc-4-1-002"]
+    assert problems[0]["scope"] == "総合"
+    assert problems[0]["topics"] == ["減価償却"]
+    assert problems[0]["page"] == 12
+    assert problems[0]["rank"] == "A"
+    assert problems[1]["number"] == "問題 2"
+    assert problems[1]["time_min"] == 0
+
+
+def test_parse_problems_keeps_only_valid_bbox():
+    raw = json.dumps([
+        {"id": "calc-4-1-001", "bbox": [0.05, 0.1, 0.95, 0.55559]},
+        {"id": "calc-4-1-002", "bbox": [0.9, 0.1, 0.1, 0.5]},
+        {"id": "calc-4-1-003", "bbox": "上半分"},
+    ])
+    problems = parse_problems(raw, "法人計算問題集4-1", "計算", "calc-4-1")
+    assert problems[0]["bbox"] == [0.05, 0.1, 0.95, 0.5556]
+    assert "bbox" not in problems[1] and "bbox" not in problems[2]
+
+
+def test_parse_problems_rejects_duplicate_ids():
+    raw = json.dumps([{"id": "theory-1"}, {"id": "theory-001"}])
+    with pytest.raises(ValueError, match="ID重複"):
+        parse_problems(raw, "理論問題集", "理論", "theory")
+
+
+def test_merge_into_master_replaces_same_book_only(tmp_path):
+    first = [{"id": "calc-4-1-001", "book": "A", "title": "old"}]
+    assert merge_into_master(tmp_path, first) == 1
+
+    # 同じ問題集の再実行は置き換え
+    assert merge_into_master(tmp_path, [{"id": "calc-4-1-001", "book": "A", "title": "new"}]) == 1
+    assert ProblemsMaster(tmp_path)["calc-4-1-001"]["title"] == "new"
+
+    with pytest.raises(ValueError, match="ID重複"):
+        merge_into_master(tmp_path, [{"id": "calc-4-1-001", "book": "B"}])
@@ -0,0 +1,86 @@
+"""problem_schema のテスト。"""
+
+import json
+
+from lib.problem_schema import SchemaError, compile_schema, main, validate_master, validate_problems
+
+
+def _problem(n, **fields):
+    problem = {
+        "id": f"calc-4-1-{n:03d}",
+        "book": "法人計算問題集4-1",
+        "number": f"問題 {n}",
+        "title": "減価償却",
+        "type": "計算",
+        "scope": "個別",
+        "topics": ["減価償却"],
+        "page": n,
+        "time_min": 15,
+        "rank": "A",
+    }
+    problem.update(fields)
+    return problem
+
+
+def test_valid_records_pass():
+    normalized = _problem(2, normalized_topics=["減価償却"], parent_category="損金", duplicate_group=None)
+    assert validate_problems([_problem(1), normalized, _problem(3, id="theory-010", type="理論")]) == []
+
+
+def test_reports_every_error_with_index():
+    bad = _problem(2, rank="S", scope="全体", page="12", topics=["a", 1], extra=True)
+    del bad["title"]
+    errors = validate_problems([_problem(1), bad, _problem(3, id="calc-4-1-3", time_min=-1)])
+
+    found = {(e.index, e.field) for e in errors}
+    assert found == {
+        (1, "rank"),
+        (1, "scope"),
+        (1, "page"),
+        (1, "topics[1]"),
+        (1, "extra"),
+        (1, "title"),
+        (2, "id"),
+        (2, "time_min"),
+    }
+    assert str(SchemaError(1, "rank", "x")) == "problems[1].rank: x"
+
+
+def test_bool_is_not_integer_and_non_object_items():
+    errors = validate_problems([_problem(1, page=True), "問題2"])
+    assert [(e.index, e.field) for e in errors] == [(0, "page"), (1, "")]
+
+
+def test_duplicate_ids_in_one_pass():
+    errors = validate_problems([_problem(1), _problem(2), _problem(1, title="別")])
+    assert [(e.index, e.field) for e in errors] == [(2, "id")]
+    assert "ID重複" in errors[0].message
+
+
+def test_validate_master_checks_keys_and_records(tmp_path, capsys):
+    master = {"version": 1, "problems": {"calc-4-1-001": _problem(1), "calc-4-1-009": _problem(2, rank="D")}}
+    errors = validate_master(master)
+    assert {(e.index, e.field) for e in errors} == {("calc-4-1-009", "id"), ("calc-4-1-009", "rank")}
+    assert validate_master({"problems": []})[0].message.startswith("master の problems")
+
+    path = tmp_path / "problems_master.json"
+    path.write_text(json.dumps(master, ensure_ascii=False), encoding="utf-8")
+    assert main([str(path)]) == 1
+    assert 'problems["calc-4-1-009"].rank' in capsys.readouterr().err
+    master["problems"]["calc-4-1-002"] = master["problems"].pop("calc-4-1-009")
+    master["problems"]["calc-4-1-002"]["rank"] = ""
+    path.write_text(json.dumps(master, ensure_ascii=False), encoding="utf-8")
+    assert main([str(path)]) == 0
+
+
+def test_compile_schema_handles_union_types_and_nesting():
+    check = compile_schema({"type": "object", "properties": {"v": {"type": ["string", "null"]}, "xs": {"type": "array", "items": {"type": "integer", "minimum": 1}}}})
+    errors = []
+    check({"v": None, "xs": [1, 0, "2"]}, 0, "", errors)
+    assert [e.field for e in errors] == ["xs[1]", "xs[2]"]
+
+
+def test_optional_bbox_is_four_fractions():
+    ok = _problem(1, bbox=[0, 0.25, 1, 0.75])
+    errors = validate_problems([ok, _problem(2, bbox=[0, 0.2, 1.5]), _problem(3)])
+    assert [(e.index, e.field) for e in errors] == [(1, "bbox"), (1, "bbox[2]")]
@@ -0,0 +1,98 @@
+"""problems_master のテスト。"""
+
+import json
+
+import pytest
+
+from lib.problems_master import ProblemsMaster
+
+
+def _p(pid, book, **fields):
+    return {"id": pid, "book": book, "title": pid, **fields}
+
+
+def _legacy(export_dir, problems):
+    path = export_dir / "problems_master.json"
+    path.write_text(
+        json.dumps({"version": 1, "total": len(problems), "problems": {p["id"]: p for p in problems}}, ensure_ascii=False),
+        encoding="utf-8",
+    )
+    return path
+
+
+def test_merge_writes_one_shard_per_book(tmp_path):
+    master = ProblemsMaster(tmp_path)
+    assert not master.found and len(master) == 0
+    assert master.merge([_p("calc-4-1-001", "計算4-1"), _p("calc-4-1-002", "計算4-1"), _p("theory-001", "理論")]) == 3
+
+    manifest = json.loads((tmp_path / "problems" / "_manifest.json").read_text(encoding="utf-8"))
+    assert manifest["total"] == 3
+    assert manifest["shards"]["計算4-1"]["count"] == 2
+    assert manifest["shards"]["理論"]["id_prefixes"] == ["theory"]
+    assert ProblemsMaster(tmp_path).verify() == []
+
+    # 別の問題集のマージは既存シャードを書き直さない
+    theory_shard = tmp_path / "problems" / "理論.json"
+    before = theory_shard.stat().st_mtime_ns
+    ProblemsMaster(tmp_path).merge([_p("calc-4-2-001", "計算4-2")])
+    assert theory_shard.stat().st_mtime_ns == before
+    assert ProblemsMaster(tmp_path).books() == ["計算4-1", "理論", "計算4-2"]
+
+
+def test_lookup_loads_only_matching_shard(tmp_path):
+    ProblemsMaster(tmp_path).merge([_p("calc-4-1-001", "計算4-1"), _p("theory-001", "理論", rank="A")])
+
+    master = ProblemsMaster(tmp_path)
+    assert master["theory-001"]["rank"] == "A"
+    assert master.get("calc-9-9-001") is None
+    assert "calc-4-1-001" not in master._shards.get("理論", {})
+    assert set(master._shards) == {"理論"}  # 計算4-1 のシャードは読んでいない
+    assert master.count("計算4-1") == 1 and len(master) == 2
+    assert dict(master.items()) == {"calc-4-1-001": _p("calc-4-1-001", "計算4-1"), "theory-001": _p("theory-001", "理論", rank="A")}
+
+
+def test_collision_with_other_book_changes_nothing(tmp_path):
+    ProblemsMaster(tmp_path).merge([_p("theory-001", "理論A")])
+    with pytest.raises(ValueError, match="ID重複: theory-001"):
+        ProblemsMaster(tmp_path).merge([_p("theory-002", "理論B"), _p("theory-001", "理論B")])
+    assert ProblemsMaster(tmp_path).books() == ["理論A"]
+
+
+def test_legacy_file_is_read_then_migrated_on_merge(tmp_path):
+    _legacy(tmp_path, [_p("calc-1-1-001", "計算1-1"), _p("theory-001", "理論")])
+
+    master = ProblemsMaster(tmp_path)
+    assert not master.sharded and master.found
+    assert master["theory-001"]["book"] == "理論"
+    assert master.export_legacy() is False  # 従来ファイルが正本のうちは書き出さない
+
+    assert master.merge([_p("calc-1-1-002", "計算1-1")]) == 3
+    reopened = ProblemsMaster(tmp_path)
+    assert reopened.sharded and reopened.count("計算1-1") == 2
+    # 移行前の従来ファイルは残さない（push の元にならない）
+    assert not (tmp_path / "problems_master.json").exists()
+
+    # 別の書き出し先は、既定の書き出し先の記録に影響しない
+    other = tmp_path / "other.json"
+    assert reopened.export_legacy(other) is True
+    assert reopened.export_legacy() is True
+    assert len(json.loads((tmp_path / "problems_master.json").read_text(encoding="utf-8"))["problems"]) == 3
+    assert reopened.export_legacy(other) is False and reopened.export_legacy() is False
+
+
+def test_export_legacy_only_when_changed(tmp_path):
+    master = ProblemsMaster(tmp_path)
+    master.merge([_p("calc-4-1-001", "計算4-1"), _p("theory-001", "理論")])
+    legacy = tmp_path / "problems_master.json"
+
+    assert master.export_legacy() is True
+    data = json.loads(legacy.read_text(encoding="utf-8"))
+    assert data["total"] == 2 and set(data["problems"]) == {"calc-4-1-001", "theory-001"}
+    assert ProblemsMaster(tmp_path).export_legacy() is False
+
+    ProblemsMaster(tmp_path).merge([_p("theory-001", "理論", title="改訂")])
+    assert ProblemsMaster(tmp_path).export_legacy() is True
+    assert json.loads(legacy.read_text(encoding="utf-8"))["problems"]["theory-001"]["title"] == "改訂"
+
+    # 明示した従来ファイルを開くとシャードではなくそのファイルを読む
+    assert ProblemsMaster.open(legacy)["theory-001"]["title"] == "改訂"
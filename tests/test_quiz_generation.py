@@ -4,6 +4,7 @@ from datetime import date, timedelta
 from lib.quiz_generation import (
     add_priority_balanced_with_problem_cap,
     build_carryover_topics,
+    drop_duplicate_problems,
 )
 
 
@@ -173,3 +174,16 @@ def test_carryover_counts_toward_daily_problem_cap():
     assert current_count == 35
     assert selected_topic_count == 3
     assert cap_reached is True
+
+
+def test_duplicate_group_is_served_once_per_day():
+    db = {
+        "a1": {"duplicate_group": "dup:a1"},
+        "b7": {"duplicate_group": "dup:a1"},
+        "c1": {"duplicate_group": None},
+        "c2": {},
+    }
+    seen: set[str] = set()
+    assert drop_duplicate_problems(["a1", "c1"], db, seen) == ["a1", "c1"]
+    assert drop_duplicate_problems(["b7", "c2", "missing"], db, seen) == ["c2", "missing"]
+    assert seen == {"dup:a1"}
@@ -0,0 +1,91 @@
+"""source_registry のテスト。"""
+
+import json
+import threading
+
+from lib.houjinzei_common import VaultPaths
+from lib.ingest_queue import scan_pending
+from lib.source_registry import SourceRegistry
+
+
+def _pdf(vp, name, content):
+    path = vp.sources / name
+    path.write_bytes(content)
+    return path
+
+
+def test_register_and_lookup_by_hash_and_alias(tmp_vault):
+    vp = VaultPaths(tmp_vault)
+    a = _pdf(vp, "計算問題集①.pdf", b"%PDF one")
+    copy = _pdf(vp, "計算問題集① (1).pdf", b"%PDF one")
+
+    registry = SourceRegistry(vp)
+    with registry.transaction():
+        sha = registry.register(a, "計算問題集", status="ingesting")
+    assert registry.ingested_as(copy) is None
+
+    with registry.transaction():
+        registry.update(sha, page_count=3, text_sha256="abc")
+        registry.mark_ingested(sha, topics_file="x_topics.json")
+
+    reloaded = SourceRegistry(vp)
+    assert reloaded.ingested_as(copy) == "計算問題集①"  # 別名でも内容で一致
+    entry = reloaded.lookup_name("計算問題集①")
+    assert entry["status"] == "ingested"
+    assert entry["page_count"] == 3
+    # 従来形式の processed にも残る
+    data = json.loads(vp.index_json.read_text(encoding="utf-8"))
+    assert [e["filename"] for e in data["processed"]] == ["計算問題集①"]
+
+
+def test_renamed_pdf_is_recognized(tmp_vault):
+    vp = VaultPaths(tmp_vault)
+    path = _pdf(vp, "old.pdf", b"%PDF body")
+    registry = SourceRegistry(vp)
+    with registry.transaction():
+        registry.mark_ingested(registry.register(path, "模試"))
+    renamed = path.rename(vp.sources / "模試_第1回.pdf")
+    assert SourceRegistry(vp).ingested_as(renamed) == "old"
+
+
+def test_legacy_entries_match_by_filename_and_are_migrated(tmp_vault):
+    vp = VaultPaths(tmp_vault)
+    vp.index_json.write_text(json.dumps({"processed": [{"filename": "計算問題集①"}]}), encoding="utf-8")
+    _pdf(vp, "計算問題集①.pdf", b"%PDF legacy")
+    _pdf(vp, "計算問題集①_copy.pdf", b"%PDF legacy")
+
+    pending, _ = scan_pending(vp)
+    assert pending == []  # 従来エントリはファイル名、そのコピーは移行後の内容ハッシュで一致
+    entry = SourceRegistry(vp).lookup_name("計算問題集①_copy")
+    assert entry["status"] == "ingested"
+    assert set(entry["filenames"]) == {"計算問題集①", "計算問題集①_copy"}
+
+
+def test_identify_reuses_recorded_hash(tmp_vault, monkeypatch):
+    vp = VaultPaths(tmp_vault)
+    path = _pdf(vp, "模試.pdf", b"%PDF x")
+    registry = SourceRegistry(vp)
+    with registry.transaction():
+        sha = registry.identify(path)
+
+    import lib.source_registry as mod
+
+    monkeypatch.setattr(mod, "pdf_sha256", lambda p: (_ for _ in ()).throw(AssertionError("rehashed")))
+    assert SourceRegistry(vp).identify(path) == sha
+
+
+def test_concurrent_transactions_do_not_lose_updates(tmp_vault):
+    vp = VaultPaths(tmp_vault)
+    paths = [_pdf(vp, f"模試{i}.pdf", f"%PDF {i}".encode()) for i in range(8)]
+
+    def register(path):
+        registry = SourceRegistry(vp)
+        with registry.transaction():
+            registry.register(path, "模試", status="ingesting")
+
+    threads = [threading.Thread(target=register, args=(p,)) for p in paths]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(SourceRegistry(vp).data["sources"]) == 8
@@ -0,0 +1,262 @@
+"""stage_dag のテスト。"""
+
+import threading
+import time
+
+import pytest
+
+from lib.stage_dag import Pipeline, StageError
+
+
+def _chain(tmp_path, calls, *, params=None):
+    src = tmp_path / "src.txt"
+    mid = tmp_path / "mid.txt"
+    out = tmp_path / "out.txt"
+    pipe = Pipeline("test", tmp_path / "state.json")
+
+    @pipe.stage(inputs=[src], outputs=[mid], params=params or {})
+    def upper():
+        calls.append("upper")
+        mid.write_text(src.read_text(encoding="utf-8").upper(), encoding="utf-8")
+
+    @pipe.stage(inputs=[mid], outputs=[out], after=["upper"])
+    def wrap():
+        calls.append("wrap")
+        out.write_text(f"[{mid.read_text(encoding='utf-8')}]", encoding="utf-8")
+
+    return pipe
+
+
+def test_second_run_skips_unchanged_stages(tmp_path):
+    (tmp_path / "src.txt").write_text("abc", encoding="utf-8")
+    calls = []
+    results = _chain(tmp_path, calls).run()
+    assert calls == ["upper", "wrap"]
+    assert {r.status for r in results.values()} == {"done"}
+    assert (tmp_path / "out.txt").read_text(encoding="utf-8") == "[ABC]"
+
+    calls.clear()
+    results = _chain(tmp_path, calls).run()
+    assert calls == []
+    assert {r.status for r in results.values()} == {"cached"}
+
+
+def test_input_change_reruns_downstream(tmp_path):
+    src = tmp_path / "src.txt"
+    src.write_text("abc", encoding="utf-8")
+    calls = []
+    _chain(tmp_path, calls).run()
+
+    src.write_text("abcd", encoding="utf-8")
+    calls.clear()
+    _chain(tmp_path, calls).run()
+    assert calls == ["upper", "wrap"]
+    assert (tmp_path / "out.txt").read_text(encoding="utf-8") == "[ABCD]"
+
+
+def test_same_output_content_keeps_downstream_cached(tmp_path):
+    src = tmp_path / "src.txt"
+    src.write_text("abc", encoding="utf-8")
+    calls = []
+    _chain(tmp_path, calls).run()
+
+    src.write_text("ABC", encoding="utf-8")  # upper の出力は同じ
+    calls.clear()
+    _chain(tmp_path, calls).run()
+    assert calls == ["upper"]
+
+
+def test_param_change_reruns_stage(tmp_path):
+    (tmp_path / "src.txt").write_text("abc", encoding="utf-8")
+    calls = []
+    _chain(tmp_path, calls, params={"v": 1}).run()
+    calls.clear()
+    _chain(tmp_path, calls, params={"v": 2}).run()
+    assert calls[0] == "upper"
+
+
+def test_tampered_or_missing_output_reruns_stage(tmp_path):
+    (tmp_path / "src.txt").write_text("abc", encoding="utf-8")
+    calls = []
+    _chain(tmp_path, calls).run()
+
+    (tmp_path / "out.txt").write_text("edited by hand", encoding="utf-8")
+    calls.clear()
+    _chain(tmp_path, calls).run()
+    assert calls == ["wrap"]
+    assert (tmp_path / "out.txt").read_text(encoding="utf-8") == "[ABC]"
+
+    (tmp_path / "mid.txt").unlink()
+    calls.clear()
+    _chain(tmp_path, calls).run()
+    assert calls == ["upper"]  # mid を作り直すと内容は同じなので wrap は再利用
+
+
+def test_invalidate_forces_rerun(tmp_path):
+    (tmp_path / "src.txt").write_text("abc", encoding="utf-8")
+    calls = []
+    _chain(tmp_path, calls).run()
+    calls.clear()
+    pipe = _chain(tmp_path, calls)
+    pipe.invalidate("wrap")
+    pipe.run()
+    assert calls == ["wrap"]
+
+
+def test_failure_blocks_downstream_and_is_retried(tmp_path):
+    out = tmp_path / "out.txt"
+    calls = []
+
+    def build(fail):
+        pipe = Pipeline("test", tmp_path / "state.json")
+
+        @pipe.stage(outputs=[out])
+        def first():
+            calls.append("first")
+            out.write_text("x", encoding="utf-8")
+
+        @pipe.stage(after=["first"])
+        def second():
+            calls.append("second")
+            if fail:
+                raise StageError("boom")
+
+        @pipe.stage(after=["second"])
+        def third():
+            calls.append("third")
+
+        return pipe
+
+    with pytest.raises(StageError, match="second: boom"):
+        build(True).run()
+    assert calls == ["first", "second"]
+
+    calls.clear()
+    results = build(False).run()
+    assert calls == ["second", "third"]
+    assert results["first"].status == "cached"
+
+
+def test_failure_does_not_block_independent_branch(tmp_path):
+    pipe = Pipeline("test", tmp_path / "state.json")
+    calls = []
+
+    @pipe.stage(cache=False)
+    def a():
+        calls.append("a")
+        raise StageError("boom")
+
+    @pipe.stage(cache=False, after=["a"])
+    def a2():
+        calls.append("a2")
+
+    @pipe.stage(cache=False, after=["a2"])
+    def a3():
+        calls.append("a3")
+
+    @pipe.stage(cache=False)
+    def b():
+        calls.append("b")
+
+    @pipe.stage(cache=False, after=["b"])
+    def c():
+        calls.append("c")
+
+    with pytest.raises(StageError, match="a: boom"):
+        pipe.run()
+    assert sorted(calls) == ["a", "b", "c"]
+
+
+def test_missing_declared_output_is_failure(tmp_path):
+    pipe = Pipeline("test", tmp_path / "state.json")
+
+    @pipe.stage(outputs=[tmp_path / "never.txt"])
+    def lazy():
+        pass
+
+    with pytest.raises(StageError, match="never.txt"):
+        pipe.run()
+
+
+def test_partial_stage_runs_downstream_and_reruns_next_time(tmp_path):
+    out = tmp_path / "out.txt"
+    calls = []
+
+    def build():
+        pipe = Pipeline("test", tmp_path / "state.json")
+
+        @pipe.stage(outputs=[out])
+        def flaky():
+            calls.append("flaky")
+            out.write_text("part", encoding="utf-8")
+            return False
+
+        @pipe.stage(inputs=[out], after=["flaky"])
+        def consume():
+            calls.append("consume")
+
+        return pipe
+
+    pipe = build()
+    results = pipe.run()
+    assert results["flaky"].status == "partial"
+    assert pipe.recorded_status("flaky") == "partial" and pipe.recorded_status("consume") == "done"
+    assert calls == ["flaky", "consume"]
+    calls.clear()
+    build().run()
+    assert calls == ["flaky"]  # 出力は同じなので consume は再利用
+
+
+def test_independent_stages_run_concurrently(tmp_path):
+    pipe = Pipeline("test", tmp_path / "state.json", workers=3)
+    barrier = threading.Barrier(3, timeout=5)
+
+    for n in range(3):
+
+        @pipe.stage(name=f"s{n}", cache=False)
+        def wait_for_others():
+            barrier.wait()  # 3 ステージが同時に走っていなければタイムアウトする
+
+    started = time.monotonic()
+    results = pipe.run()
+    assert time.monotonic() - started < 5
+    assert {r.status for r in results.values()} == {"done"}
+
+
+def test_callable_inputs_resolved_after_upstream(tmp_path):
+    listing = tmp_path / "list.txt"
+    calls = []
+
+    def build():
+        pipe = Pipeline("test", tmp_path / "state.json")
+
+        @pipe.stage(outputs=[listing])
+        def produce():
+            for name in ("a", "b"):
+                (tmp_path / f"{name}.part").write_text(name, encoding="utf-8")
+            listing.write_text("a.part\nb.part\n", encoding="utf-8")
+
+        def parts():
+            return [tmp_path / line for line in listing.read_text(encoding="utf-8").split()]
+
+        @pipe.stage(inputs=[listing, parts], after=["produce"])
+        def combine():
+            calls.append("combine")
+
+        return pipe
+
+    build().run()
+    assert calls == ["combine"]
+    (tmp_path / "b.part").write_text("changed", encoding="utf-8")
+    calls.clear()
+    build().run()
+    assert calls == ["combine"]
+
+
+def test_unknown_upstream_is_rejected(tmp_path):
+    pipe = Pipeline("test", tmp_path / "state.json")
+    with pytest.raises(ValueError):
+
+        @pipe.stage(after=["missing"])
+        def orphan():
+            pass
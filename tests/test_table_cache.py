@@ -0,0 +1,43 @@
+"""table_cache のテスト。"""
+
+import json
+import os
+
+from lib.table_cache import load_table
+
+
+def test_load_table_writes_and_reuses_marshal_cache(tmp_path):
+    src = tmp_path / "sample.json"
+    src.write_text(json.dumps({"map": {"a": "b"}}), encoding="utf-8")
+
+    assert load_table("sample", str(tmp_path)) == {"map": {"a": "b"}}
+    cache = tmp_path / "sample.marshal"
+    assert cache.exists()
+
+    # 2回目はキャッシュから同じ内容を返す
+    assert load_table("sample", str(tmp_path)) == {"map": {"a": "b"}}
+
+
+def test_load_table_ignores_stale_cache(tmp_path):
+    src = tmp_path / "sample.json"
+    src.write_text(json.dumps({"v": 1}), encoding="utf-8")
+    assert load_table("sample", str(tmp_path)) == {"v": 1}
+
+    src.write_text(json.dumps({"v": 22}), encoding="utf-8")
+    st = src.stat()
+    os.utime(src, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert load_table("sample", str(tmp_path)) == {"v": 22}
+
+
+def test_load_table_survives_corrupt_cache(tmp_path):
+    (tmp_path / "sample.json").write_text('{"ok": true}', encoding="utf-8")
+    (tmp_path / "sample.marshal").write_bytes(b"\x00garbage")
+    assert load_table("sample", str(tmp_path)) == {"ok": True}
+
+
+def test_topic_tables_are_loaded_lazily():
+    import lib.topic_normalize as tn
+
+    assert len(tn.TOPIC_MAP) > 0
+    assert tn.PREFIX_MAP == tuple(sorted(tn.PREFIX_MAP, key=lambda x: len(x[0]), reverse=True))
+    assert tn.CATEGORY_MAP["交際費等"] == "交際費等・隣接費用"
@@ -43,3 +43,38 @@ def test_variant_examples():
     assert normalize_topic("受取配当等の益金不算入（特別分配金）") == "受取配当等"
     assert normalize_topic("工事進行基準（一括評価金銭債権）") == "貸倒引当金_一括"
     assert get_parent_category("貸倒引当金_一括") == "引当金・準備金"
+
+
+def test_fuzzy_suggestion_for_unseen_variant():
+    from lib.topic_normalize import is_known_topic, suggest_topic
+
+    raw = "中小企業者等の判定"  # 判断 → 判定 の表記ゆれ
+    assert not is_known_topic(raw)
+    assert normalize_topic(raw) == raw
+
+    suggestion = suggest_topic(raw)
+    assert suggestion.matched == "中小企業者等の判断"
+    assert suggestion.normalized == "中小企業者等判定"
+    assert suggestion.distance == 1
+    assert 0.75 <= suggestion.confidence < 1
+    assert normalize_topic(raw, fuzzy=True) == "中小企業者等判定"
+
+
+def test_fuzzy_below_threshold_is_suggestion_only():
+    from lib.topic_normalize import FUZZY_MIN_CONFIDENCE, suggest_topic
+
+    raw = "仮装経理に基づく過大申告の取扱い"
+    suggestion = suggest_topic(raw)
+    assert suggestion.normalized == "仮装経理"
+    assert suggestion.confidence < FUZZY_MIN_CONFIDENCE
+    assert normalize_topic(raw, fuzzy=True) == raw
+
+
+def test_fuzzy_keeps_unrelated_topic_unchanged():
+    from lib.topic_normalize import suggest_topic
+
+    raw = "全く無関係な文字列です"
+    assert suggest_topic(raw) is None
+    assert normalize_topic(raw, fuzzy=True) == raw
+    # exact/prefix hits never go through the fuzzy stage
+    assert normalize_topic("別表五㈠Ⅰの作成", fuzzy=True) == "別表五(一)"